@@ -1,7 +1,12 @@
 import jwt
 from datetime import datetime, timedelta
 import os
+from bson import ObjectId
 from dotenv import load_dotenv
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from motor.motor_asyncio import AsyncIOMotorClient
+from database.connection import get_database
 
 load_dotenv()
 
@@ -22,5 +27,24 @@ def verify_token(token: str):
         return payload
     except jwt.ExpiredSignatureError:
         raise Exception("Token has expired")
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise Exception("Invalid token")
+
+security = HTTPBearer()
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncIOMotorClient = Depends(get_database)
+):
+    try:
+        payload = verify_token(credentials.credentials)
+        user_id = ObjectId(payload["sub"])
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
+    user = await db.users.find_one({"_id": user_id})
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+
+    user["_id"] = str(user["_id"])
+    return user
@@ -1,5 +1,7 @@
-from fastapi import FastAPI, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Depends, HTTPException, status, WebSocket, WebSocketDisconnect, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
@@ -8,11 +10,10 @@ from typing import List, Optional
 import jwt
 import bcrypt
 from models.user import User, UserCreate, UserLogin, UserResponse
-from models.delivery import Delivery, DeliveryCreate, DeliveryResponse
+from models.delivery import Delivery, DeliveryCreate, DeliveryResponse, RiderLocationUpdate
 from models.order import Order, OrderCreate, OrderResponse
-from models.payment import PaymentRequest, PaymentResponse
+from models.payment import PaymentCalculation, PaymentRequest, PaymentResponse, PaymentType
 from models.bank_account import BankAccount, BankAccountCreate
-from models.verification import DocumentVerification, VerificationStatus
 from models.commission import Commission
 from database.connection import get_database
 from auth.jwt_handler import create_access_token, get_current_user
@@ -22,9 +23,64 @@ from services.websocket_service import websocket_service
 from services.google_maps_service import google_maps_service
 from services.notification_service import notification_service
 from services.bournemoutheats_api_service import bournemoutheats_api_service
+from services.order_webhook import order_webhook
+from services.registry import service_registry
+from services.demand_heatmap import demand_heatmap
+from services.earnings_ledger import earnings_ledger
+from services.money import PENCE_PER_POUND, from_pence
+from services.dispatch_engine import DispatchEngine
+from services.prep_time_model import prep_time_model, restaurant_key
+from services.rider_locations import record_rider_location
+from contextlib import asynccontextmanager
+import os
+import json
 import random
 
-app = FastAPI(title="BournemouthEats Rider API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # External services are built lazily on first use; EAGER_SERVICES lists any
+    # (comma-separated registry names) that should be built before serving
+    eager_services = [name.strip() for name in os.getenv("EAGER_SERVICES", "").split(",") if name.strip()]
+    if eager_services:
+        service_registry.warm(eager_services)
+    
+    # Seed the in-memory demand heatmap once; it is updated incrementally afterwards
+    try:
+        await demand_heatmap.load_from_database(await get_database())
+    except Exception as e:
+        print(f"Error loading demand heatmap: {e}")
+    
+    try:
+        await earnings_ledger.ensure_indexes(await get_database())
+        # Users from before totals were kept in pence, then payments interrupted
+        # part-way on a server without transactions
+        await earnings_ledger.backfill_user_totals(await get_database())
+        await earnings_ledger.apply_pending_entries(await get_database())
+    except Exception as e:
+        print(f"Error preparing earnings ledger: {e}")
+    
+    try:
+        await prep_time_model.load_from_database(await get_database())
+    except Exception as e:
+        print(f"Error loading preparation time model: {e}")
+    
+    try:
+        await priority_service.load_from_database(await get_database())
+    except Exception as e:
+        print(f"Error loading rider priority queue: {e}")
+    
+    # Building the API service only when auto-import is on keeps it lazy otherwise
+    if os.getenv("BOURNEMOUTHEATS_AUTO_IMPORT", "false").lower() == "true":
+        bournemoutheats_api_service.start_auto_import(get_database)
+    
+    # Automatic dispatch is opt-in until it replaces manual assignment
+    if os.getenv("DISPATCH_ENABLED", "false").lower() == "true":
+        dispatch_engine.start(get_database)
+    yield
+    await dispatch_engine.stop()
+    await service_registry.shutdown()
+
+app = FastAPI(title="BournemouthEats Rider API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -42,6 +98,14 @@ security = HTTPBearer()
 priority_service = PriorityService()
 payment_service = PaymentService()
 
+async def notify_dispatch_assignment(assignment: dict):
+    await websocket_service.send_notification_to_rider(assignment["rider_id"], {
+        "type": "order_assigned",
+        **assignment
+    })
+
+dispatch_engine = DispatchEngine(priority_service, on_assignment=notify_dispatch_assignment)
+
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
@@ -94,7 +158,7 @@ async def register(user_data: UserCreate, db: AsyncIOMotorClient = Depends(get_d
     user_dict["is_active"] = False
     user_dict["efficiency_score"] = 100
     user_dict["total_deliveries"] = 0
-    user_dict["total_earnings"] = 0.0
+    user_dict["total_earnings_pence"] = 0
     user_dict["created_at"] = datetime.utcnow()
     
     result = await db.users.insert_one(user_dict)
@@ -220,6 +284,20 @@ async def assign_order_to_rider(order_id: str, rider_id: str, current_user: User
     
     return {"message": "Order assigned successfully"}
 
+@app.get("/admin/dispatch/status")
+async def get_dispatch_status(current_user: User = Depends(get_current_user)):
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return dispatch_engine.get_status()
+
+@app.post("/admin/dispatch/run")
+async def run_dispatch(current_user: User = Depends(get_current_user), db: AsyncIOMotorClient = Depends(get_database)):
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return await dispatch_engine.run_tick(db)
+
 @app.get("/admin/rider-performance")
 async def get_rider_performance(current_user: User = Depends(get_current_user), db: AsyncIOMotorClient = Depends(get_database)):
     if current_user["role"] != "Admin":
@@ -232,7 +310,7 @@ async def get_rider_performance(current_user: User = Depends(get_current_user),
             "name": "$full_name",
             "efficiency_score": "$efficiency_score",
             "total_deliveries": "$total_deliveries",
-            "total_earnings": "$total_earnings",
+            "total_earnings": {"$divide": [{"$ifNull": ["$total_earnings_pence", 0]}, PENCE_PER_POUND]},
             "average_delivery_time": "$average_delivery_time"
         }}
     ]
@@ -266,11 +344,28 @@ async def get_specific_rider_performance(rider_id: str, current_user: User = Dep
             "name": rider.get("full_name", "Unknown"),
             "efficiency_score": rider.get("efficiency_score", 100),
             "total_deliveries": rider.get("total_deliveries", 0),
-            "total_earnings": rider.get("total_earnings", 0.0)
+            "total_earnings": from_pence(rider.get("total_earnings_pence", 0))
         },
         "deliveries": deliveries
     }
 
+@app.get("/admin/rider-priority")
+async def get_rider_priority(top: int = 10, current_user: User = Depends(get_current_user)):
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return priority_service.get_queue_status(top)
+
+@app.get("/admin/prep-times")
+async def get_prep_times(restaurant: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return {
+        "estimate": prep_time_model.estimate(restaurant.strip().lower() if restaurant else None),
+        "stats": prep_time_model.get_stats()
+    }
+
 @app.get("/admin/payment-reports")
 async def get_payment_reports(current_user: User = Depends(get_current_user), db: AsyncIOMotorClient = Depends(get_database)):
     if current_user["role"] != "Admin":
@@ -281,7 +376,7 @@ async def get_payment_reports(current_user: User = Depends(get_current_user), db
         {"$match": {"role": "Rider"}},
         {"$project": {
             "name": "$full_name",
-            "total_earnings": "$total_earnings",
+            "total_earnings": {"$divide": [{"$ifNull": ["$total_earnings_pence", 0]}, PENCE_PER_POUND]},
             "efficiency_score": "$efficiency_score",
             "bonus_eligible": {"$gte": ["$efficiency_score", 70]}
         }}
@@ -299,15 +394,13 @@ async def award_bonus_to_rider(rider_id: str, bonus_amount: float, current_user:
     if current_user["role"] != "Admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    # Award bonus to rider
-    result = await db.users.update_one(
-        {"_id": ObjectId(rider_id), "role": "Rider"},
-        {"$inc": {"total_earnings": bonus_amount}}
-    )
-    
-    if result.modified_count == 0:
+    rider = await db.users.find_one({"_id": ObjectId(rider_id), "role": "Rider"}, {"_id": 1})
+    if not rider:
         raise HTTPException(status_code=400, detail="Rider not found")
     
+    # Award bonus to rider (ledger entry, weekly rollup and total_earnings_pence together)
+    await earnings_ledger.record_bonus(db, rider_id, bonus_amount, notes=f"Awarded by {current_user.get('email', 'admin')}")
+    
     return {"message": f"Bonus of ${bonus_amount} awarded successfully"}
 
 @app.get("/admin/incident-alerts")
@@ -353,8 +446,11 @@ async def update_payment_settings(settings: dict, current_user: User = Depends(g
     if current_user["role"] != "Admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    payment_service.update_settings(settings)
-    return {"message": "Payment settings updated successfully"}
+    try:
+        version = payment_service.update_settings(settings, updated_by=current_user.get("email", "admin"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": "Payment settings updated successfully", "pricing_version": version}
 
 @app.post("/admin/calculate-payment")
 async def calculate_payment(request: PaymentRequest, current_user: User = Depends(get_current_user)):
@@ -366,20 +462,44 @@ async def calculate_payment(request: PaymentRequest, current_user: User = Depend
         pickup_lng=request.pickup_lng,
         delivery_lat=request.delivery_lat,
         delivery_lng=request.delivery_lng,
-        rider_efficiency=request.rider_efficiency,
-        estimated_time=request.estimated_time,
-        peak_hours=request.peak_hours,
+        efficiency_percentage=request.efficiency_percentage,
+        order_value=request.order_value,
+        is_peak_hour=request.is_peak_hour,
         weather_conditions=request.weather_conditions
     )
     
     return PaymentResponse(**payment_data)
 
+@app.get("/admin/quote-cache/status")
+async def get_quote_cache_status(current_user: User = Depends(get_current_user)):
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return payment_service.quote_cache.get_stats()
+
 @app.get("/admin/weekly-payout-report")
-async def get_weekly_payout_report(current_user: User = Depends(get_current_user)):
+async def get_weekly_payout_report(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    include_details: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorClient = Depends(get_database)
+):
     if current_user["role"] != "Admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    return payment_service.generate_weekly_payout_report()
+    # Per-rider details are streamed out as they are aggregated rather than built up in memory
+    if include_details:
+        return StreamingResponse(
+            payment_service.stream_weekly_payout_report_json(db, start_date=start_date, end_date=end_date),
+            media_type="application/json"
+        )
+    
+    return await payment_service.generate_weekly_payout_report_from_db(
+        db,
+        start_date=start_date,
+        end_date=end_date
+    )
 
 # Phase 5 Features
 @app.get("/admin/google-maps/status")
@@ -396,12 +516,49 @@ async def get_high_demand_zones(current_user: User = Depends(get_current_user)):
     
     return google_maps_service.get_high_demand_zones()
 
+@app.put("/admin/google-maps/high-demand-zones")
+async def update_high_demand_zones(zones: List[dict], current_user: User = Depends(get_current_user)):
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    try:
+        version = google_maps_service.update_high_demand_zones(zones)
+    except (KeyError, ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid zone definition: {e}")
+
+    return {"message": "High-demand zones updated successfully", "version": version}
+
+@app.get("/admin/google-maps/zone-lookup")
+async def lookup_demand_zone(lat: float, lng: float, current_user: User = Depends(get_current_user)):
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    zone = google_maps_service.get_zone_for_location(lat, lng)
+    return {"in_zone": zone is not None, "zone": zone}
+
 @app.post("/admin/google-maps/calculate-route")
 async def calculate_route(origin: dict, destination: dict, current_user: User = Depends(get_current_user)):
     if current_user["role"] != "Admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    return google_maps_service.calculate_route(origin, destination)
+    try:
+        origin_point = (float(origin["lat"]), float(origin["lng"]))
+        destination_point = (float(destination["lat"]), float(destination["lng"]))
+    except (KeyError, ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid coordinates: {e}")
+    
+    # Maps calls block on the quota scheduler; keep them off the event loop
+    return await run_in_threadpool(google_maps_service.calculate_distance_and_time, origin_point, destination_point)
+
+@app.get("/admin/demand-heatmap")
+async def get_demand_heatmap(window: str = "15m", kind: str = "pickup", current_user: User = Depends(get_current_user)):
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        return demand_heatmap.get_heatmap(window=window, kind=kind)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/admin/notification-service/status")
 async def get_notification_service_status(current_user: User = Depends(get_current_user)):
@@ -439,18 +596,78 @@ async def get_bournemoutheats_import_stats(current_user: User = Depends(get_curr
     return bournemoutheats_api_service.get_import_stats()
 
 @app.post("/admin/bournemoutheats-api/import-orders")
-async def trigger_bournemoutheats_import(current_user: User = Depends(get_current_user)):
+async def trigger_bournemoutheats_import(current_user: User = Depends(get_current_user), db: AsyncIOMotorClient = Depends(get_database)):
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return await bournemoutheats_api_service.import_orders(db)
+
+@app.get("/admin/bournemoutheats-api/webhook-status")
+async def get_bournemoutheats_webhook_status(current_user: User = Depends(get_current_user)):
     if current_user["role"] != "Admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    return bournemoutheats_api_service.import_orders()
+    return order_webhook.get_status()
+
+@app.post("/admin/bournemoutheats-api/webhook-replay")
+async def replay_bournemoutheats_webhook_events(current_user: User = Depends(get_current_user), db: AsyncIOMotorClient = Depends(get_database)):
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    # Events parked in order_events_failed after their writes kept failing
+    return await order_webhook.replay_failed(db)
+
+@app.post("/webhooks/bournemoutheats/orders", status_code=202)
+async def receive_bournemoutheats_order_events(
+    request: Request,
+    x_bournemoutheats_timestamp: Optional[str] = Header(None),
+    x_bournemoutheats_signature: Optional[str] = Header(None)
+):
+    # Order created/updated events pushed by BournemouthEats; written by background workers
+    body = await request.body()
+    if not order_webhook.verify_signature(body, x_bournemoutheats_timestamp, x_bournemoutheats_signature):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    events = payload.get("events", [payload]) if isinstance(payload, dict) else payload
+    if not isinstance(events, list) or not all(isinstance(event, dict) for event in events):
+        raise HTTPException(status_code=400, detail="Expected an event or a list of events")
+    
+    order_webhook.start(get_database)
+    queued = order_webhook.enqueue(events)
+    if queued is None:
+        raise HTTPException(status_code=503, detail="Order queue is full", headers={"Retry-After": "5"})
+    
+    return {"received": len(events), "queued": queued}
 
 @app.put("/admin/bournemoutheats-api/settings")
 async def update_bournemoutheats_settings(settings: dict, current_user: User = Depends(get_current_user)):
     if current_user["role"] != "Admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    return bournemoutheats_api_service.update_settings(settings)
+    import_settings = {
+        key: settings[key]
+        for key in (
+            "auto_import_enabled", "import_interval_minutes", "max_orders_per_import",
+            "max_pages_per_import", "import_concurrency"
+        )
+        if key in settings
+    }
+    bournemoutheats_api_service.update_import_settings(**import_settings)
+    if import_settings.get("auto_import_enabled") is True:
+        bournemoutheats_api_service.start_auto_import(get_database)
+    elif import_settings.get("auto_import_enabled") is False:
+        await bournemoutheats_api_service.stop_auto_import()
+    return bournemoutheats_api_service.get_import_stats()
+
+@app.get("/admin/services/status")
+async def get_services_status(current_user: User = Depends(get_current_user)):
+    if current_user["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return service_registry.get_status()
 
 @app.get("/admin/websocket-service/status")
 async def get_websocket_service_status(current_user: User = Depends(get_current_user)):
@@ -460,6 +677,16 @@ async def get_websocket_service_status(current_user: User = Depends(get_current_
     return websocket_service.get_status()
 
 # Delivery endpoints
+def _preparation_start_time(delivery: dict) -> Optional[datetime]:
+    """preparation_start_time of a delivery (stored as a datetime or an ISO string)"""
+    preparation_start_time = delivery.get("preparation_start_time")
+    if isinstance(preparation_start_time, str):
+        try:
+            return datetime.fromisoformat(preparation_start_time)
+        except ValueError:
+            return None
+    return preparation_start_time
+
 @app.get("/delivery-requests")
 async def get_delivery_requests(current_user: User = Depends(get_current_user), db: AsyncIOMotorClient = Depends(get_database)):
     if current_user["role"] != "Rider":
@@ -470,6 +697,11 @@ async def get_delivery_requests(current_user: User = Depends(get_current_user),
     cursor = db.deliveries.find({"status": "pending", "rider_id": None})
     async for delivery in cursor:
         delivery["_id"] = str(delivery["_id"])
+        preparation_start_time = _preparation_start_time(delivery)
+        delivery["grace_period_ends_at"] = (
+            priority_service.grace_period_end(preparation_start_time, restaurant_key(delivery)).isoformat()
+            if preparation_start_time else None
+        )
         deliveries.append(delivery)
     
     # Send notification to admin about new delivery requests
@@ -496,6 +728,8 @@ async def accept_delivery(delivery_id: str, current_user: User = Depends(get_cur
         {"_id": ObjectId(current_user["_id"])},
         {"$inc": {"total_deliveries": 1}}
     )
+    await priority_service.record_rider_action(db, str(current_user["_id"]), "accept", delivery_id)
+    priority_service.set_rider_available(str(current_user["_id"]), False)
     
     return {"message": "Delivery accepted successfully"}
 
@@ -509,32 +743,116 @@ async def reject_delivery(delivery_id: str, current_user: User = Depends(get_cur
     if not delivery:
         raise HTTPException(status_code=404, detail="Delivery not found")
     
-    # Check if rejection penalty applies
-    penalty_applies = False
-    if delivery.get("preparation_start_time"):
-        try:
-            prep_time = datetime.fromisoformat(delivery["preparation_start_time"])
-            wait_time = datetime.utcnow() - prep_time
-            if wait_time.total_seconds() < 600:  # 10 minutes
-                penalty_applies = True
-        except ValueError:
-            pass
-    
-    # Apply penalty if needed
-    if penalty_applies:
-        penalty_points = 5
-        await db.users.update_one(
-            {"_id": ObjectId(current_user["_id"])},
-            {"$inc": {"efficiency_score": -penalty_points}}
+    # Record the rejection; a penalty applies inside the preparation grace period
+    recorded = await priority_service.record_rider_action(
+        db, str(current_user["_id"]), "reject", delivery_id, _preparation_start_time(delivery),
+        restaurant=restaurant_key(delivery)
+    )
+    penalty_applies = recorded["penalty_applied"]
+    
+    rider_id = str(current_user["_id"])
+    if delivery.get("dispatch_order_id") is not None and delivery.get("rider_id") == rider_id:
+        # A dispatched job goes back to the dispatch queue as a whole
+        await dispatch_engine.return_job(db, rider_id, delivery["dispatch_order_id"])
+        priority_service.set_rider_available(rider_id, True)
+    else:
+        # Update delivery status
+        await db.deliveries.update_one(
+            {"_id": ObjectId(delivery_id)},
+            {"$set": {"status": "rejected", "rejected_at": datetime.utcnow()}}
+        )
+    
+    return {"message": "Delivery rejected", "penalty_applied": penalty_applies}
+
+@app.post("/delivery-requests/{delivery_id}/picked-up")
+async def pick_up_delivery(delivery_id: str, current_user: User = Depends(get_current_user), db: AsyncIOMotorClient = Depends(get_database)):
+    if current_user["role"] != "Rider":
+        raise HTTPException(status_code=403, detail="Rider access required")
+    
+    picked_up_at = datetime.utcnow()
+    delivery = await db.deliveries.find_one_and_update(
+        {"_id": ObjectId(delivery_id), "rider_id": str(current_user["_id"]), "status": "accepted", "picked_up_at": None},
+        {"$set": {"picked_up_at": picked_up_at}}
+    )
+    if not delivery:
+        raise HTTPException(status_code=400, detail="Delivery not awaiting pickup")
+    
+    # The collection time teaches the restaurant's preparation time
+    preparation_start_time = _preparation_start_time(delivery)
+    if preparation_start_time:
+        prep_time_model.record_preparation(
+            restaurant_key(delivery), preparation_start_time, picked_up_at, str(delivery["_id"])
         )
     
-    # Update delivery status
-    await db.deliveries.update_one(
-        {"_id": ObjectId(delivery_id)},
-        {"$set": {"status": "rejected", "rejected_at": datetime.utcnow()}}
+    return {"message": "Delivery picked up", "picked_up_at": picked_up_at}
+
+@app.post("/delivery-requests/{delivery_id}/complete")
+async def complete_delivery(delivery_id: str, current_user: User = Depends(get_current_user), db: AsyncIOMotorClient = Depends(get_database)):
+    if current_user["role"] != "Rider":
+        raise HTTPException(status_code=403, detail="Rider access required")
+    
+    rider_id = str(current_user["_id"])
+    completed_at = datetime.utcnow()
+    delivery = await db.deliveries.find_one(
+        {"_id": ObjectId(delivery_id), "rider_id": rider_id, "status": "accepted"}
+    )
+    if not delivery:
+        raise HTTPException(status_code=400, detail="Delivery not in progress")
+    
+    efficiency = priority_service.get_rider_efficiency(rider_id).efficiency_percentage
+    distance_km = delivery.get("estimated_distance", 0.0)
+    accepted_at = delivery.get("accepted_at") or delivery.get("created_at") or completed_at
+    delivery_minutes = max(1, int((completed_at - accepted_at).total_seconds() // 60))
+    is_peak = payment_service.is_peak_hour(completed_at)
+    
+    calculation = payment_service.calculate_rider_payment(
+        distance_km=distance_km,
+        delivery_time_minutes=delivery_minutes,
+        efficiency_percentage=efficiency,
+        order_value=0.0,
+        is_peak_hour=is_peak
     )
+    order_id = str(delivery.get("order_id") or delivery["_id"])
+    
+    # Pay first: the delivery only becomes completed once its payment is recorded, and a
+    # retry after a failure here pays (or finishes paying) the same ledger entry exactly once
+    entry = await earnings_ledger.record_delivery_payment(
+        db,
+        rider_id=rider_id,
+        order_id=order_id,
+        calculation=calculation,
+        distance_km=distance_km,
+        delivery_time_minutes=delivery_minutes,
+        efficiency_percentage=efficiency,
+        is_peak_hour=is_peak,
+        when=completed_at
+    )
+    if entry is None or entry["created_at"] != completed_at:
+        # Paid by an earlier attempt; report what was actually recorded
+        payment = await db.payments.find_one({"order_id": order_id, "payment_type": PaymentType.DELIVERY.value})
+        if payment and payment.get("calculation_breakdown"):
+            calculation = PaymentCalculation(**payment["calculation_breakdown"])
+        completed_at = payment["created_at"] if payment else completed_at
+    
+    delivery = await db.deliveries.find_one_and_update(
+        {"_id": delivery["_id"], "status": "accepted"},
+        {"$set": {"status": "completed", "completed_at": completed_at, "rider_payment": calculation.model_dump()}}
+    )
+    if not delivery:
+        raise HTTPException(status_code=400, detail="Delivery not in progress")
     
-    return {"message": "Delivery rejected", "penalty_applied": penalty_applies}
+    # Closes the order and frees the rider once every order of their dispatched job is done
+    await dispatch_engine.finish_delivery(db, delivery, "completed")
+    
+    return {"message": "Delivery completed", "payment": calculation}
+
+@app.put("/rider/location")
+async def update_rider_location(location: RiderLocationUpdate, current_user: User = Depends(get_current_user), db: AsyncIOMotorClient = Depends(get_database)):
+    if current_user["role"] != "Rider":
+        raise HTTPException(status_code=403, detail="Rider access required")
+    
+    updated = await record_rider_location(db, str(current_user["_id"]), location.lat, location.lng)
+    return {"message": "Location updated" if updated else "Location unchanged"}
 
 @app.get("/delivery-history")
 async def get_delivery_history(current_user: User = Depends(get_current_user), db: AsyncIOMotorClient = Depends(get_database)):
@@ -549,6 +867,20 @@ async def get_delivery_history(current_user: User = Depends(get_current_user), d
     
     return deliveries
 
+@app.get("/rider/earnings")
+async def get_rider_earnings(current_user: User = Depends(get_current_user), db: AsyncIOMotorClient = Depends(get_database)):
+    if current_user["role"] != "Rider":
+        raise HTTPException(status_code=403, detail="Rider access required")
+    
+    return await earnings_ledger.get_earnings_summary(db, str(current_user["_id"]))
+
+@app.get("/rider/earnings/weekly")
+async def get_rider_weekly_earnings(weeks: int = 12, current_user: User = Depends(get_current_user), db: AsyncIOMotorClient = Depends(get_database)):
+    if current_user["role"] != "Rider":
+        raise HTTPException(status_code=403, detail="Rider access required")
+    
+    return await earnings_ledger.get_rider_weeks(db, str(current_user["_id"]), weeks)
+
 @app.get("/efficiency-score")
 async def get_efficiency_score(current_user: User = Depends(get_current_user), db: AsyncIOMotorClient = Depends(get_database)):
     if current_user["role"] != "Rider":
@@ -558,10 +890,23 @@ async def get_efficiency_score(current_user: User = Depends(get_current_user), d
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    windows = priority_service.get_rider_efficiency_windows(str(current_user["_id"]))
+    efficiency = windows[priority_service.efficiency.scoring_window]
     return {
-        "efficiency_score": user.get("efficiency_score", 100),
+        "efficiency_score": efficiency.efficiency_percentage,
+        "total_points": efficiency.total_points,
         "total_deliveries": user.get("total_deliveries", 0),
-        "bonus_eligible": user.get("efficiency_score", 100) > 70
+        "bonus_eligible": efficiency.bonus_eligible,
+        "windows": {
+            name: {
+                "efficiency_percentage": window.efficiency_percentage,
+                "total_points": window.total_points,
+                "accepted_orders": window.accepted_orders,
+                "rejected_orders": window.rejected_orders,
+                "penalized_rejections": window.penalized_rejections
+            }
+            for name, window in windows.items()
+        }
     }
 
 @app.post("/send-notification")
@@ -598,6 +943,7 @@ async def generate_sample_orders(current_user: User = Depends(get_current_user),
     
     # Insert sample deliveries
     result = await db.deliveries.insert_many(sample_deliveries)
+    demand_heatmap.record_orders(sample_deliveries)
     
     return {"message": f"Generated {len(sample_deliveries)} sample delivery requests", "count": len(sample_deliveries)}
 
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 
@@ -21,6 +21,10 @@ class DeliveryResponse(BaseModel):
 class Delivery(DeliveryResponse):
     pass
 
+class RiderLocationUpdate(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lng: float = Field(..., ge=-180, le=180)
+
 # New models for the priority system
 class RiderAction(BaseModel):
     rider_id: str
@@ -46,4 +50,4 @@ class PrioritySettings(BaseModel):
     points_per_penalized_rejection: int = -5
     efficiency_threshold_for_bonus: float = 70.0
     bonus_amount_per_order: float = 1.0
-    preparation_grace_period_minutes: int = 10
+    preparation_grace_fraction: float = 0.5  # of the restaurant's learned preparation time
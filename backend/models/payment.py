@@ -13,6 +13,8 @@ class PaymentType(str, Enum):
     LONG_DISTANCE_BONUS = "long_distance_bonus"
     CUSTOMER_CHARGE = "customer_charge"
     PROCESSING_FEE = "processing_fee"
+    DELIVERY = "delivery"
+    ADMIN_BONUS = "admin_bonus"
 
 class PaymentStatus(str, Enum):
     PENDING = "pending"
@@ -32,6 +34,7 @@ class PaymentCalculation(BaseModel):
     long_distance_bonus: float = Field(..., description="Long distance bonus")
     total_payment: float = Field(..., description="Total payment amount")
     breakdown: Dict = Field(..., description="Detailed breakdown of rates and calculations")
+    pricing_version: Optional[int] = Field(None, description="Pricing snapshot version used for the calculation")
 
 class CustomerCharge(BaseModel):
     """Model for customer delivery charge calculation"""
@@ -45,6 +48,7 @@ class CustomerCharge(BaseModel):
     total_charge: float = Field(..., description="Final charge to customer")
     profit_margin: float = Field(..., description="Profit margin amount")
     breakdown: Dict = Field(..., description="Detailed breakdown of rates and calculations")
+    pricing_version: Optional[int] = Field(None, description="Pricing snapshot version used for the calculation")
 
 class BankAccountInfo(BaseModel):
     """Model for bank account information"""
@@ -79,7 +83,7 @@ class PayoutReport(BaseModel):
 
 class PaymentRecord(BaseModel):
     """Model for individual payment records"""
-    _id: Optional[str] = Field(None, description="Payment record ID")
+    id: Optional[str] = Field(None, description="Payment record ID")
     rider_id: str = Field(..., description="Rider ID")
     order_id: str = Field(..., description="Order ID")
     payment_type: PaymentType = Field(..., description="Type of payment")
@@ -89,7 +93,7 @@ class PaymentRecord(BaseModel):
     efficiency_percentage: Optional[float] = Field(None, description="Rider efficiency at time of payment")
     is_peak_hour: bool = Field(False, description="Whether delivery was during peak hours")
     weather_conditions: str = Field("normal", description="Weather conditions during delivery")
-    calculation_breakdown: PaymentCalculation = Field(..., description="Payment calculation details")
+    calculation_breakdown: Optional[PaymentCalculation] = Field(None, description="Payment calculation details (delivery payments)")
     status: PaymentStatus = Field(PaymentStatus.PENDING, description="Payment status")
     created_at: datetime = Field(default_factory=datetime.utcnow, description="Payment creation timestamp")
     processed_at: Optional[datetime] = Field(None, description="When payment was processed")
@@ -110,6 +114,7 @@ class WeeklyEarnings(BaseModel):
     peak_hour_bonuses: float = Field(..., description="Total peak hour bonuses")
     weather_bonuses: float = Field(..., description="Total weather bonuses")
     long_distance_bonuses: float = Field(..., description="Total long distance bonuses")
+    admin_bonuses: float = Field(0.0, description="Total bonuses awarded by admins")
     total_earnings: float = Field(..., description="Total weekly earnings")
     average_per_delivery: float = Field(..., description="Average earnings per delivery")
     efficiency_percentage: float = Field(..., description="Weekly efficiency percentage")
@@ -149,6 +154,8 @@ class PaymentResponse(BaseModel):
     customer_charge: CustomerCharge = Field(..., description="Customer charge calculation")
     distance_km: float = Field(..., description="Calculated distance")
     estimated_delivery_time: int = Field(..., description="Estimated delivery time")
+    quote_distance_km: Optional[float] = Field(None, description="Distance the customer charge was quoted on")
+    quote_estimated_delivery_time: Optional[int] = Field(None, description="Delivery time the customer charge was quoted on")
     is_peak_hour: bool = Field(..., description="Whether time is peak hour")
     weather_conditions: str = Field(..., description="Weather conditions")
     calculation_timestamp: datetime = Field(default_factory=datetime.utcnow, description="Calculation timestamp")
@@ -0,0 +1,311 @@
+"""
+Backtest alternative payment settings against historical deliveries.
+
+Deliveries are streamed from MongoDB (completed deliveries in a date range) or
+from an export file (JSON lines or CSV), split into chunks and priced in a
+process pool under the current rules and every settings file given. The
+output compares rider pay, customer charges and margin per scenario, with
+distributions per rider, demand zone and hour of day.
+
+Usage (from the backend directory):
+    python -m scripts.backtest_pricing --since 2024-01-01 --settings higher_base.json lower_margin.json
+    python -m scripts.backtest_pricing --file deliveries.jsonl --settings higher_base.json --output backtest.json
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from services.demand_zones import DemandZoneEngine
+from services.geo_utils import haversine_km
+from services.money import from_pence, to_pence
+from services.pricing_snapshot import PricingSnapshot
+
+BASELINE = "current"
+
+# Rider pay histogram: 25p bins up to £50, last bin is everything above
+PAY_BIN_PENCE = 25
+PAY_BINS = 201
+
+DIMENSIONS = ("rider", "zone", "hour")
+
+# Delivery fields read from Mongo (and expected in export files)
+DELIVERY_FIELDS = (
+    "rider_id", "pickup_lat", "pickup_lng", "delivery_lat", "delivery_lng", "estimated_distance",
+    "estimated_time", "accepted_at", "completed_at", "efficiency_percentage", "weather_conditions"
+)
+
+# Per group: count, rider pay, customer charge and margin (int pence), pay histogram
+Group = list
+
+_worker_scenarios: Dict[str, PricingSnapshot] = {}
+_worker_zones: Optional[DemandZoneEngine] = None
+
+
+def load_scenarios(paths: List[str]) -> Dict[str, Dict]:
+    """Scenario name -> settings changes; the baseline uses the current rules"""
+    scenarios = {BASELINE: _current_settings()}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as settings_file:
+            settings = json.load(settings_file)
+        PricingSnapshot().with_updates(2, settings)  # validate before starting workers
+        scenarios[os.path.splitext(os.path.basename(path))[0]] = settings
+    return scenarios
+
+
+def _current_settings() -> Dict:
+    path = os.getenv("PAYMENT_SETTINGS_FILE")
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as settings_file:
+            return json.load(settings_file)
+    return {}
+
+
+def _parse_time(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def _float(value, default: float = 0.0) -> float:
+    try:
+        return float(value) if value not in (None, "") else default
+    except (TypeError, ValueError):
+        return default
+
+
+def stream_from_mongo(since: datetime, until: datetime, batch_size: int) -> Iterator[Dict]:
+    from pymongo import MongoClient
+    from database.connection import MONGODB_URL, DB_NAME
+    client = MongoClient(MONGODB_URL)
+    cursor = client[DB_NAME].deliveries.find(
+        {"status": {"$in": ["completed", "delivered"]}, "completed_at": {"$gte": since, "$lt": until}},
+        {name: 1 for name in DELIVERY_FIELDS},
+        batch_size=batch_size
+    )
+    try:
+        for delivery in cursor:
+            delivery.pop("_id", None)
+            yield delivery
+    finally:
+        client.close()
+
+
+def stream_from_file(path: str) -> Iterator[Dict]:
+    with open(path, "r", encoding="utf-8", newline="") as export:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(export)
+        else:
+            for line in export:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def chunked(deliveries: Iterable[Dict], size: int) -> Iterator[List[Tuple]]:
+    """Compact delivery tuples in chunks (cheap to send to workers)"""
+    chunk = []
+    for delivery in deliveries:
+        chunk.append(tuple(
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in (delivery.get(name) for name in DELIVERY_FIELDS)
+        ))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _init_worker(scenarios: Dict[str, Dict]):
+    global _worker_scenarios, _worker_zones
+    _worker_scenarios = {
+        name: PricingSnapshot().with_updates(index + 1, settings, "backtest")
+        for index, (name, settings) in enumerate(scenarios.items())
+    }
+    _worker_zones = DemandZoneEngine()
+
+
+def _new_group() -> Group:
+    return [0, 0, 0, 0, array("I", bytes(4 * PAY_BINS))]
+
+
+def price_chunk(chunk: List[Tuple]) -> Dict[str, Dict[str, Dict[str, Group]]]:
+    """Price one chunk under every scenario; returns partial aggregates"""
+    results = {name: {dimension: {} for dimension in DIMENSIONS} for name in _worker_scenarios}
+    for row in chunk:
+        (rider_id, pickup_lat, pickup_lng, delivery_lat, delivery_lng, estimated_distance,
+         estimated_time, accepted_at, completed_at, efficiency, weather) = row
+
+        pickup_lat, pickup_lng = _float(pickup_lat, None), _float(pickup_lng, None)
+        delivery_lat, delivery_lng = _float(delivery_lat, None), _float(delivery_lng, None)
+        has_points = None not in (pickup_lat, pickup_lng, delivery_lat, delivery_lng)
+        distance_km = _float(estimated_distance, None)
+        if distance_km is None:
+            if not has_points:
+                continue
+            distance_km = round(haversine_km(pickup_lat, pickup_lng, delivery_lat, delivery_lng), 2)
+
+        completed = _parse_time(completed_at)
+        accepted = _parse_time(accepted_at)
+        if completed and accepted and completed > accepted:
+            minutes = max(1, int((completed - accepted).total_seconds() // 60))
+        else:
+            minutes = int(_float(estimated_time, distance_km * 2 + 8))
+        hour = completed.hour if completed else None
+        is_peak = hour is not None and ((11 <= hour <= 14) or (17 <= hour <= 20))
+        efficiency = _float(efficiency, 100.0)
+        weather = weather or "normal"
+
+        keys = (
+            str(rider_id) if rider_id else "unknown",
+            (_worker_zones.locate(pickup_lat, pickup_lng) if has_points else None) or "outside_zones",
+            f"{hour:02d}" if hour is not None else "unknown"
+        )
+
+        for name, pricing in _worker_scenarios.items():
+            rider_pay = to_pence(pricing.rider_components(distance_km, minutes, efficiency, is_peak, weather)[-1])
+            charge = to_pence(pricing.customer_components(distance_km, minutes, is_peak, weather)[-1])
+            margin = charge - rider_pay
+            pay_bin = min(rider_pay // PAY_BIN_PENCE, PAY_BINS - 1)
+
+            by_dimension = results[name]
+            for dimension, key in zip(DIMENSIONS, keys):
+                group = by_dimension[dimension].get(key)
+                if group is None:
+                    group = by_dimension[dimension][key] = _new_group()
+                group[0] += 1
+                group[1] += rider_pay
+                group[2] += charge
+                group[3] += margin
+                group[4][pay_bin] += 1
+    return results
+
+
+def merge(total: Dict, partial: Dict):
+    for name, by_dimension in partial.items():
+        for dimension, groups in by_dimension.items():
+            target = total.setdefault(name, {}).setdefault(dimension, {})
+            for key, group in groups.items():
+                existing = target.get(key)
+                if existing is None:
+                    target[key] = group
+                    continue
+                for index in range(4):
+                    existing[index] += group[index]
+                histogram = existing[4]
+                for index, count in enumerate(group[4]):
+                    if count:
+                        histogram[index] += count
+
+
+def _percentile(histogram: array, count: int, fraction: float) -> float:
+    target = fraction * count
+    running = 0
+    for index, bin_count in enumerate(histogram):
+        running += bin_count
+        if running >= target:
+            return from_pence(index * PAY_BIN_PENCE + PAY_BIN_PENCE // 2)
+    return from_pence(PAY_BINS * PAY_BIN_PENCE)
+
+
+def summarize_group(group: Group) -> Dict:
+    count, pay, charge, margin, histogram = group
+    return {
+        "deliveries": count,
+        "rider_pay_total": from_pence(pay),
+        "rider_pay_mean": from_pence(round(pay / count)) if count else 0.0,
+        "rider_pay_p10": _percentile(histogram, count, 0.10),
+        "rider_pay_p50": _percentile(histogram, count, 0.50),
+        "rider_pay_p90": _percentile(histogram, count, 0.90),
+        "customer_charge_total": from_pence(charge),
+        "margin_total": from_pence(margin),
+        "margin_ratio": round(margin / charge, 4) if charge else 0.0
+    }
+
+
+def build_report(totals: Dict, scenarios: Dict[str, Dict], deliveries: int, seconds: float) -> Dict:
+    report = {"deliveries": deliveries, "seconds": round(seconds, 2), "scenarios": {}}
+    baseline = None
+    for name in scenarios:
+        by_dimension = totals.get(name, {dimension: {} for dimension in DIMENSIONS})
+        overall = _new_group()
+        for group in by_dimension["hour"].values():
+            for index in range(4):
+                overall[index] += group[index]
+            for index, count in enumerate(group[4]):
+                overall[4][index] += count
+
+        summary = summarize_group(overall)
+        if baseline is None:
+            baseline = summary
+        else:
+            summary["vs_baseline"] = {
+                field: round(summary[field] - baseline[field], 2)
+                for field in ("rider_pay_total", "rider_pay_mean", "customer_charge_total", "margin_total")
+            }
+        report["scenarios"][name] = {
+            "settings": scenarios[name],
+            "summary": summary,
+            **{
+                f"by_{dimension}": {key: summarize_group(group) for key, group in sorted(by_dimension[dimension].items())}
+                for dimension in DIMENSIONS
+            }
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--file", help="JSON lines or CSV export of deliveries")
+    source.add_argument("--since", type=datetime.fromisoformat, help="Start of the Mongo date range")
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--settings", nargs="*", default=[], help="Settings JSON files to compare")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=20000)
+    parser.add_argument("--output", help="Write the report here instead of stdout")
+    args = parser.parse_args()
+
+    scenarios = load_scenarios(args.settings)
+    if args.file:
+        deliveries = stream_from_file(args.file)
+    else:
+        since = args.since or datetime(1970, 1, 1)
+        deliveries = stream_from_mongo(since, args.until or datetime.utcnow(), args.chunk_size)
+
+    started = time.perf_counter()
+    totals: Dict = {}
+    processed = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(scenarios,)) as pool:
+        pending = []
+        for chunk in chunked(deliveries, args.chunk_size):
+            processed += len(chunk)
+            pending.append(pool.submit(price_chunk, chunk))
+            # Keep a bounded number of chunks in flight so memory stays flat
+            if len(pending) >= args.workers * 2:
+                merge(totals, pending.pop(0).result())
+        for future in pending:
+            merge(totals, future.result())
+
+    elapsed = time.perf_counter() - started
+    report = build_report(totals, scenarios, processed, elapsed)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    print(f"Priced {processed} deliveries x {len(scenarios)} scenarios in {elapsed:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Throughput benchmark for batch pricing against the scalar PaymentService path.
+
+Usage (from the backend directory):
+    python -m scripts.benchmark_batch_pricing --rows 100000
+"""
+import argparse
+import time
+import numpy as np
+from services.payment_service import PaymentService
+from services.batch_pricing import WEATHER_CODES
+from services.money import to_pence
+
+WEATHER_NAMES = {code: name for name, code in WEATHER_CODES.items()}
+
+RIDER_FIELDS = (
+    "base_payment", "distance_payment", "time_payment", "efficiency_bonus",
+    "peak_hour_bonus", "weather_bonus", "long_distance_bonus", "total_payment"
+)
+CUSTOMER_FIELDS = (
+    "base_fee", "distance_charge", "time_charge", "peak_hour_surcharge", "weather_surcharge",
+    "long_distance_surcharge", "subtotal", "total_charge", "profit_margin"
+)
+
+
+def generate_deliveries(rows: int, seed: int):
+    rng = np.random.default_rng(seed)
+    return {
+        "distance_km": np.round(rng.uniform(0.2, 12.0, rows), 2),
+        "minutes": rng.integers(5, 60, rows),
+        "efficiency": np.round(rng.uniform(40.0, 100.0, rows), 1),
+        "peak": rng.random(rows) < 0.4,
+        "weather": rng.integers(0, len(WEATHER_CODES), rows).astype(np.int8)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--scalar-rows", type=int, default=20000,
+                        help="rows priced through the scalar path for comparison")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    service = PaymentService()
+    data = generate_deliveries(args.rows, args.seed)
+
+    started = time.perf_counter()
+    riders = service.calculate_rider_payments_batch(
+        data["distance_km"], data["minutes"], data["efficiency"], data["peak"], data["weather"]
+    )
+    customers = service.calculate_customer_charges_batch(
+        data["distance_km"], data["minutes"], data["peak"], data["weather"]
+    )
+    batch_seconds = time.perf_counter() - started
+
+    scalar_rows = min(args.scalar_rows, args.rows)
+    mismatches = 0
+    started = time.perf_counter()
+    for i in range(scalar_rows):
+        weather = WEATHER_NAMES[int(data["weather"][i])]
+        rider = service.calculate_rider_payment(
+            float(data["distance_km"][i]), int(data["minutes"][i]), float(data["efficiency"][i]),
+            0.0, bool(data["peak"][i]), weather
+        )
+        customer = service.calculate_customer_charge(
+            float(data["distance_km"][i]), int(data["minutes"][i]), 0.0, bool(data["peak"][i]), weather
+        )
+        mismatches += sum(to_pence(getattr(rider, field)) != int(riders[field][i]) for field in RIDER_FIELDS)
+        mismatches += sum(to_pence(getattr(customer, field)) != int(customers[field][i]) for field in CUSTOMER_FIELDS)
+    scalar_seconds = time.perf_counter() - started
+
+    batch_rate = args.rows / batch_seconds
+    scalar_rate = scalar_rows / scalar_seconds
+    print(f"batch:   {args.rows} deliveries in {batch_seconds * 1000:.1f} ms ({batch_rate:,.0f}/s)")
+    print(f"scalar:  {scalar_rows} deliveries in {scalar_seconds * 1000:.1f} ms ({scalar_rate:,.0f}/s)")
+    print(f"speedup: {batch_rate / scalar_rate:.1f}x")
+    print(f"mismatched components in compared rows: {mismatches}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Write the weekly payout report straight to a JSON file.
+
+Usage (from the backend directory):
+    python -m scripts.export_payout_report payouts.json --start 2024-01-06 --end 2024-01-13
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from database.connection import get_database
+from services.payment_service import PaymentService
+from services.payout_report import DEFAULT_CHUNK_SIZE
+
+
+async def export(path: str, start_date: datetime, end_date: datetime, chunk_size: int):
+    db = await get_database()
+    with open(path, "w") as output:
+        report = await PaymentService().generate_weekly_payout_report_from_db(
+            db, start_date, end_date, output=output, chunk_size=chunk_size
+        )
+    print(
+        f"{report['report_period']}: {report['eligible_riders']}/{report['total_riders']} riders eligible, "
+        f"£{report['total_payouts']} to pay out -> {path}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--end", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+    asyncio.run(export(args.path, args.start, args.end, args.chunk_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,469 @@
+"""
+Discrete-event simulation of a Bournemouth evening against the in-process services.
+
+Orders arrive per demand zone (Poisson, scaled by each zone's demand level
+and its peak multiplier at the simulated time), restaurants prepare them,
+and riders move, accept or reject offers and deliver. Orders, riders and
+their locations live in an in-memory MongoDB (mongomock-motor, from
+requirements-dev.txt) and every dispatch tick is a real DispatchEngine
+run_tick: batching, matching and the conditional commit that turns orders
+into deliveries. Rejected jobs go back through return_job and completed
+ones through finish_delivery; accepts and rejects go through
+PriorityService, deliveries are priced by PaymentService and, with
+--websocket, offers are emitted through WebSocketService. Simulated time
+runs much faster than real time; the report covers throughput, assignment
+latency, dispatch tick cost and queue depths, and is repeatable for a seed.
+
+Usage (from the backend directory):
+    python -m scripts.simulate_evening --riders 150 --orders-per-hour 400
+    python -m scripts.simulate_evening --start 17:00 --hours 5 --seed 7 --output evening.json
+"""
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+from services.demand_zones import DemandZoneEngine
+from services.dispatch_engine import DispatchEngine
+from services.geo_utils import point_distance_km
+from services.money import from_pence, to_pence
+from services.payment_service import PaymentService
+from services.priority_service import PriorityService
+from services.rider_locations import record_rider_location
+from services.route_optimizer import ROAD_DISTANCE_FACTOR
+
+# Share of orders per zone by demand level
+ZONE_WEIGHTS = {"high": 3.0, "medium": 2.0, "low": 1.0}
+# Highest demand multiplier a zone can report (DemandZoneEngine, high zone at peak)
+MAX_DEMAND_MULTIPLIER = 2.5
+
+RESTAURANTS_PER_ZONE = 8
+DROPOFF_RADIUS_KM = 3.5
+ORDER_PRIORITIES = (("high", 0.1), ("medium", 0.3), ("low", 0.6))
+
+RESPONSE_SECONDS = (5, 30)
+REJECT_COOLDOWN_SECONDS = 60
+HANDOFF_MINUTES = 2.0
+SAMPLE_SECONDS = 60
+LOCATION_PING_SECONDS = 5 * 60
+TIMELINE_SECONDS = 15 * 60
+
+KM_PER_DEGREE = 111.32
+
+
+def _offset(point, distance_km: float, bearing: float):
+    lat, lng = point
+    return (
+        lat + distance_km * math.cos(bearing) / KM_PER_DEGREE,
+        lng + distance_km * math.sin(bearing) / (KM_PER_DEGREE * math.cos(math.radians(lat)))
+    )
+
+
+def _percentiles(values: List[float], scale: float = 1.0) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def at(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * scale, 2)
+
+    return {"count": len(ordered), "p50": at(0.50), "p90": at(0.90), "p99": at(0.99), "max": round(ordered[-1] * scale, 2)}
+
+
+class EveningSimulation:
+    def __init__(self, args):
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.start = datetime.combine(datetime.utcnow().date(), datetime.strptime(args.start, "%H:%M").time())
+        self.end_seconds = args.hours * 3600
+
+        self.zones = DemandZoneEngine()
+        self.priority_service = PriorityService()
+        self.payment_service = PaymentService()
+        # mongomock has no sessions, so commits take the standalone-server path
+        self.db = AsyncMongoMockClient()["simulate_evening"]
+        self.dispatch = DispatchEngine(
+            self.priority_service, time_budget_seconds=args.time_budget,
+            on_assignment=self.on_assignment, use_transactions=False
+        )
+        self.websocket = None
+        if args.websocket:
+            from services.websocket_service import websocket_service
+            self.websocket = websocket_service
+
+        self._events = []
+        self._tick_seconds = 0.0
+        self._sequence = itertools.count()
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        self.pending = set()
+        self.riders: Dict[str, Dict[str, Any]] = {}
+        self.restaurants = self._build_restaurants()
+        self.metrics = {
+            "created": 0, "delivered": 0, "accepts": 0, "rejects": 0, "penalized": 0,
+            "offers": 0, "notifications": 0,
+            "assignment_latency": [], "delivery_minutes": [], "tick_seconds": [], "solve_ms": [], "emit_seconds": [],
+            "pending_samples": [], "timeline": [], "busy_seconds": 0.0,
+            "rider_pay_pence": 0, "customer_charge_pence": 0
+        }
+
+    def _build_restaurants(self) -> List[Dict[str, Any]]:
+        restaurants = []
+        for zone in self.zones.zone_definitions:
+            for _ in range(RESTAURANTS_PER_ZONE):
+                distance = zone["radius_km"] * 0.6 * math.sqrt(self.random.random())
+                restaurants.append({
+                    "zone": zone["name"],
+                    "location": _offset(zone["center"], distance, self.random.uniform(0, 2 * math.pi)),
+                    "prep_minutes": self.random.uniform(8, 22)
+                })
+        return restaurants
+
+    def now(self, seconds: float) -> datetime:
+        return self.start + timedelta(seconds=seconds)
+
+    def schedule(self, seconds: float, kind: str, payload: Any = None):
+        heapq.heappush(self._events, (seconds, next(self._sequence), kind, payload))
+
+    # Setup
+
+    async def add_riders(self):
+        zone_centers = [zone["center"] for zone in self.zones.zone_definitions]
+        for index in range(self.args.riders):
+            rider_id = str(ObjectId())
+            await self.db.users.insert_one({
+                "_id": ObjectId(rider_id),
+                "role": "Rider",
+                "is_active": True,
+                "first_name": "Sim",
+                "last_name": f"Rider {index}",
+                "dispatch_order_id": None
+            })
+            self.riders[rider_id] = {
+                "rider_id": rider_id,
+                "location": _offset(self.random.choice(zone_centers), 2.0 * math.sqrt(self.random.random()),
+                                    self.random.uniform(0, 2 * math.pi)),
+                "reject_rate": self.random.uniform(0.02, 0.25),
+                "state": "idle",
+                "busy_since": None
+            }
+            await record_rider_location(self.db, rider_id, *self.riders[rider_id]["location"], self.start)
+            self.priority_service.update_rider_priority(
+                self.priority_service.get_rider_efficiency(rider_id, now=self.start), available=True
+            )
+            if self.websocket is not None:
+                self.websocket.rider_connections[rider_id] = f"sim-{rider_id}"
+
+    def schedule_arrivals(self):
+        """Thinned Poisson arrivals per zone over the whole evening"""
+        definitions = self.zones.zone_definitions
+        total_weight = sum(ZONE_WEIGHTS.get(zone.get("demand_level"), 1.0) for zone in definitions)
+        for zone in definitions:
+            base_rate = self.args.orders_per_hour * ZONE_WEIGHTS.get(zone.get("demand_level"), 1.0) / total_weight / 3600
+            max_rate = base_rate * MAX_DEMAND_MULTIPLIER
+            restaurants = [restaurant for restaurant in self.restaurants if restaurant["zone"] == zone["name"]]
+            seconds = 0.0
+            while True:
+                seconds += self.random.expovariate(max_rate)
+                if seconds >= self.end_seconds:
+                    break
+                multiplier = self.zones.get_demand_multiplier(*zone["center"], current_time=self.now(seconds))
+                if self.random.random() * max_rate <= base_rate * multiplier:
+                    self.schedule(seconds, "order", self.random.choice(restaurants))
+
+    # Events
+
+    async def on_order(self, seconds: float, restaurant: Dict[str, Any]):
+        self.metrics["created"] += 1
+        created_at = self.now(seconds)
+        prep_minutes = max(3.0, self.random.gauss(restaurant["prep_minutes"], restaurant["prep_minutes"] * 0.25))
+        roll, priority = self.random.random(), "low"
+        for level, share in ORDER_PRIORITIES:
+            if roll < share:
+                priority = level
+                break
+            roll -= share
+        order_id = f"sim-order-{self.metrics['created']}"
+        dropoff = _offset(restaurant["location"], DROPOFF_RADIUS_KM * math.sqrt(self.random.random()),
+                          self.random.uniform(0, 2 * math.pi))
+        order = {
+            "_id": order_id,
+            "pickup": restaurant["location"],
+            "dropoff": dropoff,
+            "ready_at": created_at + timedelta(minutes=prep_minutes),
+            "created_at": created_at
+        }
+        self.orders[order_id] = order
+        self.pending.add(order_id)
+        # The restaurant reports when the food is ready, so dispatch plans on the true time
+        await self.db.orders.insert_one({
+            "_id": order_id,
+            "status": "pending",
+            "rider_id": None,
+            "restaurant_id": restaurant["zone"],
+            "restaurant_address": {"latitude": restaurant["location"][0], "longitude": restaurant["location"][1]},
+            "delivery_address": {"latitude": dropoff[0], "longitude": dropoff[1]},
+            "created_at": created_at,
+            "ready_at": order["ready_at"],
+            "priority": priority
+        })
+
+    async def on_tick(self, seconds: float):
+        self._tick_seconds = seconds
+        started = time.perf_counter()
+        result = await self.dispatch.run_tick(self.db, self.now(seconds))
+        self.metrics["tick_seconds"].append(time.perf_counter() - started)
+        self.metrics["solve_ms"].append(result["solve_ms"])
+
+        if seconds + self.args.tick_seconds < self.end_seconds:
+            self.schedule(seconds + self.args.tick_seconds, "tick")
+
+    async def on_assignment(self, assignment: Dict[str, Any]):
+        """DispatchEngine callback for each committed job: offer it to the rider"""
+        seconds = self._tick_seconds
+        rider = self.riders[assignment["rider_id"]]
+        self.pending.difference_update(assignment["order_ids"])
+        rider["state"] = "offered"
+        self.metrics["offers"] += 1
+        if self.websocket is not None:
+            emit_started = time.perf_counter()
+            await self.websocket.send_notification_to_rider(rider["rider_id"], {
+                "type": "order_assigned",
+                "order_ids": assignment["order_ids"],
+                "eta_minutes": assignment["eta_minutes"],
+                "route": assignment["route"]
+            })
+            self.metrics["emit_seconds"].append(time.perf_counter() - emit_started)
+            self.metrics["notifications"] += 1
+        self.schedule(seconds + self.random.uniform(*RESPONSE_SECONDS), "respond", assignment)
+
+    async def on_respond(self, seconds: float, offer: Dict[str, Any]):
+        now = self.now(seconds)
+        rider = self.riders[offer["rider_id"]]
+        orders = [self.orders[order_id] for order_id in offer["order_ids"]]
+        action = "reject" if self.random.random() < rider["reject_rate"] else "accept"
+        penalized = False
+        for order in orders:
+            result = self.priority_service.update_rider_efficiency(
+                rider["rider_id"], action, order["_id"], preparation_start_time=order["created_at"], current_time=now
+            )
+            self.priority_service.apply_rider_action(result["action"])
+            penalized = penalized or result["penalty_applied"]
+
+        if action == "reject":
+            # One offer, one rejection, however many orders it batched
+            self.metrics["rejects"] += 1
+            self.metrics["penalized"] += int(penalized)
+            await self.dispatch.return_job(self.db, rider["rider_id"], offer["order_id"])
+            self.pending.update(offer["order_ids"])
+            rider["state"] = "cooldown"
+            self.schedule(seconds + REJECT_COOLDOWN_SECONDS, "free", rider["rider_id"])
+            return
+
+        self.metrics["accepts"] += 1
+        for order in orders:
+            self.metrics["assignment_latency"].append((now - order["created_at"]).total_seconds())
+        rider["state"] = "busy"
+        rider["busy_since"] = seconds
+
+        at_restaurant = now + timedelta(minutes=offer["eta_minutes"])
+        picked_up = max([at_restaurant] + [order["ready_at"] for order in orders])
+        finished = picked_up + timedelta(
+            minutes=offer["route"]["total_duration_minutes"] + HANDOFF_MINUTES * len(orders)
+        )
+        self.schedule((finished - self.start).total_seconds(), "deliver", {**offer, "accepted_at": now})
+
+    async def on_deliver(self, seconds: float, offer: Dict[str, Any]):
+        now = self.now(seconds)
+        rider = self.riders[offer["rider_id"]]
+        orders = [self.orders[order_id] for order_id in offer["order_ids"]]
+        is_peak = self.payment_service.is_peak_hour(now)
+        efficiency = self.priority_service.get_rider_efficiency(rider["rider_id"], now=now).efficiency_percentage
+
+        # The rider is paid for the job once: its minutes and route distance are
+        # split across the orders in proportion to their direct distances
+        job_minutes = (now - offer["accepted_at"]).total_seconds() / 60
+        direct_km = [point_distance_km(order["pickup"], order["dropoff"]) * ROAD_DISTANCE_FACTOR for order in orders]
+        total_direct_km = sum(direct_km)
+        for order, order_km in zip(orders, direct_km):
+            share = order_km / total_direct_km if total_direct_km else 1 / len(orders)
+            minutes = max(1, int(job_minutes * share))
+            payment = self.payment_service.calculate_rider_payment(
+                round(offer["route"]["total_distance_km"] * share, 2), minutes, efficiency, 0.0, is_peak
+            )
+            distance_km = round(order_km, 2)
+            charge = self.payment_service.calculate_customer_charge(
+                distance_km, self.payment_service.estimate_delivery_time(distance_km, is_peak), 0.0, is_peak
+            )
+            self.metrics["rider_pay_pence"] += to_pence(payment.total_payment)
+            self.metrics["customer_charge_pence"] += to_pence(charge.total_charge)
+            self.metrics["delivery_minutes"].append((now - order["created_at"]).total_seconds() / 60)
+            self.metrics["delivered"] += 1
+
+            delivery = await self.db.deliveries.find_one_and_update(
+                {"order_id": order["_id"], "rider_id": rider["rider_id"], "status": "accepted"},
+                {"$set": {"status": "completed", "completed_at": now}}
+            )
+            # Frees the rider's claim (and queue slot) with the job's last order
+            await self.dispatch.finish_delivery(self.db, delivery, "completed")
+
+        rider["location"] = orders[-1]["dropoff"]
+        rider["state"] = "idle"
+        await record_rider_location(self.db, rider["rider_id"], *rider["location"], now)
+        self.metrics["busy_seconds"] += max(0.0, min(seconds, self.end_seconds) - rider["busy_since"])
+
+    def on_free(self, seconds: float, rider_id: str):
+        self.riders[rider_id]["state"] = "idle"
+        self.priority_service.set_rider_available(rider_id, True)
+
+    async def on_sample(self, seconds: float):
+        now = self.now(seconds)
+        states = [rider["state"] for rider in self.riders.values()]
+        self.metrics["pending_samples"].append(len(self.pending))
+        if seconds % LOCATION_PING_SECONDS == 0:
+            # Waiting riders keep reporting where they are, so dispatch never sees them as stale
+            for rider in self.riders.values():
+                if rider["state"] in ("idle", "cooldown"):
+                    await record_rider_location(self.db, rider["rider_id"], *rider["location"], now)
+        if seconds % TIMELINE_SECONDS == 0:
+            self.metrics["timeline"].append({
+                "time": now.strftime("%H:%M"),
+                "pending_orders": len(self.pending),
+                "idle_riders": states.count("idle"),
+                "busy_riders": states.count("busy") + states.count("offered")
+            })
+        if seconds + SAMPLE_SECONDS < self.end_seconds:
+            self.schedule(seconds + SAMPLE_SECONDS, "sample")
+
+    # Run
+
+    async def run(self) -> Dict[str, Any]:
+        await self.add_riders()
+        self.schedule_arrivals()
+        self.schedule(0.0, "tick")
+        self.schedule(0.0, "sample")
+
+        started = time.perf_counter()
+        events = 0
+        while self._events:
+            seconds, _, kind, payload = heapq.heappop(self._events)
+            # Past the end only in-flight deliveries are finished
+            if seconds >= self.end_seconds and kind not in ("deliver", "respond", "free"):
+                continue
+            events += 1
+            if kind == "order":
+                await self.on_order(seconds, payload)
+            elif kind == "tick":
+                await self.on_tick(seconds)
+            elif kind == "respond":
+                await self.on_respond(seconds, payload)
+            elif kind == "deliver":
+                await self.on_deliver(seconds, payload)
+            elif kind == "free":
+                self.on_free(seconds, payload)
+            elif kind == "sample":
+                await self.on_sample(seconds)
+        wall_seconds = time.perf_counter() - started
+        return self.report(wall_seconds, events)
+
+    def report(self, wall_seconds: float, events: int) -> Dict[str, Any]:
+        metrics = self.metrics
+        hours = self.args.hours
+        pending = metrics["pending_samples"]
+        margin = metrics["customer_charge_pence"] - metrics["rider_pay_pence"]
+        dispatch = self.dispatch.get_status()
+        report = {
+            "simulation": {
+                "start": self.start.isoformat(),
+                "hours": hours,
+                "riders": self.args.riders,
+                "orders_per_hour": self.args.orders_per_hour,
+                "tick_seconds": self.args.tick_seconds,
+                "seed": self.args.seed,
+                "events": events,
+                "wall_seconds": round(wall_seconds, 2),
+                "speedup": round(hours * 3600 / wall_seconds, 1) if wall_seconds else None
+            },
+            "orders": {
+                "created": metrics["created"],
+                "delivered": metrics["delivered"],
+                "unassigned_at_end": len(self.pending)
+            },
+            "throughput": {
+                "deliveries_per_hour": round(metrics["delivered"] / hours, 1),
+                "deliveries_per_rider_hour": round(metrics["delivered"] / (hours * self.args.riders), 2),
+                "rider_utilisation": round(metrics["busy_seconds"] / (hours * 3600 * self.args.riders), 3)
+            },
+            "assignment_latency_seconds": _percentiles(metrics["assignment_latency"]),
+            "order_to_door_minutes": _percentiles(metrics["delivery_minutes"]),
+            "dispatch": {
+                "ticks": dispatch["ticks"],
+                "tick_ms": _percentiles(metrics["tick_seconds"], 1000),
+                "solve_ms": _percentiles(metrics["solve_ms"]),
+                "budget_exceeded": dispatch["budget_exceeded"],
+                "conflicts": dispatch["conflicts"],
+                "offers": metrics["offers"],
+                "batching": dispatch["batching"]
+            },
+            "queue_depth": {
+                "pending_orders_mean": round(sum(pending) / len(pending), 1) if pending else 0.0,
+                "pending_orders_max": max(pending) if pending else 0,
+                "timeline": metrics["timeline"]
+            },
+            "riders": {
+                "accepts": metrics["accepts"],
+                "rejects": metrics["rejects"],
+                "penalized_rejections": metrics["penalized"],
+                "priority_queue": self.priority_service.queue.get_stats()
+            },
+            "payments": {
+                "rider_pay_total": from_pence(metrics["rider_pay_pence"]),
+                "customer_charges_total": from_pence(metrics["customer_charge_pence"]),
+                "margin_total": from_pence(margin)
+            }
+        }
+        if self.websocket is not None:
+            report["websocket"] = {
+                "notifications": metrics["notifications"],
+                "emit_ms": _percentiles(metrics["emit_seconds"], 1000)
+            }
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--start", default="17:00", help="Simulated start time (HH:MM, UTC)")
+    parser.add_argument("--hours", type=float, default=5.0)
+    parser.add_argument("--riders", type=int, default=150)
+    parser.add_argument("--orders-per-hour", type=float, default=400.0, help="Off-peak order rate across all zones")
+    parser.add_argument("--tick-seconds", type=float, default=5.0, help="Simulated seconds between dispatch ticks")
+    parser.add_argument("--time-budget", type=float, default=1.0, help="Dispatch solve budget per tick (wall seconds)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--websocket", action="store_true", help="Emit offers through WebSocketService")
+    parser.add_argument("--output", help="Write the report here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(EveningSimulation(args).run())
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    simulation = report["simulation"]
+    print(
+        f"Simulated {simulation['hours']}h ({report['orders']['created']} orders) in "
+        f"{simulation['wall_seconds']}s ({simulation['speedup']}x real time)",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import time
+from heapq import heappop, heappush
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+# Cost for pairs that must not be matched; pairs at or above it are dropped
+FORBIDDEN_COST = 1e6
+
+# Cost of leaving a row unmatched (each row has a private fallback column at
+# this cost), so more matches always beat cheaper ones
+UNMATCHED_COST = FORBIDDEN_COST
+
+
+def solve_assignment(
+    rows: int,
+    columns: int,
+    pair_rows: Sequence[int],
+    pair_columns: Sequence[int],
+    pair_costs: Sequence[float],
+    deadline: Optional[float] = None
+) -> Tuple[List[Tuple[int, int]], bool]:
+    """
+    Minimum-cost matching of rows to columns over a sparse set of candidate pairs
+
+    Successive shortest augmenting paths (Dijkstra on reduced costs with
+    column potentials), visiting only each row's candidate pairs, so the
+    work follows the number of candidates rather than rows x columns. Each
+    row is matched to at most one column and each column to at most one
+    row. As many rows as possible are matched and, among those matchings,
+    the total cost is minimal (the same optimum as a dense Hungarian solve
+    with forbidden pairs). The problem is solved transposed when there are
+    more rows than columns.
+    Pairs costing FORBIDDEN_COST or more are ignored.
+
+    Args:
+        rows, columns: Problem size
+        pair_rows, pair_columns, pair_costs: Candidate pairs (parallel sequences)
+        deadline: time.perf_counter() value; rows not augmented by then are
+            matched greedily to their cheapest free candidate
+
+    Returns:
+        ([(row, column), ...], optimal) where optimal is False if the
+        deadline forced the greedy fallback
+    """
+    pair_rows = np.asarray(pair_rows, dtype=np.int64)
+    pair_columns = np.asarray(pair_columns, dtype=np.int64)
+    pair_costs = np.asarray(pair_costs, dtype=np.float64)
+    keep = pair_costs < FORBIDDEN_COST
+    pair_rows, pair_columns, pair_costs = pair_rows[keep], pair_columns[keep], pair_costs[keep]
+    if rows == 0 or columns == 0 or len(pair_costs) == 0:
+        return [], True
+    if rows > columns:
+        pairs, optimal = solve_assignment(columns, rows, pair_columns, pair_rows, pair_costs, deadline)
+        return sorted((row, column) for column, row in pairs), optimal
+
+    # Adjacency lists, cheapest candidate first, ending with the row's
+    # fallback column (columns + row) that stands for leaving it unmatched
+    order = np.lexsort((pair_costs, pair_rows))
+    starts = np.searchsorted(pair_rows[order], np.arange(rows + 1))
+    adjacency = [
+        list(zip(pair_columns[order[start:end]].tolist(), pair_costs[order[start:end]].tolist()))
+        + [(columns + row, UNMATCHED_COST)]
+        for row, (start, end) in enumerate(zip(starts[:-1], starts[1:]))
+    ]
+
+    v = [0.0] * (columns + rows)       # column potentials
+    row_match = [-1] * rows            # row -> column
+    column_match = [-1] * (columns + rows)  # column -> row
+    matched_cost = [0.0] * rows        # cost of each row's matched pair
+    optimal = True
+
+    for row in range(rows):
+        candidates = adjacency[row]
+        if len(candidates) == 1:
+            row_match[row] = columns + row
+            column_match[columns + row] = row
+            matched_cost[row] = UNMATCHED_COST
+            continue
+        if deadline is not None and time.perf_counter() > deadline:
+            optimal = False
+            _greedy_rows(adjacency, range(row, rows), row_match, column_match)
+            break
+
+        # Dijkstra from row over columns; a matched column leads on to its row.
+        # via[column] is the (row, cost) of the pair that reached it
+        dist = {}
+        via = {}
+        heap = []
+        for column, cost in candidates:
+            distance = cost - v[column]
+            if distance < dist.get(column, np.inf):
+                dist[column] = distance
+                via[column] = (row, cost)
+                heappush(heap, (distance, column))
+
+        done = {}
+        while True:
+            distance, column = heappop(heap)
+            if column in done:
+                continue
+            done[column] = distance
+            owner = column_match[column]
+            if owner < 0:
+                free_column = column
+                break
+            # Reduced costs from owner, relative to its (tight) matched pair
+            base = distance - (matched_cost[owner] - v[column])
+            for next_column, cost in adjacency[owner]:
+                if next_column in done:
+                    continue
+                next_distance = base + cost - v[next_column]
+                if next_distance < dist.get(next_column, np.inf):
+                    dist[next_column] = next_distance
+                    via[next_column] = (owner, cost)
+                    heappush(heap, (next_distance, next_column))
+
+        shortest = done[free_column]
+        for column, distance in done.items():
+            v[column] += distance - shortest
+
+        # Flip the augmenting path back to row
+        column = free_column
+        while True:
+            owner, cost = via[column]
+            next_column = row_match[owner]
+            row_match[owner] = column
+            column_match[column] = owner
+            matched_cost[owner] = cost
+            if owner == row:
+                break
+            column = next_column
+
+    pairs = [(row, column) for row, column in enumerate(row_match) if 0 <= column < columns]
+    return pairs, optimal
+
+
+def _greedy_rows(adjacency, rows, row_match, column_match):
+    for row in rows:
+        for column, _ in adjacency[row][:-1]:
+            if column_match[column] < 0:
+                row_match[row] = column
+                column_match[column] = row
+                break
@@ -0,0 +1,151 @@
+from typing import Dict, Iterable, Sequence
+import numpy as np
+from services.pricing_snapshot import PricingSnapshot
+
+# Weather codes for columnar inputs
+WEATHER_CODES = {
+    "normal": 0,
+    "rain": 1,
+    "snow": 2,
+    "storm": 3
+}
+
+# Codes that earn the adverse-weather bonus/surcharge (pricing_snapshot.ADVERSE_WEATHER)
+ADVERSE_WEATHER_CODES = (1, 2, 3)
+
+
+def encode_weather(conditions: Iterable[str]) -> np.ndarray:
+    """Convert weather condition strings to weather codes (unknown -> normal)"""
+    return np.fromiter((WEATHER_CODES.get(condition, 0) for condition in conditions), dtype=np.int8)
+
+
+def round2(values: np.ndarray) -> np.ndarray:
+    """
+    Round to 2 decimal places exactly like Python's round(value, 2)
+
+    np.round scales by 100 before rounding, which can disagree with round()
+    when the scaled value lands within float error of a half; those few
+    elements are rounded with round() itself.
+    """
+    scaled = values * 100.0
+    rounded = np.rint(scaled) / 100.0
+    ambiguous = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    if ambiguous.any():
+        indexes = np.nonzero(ambiguous)[0]
+        rounded[indexes] = [round(float(value), 2) for value in values[indexes]]
+    return rounded
+
+
+def to_pence_array(values: np.ndarray) -> np.ndarray:
+    """Pounds to int64 pence, matching money.to_pence element for element"""
+    return np.rint(round2(values) * 100.0).astype(np.int64)
+
+
+def _as_arrays(distance_km: Sequence[float], minutes: Sequence[float], is_peak_hour: Sequence[bool],
+               weather_code: Sequence[int]):
+    distance = np.asarray(distance_km, dtype=np.float64)
+    minutes = np.asarray(minutes, dtype=np.float64)
+    peak = np.asarray(is_peak_hour, dtype=bool)
+    adverse = np.isin(np.asarray(weather_code), ADVERSE_WEATHER_CODES)
+    if not (distance.shape == minutes.shape == peak.shape == adverse.shape):
+        raise ValueError("All input columns must have the same length")
+    return distance, minutes, peak, adverse
+
+
+def price_rider_payments(
+    pricing: PricingSnapshot,
+    distance_km: Sequence[float],
+    delivery_time_minutes: Sequence[float],
+    efficiency_percentage: Sequence[float],
+    is_peak_hour: Sequence[bool],
+    weather_code: Sequence[int]
+) -> Dict[str, np.ndarray]:
+    """
+    Vectorized PaymentService.calculate_rider_payment
+
+    The arithmetic follows the scalar path operation for operation, so every
+    component matches it exactly after rounding. Amounts are int64 pence.
+    """
+    distance, minutes, peak, adverse = _as_arrays(distance_km, delivery_time_minutes, is_peak_hour, weather_code)
+    efficiency = np.asarray(efficiency_percentage, dtype=np.float64)
+    if efficiency.shape != distance.shape:
+        raise ValueError("All input columns must have the same length")
+
+    base_payment = np.full(distance.shape, float(pricing.base_delivery_rate))
+    distance_payment = distance * pricing.distance_rate_per_km
+    time_payment = minutes * pricing.time_rate_per_minute
+    subtotal = base_payment + distance_payment + time_payment
+
+    efficiency_bonus = np.where(efficiency >= pricing.efficiency_bonus_threshold,
+                                subtotal * pricing.efficiency_bonus_rate, 0.0)
+    peak_hour_bonus = np.where(peak, subtotal * pricing.rider_peak_hour_rate, 0.0)
+    weather_bonus = np.where(adverse, subtotal * pricing.rider_weather_rate, 0.0)
+    long_distance_bonus = np.where(distance > pricing.long_distance_threshold_km,
+                                   distance_payment * pricing.rider_long_distance_rate, 0.0)
+
+    total_payment = (
+        base_payment +
+        distance_payment +
+        time_payment +
+        efficiency_bonus +
+        peak_hour_bonus +
+        weather_bonus +
+        long_distance_bonus
+    )
+
+    return {
+        "base_payment": to_pence_array(base_payment),
+        "distance_payment": to_pence_array(distance_payment),
+        "time_payment": to_pence_array(time_payment),
+        "efficiency_bonus": to_pence_array(efficiency_bonus),
+        "peak_hour_bonus": to_pence_array(peak_hour_bonus),
+        "weather_bonus": to_pence_array(weather_bonus),
+        "long_distance_bonus": to_pence_array(long_distance_bonus),
+        "total_payment": to_pence_array(total_payment),
+        "pricing_version": pricing.version
+    }
+
+
+def price_customer_charges(
+    pricing: PricingSnapshot,
+    distance_km: Sequence[float],
+    estimated_delivery_time_minutes: Sequence[float],
+    is_peak_hour: Sequence[bool],
+    weather_code: Sequence[int]
+) -> Dict[str, np.ndarray]:
+    """Vectorized PaymentService.calculate_customer_charge (amounts in int64 pence)"""
+    distance, minutes, peak, adverse = _as_arrays(distance_km, estimated_delivery_time_minutes, is_peak_hour,
+                                                  weather_code)
+
+    base_fee = np.full(distance.shape, float(pricing.customer_base_fee))
+    distance_charge = distance * pricing.customer_distance_rate
+    time_charge = minutes * pricing.customer_time_rate
+    subtotal_before_surcharges = base_fee + distance_charge + time_charge
+
+    peak_hour_surcharge = np.where(peak, subtotal_before_surcharges * pricing.customer_peak_hour_rate, 0.0)
+    weather_surcharge = np.where(adverse, subtotal_before_surcharges * pricing.customer_weather_rate, 0.0)
+    long_distance_surcharge = np.where(distance > pricing.long_distance_threshold_km,
+                                       distance_charge * pricing.customer_long_distance_rate, 0.0)
+
+    subtotal = (
+        base_fee +
+        distance_charge +
+        time_charge +
+        peak_hour_surcharge +
+        weather_surcharge +
+        long_distance_surcharge
+    )
+    total_charge = round2(subtotal * pricing.profit_margin_multiplier)
+
+    return {
+        "base_fee": to_pence_array(base_fee),
+        "distance_charge": to_pence_array(distance_charge),
+        "time_charge": to_pence_array(time_charge),
+        "peak_hour_surcharge": to_pence_array(peak_hour_surcharge),
+        "weather_surcharge": to_pence_array(weather_surcharge),
+        "long_distance_surcharge": to_pence_array(long_distance_surcharge),
+        "subtotal": to_pence_array(subtotal),
+        "total_charge": to_pence_array(total_charge),
+        "profit_margin": to_pence_array(total_charge - subtotal),
+        "pricing_version": pricing.version
+    }
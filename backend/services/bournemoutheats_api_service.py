@@ -1,9 +1,46 @@
 import os
+import json
+import math
+import hashlib
+import time
+import random
 import asyncio
-from typing import Dict, List, Optional, Any
+from typing import Awaitable, Callable, Dict, List, Optional, Any
 from datetime import datetime, timedelta
-import aiohttp
 from dotenv import load_dotenv
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+from services.single_flight import AsyncSingleFlight
+from services.registry import service_registry
+from services.demand_heatmap import demand_heatmap
+from services.prep_time_model import prep_time_model, restaurant_key
+from services.json_stream import JSONArrayStream
+
+# Import progress document in import_state
+IMPORT_STATE_ID = "bournemoutheats_orders"
+
+# Re-read this much before the high-water mark so orders sharing its timestamp are not missed
+HIGH_WATER_OVERLAP_SECONDS = 60
+
+# A backlog longer than this many intervals is fetched in concurrent time slices
+CATCH_UP_INTERVALS = 2
+
+IMPORT_JITTER = 0.2
+MAX_IMPORT_BACKOFF_SECONDS = 30 * 60
+
+# Orders per bulk_write round trip
+PERSIST_BATCH_SIZE = 500
+DUPLICATE_KEY_CODE = 11000
+
+# Set when an order is first stored; afterwards dispatch and riders own them
+INSERT_ONLY_FIELDS = ("_id", "status", "created_at")
+
+# Order pages are parsed as they download and ingested in batches of this size
+STREAM_CHUNK_BYTES = 64 * 1024
+STREAM_BATCH_SIZE = PERSIST_BATCH_SIZE
+
+# Failed transforms listed in the import response (the rest are only counted)
+FAILED_ORDER_SAMPLES = 5
 
 load_dotenv()
 
@@ -18,17 +55,36 @@ class BournemouthEatsAPIService:
         self.auto_import_enabled = os.getenv("BOURNEMOUTHEATS_AUTO_IMPORT", "false").lower() == "true"
         self.import_interval_minutes = int(os.getenv("BOURNEMOUTHEATS_IMPORT_INTERVAL", "5"))
         self.max_orders_per_import = int(os.getenv("BOURNEMOUTHEATS_MAX_ORDERS", "50"))
+        self.max_pages_per_import = int(os.getenv("BOURNEMOUTHEATS_MAX_PAGES", "100"))
+        self.import_concurrency = int(os.getenv("BOURNEMOUTHEATS_IMPORT_CONCURRENCY", "4"))
         
         # Session for HTTP requests
         self.session = None
         self.last_import_time = None
+        # Orders updated before this are imported; persisted in import_state
+        self.high_water_mark: Optional[datetime] = None
+        self._catch_up_span: Optional[timedelta] = None
+        self._import_lock = asyncio.Lock()
+        self._import_task: Optional[asyncio.Task] = None
+        self._indexes_ready = False
         self.import_stats = {
             "total_imported": 0,
             "total_failed": 0,
+            "total_inserted": 0,
+            "total_updated": 0,
+            "total_unchanged": 0,
             "last_successful_import": None,
-            "last_error": None
+            "last_error": None,
+            "runs": 0,
+            "pages_fetched": 0,
+            "consecutive_failures": 0,
+            "last_run": None,
+            "next_run_at": None
         }
         
+        # Identical concurrent lookups share one in-flight request
+        self.single_flight = AsyncSingleFlight()
+        
         # Order mapping configuration
         self.status_mapping = {
             "pending": "pending",
@@ -43,6 +99,7 @@ class BournemouthEatsAPIService:
     async def initialize(self):
         """Initialize the service and create HTTP session"""
         if self.session is None:
+            import aiohttp
             self.session = aiohttp.ClientSession(
                 headers={
                     "Authorization": f"Bearer {self.api_key}",
@@ -52,7 +109,8 @@ class BournemouthEatsAPIService:
             )
     
     async def close(self):
-        """Close the HTTP session"""
+        """Stop the background importer and close the HTTP session"""
+        await self.stop_auto_import()
         if self.session:
             await self.session.close()
             self.session = None
@@ -94,92 +152,378 @@ class BournemouthEatsAPIService:
     
     async def import_orders(
         self,
+        db=None,
         since: Optional[datetime] = None,
         limit: Optional[int] = None
     ) -> Dict[str, any]:
         """
         Import orders from BournemouthEats API
         
+        Pages through the API by update time until a page comes back short
+        (at most max_pages_per_import pages per run). A backlog of more than a few intervals is split into
+        time slices fetched concurrently. Pages are parsed as they download
+        and stored in batches, so memory stays flat however large the page.
+        
         Args:
-            since: Import orders since this time
-            limit: Maximum number of orders to import
+            db: Database for the durable high-water mark (optional)
+            since: Import orders updated since this time (default: the high-water mark)
+            limit: Orders per page (default: max_orders_per_import)
         
         Returns:
             Dictionary with import results
         """
-        if not self.auto_import_enabled:
+        if not self.api_key:
             return {
                 "success": False,
-                "error": "Auto-import is disabled",
+                "error": "BournemouthEats API key is not configured",
                 "imported_count": 0
             }
         
-        try:
-            await self.initialize()
-            
-            # Set default parameters
-            if since is None:
-                since = self.last_import_time or (datetime.utcnow() - timedelta(hours=1))
-            
-            if limit is None:
-                limit = self.max_orders_per_import
-            
-            # Prepare request parameters
-            params = {
-                "since": since.isoformat(),
-                "limit": limit,
-                "status": "pending,confirmed,preparing,ready"
-            }
-            
-            # Fetch orders from API
-            async with self.session.get(
-                f"{self.api_base_url}/orders",
-                params=params
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise Exception(f"API request failed: {response.status} - {error_text}")
+        async with self._import_lock:
+            started = time.monotonic()
+            try:
+                await self.initialize()
+                now = datetime.utcnow()
+                
+                # Resume from the stored high-water mark unless a start time is given
+                follow_high_water_mark = since is None
+                if follow_high_water_mark:
+                    if self.high_water_mark is None and db is not None:
+                        self.high_water_mark = await self._load_high_water_mark(db)
+                    since = (
+                        self.high_water_mark - timedelta(seconds=HIGH_WATER_OVERLAP_SECONDS)
+                        if self.high_water_mark else now - timedelta(hours=1)
+                    )
+                
+                # While catching up, each run covers about as much time per slice
+                # as the last capped run managed, so slices finish within the page cap
+                until = now
+                if follow_high_water_mark and self._catch_up_span is not None:
+                    until = min(now, since + self._catch_up_span * self.import_concurrency)
+                summary = {
+                    "imported_count": 0,
+                    "failed_count": 0,
+                    "persisted": None,
+                    "failed_samples": [],
+                    "geocoding": {}
+                }
+                
+                async def ingest(batch: List[Dict[str, any]]):
+                    self._merge_ingested(summary, await self.ingest_orders(db, batch))
                 
-                orders_data = await response.json()
-                orders = orders_data.get("orders", [])
+                fetched = await self._fetch_orders(since, until, limit or self.max_orders_per_import, ingest)
+                high_water_mark = fetched["high_water_mark"]
+                caught_up = fetched["caught_up"] and until == now
+                if follow_high_water_mark:
+                    if caught_up:
+                        self._catch_up_span = None
+                    elif fetched["caught_up"]:
+                        self._catch_up_span *= 2
+                    else:
+                        self._catch_up_span = max(fetched["slice_span_covered"], timedelta(minutes=1))
                 
-                # Process and transform orders
-                imported_orders = []
-                failed_orders = []
+                persisted = summary["persisted"]
                 
-                for order_data in orders:
-                    try:
-                        transformed_order = self._transform_order(order_data)
-                        imported_orders.append(transformed_order)
-                    except Exception as e:
-                        failed_orders.append({
-                            "original_data": order_data,
-                            "error": str(e)
-                        })
+                # Advance the high-water mark only over what this run fully covered and stored
+                if (
+                    follow_high_water_mark
+                    and (persisted is None or persisted["write_errors"] == 0)
+                    and (self.high_water_mark is None or high_water_mark > self.high_water_mark)
+                ):
+                    self.high_water_mark = high_water_mark
+                    if db is not None:
+                        await self._save_high_water_mark(db, self.high_water_mark)
                 
                 # Update import statistics
-                self.import_stats["total_imported"] += len(imported_orders)
-                self.import_stats["total_failed"] += len(failed_orders)
                 self.import_stats["last_successful_import"] = datetime.utcnow()
+                self.import_stats["runs"] += 1
+                self.import_stats["pages_fetched"] += fetched["pages"]
+                self.import_stats["last_run"] = {
+                    "seconds": round(time.monotonic() - started, 2),
+                    "pages": fetched["pages"],
+                    "slices": fetched["slices"],
+                    "orders": fetched["fetched"],
+                    "caught_up": caught_up,
+                    "behind_seconds": round((now - since).total_seconds())
+                }
                 self.last_import_time = datetime.utcnow()
                 
                 return {
                     "success": True,
-                    "imported_count": len(imported_orders),
-                    "failed_count": len(failed_orders),
-                    "orders": imported_orders,
-                    "failed_orders": failed_orders,
+                    "fetched_count": fetched["fetched"],
+                    **summary,
+                    "pages": fetched["pages"],
+                    "caught_up": caught_up,
+                    "high_water_mark": self.high_water_mark.isoformat() if self.high_water_mark else None,
                     "import_timestamp": datetime.utcnow().isoformat()
                 }
                 
-        except Exception as e:
-            self.import_stats["last_error"] = str(e)
-            return {
-                "success": False,
-                "error": str(e),
-                "imported_count": 0,
-                "failed_count": 0
+            except Exception as e:
+                self.import_stats["last_error"] = str(e)
+                return {
+                    "success": False,
+                    "error": str(e),
+                    "imported_count": 0,
+                    "failed_count": 0
+                }
+    
+    async def ingest_orders(self, db, api_orders: List[Dict[str, any]]) -> Dict[str, any]:
+        """
+        Transform API orders, feed the in-memory models and upsert them
+        
+        Shared by the polling import and the order webhook.
+        
+        Args:
+            db: Database to persist to (None only transforms and records)
+            api_orders: Orders in the BournemouthEats API format
+        
+        Returns:
+            Counts, persistence results and a few failure samples
+        """
+        imported_orders = []
+        failed_orders = []
+        
+        for order_data in api_orders:
+            try:
+                transformed_order = self._transform_order(order_data)
+                imported_orders.append(transformed_order)
+            except Exception as e:
+                failed_orders.append({
+                    "external_order_id": order_data.get("id"),
+                    "error": str(e)
+                })
+        
+        # Resolve orders that arrived without coordinates from the local geocode store
+        geocoding = self._geocode_missing_coordinates(imported_orders)
+        
+        # Feed the demand heatmap incrementally
+        demand_heatmap.record_orders(imported_orders)
+        
+        # Orders the restaurant has marked ready train the preparation-time model
+        prep_time_model.record_orders(imported_orders)
+        
+        persisted = await self._persist_orders(db, imported_orders) if db is not None else None
+        
+        self.import_stats["total_imported"] += len(imported_orders)
+        self.import_stats["total_failed"] += len(failed_orders)
+        if persisted is not None:
+            for count in ("inserted", "updated", "unchanged"):
+                self.import_stats[f"total_{count}"] += persisted[count]
+        
+        return {
+            "imported_count": len(imported_orders),
+            "failed_count": len(failed_orders),
+            "persisted": persisted,
+            "failed_samples": failed_orders[:FAILED_ORDER_SAMPLES],
+            "geocoding": geocoding
+        }
+    
+    def _merge_ingested(self, summary: Dict[str, any], result: Dict[str, any]):
+        """Add one ingest_orders batch result to a run's totals"""
+        summary["imported_count"] += result["imported_count"]
+        summary["failed_count"] += result["failed_count"]
+        room = FAILED_ORDER_SAMPLES - len(summary["failed_samples"])
+        summary["failed_samples"].extend(result["failed_samples"][:max(room, 0)])
+        for name, count in result["geocoding"].items():
+            summary["geocoding"][name] = summary["geocoding"].get(name, 0) + count
+        if result["persisted"] is not None:
+            persisted = summary["persisted"] or {}
+            for name, count in result["persisted"].items():
+                persisted[name] = persisted.get(name, 0) + count
+            summary["persisted"] = persisted
+    
+    async def _fetch_orders(
+        self,
+        since: datetime,
+        until: datetime,
+        page_size: int,
+        ingest: Callable[[List[Dict[str, any]]], Awaitable[None]]
+    ) -> Dict[str, any]:
+        """Stream every order updated in [since, until) to ingest, in concurrent slices when far behind"""
+        interval = timedelta(minutes=self.import_interval_minutes)
+        slice_count = 1
+        if until - since > interval * CATCH_UP_INTERVALS:
+            slice_count = max(1, min(self.import_concurrency, math.ceil((until - since) / interval)))
+        step = (until - since) / slice_count
+        slices = [(since + step * index, since + step * (index + 1)) for index in range(slice_count)]
+        slices[-1] = (slices[-1][0], until)
+        
+        pages_per_slice = max(1, self.max_pages_per_import // slice_count)
+        # A failed slice cancels the others instead of leaving them ingesting
+        # into an import that has already failed
+        try:
+            async with asyncio.TaskGroup() as group:
+                tasks = [
+                    group.create_task(self._fetch_slice(start, end, page_size, pages_per_slice, ingest))
+                    for start, end in slices
+                ]
+        except ExceptionGroup as errors:
+            raise errors.exceptions[0]
+        results = [task.result() for task in tasks]
+        
+        # The mark only moves to update times actually seen, through complete
+        # slices and into the first one cut short by the page cap; later slices
+        # are fetched again next run
+        high_water_mark = since
+        slice_span_covered = step
+        for (start, end), result in zip(slices, results):
+            if result["latest_seen"] is not None:
+                high_water_mark = max(high_water_mark, result["latest_seen"])
+            if not result["complete"]:
+                slice_span_covered = high_water_mark - start
+                break
+        
+        # Orders on a slice edge may arrive twice; the upsert's content hash leaves the repeat alone
+        return {
+            "fetched": sum(result["fetched"] for result in results),
+            "pages": sum(result["pages"] for result in results),
+            "slices": slice_count,
+            "caught_up": all(result["complete"] for result in results),
+            "high_water_mark": high_water_mark,
+            "slice_span_covered": slice_span_covered
+        }
+    
+    async def _fetch_slice(
+        self,
+        since: datetime,
+        until: datetime,
+        page_size: int,
+        max_pages: int,
+        ingest: Callable[[List[Dict[str, any]]], Awaitable[None]]
+    ) -> Dict[str, any]:
+        """
+        Page through one time slice, ingesting orders as they are parsed
+        
+        The API only filters by since and returns at most limit orders, oldest
+        update first, so each page starts at the latest update time seen so far
+        and a full page means there may be more. Orders updated at or after
+        until belong to a later slice (or run) and are skipped; seeing one
+        means this slice is done.
+        """
+        fetched = 0
+        latest_seen = None
+        page_since = since
+        
+        for page in range(1, max_pages + 1):
+            params = {
+                "since": page_since.isoformat(),
+                "limit": page_size,
+                "status": "pending,confirmed,preparing,ready"
             }
+            page_count = 0
+            reached_until = False
+            
+            async def flush(batch: List[Dict[str, any]]):
+                nonlocal fetched, latest_seen, page_count, reached_until
+                page_count += len(batch)
+                in_slice = []
+                for order in batch:
+                    seen = self._parse_time(order.get("updated_at") or order.get("created_at"))
+                    if seen is not None and seen >= until:
+                        reached_until = True
+                        continue
+                    in_slice.append(order)
+                    if seen is not None and (latest_seen is None or seen > latest_seen):
+                        latest_seen = seen
+                fetched += len(in_slice)
+                if in_slice:
+                    await ingest(in_slice)
+            
+            async with self.session.get(
+                f"{self.api_base_url}/orders",
+                params=params
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise Exception(f"API request failed: {response.status} - {error_text}")
+                
+                # Store orders while the rest of the page is still downloading
+                parser = JSONArrayStream("orders")
+                batch = []
+                async for chunk in response.content.iter_chunked(STREAM_CHUNK_BYTES):
+                    batch.extend(parser.feed(chunk))
+                    if len(batch) >= STREAM_BATCH_SIZE:
+                        await flush(batch)
+                        batch = []
+                if batch:
+                    await flush(batch)
+                parser.close()
+            
+            if reached_until or page_count < page_size:
+                return {"fetched": fetched, "pages": page, "complete": True, "latest_seen": latest_seen}
+            if latest_seen is None or latest_seen <= page_since:
+                # A full page without a newer update time: paging by since cannot get past it
+                break
+            page_since = latest_seen
+        return {"fetched": fetched, "pages": page, "complete": False, "latest_seen": latest_seen}
+    
+    async def ensure_indexes(self, db):
+        # One stored order per BournemouthEats order; manual orders have no external id
+        await db.orders.create_index(
+            [("external_order_id", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"external_order_id": {"$exists": True}}
+        )
+    
+    async def _persist_orders(self, db, orders: List[Dict[str, any]]) -> Dict[str, int]:
+        """
+        Upsert imported orders by external_order_id in unordered bulk writes
+        
+        The filter only matches a stored order whose content_hash differs and
+        that is no newer than the incoming one (compare-and-set on updated_at),
+        so an unchanged or out-of-date order's upsert collides with the unique
+        external_order_id index and is counted as unchanged instead of being
+        rewritten; a late webhook or poll never rolls an order back. Fields
+        the rider app owns after import (status, rider_id) are only set on insert.
+        """
+        if not self._indexes_ready:
+            await self.ensure_indexes(db)
+            self._indexes_ready = True
+        
+        counts = {"inserted": 0, "updated": 0, "unchanged": 0, "write_errors": 0}
+        for start in range(0, len(orders), PERSIST_BATCH_SIZE):
+            operations = []
+            for order in orders[start:start + PERSIST_BATCH_SIZE]:
+                on_insert = {field: order[field] for field in INSERT_ONLY_FIELDS if field in order}
+                on_insert["rider_id"] = None
+                operations.append(UpdateOne(
+                    {
+                        "external_order_id": order["external_order_id"],
+                        "content_hash": {"$ne": order["content_hash"]},
+                        "updated_at": {"$lte": order["updated_at"]}
+                    },
+                    {
+                        "$set": {field: value for field, value in order.items() if field not in on_insert},
+                        "$setOnInsert": on_insert
+                    },
+                    upsert=True
+                ))
+            try:
+                result = await db.orders.bulk_write(operations, ordered=False)
+                details = result.bulk_api_result
+            except BulkWriteError as e:
+                details = e.details
+                for error in details.get("writeErrors", []):
+                    if error.get("code") == DUPLICATE_KEY_CODE:
+                        counts["unchanged"] += 1
+                    else:
+                        counts["write_errors"] += 1
+            counts["inserted"] += details.get("nUpserted", 0)
+            counts["updated"] += details.get("nModified", 0)
+        return counts
+    
+    async def _load_high_water_mark(self, db) -> Optional[datetime]:
+        """Last fully imported update time, stored in import_state"""
+        state = await db.import_state.find_one({"_id": IMPORT_STATE_ID})
+        return state.get("high_water_mark") if state else None
+    
+    async def _save_high_water_mark(self, db, high_water_mark: datetime):
+        # $max keeps the mark from moving backwards if runs ever overlap
+        await db.import_state.update_one(
+            {"_id": IMPORT_STATE_ID},
+            {"$max": {"high_water_mark": high_water_mark}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
     
     def _transform_order(self, api_order: Dict[str, any]) -> Dict[str, any]:
         """
@@ -200,6 +544,8 @@ class BournemouthEatsAPIService:
         pickup_address = api_order.get("restaurant", {}).get("address", {})
         delivery_address = api_order.get("delivery_address", {})
         
+        created_at = datetime.fromisoformat(api_order.get("created_at", datetime.utcnow().isoformat()))
+        
         # Extract coordinates
         pickup_lat = pickup_address.get("latitude")
         pickup_lng = pickup_address.get("longitude")
@@ -210,6 +556,7 @@ class BournemouthEatsAPIService:
         transformed_order = {
             "_id": f"be_{order_id}",  # Prefix to avoid conflicts
             "order_id": order_id,
+            "restaurant_id": api_order.get("restaurant", {}).get("id"),
             "restaurant_name": restaurant_name,
             "restaurant_address": {
                 "street": pickup_address.get("street", ""),
@@ -242,19 +589,50 @@ class BournemouthEatsAPIService:
                 api_order.get("status", "pending"),
                 "pending"
             ),
-            "estimated_preparation_time": api_order.get("estimated_preparation_time", 20),
-            "created_at": datetime.fromisoformat(api_order.get("created_at", datetime.utcnow().isoformat())),
+            "external_status": self.status_mapping.get(
+                api_order.get("status", "pending"),
+                "pending"
+            ),
+            "estimated_preparation_time": api_order.get("estimated_preparation_time"),
+            "preparation_started_at": self._parse_time(api_order.get("preparation_started_at")),
+            "ready_at": self._parse_time(api_order.get("ready_at")),
+            "created_at": created_at,
             "updated_at": datetime.fromisoformat(api_order.get("updated_at", datetime.utcnow().isoformat())),
             "source": "bournemoutheats_api",
             "external_order_id": order_id,
+            "content_hash": hashlib.sha1(json.dumps(api_order, sort_keys=True, default=str).encode()).hexdigest(),
             "priority": self._calculate_priority(api_order),
             "special_instructions": api_order.get("special_instructions", ""),
             "payment_method": api_order.get("payment_method", "unknown"),
             "is_paid": api_order.get("is_paid", False)
         }
         
+        # Orders without the restaurant's own estimate get the learned one
+        if transformed_order["estimated_preparation_time"] is None:
+            transformed_order["estimated_preparation_time"] = round(
+                prep_time_model.expected_minutes(restaurant_key(transformed_order), created_at)
+            )
+        
         return transformed_order
     
+    def _parse_time(self, value: Optional[str]) -> Optional[datetime]:
+        """Parse an optional ISO timestamp from the API"""
+        if not value:
+            return None
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    
+    def _geocode_missing_coordinates(self, orders: List[Dict[str, any]]) -> Dict[str, int]:
+        """Fill in missing pickup/delivery coordinates without calling Google"""
+        try:
+            from services.google_maps_service import google_maps_service
+            return google_maps_service.geocode_orders(orders)
+        except Exception as e:
+            print(f"Error geocoding imported orders: {e}")
+            return {"resolved": 0, "unresolved": 0, "approximate": 0}
+    
     def _calculate_priority(self, api_order: Dict[str, any]) -> str:
         """Calculate order priority based on various factors"""
         priority_score = 0
@@ -365,6 +743,14 @@ class BournemouthEatsAPIService:
         Returns:
             Restaurant information
         """
+        return await self.single_flight.do(
+            ("restaurant", restaurant_id),
+            self._fetch_restaurant_info,
+            restaurant_id
+        )
+    
+    async def _fetch_restaurant_info(self, restaurant_id: str) -> Dict[str, any]:
+        """Uncoalesced restaurant information request"""
         try:
             await self.initialize()
             
@@ -403,22 +789,41 @@ class BournemouthEatsAPIService:
             return []
     
     def get_import_stats(self) -> Dict[str, any]:
-        """Get import statistics"""
+        """Get import statistics, including how far the import is behind the API"""
+        now = datetime.utcnow()
+        next_run_at = self.import_stats["next_run_at"]
         return {
             **self.import_stats,
+            "next_run_at": next_run_at.isoformat() if next_run_at else None,
             "auto_import_enabled": self.auto_import_enabled,
+            "auto_import_running": self._import_task is not None and not self._import_task.done(),
             "import_interval_minutes": self.import_interval_minutes,
             "max_orders_per_import": self.max_orders_per_import,
+            "max_pages_per_import": self.max_pages_per_import,
+            "import_concurrency": self.import_concurrency,
+            "high_water_mark": self.high_water_mark.isoformat() if self.high_water_mark else None,
+            "lag_seconds": round((now - self.high_water_mark).total_seconds()) if self.high_water_mark else None,
             "last_import_time": self.last_import_time.isoformat() if self.last_import_time else None
         }
     
+    def get_status(self) -> Dict[str, any]:
+        """Get service status and request coalescing metrics"""
+        return {
+            "configured": bool(self.api_key),
+            "api_base_url": self.api_base_url,
+            "auto_import_enabled": self.auto_import_enabled,
+            "single_flight": self.single_flight.get_stats()
+        }
+    
     def update_import_settings(
         self,
         auto_import_enabled: Optional[bool] = None,
         import_interval_minutes: Optional[int] = None,
-        max_orders_per_import: Optional[int] = None
+        max_orders_per_import: Optional[int] = None,
+        max_pages_per_import: Optional[int] = None,
+        import_concurrency: Optional[int] = None
     ):
-        """Update import settings"""
+        """Update import settings (the background importer picks them up on its next run)"""
         if auto_import_enabled is not None:
             self.auto_import_enabled = auto_import_enabled
         
@@ -427,19 +832,50 @@ class BournemouthEatsAPIService:
         
         if max_orders_per_import is not None:
             self.max_orders_per_import = max_orders_per_import
+        
+        if max_pages_per_import is not None:
+            self.max_pages_per_import = max_pages_per_import
+        
+        if import_concurrency is not None:
+            self.import_concurrency = import_concurrency
     
-    async def start_auto_import(self):
-        """Start automatic order import (for future implementation)"""
+    def start_auto_import(self, get_database: Callable[[], Awaitable[any]]):
+        """Import in the background every import_interval_minutes until stop_auto_import()"""
         if not self.auto_import_enabled:
             return
-        
-        # This would be implemented as a background task
-        # For now, just log that it's enabled
-        print(f"Auto-import enabled with {self.import_interval_minutes} minute interval")
+        if self._import_task is None or self._import_task.done():
+            self._import_task = asyncio.create_task(self._run_auto_import(get_database))
+            print(f"Auto-import enabled with {self.import_interval_minutes} minute interval")
     
     async def stop_auto_import(self):
         """Stop automatic order import"""
-        print("Auto-import stopped")
+        if self._import_task is not None:
+            self._import_task.cancel()
+            try:
+                await self._import_task
+            except asyncio.CancelledError:
+                pass
+            self._import_task = None
+            print("Auto-import stopped")
+    
+    async def _run_auto_import(self, get_database: Callable[[], Awaitable[any]]):
+        db = await get_database()
+        while True:
+            result = await self.import_orders(db)
+            if result["success"]:
+                self.import_stats["consecutive_failures"] = 0
+            else:
+                self.import_stats["consecutive_failures"] += 1
+            
+            # A run cut short by the page cap continues straight away; otherwise
+            # wait the interval with jitter (and back off while the API fails)
+            if result.get("caught_up") is False:
+                delay = 1.0
+            else:
+                delay = self.import_interval_minutes * 60 * random.uniform(1 - IMPORT_JITTER, 1 + IMPORT_JITTER)
+                delay = min(delay * 2 ** self.import_stats["consecutive_failures"], MAX_IMPORT_BACKOFF_SECONDS)
+            self.import_stats["next_run_at"] = datetime.utcnow() + timedelta(seconds=delay)
+            await asyncio.sleep(delay)
 
-# Create global instance
-bournemoutheats_api_service = BournemouthEatsAPIService()
+# Global instance, built on first use
+bournemoutheats_api_service = service_registry.lazy("bournemoutheats_api", BournemouthEatsAPIService)
@@ -0,0 +1,235 @@
+import math
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import datetime, timedelta
+
+# Grid covering Bournemouth, Poole and Christchurch (~280m x ~280m cells)
+GRID_ORIGIN = (50.66, -2.10)
+GRID_CELL_LAT = 0.0025
+GRID_CELL_LNG = 0.004
+GRID_ROWS = 64
+GRID_COLS = 100
+
+BUCKET_SECONDS = 300
+WEEK_BUCKETS = 7 * 24 * 3600 // BUCKET_SECONDS
+
+# Running windows maintained incrementally, in buckets
+RUNNING_WINDOWS = {"15m": 3, "1h": 12}
+LAST_WEEK_WINDOW = "last_week"
+
+KINDS = ("pickup", "dropoff")
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _bucket_of(when: datetime) -> int:
+    return int((when - EPOCH).total_seconds()) // BUCKET_SECONDS
+
+
+def _cell_index(lat: float, lng: float) -> Optional[int]:
+    row = math.floor((lat - GRID_ORIGIN[0]) / GRID_CELL_LAT)
+    col = math.floor((lng - GRID_ORIGIN[1]) / GRID_CELL_LNG)
+    if 0 <= row < GRID_ROWS and 0 <= col < GRID_COLS:
+        return row * GRID_COLS + col
+    return None
+
+
+def _empty_grid() -> array:
+    return array("I", bytes(4 * GRID_ROWS * GRID_COLS))
+
+
+class DemandHeatmap:
+    """
+    Order pickup and drop-off counts on a fixed grid over sliding time windows.
+
+    Events go into sparse 5-minute buckets kept for a week. The 15-minute and
+    1-hour windows are dense grids updated as events arrive and as buckets
+    expire, so reading them is a copy of one array. The same hour last week
+    is summed from its twelve sparse buckets on request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # bucket -> {kind: {cell: count}}
+        self._buckets: Dict[int, Dict[str, Dict[int, int]]] = {}
+        self._bucket_orders: Dict[int, List[str]] = {}
+        self._seen_orders: Dict[str, int] = {}
+        self._windows = {
+            window: {kind: _empty_grid() for kind in KINDS}
+            for window in RUNNING_WINDOWS
+        }
+        self._current_bucket = _bucket_of(datetime.utcnow())
+        self.stats = {"events": 0, "duplicates": 0, "outside_grid": 0}
+
+    def _advance(self, now_bucket: int):
+        """Move running windows forward, subtracting buckets that fell out"""
+        if now_bucket <= self._current_bucket:
+            return
+
+        for window, size in RUNNING_WINDOWS.items():
+            old_start = self._current_bucket - size + 1
+            new_start = now_bucket - size + 1
+            for bucket in range(old_start, min(new_start, self._current_bucket + 1)):
+                counts = self._buckets.get(bucket)
+                if not counts:
+                    continue
+                for kind, cells in counts.items():
+                    grid = self._windows[window][kind]
+                    for cell, count in cells.items():
+                        grid[cell] -= count
+
+        # Drop buckets older than last week's comparison window
+        oldest_kept = now_bucket - WEEK_BUCKETS - RUNNING_WINDOWS["1h"]
+        for bucket in [bucket for bucket in self._buckets if bucket < oldest_kept]:
+            del self._buckets[bucket]
+            for order_id in self._bucket_orders.pop(bucket, ()):
+                self._seen_orders.pop(order_id, None)
+
+        self._current_bucket = now_bucket
+
+    def record_order(
+        self,
+        order_id: Optional[str],
+        pickup: Optional[Tuple[float, float]],
+        dropoff: Optional[Tuple[float, float]],
+        when: Optional[datetime] = None
+    ) -> bool:
+        """
+        Add one order's pickup and drop-off points to the heatmap
+
+        Args:
+            order_id: Order identifier used to ignore repeated imports
+            pickup: (lat, lng) of the restaurant
+            dropoff: (lat, lng) of the customer
+            when: Order creation time in UTC (defaults to now)
+
+        Returns:
+            True if the order was counted
+        """
+        now_bucket = _bucket_of(datetime.utcnow())
+        bucket = _bucket_of(when) if when else now_bucket
+
+        with self._lock:
+            self._advance(now_bucket)
+            if bucket < now_bucket - WEEK_BUCKETS - RUNNING_WINDOWS["1h"] or bucket > now_bucket:
+                return False
+            if order_id is not None:
+                if order_id in self._seen_orders:
+                    self.stats["duplicates"] += 1
+                    return False
+                self._seen_orders[order_id] = bucket
+                self._bucket_orders.setdefault(bucket, []).append(order_id)
+
+            counts = self._buckets.setdefault(bucket, {kind: {} for kind in KINDS})
+            for kind, point in (("pickup", pickup), ("dropoff", dropoff)):
+                if point is None or point[0] is None or point[1] is None:
+                    continue
+                cell = _cell_index(point[0], point[1])
+                if cell is None:
+                    self.stats["outside_grid"] += 1
+                    continue
+                counts[kind][cell] = counts[kind].get(cell, 0) + 1
+                for window, size in RUNNING_WINDOWS.items():
+                    if bucket > now_bucket - size:
+                        self._windows[window][kind][cell] += 1
+
+            self.stats["events"] += 1
+            return True
+
+    def record_orders(self, orders: Iterable[Dict]) -> int:
+        """
+        Add imported orders or delivery documents to the heatmap
+
+        Understands both the imported order format (restaurant_address /
+        delivery_address) and delivery documents (pickup_lat / delivery_lat).
+        """
+        recorded = 0
+        for order in orders:
+            if "restaurant_address" in order:
+                restaurant = order.get("restaurant_address") or {}
+                customer = order.get("delivery_address") or {}
+                pickup = (restaurant.get("latitude"), restaurant.get("longitude"))
+                dropoff = (customer.get("latitude"), customer.get("longitude"))
+            else:
+                pickup = (order.get("pickup_lat"), order.get("pickup_lng"))
+                dropoff = (order.get("delivery_lat"), order.get("delivery_lng"))
+
+            order_id = order.get("external_order_id") or order.get("_id")
+            created_at = order.get("created_at")
+            if not isinstance(created_at, datetime):
+                created_at = None
+            if self.record_order(str(order_id) if order_id is not None else None, pickup, dropoff, created_at):
+                recorded += 1
+        return recorded
+
+    async def load_from_database(self, db, hours: int = 7 * 24 + 1) -> int:
+        """Seed the heatmap from recent orders and deliveries (used once at startup)"""
+        since = datetime.utcnow() - timedelta(hours=hours)
+        recorded = 0
+        order_fields = {"external_order_id": 1, "restaurant_address": 1, "delivery_address": 1, "created_at": 1}
+        async for order in db.orders.find({"created_at": {"$gte": since}}, order_fields):
+            recorded += self.record_orders([order])
+        delivery_fields = {"pickup_lat": 1, "pickup_lng": 1, "delivery_lat": 1, "delivery_lng": 1, "created_at": 1}
+        async for delivery in db.deliveries.find({"created_at": {"$gte": since}}, delivery_fields):
+            recorded += self.record_orders([delivery])
+        return recorded
+
+    def get_heatmap(self, window: str = "15m", kind: str = "pickup") -> Dict:
+        """
+        Get counts per grid cell for a window
+
+        Args:
+            window: 15m, 1h or last_week (the same hour one week ago)
+            kind: pickup, dropoff or all
+
+        Returns:
+            Grid description and a row-major list of counts
+        """
+        if window not in RUNNING_WINDOWS and window != LAST_WEEK_WINDOW:
+            raise ValueError(f"Unknown window: {window}")
+        if kind not in KINDS and kind != "all":
+            raise ValueError(f"Unknown kind: {kind}")
+        kinds = KINDS if kind == "all" else (kind,)
+
+        now_bucket = _bucket_of(datetime.utcnow())
+        with self._lock:
+            self._advance(now_bucket)
+            if window in RUNNING_WINDOWS:
+                counts = array("I", self._windows[window][kinds[0]])
+                for extra_kind in kinds[1:]:
+                    extra = self._windows[window][extra_kind]
+                    for cell in range(len(counts)):
+                        counts[cell] += extra[cell]
+            else:
+                counts = _empty_grid()
+                end = now_bucket - WEEK_BUCKETS
+                for bucket in range(end - RUNNING_WINDOWS["1h"] + 1, end + 1):
+                    bucket_counts = self._buckets.get(bucket)
+                    if not bucket_counts:
+                        continue
+                    for selected_kind in kinds:
+                        for cell, count in bucket_counts[selected_kind].items():
+                            counts[cell] += count
+
+        return {
+            "window": window,
+            "kind": kind,
+            "origin": list(GRID_ORIGIN),
+            "cell_size": [GRID_CELL_LAT, GRID_CELL_LNG],
+            "rows": GRID_ROWS,
+            "cols": GRID_COLS,
+            "total": sum(counts),
+            "counts": counts.tolist()
+        }
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get heatmap statistics"""
+        return {
+            **self.stats,
+            "buckets": len(self._buckets),
+            "tracked_orders": len(self._seen_orders)
+        }
+
+# Create global instance
+demand_heatmap = DemandHeatmap()
@@ -0,0 +1,293 @@
+import os
+import json
+import math
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+from services.geo_utils import EARTH_RADIUS_KM, haversine_km
+
+MINUTES_PER_DAY = 24 * 60
+
+# Grid cell size for the spatial index (~550m x ~560m around Bournemouth)
+GRID_CELL_LAT = 0.005
+GRID_CELL_LNG = 0.008
+
+# Zone bounding boxes are widened slightly so rounding never drops a cell
+# that a point inside the radius can fall in
+ZONE_BOX_MARGIN = 1.01
+
+# Default high-demand zones around Bournemouth
+DEFAULT_DEMAND_ZONES = [
+    {
+        "name": "Bournemouth Town Centre",
+        "center": (50.7192, -1.8808),
+        "radius_km": 1.0,
+        "demand_level": "high",
+        "peak_hours": ["11:00-14:00", "17:00-20:00"]
+    },
+    {
+        "name": "Poole Road Area",
+        "center": (50.7180, -1.8850),
+        "radius_km": 0.8,
+        "demand_level": "medium",
+        "peak_hours": ["12:00-14:00", "18:00-20:00"]
+    },
+    {
+        "name": "Winton Area",
+        "center": (50.7300, -1.8700),
+        "radius_km": 1.2,
+        "demand_level": "medium",
+        "peak_hours": ["11:30-13:30", "17:30-19:30"]
+    },
+    {
+        "name": "Charminster Area",
+        "center": (50.7400, -1.8600),
+        "radius_km": 1.0,
+        "demand_level": "low",
+        "peak_hours": ["12:00-14:00", "18:00-20:00"]
+    }
+]
+
+
+def _parse_minute_of_day(value: str) -> int:
+    """Parse an 'HH:MM' string into minutes since midnight"""
+    hours, minutes = value.strip().split(":")
+    minute = int(hours) * 60 + int(minutes)
+    if not 0 <= minute < MINUTES_PER_DAY:
+        raise ValueError(f"Invalid time of day: {value}")
+    return minute
+
+
+def _cell_of(lat: float, lng: float) -> Tuple[int, int]:
+    return (math.floor(lat / GRID_CELL_LAT), math.floor(lng / GRID_CELL_LNG))
+
+
+class CompiledZone:
+    """A demand zone with its peak hours expanded into a minute-of-day table"""
+
+    __slots__ = (
+        "index", "definition", "name", "lat", "lng", "radius_km",
+        "demand_level", "peak_minutes", "multipliers", "wait_times"
+    )
+
+    def __init__(self, index: int, definition: Dict):
+        self.index = index
+        self.definition = definition
+        self.name = definition["name"]
+        self.lat, self.lng = definition["center"]
+        self.radius_km = float(definition["radius_km"])
+        if not self.radius_km > 0:
+            raise ValueError(f"Zone {self.name!r} needs a positive radius_km, got {definition['radius_km']!r}")
+        self.demand_level = definition.get("demand_level", "low")
+
+        # One byte per minute of the day: 1 if the minute is inside a peak window.
+        # Ranges are inclusive at both ends, matching the "HH:MM" string comparison
+        # used previously; a range whose end is before its start wraps past midnight.
+        peak_minutes = bytearray(MINUTES_PER_DAY)
+        for peak_range in definition.get("peak_hours", []):
+            start_str, end_str = peak_range.split("-")
+            start, end = _parse_minute_of_day(start_str), _parse_minute_of_day(end_str)
+            if start <= end:
+                peak_minutes[start:end + 1] = b"\x01" * (end - start + 1)
+            else:
+                peak_minutes[start:] = b"\x01" * (MINUTES_PER_DAY - start)
+                peak_minutes[:end + 1] = b"\x01" * (end + 1)
+        self.peak_minutes = bytes(peak_minutes)
+
+        # Indexed by is_peak (0 = off-peak, 1 = peak)
+        if self.demand_level == "high":
+            self.multipliers = (1.5, 2.5)
+        else:
+            self.multipliers = (1.0, 2.0)
+
+        base_wait_time = 15  # minutes
+        if self.demand_level == "high":
+            base_wait_time = 25
+        elif self.demand_level == "medium":
+            base_wait_time = 20
+        self.wait_times = (base_wait_time, base_wait_time + 10)
+
+    def status(self, minute_of_day: int) -> Dict:
+        is_peak = self.peak_minutes[minute_of_day]
+        return {
+            **self.definition,
+            "is_peak_hour": bool(is_peak),
+            "current_demand_multiplier": self.multipliers[is_peak],
+            "estimated_wait_time": self.wait_times[is_peak]
+        }
+
+
+class _CompiledZoneSet:
+    """Immutable snapshot of compiled zones plus their spatial grid index"""
+
+    def __init__(self, zones: List[Dict], version: int):
+        self.version = version
+        self.zones = [CompiledZone(index, zone) for index, zone in enumerate(zones)]
+        self.grid: Dict[Tuple[int, int], Tuple[int, ...]] = {}
+
+        grid: Dict[Tuple[int, int], List[int]] = {}
+        for zone in self.zones:
+            # Bounding box of the zone circle on the sphere haversine_km measures
+            # on, expressed in grid cells
+            angle = zone.radius_km / EARTH_RADIUS_KM
+            dlat = math.degrees(angle) * ZONE_BOX_MARGIN
+            lng_sine = min(1.0, math.sin(angle) / math.cos(math.radians(zone.lat)))
+            dlng = math.degrees(math.asin(lng_sine)) * ZONE_BOX_MARGIN
+            min_row, min_col = _cell_of(zone.lat - dlat, zone.lng - dlng)
+            max_row, max_col = _cell_of(zone.lat + dlat, zone.lng + dlng)
+            for row in range(min_row, max_row + 1):
+                for col in range(min_col, max_col + 1):
+                    grid.setdefault((row, col), []).append(zone.index)
+
+        self.grid = {cell: tuple(indexes) for cell, indexes in grid.items()}
+
+    def locate(self, lat: float, lng: float) -> Optional[CompiledZone]:
+        candidates = self.grid.get(_cell_of(lat, lng))
+        if not candidates:
+            return None
+
+        # Overlapping zones resolve to the one whose centre is relatively closest
+        best_zone = None
+        best_ratio = None
+        for index in candidates:
+            zone = self.zones[index]
+            distance = haversine_km(lat, lng, zone.lat, zone.lng)
+            if distance > zone.radius_km:
+                continue
+            ratio = distance / zone.radius_km
+            if best_ratio is None or ratio < best_ratio:
+                best_zone, best_ratio = zone, ratio
+        return best_zone
+
+
+class DemandZoneEngine:
+    """
+    Precompiled demand zones with O(1) point-in-zone and current-multiplier lookups.
+
+    Zone definitions are compiled once into minute-of-day peak tables and a grid
+    index. Reloading builds a new snapshot and swaps it in a single assignment, so
+    concurrent lookups always see a complete zone set.
+    """
+
+    def __init__(self, zones: Optional[List[Dict]] = None, zones_file: Optional[str] = None,
+                 reload_check_seconds: float = 30.0):
+        self.zones_file = zones_file if zones_file is not None else os.getenv("DEMAND_ZONES_FILE")
+        self.reload_check_seconds = reload_check_seconds
+        self._lock = threading.Lock()
+        self._version = 0
+        self._file_mtime: Optional[float] = None
+        self._next_file_check = 0.0
+        self._compiled: Optional[_CompiledZoneSet] = None
+
+        if self.zones_file and os.path.exists(self.zones_file):
+            self.reload_if_changed(force=True)
+        if self._compiled is None:
+            self.load_zones(zones if zones is not None else DEFAULT_DEMAND_ZONES)
+
+    @property
+    def version(self) -> int:
+        return self._compiled.version
+
+    @property
+    def zone_definitions(self) -> List[Dict]:
+        return [zone.definition for zone in self._compiled.zones]
+
+    def load_zones(self, zones: List[Dict]) -> int:
+        """
+        Compile and atomically install a new set of zone definitions
+
+        Args:
+            zones: Zone dictionaries (name, center, radius_km, demand_level, peak_hours)
+
+        Returns:
+            Version number of the installed zone set
+        """
+        normalized = []
+        for zone in zones:
+            normalized.append({**zone, "center": tuple(zone["center"])})
+
+        with self._lock:
+            # Compile before bumping the version so an invalid zone leaves the current set in place
+            compiled = _CompiledZoneSet(normalized, self._version + 1)
+            self._version = compiled.version
+            self._compiled = compiled
+        return compiled.version
+
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """Reload zones from the zones file if it has been modified"""
+        if not self.zones_file:
+            return False
+
+        now = time.monotonic()
+        if not force and now < self._next_file_check:
+            return False
+        self._next_file_check = now + self.reload_check_seconds
+
+        try:
+            mtime = os.path.getmtime(self.zones_file)
+            if not force and mtime == self._file_mtime:
+                return False
+            with open(self.zones_file, "r", encoding="utf-8") as zones_file:
+                zones = json.load(zones_file)
+            self.load_zones(zones)
+            self._file_mtime = mtime
+            return True
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Error reloading demand zones from {self.zones_file}: {e}")
+            return False
+
+    def _current(self) -> _CompiledZoneSet:
+        if self.zones_file:
+            self.reload_if_changed()
+        return self._compiled
+
+    @staticmethod
+    def _minute_of_day(current_time: Optional[datetime]) -> int:
+        if current_time is None:
+            current_time = datetime.now()
+        return current_time.hour * 60 + current_time.minute
+
+    def locate(self, lat: float, lng: float) -> Optional[str]:
+        """Return the name of the zone containing a point, or None"""
+        zone = self._current().locate(lat, lng)
+        return zone.name if zone else None
+
+    def get_zone_status(
+        self,
+        lat: float,
+        lng: float,
+        current_time: Optional[datetime] = None
+    ) -> Optional[Dict]:
+        """
+        Get the zone containing a point together with its current demand status
+
+        Args:
+            lat: Latitude
+            lng: Longitude
+            current_time: Time to evaluate peak hours at (defaults to now)
+
+        Returns:
+            Zone status dictionary or None if the point is outside every zone
+        """
+        zone = self._current().locate(lat, lng)
+        if zone is None:
+            return None
+        return zone.status(self._minute_of_day(current_time))
+
+    def get_demand_multiplier(
+        self,
+        lat: float,
+        lng: float,
+        current_time: Optional[datetime] = None
+    ) -> float:
+        """Current demand multiplier at a point (1.0 outside all zones)"""
+        zone = self._current().locate(lat, lng)
+        if zone is None:
+            return 1.0
+        return zone.multipliers[zone.peak_minutes[self._minute_of_day(current_time)]]
+
+    def get_all_zone_statuses(self, current_time: Optional[datetime] = None) -> List[Dict]:
+        """Current demand status of every zone"""
+        minute = self._minute_of_day(current_time)
+        return [zone.status(minute) for zone in self._current().zones]
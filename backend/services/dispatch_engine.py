@@ -0,0 +1,565 @@
+import os
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+from datetime import datetime, timedelta
+import numpy as np
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from services.assignment import solve_assignment
+from services.geo_utils import EARTH_RADIUS_KM, point_distance_km
+from services.order_batching import OrderBatcher
+from services.prep_time_model import restaurant_key
+from services.route_optimizer import MINUTES_PER_KM, ROAD_DISTANCE_FACTOR
+
+# MongoDB IllegalOperation: transactions need a replica set or mongos
+TRANSACTIONS_UNSUPPORTED_CODE = 20
+
+# Minutes of pickup ETA an order's priority is worth when riders are scarce
+ORDER_PRIORITY_MINUTES = {"high": 10.0, "medium": 5.0, "low": 0.0}
+
+# Cost weights, in minutes per minute
+RIDER_IDLE_WEIGHT = 0.5   # rider waiting at the restaurant for food
+FOOD_WAIT_WEIGHT = 1.0    # ready food waiting for the rider
+
+# Pickup ETA the best-ranked rider is worth over the worst-ranked one
+RIDER_PRIORITY_MINUTES = 5.0
+
+
+class _AssignmentConflict(Exception):
+    """The order or rider was taken by someone else between solve and commit"""
+
+
+def pickup_eta_minutes(order_points: np.ndarray, rider_points: np.ndarray) -> np.ndarray:
+    """
+    (orders, riders) road ETA estimate in minutes from (lat, lng) arrays
+
+    Uses the equirectangular approximation (within 0.1% of haversine over a
+    city) so the full matrix needs no trigonometry per pair.
+    """
+    order_lat = np.radians(order_points[:, 0])[:, None]
+    order_lng = np.radians(order_points[:, 1])[:, None]
+    rider_lat = np.radians(rider_points[:, 0])[None, :]
+    rider_lng = np.radians(rider_points[:, 1])[None, :]
+    north = rider_lat - order_lat
+    east = (rider_lng - order_lng) * np.cos(order_lat)
+    distance_km = EARTH_RADIUS_KM * np.sqrt(north * north + east * east)
+    return distance_km * (ROAD_DISTANCE_FACTOR * MINUTES_PER_KM)
+
+
+class DispatchEngine:
+    """
+    Periodic batch assignment of pending orders to available riders.
+
+    Each tick collects unassigned orders and free riders, groups compatible
+    orders into multi-drop jobs (see OrderBatcher), prices candidate pairs
+    (pickup ETA, time the rider or the food would wait at the restaurant,
+    the rider's priority score and the order's priority) and solves them as
+    a minimum-cost matching within a time budget. Candidates are each
+    order's nearest riders plus each rider's nearest orders, so the solve
+    grows with the number of candidate pairs rather than orders x riders
+    and no rider near work is left out. Every pair is committed with
+    conditional updates on both the rider and the job's orders (in a transaction where the
+    server supports one), so manual assignments and riders accepting work
+    in the meantime are never overwritten. Each assigned order becomes an
+    accepted delivery for the rider; the rider's dispatch claim is released
+    by finish_delivery once every order of the job is completed or
+    cancelled.
+    """
+
+    def __init__(
+        self,
+        priority_service,
+        interval_seconds: float = None,
+        time_budget_seconds: float = None,
+        candidates_per_order: int = 25,
+        candidates_per_rider: int = 5,
+        max_orders_per_tick: int = 500,
+        max_pickup_minutes: float = 30.0,
+        location_max_age_minutes: float = 10.0,
+        on_assignment: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        batcher: Optional[OrderBatcher] = None,
+        use_transactions: Optional[bool] = None
+    ):
+        self.priority_service = priority_service
+        self.interval_seconds = interval_seconds if interval_seconds is not None else float(os.getenv("DISPATCH_INTERVAL_SECONDS", "5"))
+        self.time_budget_seconds = time_budget_seconds if time_budget_seconds is not None else float(os.getenv("DISPATCH_TIME_BUDGET_SECONDS", "1.0"))
+        self.candidates_per_order = candidates_per_order
+        self.candidates_per_rider = candidates_per_rider
+        self.max_orders_per_tick = max_orders_per_tick
+        self.max_pickup_minutes = max_pickup_minutes
+        self.location_max_age_minutes = location_max_age_minutes
+        self.on_assignment = on_assignment
+        if batcher is None and os.getenv("ORDER_BATCHING_ENABLED", "true").lower() == "true":
+            batcher = OrderBatcher()
+        self.batcher = batcher
+
+        # None: detected on the first commit
+        self._transactions_supported: Optional[bool] = use_transactions
+        self._task: Optional[asyncio.Task] = None
+        self._tick_lock = asyncio.Lock()
+        self.stats = {
+            "ticks": 0,
+            "assigned": 0,
+            "assigned_orders": 0,
+            "conflicts": 0,
+            "cancelled": 0,
+            "budget_exceeded": 0,
+            "last_tick": None
+        }
+
+    def build_candidates(
+        self,
+        orders: Sequence[Dict[str, Any]],
+        riders: Sequence[Dict[str, Any]],
+        now: Optional[datetime] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Candidate (order, rider) pairs with their cost
+
+        Orders (or jobs) need pickup (lat, lng), ready_at and priority;
+        riders need (lat, lng) and priority_score. Only ETAs are computed for
+        every pair; each order keeps its candidates_per_order nearest riders,
+        each rider its candidates_per_rider nearest orders, and pairs beyond
+        max_pickup_minutes are dropped before anything else is priced.
+
+        Returns:
+            rows (order indexes), columns (rider indexes), cost and eta, one
+            entry per pair in row-major order
+        """
+        now = now or datetime.utcnow()
+        order_points = np.array([order["pickup"] for order in orders], dtype=np.float64).reshape(-1, 2)
+        rider_points = np.array([rider["location"] for rider in riders], dtype=np.float64).reshape(-1, 2)
+        eta = pickup_eta_minutes(order_points, rider_points)
+
+        allowed = np.zeros_like(eta, dtype=bool)
+        per_order = min(self.candidates_per_order, len(riders))
+        if per_order:
+            nearest = np.argpartition(eta, per_order - 1, axis=1)[:, :per_order]
+            np.put_along_axis(allowed, nearest, True, axis=1)
+        per_rider = min(self.candidates_per_rider, len(orders))
+        if per_rider:
+            nearest = np.argpartition(eta, per_rider - 1, axis=0)[:per_rider, :]
+            np.put_along_axis(allowed, nearest, True, axis=0)
+        allowed &= eta <= self.max_pickup_minutes
+
+        rows, columns = np.nonzero(allowed)
+        eta = eta[rows, columns]
+
+        ready_in = np.array([
+            max(0.0, (order["ready_at"] - now).total_seconds() / 60) if order.get("ready_at") else 0.0
+            for order in orders
+        ])[rows]
+        rider_idle = np.maximum(ready_in - eta, 0.0)
+        food_wait = np.maximum(eta - ready_in, 0.0)
+
+        scores = np.array([rider["priority_score"] for rider in riders], dtype=np.float64)
+        spread = scores.max() - scores.min() if len(scores) else 0.0
+        rider_bonus = (scores - scores.min()) / spread * RIDER_PRIORITY_MINUTES if spread > 0 else np.zeros_like(scores)
+        order_bonus = np.array([ORDER_PRIORITY_MINUTES.get(order.get("priority"), 0.0) for order in orders])
+
+        cost = (eta + RIDER_IDLE_WEIGHT * rider_idle + FOOD_WAIT_WEIGHT * food_wait
+                - rider_bonus[columns] - order_bonus[rows])
+        return {"rows": rows, "columns": columns, "cost": cost, "eta": eta}
+
+    def build_jobs(self, orders: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Batch orders into jobs, or one job per order without a batcher"""
+        if self.batcher is not None:
+            return self.batcher.build_jobs(orders)
+        return [{**order, "order_ids": [order["_id"]], "route": None} for order in orders]
+
+    def plan(self, jobs: Sequence[Dict[str, Any]], riders: Sequence[Dict[str, Any]],
+             now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Solve one tick; returns the (job, rider) pairs with their ETA and cost"""
+        started = time.perf_counter()
+        deadline = started + self.time_budget_seconds
+        if not jobs or not riders:
+            return {"assignments": [], "optimal": True, "solve_ms": 0.0}
+
+        candidates = self.build_candidates(jobs, riders, now)
+        pairs, optimal = solve_assignment(
+            len(jobs), len(riders), candidates["rows"], candidates["columns"], candidates["cost"], deadline
+        )
+        # Pairs are in row-major order, so each chosen pair is found by binary search
+        keys = candidates["rows"] * len(riders) + candidates["columns"]
+        assignments = []
+        for row, column in pairs:
+            index = int(np.searchsorted(keys, row * len(riders) + column))
+            assignments.append({
+                "job": jobs[row],
+                "rider": riders[column],
+                "eta_minutes": round(float(candidates["eta"][index]), 1),
+                "cost": round(float(candidates["cost"][index]), 2)
+            })
+        return {
+            "assignments": assignments,
+            "optimal": optimal,
+            "solve_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+
+    async def load_orders(self, db) -> List[Dict[str, Any]]:
+        """Unassigned pending orders with restaurant coordinates, oldest first"""
+        orders = []
+        cursor = db.orders.find(
+            {
+                "status": "pending",
+                "rider_id": None,
+                "external_status": {"$ne": "cancelled"},
+                "restaurant_address.latitude": {"$ne": None},
+                "restaurant_address.longitude": {"$ne": None}
+            },
+            {
+                "restaurant_id": 1, "restaurant_name": 1, "restaurant_address": 1, "delivery_address": 1,
+                "created_at": 1, "preparation_started_at": 1, "ready_at": 1, "estimated_preparation_time": 1,
+                "priority": 1
+            }
+        ).sort("created_at", 1).limit(self.max_orders_per_tick)
+        async for order in cursor:
+            address = order["restaurant_address"]
+            dropoff = order.get("delivery_address") or {}
+            # Food the restaurant reported ready is ready; otherwise use the platform's
+            # preparation estimate, and the learned preparation time without one
+            ready_at = order.get("ready_at")
+            started_at = order.get("preparation_started_at") or order.get("created_at")
+            estimated_minutes = order.get("estimated_preparation_time")
+            if not isinstance(ready_at, datetime) and isinstance(started_at, datetime):
+                if isinstance(estimated_minutes, (int, float)) and estimated_minutes > 0:
+                    ready_at = started_at + timedelta(minutes=estimated_minutes)
+                else:
+                    ready_at = self.priority_service.prep_times.ready_at(restaurant_key(order), started_at)
+            orders.append({
+                "_id": order["_id"],
+                "pickup": (address["latitude"], address["longitude"]),
+                "dropoff": (
+                    (dropoff["latitude"], dropoff["longitude"])
+                    if dropoff.get("latitude") is not None and dropoff.get("longitude") is not None else None
+                ),
+                "ready_at": ready_at if isinstance(ready_at, datetime) else None,
+                "priority": order.get("priority", "low"),
+                # Carried onto the delivery so its pickup can teach preparation times
+                "restaurant_id": order.get("restaurant_id"),
+                "restaurant_name": order.get("restaurant_name"),
+                "preparation_started_at": order.get("preparation_started_at")
+            })
+        return orders
+
+    async def load_riders(self, db, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Active riders with a recent location (see rider_locations) who are free in the priority queue"""
+        now = now or datetime.utcnow()
+        queue = self.priority_service.queue
+        self.priority_service.refresh_scores(now)
+        riders = []
+        cursor = db.users.find(
+            {
+                "role": "Rider",
+                "is_active": True,
+                "dispatch_order_id": None,
+                "current_location.lat": {"$ne": None},
+                "current_location.lng": {"$ne": None},
+                "current_location.updated_at": {"$gte": now - timedelta(minutes=self.location_max_age_minutes)}
+            },
+            {"current_location": 1}
+        )
+        async for rider in cursor:
+            rider_id = str(rider["_id"])
+            if rider_id not in queue:
+                self.priority_service.update_rider_priority(self.priority_service.get_rider_efficiency(rider_id))
+            if not queue.is_available(rider_id):
+                continue
+            location = rider["current_location"]
+            riders.append({
+                "_id": rider["_id"],
+                "rider_id": rider_id,
+                "location": (location["lat"], location["lng"]),
+                "priority_score": queue.score(rider_id) or 0.0
+            })
+        return riders
+
+    async def run_tick(self, db, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Collect, solve and commit one round of assignments (now is for simulations and backtests)"""
+        async with self._tick_lock:
+            now = now or datetime.utcnow()
+            cancelled = await self.release_cancelled(db)
+            orders = await self.load_orders(db)
+            riders = await self.load_riders(db, now)
+            jobs = await asyncio.to_thread(self.build_jobs, orders)
+            plan = await asyncio.to_thread(self.plan, jobs, riders, now)
+
+            assigned, conflicts = [], 0
+            orders_by_id = {order["_id"]: order for order in orders}
+            for assignment in plan["assignments"]:
+                try:
+                    await self._commit(db, assignment, orders_by_id, now)
+                except _AssignmentConflict:
+                    conflicts += 1
+                    continue
+                job = assignment["job"]
+                rider_id = assignment["rider"]["rider_id"]
+                self.priority_service.set_rider_available(rider_id, False)
+                result = {
+                    "order_id": str(job["_id"]),
+                    "order_ids": [str(order_id) for order_id in job["order_ids"]],
+                    "batch_id": str(assignment["batch_id"]) if assignment.get("batch_id") else None,
+                    "rider_id": rider_id,
+                    "eta_minutes": assignment["eta_minutes"],
+                    "route": job["route"]
+                }
+                assigned.append(result)
+                if self.on_assignment is not None:
+                    try:
+                        await self.on_assignment(result)
+                    except Exception as e:
+                        print(f"Error notifying dispatch assignment: {e}")
+
+            self.stats["ticks"] += 1
+            self.stats["assigned"] += len(assigned)
+            self.stats["assigned_orders"] += sum(len(result["order_ids"]) for result in assigned)
+            self.stats["conflicts"] += conflicts
+            self.stats["cancelled"] += cancelled
+            if not plan["optimal"]:
+                self.stats["budget_exceeded"] += 1
+            self.stats["last_tick"] = {
+                "at": now.isoformat(),
+                "orders": len(orders),
+                "jobs": len(jobs),
+                "riders": len(riders),
+                "assigned": len(assigned),
+                "conflicts": conflicts,
+                "cancelled": cancelled,
+                "optimal": plan["optimal"],
+                "solve_ms": plan["solve_ms"]
+            }
+            return {**self.stats["last_tick"], "assignments": assigned}
+
+    async def _commit(self, db, assignment: Dict[str, Any], orders_by_id: Dict[Any, Dict[str, Any]], now: datetime):
+        job = assignment["job"]
+        order_ids = job["order_ids"]
+        rider = assignment["rider"]
+        batch_id = ObjectId() if len(order_ids) > 1 else None
+        deliveries = [
+            self._delivery_for(orders_by_id[order_id], job["_id"], rider["rider_id"], batch_id, now)
+            for order_id in order_ids
+        ]
+
+        async def operations(session):
+            claimed = await db.users.update_one(
+                {"_id": rider["_id"], "dispatch_order_id": None},
+                {"$set": {"dispatch_order_id": job["_id"], "dispatched_at": now}},
+                session=session
+            )
+            if claimed.modified_count == 0:
+                raise _AssignmentConflict()
+            assigned = await db.orders.update_many(
+                {"_id": {"$in": order_ids}, "status": "pending", "rider_id": None},
+                {"$set": {
+                    "rider_id": rider["rider_id"],
+                    "status": "assigned",
+                    "assigned_at": now,
+                    "assigned_by": "dispatch",
+                    "dispatch_eta_minutes": assignment["eta_minutes"],
+                    "batch_id": batch_id
+                }},
+                session=session
+            )
+            if assigned.modified_count < len(order_ids):
+                if session is None:
+                    await self._undo_partial(db, order_ids, rider["rider_id"], now)
+                    await self.release_rider(db, rider["rider_id"], job["_id"])
+                raise _AssignmentConflict()
+            try:
+                await db.deliveries.insert_many(deliveries, session=session)
+                if batch_id is not None:
+                    await db.order_batches.insert_one({
+                        "_id": batch_id,
+                        "order_ids": order_ids,
+                        "rider_id": rider["rider_id"],
+                        "route": job["route"],
+                        "status": "assigned",
+                        "created_at": now
+                    }, session=session)
+            except Exception:
+                if session is None:
+                    await db.deliveries.delete_many({"dispatch_order_id": job["_id"], "created_at": now})
+                    await self._undo_partial(db, order_ids, rider["rider_id"], now)
+                    await self.release_rider(db, rider["rider_id"], job["_id"])
+                raise
+
+        assignment["batch_id"] = batch_id
+        if self._transactions_supported is not False:
+            try:
+                async with await db.client.start_session() as session:
+                    async with session.start_transaction():
+                        await operations(session)
+                self._transactions_supported = True
+                return
+            except OperationFailure as e:
+                if e.code != TRANSACTIONS_UNSUPPORTED_CODE:
+                    raise
+                self._transactions_supported = False
+        # Without a transaction the rider is claimed first; if any order of the
+        # job was taken, or its deliveries cannot be written, the job's orders
+        # are put back and the rider released
+        await operations(None)
+
+    async def _undo_partial(self, db, order_ids: List[Any], rider_id: str, now: datetime):
+        """Put back the orders of a job that was only partly assigned (no transaction)"""
+        await db.orders.update_many(
+            {"_id": {"$in": order_ids}, "rider_id": rider_id, "assigned_by": "dispatch", "assigned_at": now},
+            {
+                "$set": {"rider_id": None, "status": "pending"},
+                "$unset": {"assigned_at": "", "assigned_by": "", "dispatch_eta_minutes": "", "batch_id": ""}
+            }
+        )
+
+    @staticmethod
+    def _delivery_for(order: Dict[str, Any], job_id: Any, rider_id: str, batch_id: Optional[ObjectId],
+                      now: datetime) -> Dict[str, Any]:
+        """The accepted delivery a dispatched order becomes for its rider"""
+        distance_km = (
+            point_distance_km(order["pickup"], order["dropoff"]) * ROAD_DISTANCE_FACTOR
+            if order.get("dropoff") else 0.0
+        )
+        return {
+            "order_id": str(order["_id"]),
+            "rider_id": rider_id,
+            "status": "accepted",
+            "restaurant_id": order.get("restaurant_id"),
+            "restaurant_name": order.get("restaurant_name"),
+            "preparation_start_time": order.get("preparation_started_at"),
+            "estimated_distance": round(distance_km, 2),
+            "dispatch_order_id": job_id,
+            "batch_id": batch_id,
+            "created_at": now,
+            "accepted_at": now
+        }
+
+    async def finish_delivery(self, db, delivery: Dict[str, Any], status: str) -> bool:
+        """
+        Close a delivery's order as completed or cancelled and free the rider when their job is done
+
+        A dispatched rider keeps their claim until no delivery of the job
+        (dispatch_order_id) is still accepted, and the claim is only
+        released while it is still for that job.
+
+        Returns:
+            True if the rider was freed for new work
+        """
+        now = datetime.utcnow()
+        rider_id = delivery["rider_id"]
+        order_id = delivery.get("order_id")
+        if order_id:
+            await db.orders.update_one(
+                {"_id": ObjectId(order_id) if ObjectId.is_valid(order_id) else order_id,
+                 "rider_id": rider_id, "status": "assigned"},
+                {"$set": {"status": status, f"{status}_at": now}}
+            )
+
+        job_id = delivery.get("dispatch_order_id")
+        if job_id is not None:
+            if await db.deliveries.count_documents(
+                {"dispatch_order_id": job_id, "rider_id": rider_id, "status": "accepted"}, limit=1
+            ):
+                return False
+            await self.release_rider(db, rider_id, job_id)
+        self.priority_service.set_rider_available(rider_id, True)
+        return True
+
+    async def return_job(self, db, rider_id: str, job_id: Any) -> int:
+        """
+        Hand a rider's dispatched job back when they reject it
+
+        The job's open deliveries are marked rejected, their orders go back
+        to pending for the next tick and the rider's claim is released. The
+        rider's availability is left to the caller.
+
+        Returns:
+            Number of orders put back
+        """
+        now = datetime.utcnow()
+        deliveries = await db.deliveries.find(
+            {"dispatch_order_id": job_id, "rider_id": rider_id, "status": "accepted"}, {"order_id": 1}
+        ).to_list(length=None)
+        await db.deliveries.update_many(
+            {"_id": {"$in": [delivery["_id"] for delivery in deliveries]}, "status": "accepted"},
+            {"$set": {"status": "rejected", "rejected_at": now}}
+        )
+        order_ids = [
+            ObjectId(delivery["order_id"]) if ObjectId.is_valid(delivery["order_id"]) else delivery["order_id"]
+            for delivery in deliveries
+        ]
+        returned = await db.orders.update_many(
+            {"_id": {"$in": order_ids}, "rider_id": rider_id, "status": "assigned", "assigned_by": "dispatch"},
+            {
+                "$set": {"rider_id": None, "status": "pending"},
+                "$unset": {"assigned_at": "", "assigned_by": "", "dispatch_eta_minutes": "", "batch_id": ""}
+            }
+        )
+        await self.release_rider(db, rider_id, job_id)
+        return returned.modified_count
+
+    async def release_cancelled(self, db) -> int:
+        """Cancel the deliveries of dispatched orders the platform has since cancelled"""
+        cancelled = 0
+        cursor = db.orders.find(
+            {"status": "assigned", "assigned_by": "dispatch", "external_status": "cancelled"},
+            {"rider_id": 1}
+        )
+        async for order in cursor:
+            order_id = str(order["_id"])
+            delivery = await db.deliveries.find_one_and_update(
+                {"order_id": order_id, "rider_id": order["rider_id"], "status": "accepted"},
+                {"$set": {"status": "cancelled", "cancelled_at": datetime.utcnow()}}
+            )
+            if delivery is not None:
+                await self.finish_delivery(db, delivery, "cancelled")
+            else:
+                # The delivery was already closed (and its rider freed); only the order is left
+                await db.orders.update_one(
+                    {"_id": order["_id"], "status": "assigned"},
+                    {"$set": {"status": "cancelled", "cancelled_at": datetime.utcnow()}}
+                )
+            cancelled += 1
+        return cancelled
+
+    async def release_rider(self, db, rider_id: str, order_id: Any):
+        """Free a rider's dispatch claim, but only while it is still for order_id (the job's first order)"""
+        await db.users.update_one(
+            {"_id": ObjectId(rider_id), "dispatch_order_id": order_id},
+            {"$set": {"dispatch_order_id": None}}
+        )
+
+    def start(self, get_database: Callable[[], Awaitable[Any]]):
+        """Run ticks in the background until stop()"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(get_database))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, get_database: Callable[[], Awaitable[Any]]):
+        db = await get_database()
+        while True:
+            try:
+                await self.run_tick(db)
+            except Exception as e:
+                print(f"Error in dispatch tick: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.interval_seconds,
+            "time_budget_seconds": self.time_budget_seconds,
+            "candidates_per_order": self.candidates_per_order,
+            "candidates_per_rider": self.candidates_per_rider,
+            "max_orders_per_tick": self.max_orders_per_tick,
+            "batching": self.batcher.get_stats() if self.batcher is not None else None,
+            **self.stats
+        }
+
@@ -0,0 +1,405 @@
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from bson import ObjectId
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from models.payment import PaymentCalculation, PaymentRecord, PaymentStatus, PaymentType
+from services.money import from_pence, to_pence
+
+# PaymentCalculation field -> WeeklyEarnings total; rollups store each as <total>_pence
+COMPONENT_TOTALS = {
+    "base_payment": "base_payments",
+    "distance_payment": "distance_payments",
+    "time_payment": "time_payments",
+    "efficiency_bonus": "efficiency_bonuses",
+    "peak_hour_bonus": "peak_hour_bonuses",
+    "weather_bonus": "weather_bonuses",
+    "long_distance_bonus": "long_distance_bonuses"
+}
+
+# MongoDB IllegalOperation: transactions need a replica set or mongos
+TRANSACTIONS_UNSUPPORTED_CODE = 20
+
+# Ledger entries remembered on each user to keep the total_earnings_pence counter idempotent;
+# a retry replays an entry soon after the failure, so a short window is enough
+RECENT_USER_ENTRIES = 50
+
+
+def week_start_for(when: datetime) -> datetime:
+    """Monday 00:00 (UTC) of the week containing when"""
+    day = when.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day - timedelta(days=day.weekday())
+
+
+class EarningsLedger:
+    """
+    Append-only rider earnings ledger with per-rider weekly rollups.
+
+    Every payment writes a payment record, one immutable ledger entry and an
+    $inc (in integer pence, so totals stay exact) on the rider's rollup for that week (plus the users.total_earnings_pence
+    counter), inside one transaction where the deployment supports them.
+    Weekly statements and payout runs read the rollups (one document per
+    rider per week) instead of scanning payments; rebuild_rollups recomputes
+    them from the ledger if they are ever in doubt.
+
+    Without transactions the ledger entry is inserted first, marked pending
+    and carrying its payment record. The rollup and user updates are keyed by
+    the entry id (rollups list the entries they include), so re-applying an
+    entry is a no-op; the pending mark is cleared once everything is written.
+    A retried delivery payment finishes its pending entry, and
+    apply_pending_entries finishes any that were never retried.
+    """
+
+    def __init__(self):
+        self._transactions_supported: Optional[bool] = None
+
+    async def ensure_indexes(self, db):
+        await db.earnings_ledger.create_index([("rider_id", ASCENDING), ("created_at", ASCENDING)])
+        # A delivery is paid at most once
+        await db.earnings_ledger.create_index(
+            [("order_id", ASCENDING), ("entry_type", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"entry_type": PaymentType.DELIVERY.value}
+        )
+        await db.rider_weekly_earnings.create_index(
+            [("rider_id", ASCENDING), ("week_start", ASCENDING)], unique=True
+        )
+        await db.rider_weekly_earnings.create_index([("week_start", ASCENDING)])
+        await db.earnings_ledger.create_index(
+            [("created_at", ASCENDING)], partialFilterExpression={"pending": True}
+        )
+
+    async def _write(self, db, operations: Callable[[Any], Awaitable[None]]):
+        """Run operations(session) in a transaction, or without one on a standalone server"""
+        if self._transactions_supported is not False:
+            try:
+                async with await db.client.start_session() as session:
+                    async with session.start_transaction():
+                        await operations(session)
+                self._transactions_supported = True
+                return
+            except OperationFailure as e:
+                if e.code != TRANSACTIONS_UNSUPPORTED_CODE:
+                    raise
+                self._transactions_supported = False
+        # Without a transaction the ledger entry is written first, so its unique
+        # index stops a retried delivery payment being applied twice
+        await operations(None)
+
+    async def _append(self, db, record: PaymentRecord, rollup_inc: Dict[str, Any], when: datetime) -> Dict:
+        week_start = week_start_for(when)
+        payment = record.model_dump(exclude={"id"})
+        payment["_id"] = ObjectId()
+        payment["payment_type"] = record.payment_type.value
+        payment["status"] = record.status.value
+        payment["amount_pence"] = to_pence(record.amount)
+        entry = {
+            "_id": ObjectId(),
+            "payment_id": payment["_id"],
+            "rider_id": record.rider_id,
+            "order_id": record.order_id,
+            "entry_type": record.payment_type.value,
+            "amount_pence": payment["amount_pence"],
+            "components": {
+                field: value
+                for field, value in rollup_inc.items()
+                if field not in ("total_earnings_pence", "total_deliveries")
+            },
+            "week_start": week_start,
+            "created_at": when,
+            # Cleared by _apply once the payment, rollup and user total are written
+            "pending": True,
+            "payment": payment
+        }
+
+        async def operations(session):
+            await db.earnings_ledger.insert_one(entry, session=session)
+            await self._apply(db, entry, session)
+
+        await self._write(db, operations)
+        return self._public(entry)
+
+    async def _apply(self, db, entry: Dict, session=None):
+        """Write an entry's payment record, rollup $inc and user total; safe to repeat"""
+        entry_id = entry["_id"]
+        await db.payments.update_one(
+            {"_id": entry["payment_id"]}, {"$setOnInsert": entry["payment"]}, upsert=True, session=session
+        )
+
+        rollup_filter = {"rider_id": entry["rider_id"], "week_start": entry["week_start"], "entry_ids": {"$ne": entry_id}}
+        rollup_update = {
+            "$inc": self._rollup_inc(entry),
+            "$push": {"entry_ids": entry_id},
+            "$max": {"updated_at": entry["created_at"]},
+            "$setOnInsert": {"week_end": entry["week_start"] + timedelta(days=7)}
+        }
+        try:
+            await db.rider_weekly_earnings.update_one(rollup_filter, rollup_update, upsert=True, session=session)
+        except DuplicateKeyError:
+            # Either the week's rollup already includes this entry (nothing to do) or
+            # another payment created it first; without the upsert only the latter applies
+            await db.rider_weekly_earnings.update_one(rollup_filter, rollup_update, session=session)
+
+        if ObjectId.is_valid(entry["rider_id"]):
+            await db.users.update_one(
+                {"_id": ObjectId(entry["rider_id"]), "earnings_entry_ids": {"$ne": entry_id}},
+                {
+                    "$inc": {"total_earnings_pence": entry["amount_pence"]},
+                    "$push": {"earnings_entry_ids": {"$each": [entry_id], "$slice": -RECENT_USER_ENTRIES}}
+                },
+                session=session
+            )
+
+        await db.earnings_ledger.update_one(
+            {"_id": entry_id}, {"$unset": {"pending": "", "payment": ""}}, session=session
+        )
+
+    async def backfill_user_totals(self, db) -> int:
+        """
+        Set users.total_earnings_pence from the rollups for riders that do not have it yet
+
+        Returns:
+            Number of users updated
+        """
+        updated = 0
+        cursor = db.rider_weekly_earnings.aggregate([
+            {"$group": {"_id": "$rider_id", "total_earnings_pence": {"$sum": "$total_earnings_pence"}}}
+        ])
+        async for total in cursor:
+            if not ObjectId.is_valid(total["_id"]):
+                continue
+            result = await db.users.update_one(
+                {"_id": ObjectId(total["_id"]), "total_earnings_pence": {"$exists": False}},
+                {"$set": {"total_earnings_pence": total["total_earnings_pence"]}}
+            )
+            updated += result.modified_count
+        return updated
+
+    @staticmethod
+    def _rollup_inc(entry: Dict) -> Dict[str, Any]:
+        rollup_inc = dict(entry["components"])
+        rollup_inc["total_earnings_pence"] = entry["amount_pence"]
+        if entry["entry_type"] == PaymentType.DELIVERY.value:
+            rollup_inc["total_deliveries"] = 1
+        return rollup_inc
+
+    @staticmethod
+    def _public(entry: Dict) -> Dict:
+        return {field: value for field, value in entry.items() if field not in ("pending", "payment")}
+
+    async def apply_pending_entries(self, db, older_than: timedelta = timedelta(minutes=5)) -> int:
+        """
+        Finish ledger entries whose writes were interrupted (standalone servers only)
+
+        Returns:
+            Number of entries applied
+        """
+        applied = 0
+        cursor = db.earnings_ledger.find({"pending": True, "created_at": {"$lt": datetime.utcnow() - older_than}})
+        async for entry in cursor:
+            await self._apply(db, entry)
+            applied += 1
+        return applied
+
+    async def record_delivery_payment(
+        self,
+        db,
+        rider_id: str,
+        order_id: str,
+        calculation: PaymentCalculation,
+        distance_km: float,
+        delivery_time_minutes: int,
+        efficiency_percentage: float,
+        is_peak_hour: bool = False,
+        weather_conditions: str = "normal",
+        when: Optional[datetime] = None
+    ) -> Optional[Dict]:
+        """
+        Record a delivery payment in the ledger and the rider's weekly rollup
+
+        Returns:
+            The ledger entry, or None if this delivery has already been paid.
+            A retry after an interrupted write finishes and returns the
+            original entry (with its original amounts).
+        """
+        when = when or datetime.utcnow()
+        record = PaymentRecord(
+            rider_id=rider_id,
+            order_id=order_id,
+            payment_type=PaymentType.DELIVERY,
+            amount=calculation.total_payment,
+            distance_km=distance_km,
+            delivery_time_minutes=delivery_time_minutes,
+            efficiency_percentage=efficiency_percentage,
+            is_peak_hour=is_peak_hour,
+            weather_conditions=weather_conditions,
+            calculation_breakdown=calculation,
+            status=PaymentStatus.PENDING,
+            created_at=when
+        )
+        rollup_inc = {
+            f"{rollup_field}_pence": to_pence(getattr(calculation, field))
+            for field, rollup_field in COMPONENT_TOTALS.items()
+        }
+        rollup_inc.update({
+            "total_deliveries": 1,
+            "total_distance_km": distance_km,
+            "total_delivery_time_minutes": delivery_time_minutes,
+            "efficiency_percentage_sum": efficiency_percentage,
+            "total_earnings_pence": to_pence(calculation.total_payment)
+        })
+        try:
+            return await self._append(db, record, rollup_inc, when)
+        except DuplicateKeyError:
+            entry = await db.earnings_ledger.find_one(
+                {"order_id": order_id, "entry_type": PaymentType.DELIVERY.value, "pending": True}
+            )
+            if entry is None:
+                return None
+            await self._apply(db, entry)
+            return self._public(entry)
+
+    async def record_bonus(
+        self,
+        db,
+        rider_id: str,
+        amount: float,
+        notes: Optional[str] = None,
+        when: Optional[datetime] = None
+    ) -> Dict:
+        """Record an admin-awarded bonus in the ledger and the rider's weekly rollup"""
+        when = when or datetime.utcnow()
+        record = PaymentRecord(
+            rider_id=rider_id,
+            order_id="",
+            payment_type=PaymentType.ADMIN_BONUS,
+            amount=amount,
+            status=PaymentStatus.PENDING,
+            created_at=when,
+            notes=notes
+        )
+        amount_pence = to_pence(amount)
+        rollup_inc = {"admin_bonuses_pence": amount_pence, "total_earnings_pence": amount_pence}
+        return await self._append(db, record, rollup_inc, when)
+
+    async def get_weekly_earnings(self, db, rider_id: str, week_start: datetime) -> Dict:
+        """
+        Get a rider's earnings for one week from the rollup
+
+        Returns:
+            Dictionary shaped like models.payment.WeeklyEarnings
+        """
+        week_start = week_start_for(week_start)
+        rollup = await db.rider_weekly_earnings.find_one({"rider_id": rider_id, "week_start": week_start}) or {}
+        return self._statement(rider_id, week_start, rollup)
+
+    async def get_rider_weeks(self, db, rider_id: str, weeks: int = 12) -> List[Dict]:
+        """Get a rider's most recent weekly statements, newest first"""
+        statements = []
+        cursor = db.rider_weekly_earnings.find({"rider_id": rider_id}).sort("week_start", -1).limit(weeks)
+        async for rollup in cursor:
+            statements.append(self._statement(rider_id, rollup["week_start"], rollup))
+        return statements
+
+    async def get_earnings_summary(self, db, rider_id: str, now: Optional[datetime] = None) -> Dict:
+        """
+        Get a rider's lifetime, this week and this month earnings
+
+        Lifetime and weekly figures come from the rollups; the month is summed
+        from the ledger because it does not line up with week boundaries.
+        """
+        now = now or datetime.utcnow()
+        week_start = week_start_for(now)
+        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+        totals = await db.rider_weekly_earnings.aggregate([
+            {"$match": {"rider_id": rider_id}},
+            {"$group": {
+                "_id": None,
+                "total_earnings_pence": {"$sum": "$total_earnings_pence"},
+                "deliveries_completed": {"$sum": "$total_deliveries"},
+                "this_week_pence": {"$sum": {"$cond": [{"$eq": ["$week_start", week_start]}, "$total_earnings_pence", 0]}}
+            }}
+        ]).to_list(length=1)
+        month = await db.earnings_ledger.aggregate([
+            {"$match": {"rider_id": rider_id, "created_at": {"$gte": month_start}}},
+            {"$group": {"_id": None, "amount_pence": {"$sum": "$amount_pence"}}}
+        ]).to_list(length=1)
+
+        totals = totals[0] if totals else {}
+        return {
+            "rider_id": rider_id,
+            "total_earnings": from_pence(totals.get("total_earnings_pence", 0)),
+            "this_week": from_pence(totals.get("this_week_pence", 0)),
+            "this_month": from_pence(month[0]["amount_pence"]) if month else 0.0,
+            "deliveries_completed": totals.get("deliveries_completed", 0)
+        }
+
+    def _statement(self, rider_id: str, week_start: datetime, rollup: Dict) -> Dict:
+        deliveries = rollup.get("total_deliveries", 0)
+        total_earnings = rollup.get("total_earnings_pence", 0)
+        statement = {
+            "rider_id": rider_id,
+            "week_start": week_start,
+            "week_end": week_start + timedelta(days=7),
+            "total_deliveries": deliveries,
+            "total_distance_km": round(rollup.get("total_distance_km", 0.0), 2),
+            "total_delivery_time_minutes": rollup.get("total_delivery_time_minutes", 0),
+            "admin_bonuses": from_pence(rollup.get("admin_bonuses_pence", 0)),
+            "total_earnings": from_pence(total_earnings),
+            "average_per_delivery": from_pence(round(total_earnings / deliveries)) if deliveries else 0.0,
+            "efficiency_percentage": round(rollup.get("efficiency_percentage_sum", 0.0) / deliveries, 1) if deliveries else 0.0
+        }
+        for rollup_field in COMPONENT_TOTALS.values():
+            statement[rollup_field] = from_pence(rollup.get(f"{rollup_field}_pence", 0))
+        return statement
+
+    async def rebuild_rollups(self, db, rider_id: Optional[str] = None) -> int:
+        """
+        Recompute weekly rollups from the ledger
+
+        Args:
+            rider_id: Only rebuild this rider's weeks (default: everyone)
+
+        Returns:
+            Number of rollup documents for the rebuilt riders
+        """
+        match = {"rider_id": rider_id} if rider_id else {}
+        group = {
+            "_id": {"rider_id": "$rider_id", "week_start": "$week_start"},
+            "total_earnings_pence": {"$sum": "$amount_pence"},
+            "total_deliveries": {"$sum": {"$cond": [{"$eq": ["$entry_type", PaymentType.DELIVERY.value]}, 1, 0]}},
+            "admin_bonuses_pence": {"$sum": {"$cond": [
+                {"$eq": ["$entry_type", PaymentType.ADMIN_BONUS.value]}, "$amount_pence", 0
+            ]}},
+            "updated_at": {"$max": "$created_at"},
+            "entry_ids": {"$push": "$_id"}
+        }
+        for rollup_field in COMPONENT_TOTALS.values():
+            group[f"{rollup_field}_pence"] = {"$sum": {"$ifNull": [f"$components.{rollup_field}_pence", 0]}}
+        for field in ("total_distance_km", "total_delivery_time_minutes", "efficiency_percentage_sum"):
+            group[field] = {"$sum": {"$ifNull": [f"$components.{field}", 0]}}
+
+        project = {field: 1 for field in group if field != "_id"}
+        project.update({
+            "_id": 0,
+            "rider_id": "$_id.rider_id",
+            "week_start": "$_id.week_start",
+            "week_end": {"$add": ["$_id.week_start", 7 * 24 * 3600 * 1000]}
+        })
+
+        await db.earnings_ledger.aggregate([
+            {"$match": match},
+            {"$group": group},
+            {"$project": project},
+            {"$merge": {
+                "into": "rider_weekly_earnings",
+                "on": ["rider_id", "week_start"],
+                "whenMatched": "replace",
+                "whenNotMatched": "insert"
+            }}
+        ], allowDiskUse=True).to_list(length=None)
+        return await db.rider_weekly_earnings.count_documents(match)
+
+# Create global instance
+earnings_ledger = EarningsLedger()
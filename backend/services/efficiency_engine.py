@@ -0,0 +1,122 @@
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Mapping, Optional
+
+# Rolling windows in days; "today" is the current UTC day
+DEFAULT_WINDOWS = {"today": 1, "7d": 7, "30d": 30}
+
+# Counter slots per day bucket
+ACCEPTED, REJECTED, PENALIZED = 0, 1, 2
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _day_of(when: datetime) -> int:
+    return (when - EPOCH).days
+
+
+class _RiderCounters:
+    __slots__ = ("day", "buckets", "sums")
+
+    def __init__(self, day: int, horizon: int, windows: Iterable[str]):
+        self.day = day
+        self.buckets: List[List[int]] = [[0, 0, 0] for _ in range(horizon)]
+        self.sums: Dict[str, List[int]] = {name: [0, 0, 0] for name in windows}
+
+
+class EfficiencyEngine:
+    """
+    Rolling accept/reject counters per rider over several day windows.
+
+    Each rider has a ring of daily buckets (as many as the longest window)
+    and a running total per window. An action adds to its day bucket and to
+    every window covering that day; moving to a new day subtracts the
+    buckets that fall out of each window. Reads never rescan history, so
+    efficiency, points and bonus eligibility cost O(windows).
+    """
+
+    def __init__(self, windows: Optional[Mapping[str, int]] = None, scoring_window: Optional[str] = None):
+        self.windows = dict(windows or DEFAULT_WINDOWS)
+        if not self.windows or min(self.windows.values()) < 1:
+            raise ValueError("Efficiency windows must be at least one day")
+        self.horizon = max(self.windows.values())
+        self.scoring_window = scoring_window or os.getenv("EFFICIENCY_SCORING_WINDOW", "30d")
+        if self.scoring_window not in self.windows:
+            raise ValueError(f"Unknown efficiency window: {self.scoring_window}")
+        self._lock = threading.Lock()
+        self._riders: Dict[str, _RiderCounters] = {}
+
+    def record(self, rider_id: str, action: str, penalty_applied: bool, when: Optional[datetime] = None) -> bool:
+        """
+        Count one accept or reject; returns False for actions older than the longest window
+
+        Late events inside the horizon are added to the day they happened.
+        """
+        day = _day_of(when or datetime.utcnow())
+        with self._lock:
+            counters = self._riders.get(rider_id)
+            if counters is None:
+                counters = self._riders[rider_id] = _RiderCounters(day, self.horizon, self.windows)
+            self._advance(counters, day)
+            if day <= counters.day - self.horizon:
+                return False
+
+            slots = [ACCEPTED] if action == "accept" else [REJECTED] + ([PENALIZED] if penalty_applied else [])
+            bucket = counters.buckets[day % self.horizon]
+            for slot in slots:
+                bucket[slot] += 1
+            for name, length in self.windows.items():
+                if day > counters.day - length:
+                    window = counters.sums[name]
+                    for slot in slots:
+                        window[slot] += 1
+            return True
+
+    def counts(self, rider_id: str, window: Optional[str] = None, now: Optional[datetime] = None) -> Dict[str, int]:
+        """accepted, rejected and penalized_rejections for a rider over a window"""
+        window = window or self.scoring_window
+        if window not in self.windows:
+            raise ValueError(f"Unknown efficiency window: {window}")
+        with self._lock:
+            counters = self._riders.get(rider_id)
+            if counters is None:
+                return {"accepted": 0, "rejected": 0, "penalized_rejections": 0}
+            self._advance(counters, _day_of(now or datetime.utcnow()))
+            accepted, rejected, penalized = counters.sums[window]
+        return {"accepted": accepted, "rejected": rejected, "penalized_rejections": penalized}
+
+    def rider_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._riders)
+
+    def clear(self):
+        with self._lock:
+            self._riders.clear()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            riders = len(self._riders)
+        return {
+            "riders": riders,
+            "windows": self.windows,
+            "scoring_window": self.scoring_window
+        }
+
+    def _advance(self, counters: _RiderCounters, day: int):
+        if day <= counters.day:
+            return
+        if day - counters.day >= self.horizon:
+            for bucket in counters.buckets:
+                bucket[:] = (0, 0, 0)
+            for window in counters.sums.values():
+                window[:] = (0, 0, 0)
+        else:
+            for current in range(counters.day + 1, day + 1):
+                for name, length in self.windows.items():
+                    leaving = counters.buckets[(current - length) % self.horizon]
+                    window = counters.sums[name]
+                    for slot in (ACCEPTED, REJECTED, PENALIZED):
+                        window[slot] -= leaving[slot]
+                counters.buckets[current % self.horizon][:] = (0, 0, 0)
+        counters.day = day
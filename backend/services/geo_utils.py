@@ -0,0 +1,18 @@
+import math
+from typing import Tuple
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometers (unrounded)"""
+    rlat1, rlat2 = math.radians(lat1), math.radians(lat2)
+    dlat = rlat2 - rlat1
+    dlng = math.radians(lng2 - lng1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(rlat1) * math.cos(rlat2) * math.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def point_distance_km(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    """Haversine distance between two (lat, lng) tuples"""
+    return haversine_km(a[0], a[1], b[0], b[1])
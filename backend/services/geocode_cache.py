@@ -0,0 +1,302 @@
+import os
+import re
+import csv
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from datetime import datetime
+from services.single_flight import SingleFlight
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+DEFAULT_CACHE_PATH = os.path.join(DATA_DIR, "geocode_cache.sqlite3")
+BUNDLED_CENTROIDS_PATH = os.path.join(DATA_DIR, "bh_postcode_centroids.csv")
+
+# Reverse lookups are cached per ~10m cell
+REVERSE_GEOCODE_PRECISION = 4
+
+POSTCODE_PATTERN = re.compile(r"\b([A-Z]{1,2}\d[A-Z\d]?)\s*(\d[A-Z]{2})\b")
+OUTWARD_CODE_PATTERN = re.compile(r"\b([A-Z]{1,2}\d[A-Z\d]?)\b")
+
+STREET_ABBREVIATIONS = {
+    "RD": "ROAD",
+    "ST": "STREET",
+    "AVE": "AVENUE",
+    "AV": "AVENUE",
+    "CRES": "CRESCENT",
+    "DR": "DRIVE",
+    "LN": "LANE",
+    "CL": "CLOSE",
+    "GDNS": "GARDENS",
+    "PL": "PLACE",
+    "SQ": "SQUARE",
+    "TER": "TERRACE",
+    "CT": "COURT",
+}
+
+COUNTRY_SUFFIXES = {"UK", "GB", "ENGLAND", "UNITED KINGDOM"}
+
+
+def normalize_postcode(postcode: str) -> Optional[str]:
+    """Canonical 'OUT IN' form of a UK postcode, or None if it is not one"""
+    if not postcode:
+        return None
+    match = POSTCODE_PATTERN.search(postcode.upper())
+    if not match:
+        return None
+    return f"{match.group(1)} {match.group(2)}"
+
+
+def extract_postcode(address: str) -> Optional[str]:
+    """Find the last full UK postcode in an address string"""
+    matches = POSTCODE_PATTERN.findall(address.upper())
+    if not matches:
+        return None
+    outward, inward = matches[-1]
+    return f"{outward} {inward}"
+
+
+def normalize_address(address: str) -> str:
+    """
+    Normalize an address into a stable cache key
+
+    Upper-cases, strips punctuation, collapses whitespace, expands common street
+    abbreviations, drops trailing country names and canonicalizes the postcode.
+    """
+    upper = address.upper()
+    postcode = extract_postcode(upper)
+    if postcode:
+        upper = POSTCODE_PATTERN.sub(" ", upper)
+
+    parts = []
+    for part in re.split(r"[,\n]", upper):
+        tokens = re.sub(r"[^A-Z0-9 ]", " ", part).split()
+        tokens = [STREET_ABBREVIATIONS.get(token, token) for token in tokens]
+        if tokens:
+            parts.append(" ".join(tokens))
+
+    while parts and parts[-1] in COUNTRY_SUFFIXES:
+        parts.pop()
+    if postcode:
+        parts.append(postcode)
+
+    return ", ".join(parts)
+
+
+class GeocodeCache:
+    """
+    Persistent geocode store backed by SQLite.
+
+    Lookups are resolved, in order, from normalized-address entries, unit
+    postcode centroids (from POSTCODE_CENTROIDS_FILE) and centroids learned
+    from earlier Google results. The bundled table only has district
+    centroids, a kilometre or more off, so they are returned only when a
+    caller asks for an approximate location and never stand in for an
+    address. Concurrent lookups of the same uncached address share a single
+    loader call.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, centroids_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("GEOCODE_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+
+        if self.db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            "address_key TEXT PRIMARY KEY, lat REAL, lng REAL, postcode TEXT, "
+            "source TEXT, created_at TEXT)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postcode_centroid ("
+            "postcode TEXT PRIMARY KEY, lat REAL, lng REAL, samples INTEGER)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reverse_geocode ("
+            "cell_key TEXT PRIMARY KEY, address TEXT, created_at TEXT)"
+        )
+        self._conn.commit()
+
+        # Bundled centroids: full unit postcodes and outward codes (districts)
+        self.unit_centroids: Dict[str, Tuple[float, float]] = {}
+        self.district_centroids: Dict[str, Tuple[float, float]] = {}
+        self._load_centroids(BUNDLED_CENTROIDS_PATH)
+        extra_centroids = centroids_path or os.getenv("POSTCODE_CENTROIDS_FILE")
+        if extra_centroids:
+            self._load_centroids(extra_centroids)
+
+        self.stats = {
+            "address_hits": 0,
+            "postcode_hits": 0,
+            "district_hits": 0,
+            "misses": 0
+        }
+
+    def _load_centroids(self, path: str):
+        """Load a postcode,latitude,longitude CSV into the centroid tables"""
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, newline="", encoding="utf-8") as centroids_file:
+                for row in csv.DictReader(centroids_file):
+                    code = row["postcode"].strip().upper()
+                    location = (float(row["latitude"]), float(row["longitude"]))
+                    unit = normalize_postcode(code)
+                    if unit:
+                        self.unit_centroids[unit] = location
+                    else:
+                        self.district_centroids[code] = location
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Error loading postcode centroids from {path}: {e}")
+
+    def lookup(self, address: str, allow_approximate: bool = False) -> Optional[Dict]:
+        """
+        Resolve an address locally without calling Google
+
+        Args:
+            address: Address string
+            allow_approximate: Fall back to the postcode district centroid
+                (precision "district"); not precise enough for delivery coordinates
+
+        Returns:
+            Dictionary with location, source and precision, or None on a miss
+        """
+        key = normalize_address(address)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT lat, lng FROM geocode WHERE address_key = ?", (key,)
+            ).fetchone()
+        if row:
+            self._count("address_hits")
+            return {"location": (row[0], row[1]), "source": "cache", "precision": "address"}
+
+        postcode = extract_postcode(address)
+        if postcode:
+            location = self.unit_centroids.get(postcode)
+            if location is None:
+                with self._lock:
+                    row = self._conn.execute(
+                        "SELECT lat, lng FROM postcode_centroid WHERE postcode = ?", (postcode,)
+                    ).fetchone()
+                if row:
+                    location = (row[0], row[1])
+            if location is not None:
+                self._count("postcode_hits")
+                return {"location": location, "source": "postcode", "precision": "postcode"}
+
+        if allow_approximate:
+            outward = postcode.split(" ")[0] if postcode else None
+            if outward is None:
+                match = OUTWARD_CODE_PATTERN.findall(address.upper())
+                outward = next((code for code in reversed(match) if code in self.district_centroids), None)
+            location = self.district_centroids.get(outward) if outward else None
+            if location is not None:
+                self._count("district_hits")
+                return {"location": location, "source": "postcode", "precision": "district"}
+
+        self._count("misses")
+        return None
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def store(self, address: str, location: Tuple[float, float], source: str = "google"):
+        """Store a geocoding result and fold it into the learned postcode centroid"""
+        key = normalize_address(address)
+        postcode = extract_postcode(address)
+        lat, lng = location
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode (address_key, lat, lng, postcode, source, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, lat, lng, postcode, source, datetime.utcnow().isoformat())
+            )
+            if postcode and postcode not in self.unit_centroids:
+                # Running mean of every address seen in the postcode
+                self._conn.execute(
+                    "INSERT INTO postcode_centroid (postcode, lat, lng, samples) VALUES (?, ?, ?, 1) "
+                    "ON CONFLICT(postcode) DO UPDATE SET "
+                    "lat = lat + (excluded.lat - lat) / (samples + 1), "
+                    "lng = lng + (excluded.lng - lng) / (samples + 1), "
+                    "samples = samples + 1",
+                    (postcode, lat, lng)
+                )
+            self._conn.commit()
+
+    def get_or_load(
+        self,
+        address: str,
+        loader: Callable[[str], Optional[Tuple[float, float]]]
+    ) -> Optional[Tuple[float, float]]:
+        """
+        Resolve an address locally, or call loader once for all concurrent callers
+
+        Args:
+            address: Address string
+            loader: Function that geocodes the address remotely
+
+        Returns:
+            (lat, lng) tuple or None if not found
+        """
+        cached = self.lookup(address)
+        if cached:
+            return cached["location"]
+
+        return self._flights.do(normalize_address(address), self._load_and_store, address, loader)
+
+    def _load_and_store(
+        self,
+        address: str,
+        loader: Callable[[str], Optional[Tuple[float, float]]]
+    ) -> Optional[Tuple[float, float]]:
+        location = loader(address)
+        if location:
+            self.store(address, location)
+        return location
+
+    def lookup_many(self, addresses: List[str], allow_approximate: bool = False) -> Dict[str, Optional[Dict]]:
+        """Resolve many addresses locally, looking each distinct address up once"""
+        results: Dict[str, Optional[Dict]] = {}
+        for address in addresses:
+            if address not in results:
+                results[address] = self.lookup(address, allow_approximate=allow_approximate)
+        return results
+
+    @staticmethod
+    def _cell_key(lat: float, lng: float) -> str:
+        return f"{round(lat, REVERSE_GEOCODE_PRECISION)},{round(lng, REVERSE_GEOCODE_PRECISION)}"
+
+    def lookup_reverse(self, lat: float, lng: float) -> Optional[str]:
+        """Cached address for coordinates, or None on a miss"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT address FROM reverse_geocode WHERE cell_key = ?", (self._cell_key(lat, lng),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def store_reverse(self, lat: float, lng: float, address: str):
+        """Store a reverse geocoding result"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reverse_geocode (cell_key, address, created_at) VALUES (?, ?, ?)",
+                (self._cell_key(lat, lng), address, datetime.utcnow().isoformat())
+            )
+            self._conn.commit()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get cache statistics"""
+        with self._lock:
+            addresses = self._conn.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+            learned_postcodes = self._conn.execute("SELECT COUNT(*) FROM postcode_centroid").fetchone()[0]
+            stats = dict(self.stats)
+        return {
+            **stats,
+            "shared_lookups": self._flights.get_stats()["calls_saved"],
+            "cached_addresses": addresses,
+            "learned_postcodes": learned_postcodes,
+            "bundled_postcodes": len(self.unit_centroids),
+            "bundled_districts": len(self.district_centroids)
+        }
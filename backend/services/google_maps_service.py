@@ -1,57 +1,59 @@
 import os
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
-import googlemaps
 from dotenv import load_dotenv
+from services.demand_zones import DemandZoneEngine
+from services.geocode_cache import GeocodeCache
+from services.single_flight import SingleFlight, coordinate_key
+from services.traffic_profile import TrafficProfile
+from services.route_optimizer import optimize_stop_sequence
+from services.maps_scheduler import MapsCallScheduler
+from services.registry import service_registry
 
 load_dotenv()
 
 class GoogleMapsService:
     def __init__(self):
+        # The googlemaps SDK is only imported when a key is configured
         api_key = os.getenv("GOOGLE_MAPS_API_KEY")
-        if not api_key:
-            raise ValueError("GOOGLE_MAPS_API_KEY environment variable is required")
+        self.gmaps = None
+        if api_key:
+            import googlemaps
+            self.gmaps = googlemaps.Client(key=api_key)
         
-        self.gmaps = googlemaps.Client(key=api_key)
+        # QPS limit, daily budget and priority classes for every Maps request
+        self.scheduler = MapsCallScheduler()
         self.bournemouth_center = (50.7192, -1.8808)  # Bournemouth city center
         
-        # High-demand zones around Bournemouth
-        self.high_demand_zones = [
-            {
-                "name": "Bournemouth Town Centre",
-                "center": (50.7192, -1.8808),
-                "radius_km": 1.0,
-                "demand_level": "high",
-                "peak_hours": ["11:00-14:00", "17:00-20:00"]
-            },
-            {
-                "name": "Poole Road Area",
-                "center": (50.7180, -1.8850),
-                "radius_km": 0.8,
-                "demand_level": "medium",
-                "peak_hours": ["12:00-14:00", "18:00-20:00"]
-            },
-            {
-                "name": "Winton Area",
-                "center": (50.7300, -1.8700),
-                "radius_km": 1.2,
-                "demand_level": "medium",
-                "peak_hours": ["11:30-13:30", "17:30-19:30"]
-            },
-            {
-                "name": "Charminster Area",
-                "center": (50.7400, -1.8600),
-                "radius_km": 1.0,
-                "demand_level": "low",
-                "peak_hours": ["12:00-14:00", "18:00-20:00"]
-            }
-        ]
+        # High-demand zones around Bournemouth, compiled for fast lookups
+        self.zone_engine = DemandZoneEngine()
+        
+        # Persistent geocode store shared by forward and reverse lookups
+        self.geocode_cache = GeocodeCache()
+        
+        # Identical concurrent route/traffic lookups share one Google request
+        self.single_flight = SingleFlight()
+        
+        # Learned traffic delays per zone pair and time of week
+        self.traffic_profile = TrafficProfile(self.zone_engine.locate)
+    
+    def _maps_call(self, priority: str, method_name: str, *args, **kwargs):
+        """Run a Google Maps client call through the rate limit and budget scheduler"""
+        if self.gmaps is None:
+            raise ValueError("GOOGLE_MAPS_API_KEY environment variable is required")
+        return self.scheduler.execute(priority, getattr(self.gmaps, method_name), *args, **kwargs)
+    
+    @property
+    def high_demand_zones(self) -> List[Dict]:
+        """Current high-demand zone definitions"""
+        return self.zone_engine.zone_definitions
     
     def calculate_distance_and_time(
         self,
         origin: Tuple[float, float],
         destination: Tuple[float, float],
-        mode: str = "driving"
+        mode: str = "driving",
+        priority: str = "quote"
     ) -> Dict[str, any]:
         """
         Calculate distance and travel time between two points
@@ -60,13 +62,30 @@ class GoogleMapsService:
             origin: (lat, lng) tuple for starting point
             destination: (lat, lng) tuple for destination
             mode: Travel mode (driving, walking, bicycling, transit)
+            priority: Scheduling class (dispatch, quote or analytics)
         
         Returns:
             Dictionary with distance, duration, and route information
         """
+        return self.single_flight.do(
+            ("distance", coordinate_key(origin, destination), mode),
+            self._calculate_distance_and_time,
+            origin, destination, mode, priority
+        )
+    
+    def _calculate_distance_and_time(
+        self,
+        origin: Tuple[float, float],
+        destination: Tuple[float, float],
+        mode: str = "driving",
+        priority: str = "quote"
+    ) -> Dict[str, any]:
+        """Uncoalesced Google directions lookup"""
         try:
             # Get directions
-            directions = self.gmaps.directions(
+            directions = self._maps_call(
+                priority,
+                "directions",
                 origin,
                 destination,
                 mode=mode,
@@ -127,55 +146,36 @@ class GoogleMapsService:
         Returns:
             List of high-demand zones with current status
         """
-        if current_time is None:
-            current_time = datetime.now()
-        
-        current_hour = current_time.strftime("%H:%M")
-        
-        zones_with_status = []
-        for zone in self.high_demand_zones:
-            # Check if current time is in peak hours
-            is_peak_hour = False
-            for peak_range in zone["peak_hours"]:
-                start_time, end_time = peak_range.split("-")
-                if start_time <= current_hour <= end_time:
-                    is_peak_hour = True
-                    break
-            
-            # Calculate demand multiplier based on time
-            demand_multiplier = 1.0
-            if is_peak_hour:
-                demand_multiplier = 2.5 if zone["demand_level"] == "high" else 2.0
-            else:
-                demand_multiplier = 1.5 if zone["demand_level"] == "high" else 1.0
-            
-            zones_with_status.append({
-                **zone,
-                "is_peak_hour": is_peak_hour,
-                "current_demand_multiplier": demand_multiplier,
-                "estimated_wait_time": self._estimate_wait_time(zone, is_peak_hour)
-            })
-        
-        return zones_with_status
+        return self.zone_engine.get_all_zone_statuses(current_time)
     
-    def _estimate_wait_time(self, zone: Dict, is_peak_hour: bool) -> int:
-        """Estimate wait time for orders in a zone"""
-        base_wait_time = 15  # minutes
-        
-        if zone["demand_level"] == "high":
-            base_wait_time = 25
-        elif zone["demand_level"] == "medium":
-            base_wait_time = 20
+    def get_zone_for_location(
+        self,
+        lat: float,
+        lng: float,
+        current_time: Optional[datetime] = None
+    ) -> Optional[Dict]:
+        """
+        Get the demand zone containing a location and its current status
         
-        if is_peak_hour:
-            base_wait_time += 10
+        Args:
+            lat: Latitude
+            lng: Longitude
+            current_time: Current time (defaults to now)
         
-        return base_wait_time
+        Returns:
+            Zone with current status, or None if the location is outside all zones
+        """
+        return self.zone_engine.get_zone_status(lat, lng, current_time)
+    
+    def update_high_demand_zones(self, zones: List[Dict]) -> int:
+        """Replace the high-demand zone definitions and return the new version"""
+        return self.zone_engine.load_zones(zones)
     
     def get_nearby_restaurants(
         self,
         location: Tuple[float, float],
-        radius_meters: int = 2000
+        radius_meters: int = 2000,
+        priority: str = "analytics"
     ) -> List[Dict]:
         """
         Get nearby restaurants from Google Places API
@@ -183,12 +183,15 @@ class GoogleMapsService:
         Args:
             location: (lat, lng) tuple for search center
             radius_meters: Search radius in meters
+            priority: Scheduling class (dispatch, quote or analytics)
         
         Returns:
             List of nearby restaurants
         """
         try:
-            places_result = self.gmaps.places_nearby(
+            places_result = self._maps_call(
+                priority,
+                "places_nearby",
                 location=location,
                 radius=radius_meters,
                 type='restaurant'
@@ -215,18 +218,80 @@ class GoogleMapsService:
     def get_route_optimization(
         self,
         waypoints: List[Tuple[float, float]],
-        optimize: bool = True
+        optimize: bool = True,
+        precedence: Optional[List[Tuple[int, int]]] = None,
+        fixed_end: bool = True,
+        include_directions: bool = False,
+        priority: str = "dispatch"
     ) -> Dict[str, any]:
         """
         Get optimized route for multiple waypoints
         
+        Stop order is optimized locally, so there is no waypoint cap and no API
+        call unless turn-by-turn directions are requested.
+        
         Args:
-            waypoints: List of (lat, lng) tuples
+            waypoints: List of (lat, lng) tuples; the first is the start
             optimize: Whether to optimize the route order
+            precedence: (pickup_index, dropoff_index) pairs that must stay in order
+            fixed_end: Keep the last waypoint as the final stop
+            include_directions: Fetch Google directions for the optimized order
+            priority: Scheduling class (dispatch, quote or analytics)
         
         Returns:
             Optimized route information
         """
+        if len(waypoints) < 2:
+            return {"error": "Need at least 2 waypoints"}
+        
+        if not optimize:
+            return self.single_flight.do(
+                ("route", coordinate_key(*waypoints), False),
+                self._get_route_optimization,
+                waypoints, False, priority
+            )
+        
+        try:
+            sequence = optimize_stop_sequence(
+                waypoints,
+                start=0,
+                end=len(waypoints) - 1 if fixed_end else None,
+                precedence=precedence or ()
+            )
+        except (ValueError, IndexError) as e:
+            return {"error": str(e)}
+        
+        ordered_waypoints = [waypoints[index] for index in sequence["order"]]
+        result = {
+            "total_distance_km": sequence["total_distance_km"],
+            "total_duration_minutes": sequence["total_duration_minutes"],
+            "waypoints_order": sequence["order"],
+            "ordered_waypoints": ordered_waypoints,
+            "source": "local"
+        }
+        
+        # Google accepts an origin, a destination and up to 23 intermediate waypoints
+        if include_directions and len(ordered_waypoints) <= 25:
+            directions = self.single_flight.do(
+                ("route", coordinate_key(*ordered_waypoints), False),
+                self._get_route_optimization,
+                ordered_waypoints, False, priority
+            )
+            if "error" not in directions:
+                result["total_distance_km"] = directions["total_distance_km"]
+                result["total_duration_minutes"] = directions["total_duration_minutes"]
+                result["route"] = directions["route"]
+                result["source"] = "local+directions"
+        
+        return result
+    
+    def _get_route_optimization(
+        self,
+        waypoints: List[Tuple[float, float]],
+        optimize: bool = True,
+        priority: str = "dispatch"
+    ) -> Dict[str, any]:
+        """Google directions through the waypoints, optionally letting Google reorder them"""
         try:
             if len(waypoints) < 2:
                 return {"error": "Need at least 2 waypoints"}
@@ -235,7 +300,9 @@ class GoogleMapsService:
             destination = waypoints[-1]
             waypoints_middle = waypoints[1:-1] if len(waypoints) > 2 else []
             
-            directions = self.gmaps.directions(
+            directions = self._maps_call(
+                priority,
+                "directions",
                 origin,
                 destination,
                 waypoints=waypoints_middle,
@@ -267,7 +334,8 @@ class GoogleMapsService:
     def get_traffic_conditions(
         self,
         origin: Tuple[float, float],
-        destination: Tuple[float, float]
+        destination: Tuple[float, float],
+        priority: str = "quote"
     ) -> Dict[str, any]:
         """
         Get current traffic conditions for a route
@@ -275,13 +343,39 @@ class GoogleMapsService:
         Args:
             origin: (lat, lng) tuple for starting point
             destination: (lat, lng) tuple for destination
+            priority: Scheduling class (dispatch, quote or analytics)
         
         Returns:
             Traffic information
         """
+        # Answer from the historical profile when it is confident for this slot; a
+        # share of those lookups still goes live so the profile keeps learning
+        prediction = self.traffic_profile.predict(origin, destination)
+        if prediction and prediction["confident"] and not self.traffic_profile.should_refresh():
+            return self._traffic_result(
+                prediction["normal_seconds"],
+                prediction["traffic_seconds"],
+                source="profile"
+            )
+        
+        return self.single_flight.do(
+            ("traffic", coordinate_key(origin, destination)),
+            self._get_traffic_conditions,
+            origin, destination, priority
+        )
+    
+    def _get_traffic_conditions(
+        self,
+        origin: Tuple[float, float],
+        destination: Tuple[float, float],
+        priority: str = "quote"
+    ) -> Dict[str, any]:
+        """Uncoalesced Google traffic lookup"""
         try:
             # Get directions with traffic info
-            directions = self.gmaps.directions(
+            directions = self._maps_call(
+                priority,
+                "directions",
                 origin,
                 destination,
                 mode="driving",
@@ -296,31 +390,35 @@ class GoogleMapsService:
             leg = route['legs'][0]
             
             # Check if there are traffic conditions
-            has_traffic = 'duration_in_traffic' in leg
-            
-            if has_traffic:
-                normal_duration = leg['duration']['value']
-                traffic_duration = leg['duration_in_traffic']['value']
-                traffic_delay = traffic_duration - normal_duration
-                
-                return {
-                    "has_traffic": True,
-                    "normal_duration_minutes": round(normal_duration / 60, 1),
-                    "traffic_duration_minutes": round(traffic_duration / 60, 1),
-                    "traffic_delay_minutes": round(traffic_delay / 60, 1),
-                    "traffic_level": self._get_traffic_level(traffic_delay)
-                }
-            else:
+            normal_duration = leg['duration']['value']
+            if 'duration_in_traffic' not in leg:
                 return {
                     "has_traffic": False,
-                    "normal_duration_minutes": round(leg['duration']['value'] / 60, 1),
+                    "normal_duration_minutes": round(normal_duration / 60, 1),
                     "traffic_delay_minutes": 0,
-                    "traffic_level": "low"
+                    "traffic_level": "low",
+                    "source": "live"
                 }
+            
+            traffic_duration = leg['duration_in_traffic']['value']
+            self.traffic_profile.record(origin, destination, normal_duration, traffic_duration)
+            return self._traffic_result(normal_duration, traffic_duration, source="live")
                 
         except Exception as e:
             return {"error": str(e)}
     
+    def _traffic_result(self, normal_duration: float, traffic_duration: float, source: str) -> Dict[str, any]:
+        """Build a traffic response from free-flow and in-traffic durations (seconds)"""
+        traffic_delay = traffic_duration - normal_duration
+        return {
+            "has_traffic": True,
+            "normal_duration_minutes": round(normal_duration / 60, 1),
+            "traffic_duration_minutes": round(traffic_duration / 60, 1),
+            "traffic_delay_minutes": round(traffic_delay / 60, 1),
+            "traffic_level": self._get_traffic_level(traffic_delay),
+            "source": source
+        }
+    
     def _get_traffic_level(self, delay_seconds: int) -> str:
         """Determine traffic level based on delay"""
         delay_minutes = delay_seconds / 60
@@ -334,45 +432,127 @@ class GoogleMapsService:
         else:
             return "severe"
     
-    def get_geocoding(self, address: str) -> Optional[Tuple[float, float]]:
+    def get_geocoding(self, address: str, priority: str = "quote") -> Optional[Tuple[float, float]]:
         """
         Get coordinates for an address
         
         Args:
             address: Address string
+            priority: Scheduling class (dispatch, quote or analytics)
         
         Returns:
             (lat, lng) tuple or None if not found
         """
         try:
-            result = self.gmaps.geocode(address)
-            if result:
-                location = result[0]['geometry']['location']
-                return (location['lat'], location['lng'])
-            return None
+            return self.geocode_cache.get_or_load(
+                address,
+                lambda remote_address: self._geocode_remote(remote_address, priority)
+            )
         except Exception as e:
             print(f"Error geocoding address: {e}")
             return None
     
-    def get_reverse_geocoding(self, lat: float, lng: float) -> Optional[str]:
+    def _geocode_remote(self, address: str, priority: str = "quote") -> Optional[Tuple[float, float]]:
+        """Geocode an address with Google"""
+        result = self._maps_call(priority, "geocode", address)
+        if result:
+            location = result[0]['geometry']['location']
+            return (location['lat'], location['lng'])
+        return None
+    
+    def get_reverse_geocoding(self, lat: float, lng: float, priority: str = "analytics") -> Optional[str]:
         """
         Get address for coordinates
         
         Args:
             lat: Latitude
             lng: Longitude
+            priority: Scheduling class (dispatch, quote or analytics)
         
         Returns:
             Address string or None if not found
         """
+        cached = self.geocode_cache.lookup_reverse(lat, lng)
+        if cached:
+            return cached
+        
         try:
-            result = self.gmaps.reverse_geocode((lat, lng))
+            result = self._maps_call(priority, "reverse_geocode", (lat, lng))
             if result:
-                return result[0]['formatted_address']
+                address = result[0]['formatted_address']
+                self.geocode_cache.store_reverse(lat, lng, address)
+                return address
             return None
         except Exception as e:
             print(f"Error reverse geocoding: {e}")
             return None
+    
+    def geocode_orders(self, orders: List[Dict], allow_remote: bool = False) -> Dict[str, int]:
+        """
+        Fill in missing coordinates on imported orders
+        
+        Only address-level and unit-postcode results are written; a district
+        centroid can put a drop-off over a kilometre out, so addresses that
+        resolve no better than that are left without coordinates and counted
+        as approximate.
+        
+        Args:
+            orders: Orders in internal format (restaurant_address / delivery_address)
+            allow_remote: Call Google for addresses that cannot be resolved locally
+        
+        Returns:
+            Counts of resolved, unresolved and approximate-only addresses
+        """
+        resolved = 0
+        unresolved = 0
+        approximate = 0
+        
+        for order in orders:
+            for field in ("restaurant_address", "delivery_address"):
+                address = order.get(field) or {}
+                if address.get("latitude") is not None and address.get("longitude") is not None:
+                    continue
+                
+                address_text = ", ".join(
+                    part for part in (
+                        address.get("street", ""),
+                        address.get("city", ""),
+                        address.get("postcode", "")
+                    ) if part
+                )
+                if not address_text:
+                    unresolved += 1
+                    continue
+                
+                result = self.geocode_cache.lookup(address_text, allow_approximate=not allow_remote)
+                if result and result["precision"] != "district":
+                    location, precision = result["location"], result["precision"]
+                elif allow_remote:
+                    location, precision = self.get_geocoding(address_text), "address"
+                else:
+                    location = None
+                
+                if location:
+                    address["latitude"], address["longitude"] = location
+                    address["geocode_precision"] = precision
+                    resolved += 1
+                else:
+                    unresolved += 1
+                    if result:
+                        approximate += 1
+        
+        return {"resolved": resolved, "unresolved": unresolved, "approximate": approximate}
+
+    def get_status(self) -> Dict[str, any]:
+        """Get service status and request coalescing metrics"""
+        return {
+            "configured": self.gmaps is not None,
+            "demand_zones_version": self.zone_engine.version,
+            "scheduler": self.scheduler.get_stats(),
+            "single_flight": self.single_flight.get_stats(),
+            "traffic_profile": self.traffic_profile.get_stats(),
+            "geocode_cache": self.geocode_cache.get_stats()
+        }
 
-# Create global instance
-google_maps_service = GoogleMapsService()
+# Global instance, built on first use
+google_maps_service = service_registry.lazy("google_maps", GoogleMapsService)
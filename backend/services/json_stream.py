@@ -0,0 +1,133 @@
+import codecs
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+WHITESPACE = " \t\n\r"
+NUMBER_DELIMITERS = WHITESPACE + ",]}"
+
+# Parsed text is dropped from the buffer once this much has built up
+COMPACT_CHARS = 64 * 1024
+
+
+class JSONArrayStream:
+    """
+    Incremental parser for a JSON object with one large array member.
+
+    Bytes are fed as they arrive off the socket; feed() returns the
+    array's items as soon as each one is complete, so only the unparsed
+    tail of the document is held in memory. The object's other members
+    (a total count and the like) are kept and returned by close().
+    """
+
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self.fields: Dict[str, Any] = {}
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._position = 0
+        self._state = "start"
+        self._key: Optional[str] = None
+
+    def feed(self, data: bytes) -> List[Any]:
+        """Add a chunk of the document; returns the array items it completed"""
+        self._buffer += self._text.decode(data)
+        return self._parse(final=False)
+
+    def close(self) -> Dict[str, Any]:
+        """Finish the document; returns the members other than the array"""
+        self._buffer += self._text.decode(b"", final=True)
+        self._parse(final=True)
+        if self._state != "done":
+            raise ValueError("Truncated JSON document")
+        return self.fields
+
+    def _parse(self, final: bool) -> List[Any]:
+        items = []
+        buffer = self._buffer
+        position = self._position
+        while True:
+            while position < len(buffer) and buffer[position] in WHITESPACE:
+                position += 1
+            if position >= len(buffer):
+                break
+            char = buffer[position]
+            state = self._state
+
+            if state == "start":
+                if char != "{":
+                    raise ValueError("Expected a JSON object")
+                self._state, position = "first_key", position + 1
+            elif state in ("first_key", "key"):
+                if char == "}" and state == "first_key":
+                    self._state, position = "done", position + 1
+                    continue
+                if char != '"':
+                    raise ValueError(f"Expected a member name at {char!r}")
+                decoded = self._decode(buffer, position, final)
+                if decoded is None:
+                    break
+                self._key, position = decoded
+                self._state = "colon"
+            elif state == "colon":
+                if char != ":":
+                    raise ValueError(f"Expected ':' at {char!r}")
+                self._state, position = "value", position + 1
+            elif state == "value":
+                if self._key == self.array_key and char == "[":
+                    self._state, position = "first_item", position + 1
+                    continue
+                decoded = self._decode(buffer, position, final)
+                if decoded is None:
+                    break
+                self.fields[self._key], position = decoded
+                self._state = "after_value"
+            elif state == "after_value":
+                if char == ",":
+                    self._state = "key"
+                elif char == "}":
+                    self._state = "done"
+                else:
+                    raise ValueError(f"Expected ',' or '}}' at {char!r}")
+                position += 1
+            elif state in ("first_item", "item"):
+                if char == "]" and state == "first_item":
+                    self._state, position = "after_value", position + 1
+                    continue
+                decoded = self._decode(buffer, position, final)
+                if decoded is None:
+                    break
+                item, position = decoded
+                items.append(item)
+                self._state = "after_item"
+            elif state == "after_item":
+                if char == ",":
+                    self._state = "item"
+                elif char == "]":
+                    self._state = "after_value"
+                else:
+                    raise ValueError(f"Expected ',' or ']' at {char!r}")
+                position += 1
+            else:
+                raise ValueError("Unexpected data after JSON document")
+
+        if position > COMPACT_CHARS:
+            buffer = buffer[position:]
+            position = 0
+        self._buffer = buffer
+        self._position = position
+        return items
+
+    def _decode(self, buffer: str, position: int, final: bool) -> Optional[Tuple[Any, int]]:
+        """(value, end) of the value at position, or None if it is not complete yet"""
+        try:
+            value, end = self._decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if final:
+                raise ValueError("Invalid or truncated JSON document")
+            return None
+        # A number is only complete once a delimiter follows; "1." or "12" may continue in the next chunk
+        if not final and isinstance(value, (int, float)) and not isinstance(value, bool):
+            if end >= len(buffer) or buffer[end] not in NUMBER_DELIMITERS:
+                return None
+        return value, end
@@ -0,0 +1,222 @@
+import os
+import time
+import asyncio
+import heapq
+import itertools
+import threading
+from collections import deque
+from enum import IntEnum
+from typing import Any, Callable, Dict, Union
+from datetime import datetime
+
+
+class MapsPriority(IntEnum):
+    """Priority classes for Google Maps calls (lower value is served first)"""
+    DISPATCH = 0
+    QUOTE = 1
+    ANALYTICS = 2
+
+
+class MapsQuotaExceeded(Exception):
+    """Raised when a Maps call is shed by the rate limit or the daily budget"""
+
+
+# Share of the daily budget each class may consume; the remainder is reserved
+# for higher classes so analytics runs out first and live dispatch last
+DEFAULT_BUDGET_SHARE = {
+    MapsPriority.DISPATCH: 1.0,
+    MapsPriority.QUOTE: 0.95,
+    MapsPriority.ANALYTICS: 0.8,
+}
+
+# How long a call may wait for a rate-limit token before it is shed
+DEFAULT_MAX_WAIT_SECONDS = {
+    MapsPriority.DISPATCH: 5.0,
+    MapsPriority.QUOTE: 2.0,
+    MapsPriority.ANALYTICS: 0.5,
+}
+
+LATENCY_SAMPLES = 500
+
+
+class _ClassMetrics:
+    def __init__(self):
+        self.submitted = 0
+        self.executed = 0
+        self.failed = 0
+        self.rejected_rate_limit = 0
+        self.rejected_budget = 0
+        self.waiting = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.queue_waits = deque(maxlen=LATENCY_SAMPLES)
+
+    def as_dict(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        return {
+            "submitted": self.submitted,
+            "executed": self.executed,
+            "failed": self.failed,
+            "rejected_rate_limit": self.rejected_rate_limit,
+            "rejected_budget": self.rejected_budget,
+            "waiting": self.waiting,
+            "avg_latency_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+            "p95_latency_ms": round(latencies[int(len(latencies) * 0.95) - 1 if len(latencies) > 1 else 0] * 1000, 1)
+            if latencies else 0.0,
+            "avg_queue_wait_ms": round(sum(self.queue_waits) / len(self.queue_waits) * 1000, 1)
+            if self.queue_waits else 0.0
+        }
+
+
+class MapsCallScheduler:
+    """
+    Token-bucket QPS limit and daily budget in front of the Google Maps client.
+
+    Calls queue for tokens in priority order (live dispatch, then customer
+    quotes, then admin analytics). Lower classes give up sooner and are held
+    back from the last part of the daily budget, so they are shed first.
+
+    Waiting for a token blocks the calling thread, so Maps calls from async
+    code go through run_in_threadpool. A call made on an event loop thread
+    never waits: it runs if a token is free and is shed otherwise, rather
+    than stalling every request, websocket and dispatch tick on the loop.
+    """
+
+    def __init__(
+        self,
+        qps: float = None,
+        burst: int = None,
+        daily_budget: int = None,
+        budget_share: Dict[MapsPriority, float] = None,
+        max_wait_seconds: Dict[MapsPriority, float] = None
+    ):
+        self.qps = qps if qps is not None else float(os.getenv("GOOGLE_MAPS_QPS_LIMIT", "10"))
+        self.burst = burst if burst is not None else max(1, int(self.qps))
+        self.daily_budget = daily_budget if daily_budget is not None else int(os.getenv("GOOGLE_MAPS_DAILY_BUDGET", "20000"))
+        self.budget_share = budget_share or dict(DEFAULT_BUDGET_SHARE)
+        self.max_wait_seconds = max_wait_seconds or dict(DEFAULT_MAX_WAIT_SECONDS)
+
+        self._condition = threading.Condition()
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._waiters = []  # heap of [priority, sequence, cancelled]
+        self._sequence = itertools.count()
+
+        self._budget_day = datetime.utcnow().date()
+        self._budget_used = 0
+        self._metrics = {priority: _ClassMetrics() for priority in MapsPriority}
+
+    @staticmethod
+    def parse_priority(priority: Union[str, int, MapsPriority]) -> MapsPriority:
+        if isinstance(priority, str):
+            return MapsPriority[priority.upper()]
+        return MapsPriority(priority)
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.qps)
+            self._last_refill = now
+
+    def _reserve_budget(self, priority: MapsPriority) -> bool:
+        today = datetime.utcnow().date()
+        if today != self._budget_day:
+            self._budget_day = today
+            self._budget_used = 0
+        if self._budget_used >= self.daily_budget * self.budget_share[priority]:
+            return False
+        self._budget_used += 1
+        return True
+
+    def _head(self):
+        while self._waiters and self._waiters[0][2]:
+            heapq.heappop(self._waiters)
+        return self._waiters[0] if self._waiters else None
+
+    @staticmethod
+    def _on_event_loop() -> bool:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return True
+
+    def _acquire(self, priority: MapsPriority):
+        metrics = self._metrics[priority]
+        max_wait = 0.0 if self._on_event_loop() else self.max_wait_seconds[priority]
+        deadline = time.monotonic() + max_wait
+
+        with self._condition:
+            if not self._reserve_budget(priority):
+                metrics.rejected_budget += 1
+                raise MapsQuotaExceeded(f"Daily Google Maps budget exhausted for {priority.name.lower()} calls")
+
+            waiter = [int(priority), next(self._sequence), False]
+            heapq.heappush(self._waiters, waiter)
+            metrics.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._head() is waiter and self._tokens >= 1:
+                        heapq.heappop(self._waiters)
+                        self._tokens -= 1
+                        # Let the next waiter check for a token
+                        self._condition.notify_all()
+                        return
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        waiter[2] = True
+                        self._budget_used -= 1
+                        metrics.rejected_rate_limit += 1
+                        self._condition.notify_all()
+                        raise MapsQuotaExceeded(f"Google Maps rate limit reached for {priority.name.lower()} calls")
+
+                    next_token = (1 - self._tokens) / self.qps if self._tokens < 1 else 0.0
+                    self._condition.wait(min(remaining, max(next_token, 0.001)))
+            finally:
+                metrics.waiting -= 1
+
+    def execute(self, priority: Union[str, int, MapsPriority], fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a Maps client call under the rate limit and daily budget
+
+        Args:
+            priority: dispatch, quote or analytics
+            fn: Client method to call
+
+        Returns:
+            The client method's result
+
+        Raises:
+            MapsQuotaExceeded: if the call was shed
+        """
+        priority = self.parse_priority(priority)
+        metrics = self._metrics[priority]
+        metrics.submitted += 1
+
+        queued_at = time.perf_counter()
+        self._acquire(priority)
+        started_at = time.perf_counter()
+        metrics.queue_waits.append(started_at - queued_at)
+
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            metrics.failed += 1
+            raise
+        finally:
+            metrics.latencies.append(time.perf_counter() - queued_at)
+
+        metrics.executed += 1
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-class latency and rejection metrics plus budget usage"""
+        with self._condition:
+            return {
+                "qps_limit": self.qps,
+                "daily_budget": self.daily_budget,
+                "budget_used_today": self._budget_used,
+                "classes": {priority.name.lower(): metrics.as_dict() for priority, metrics in self._metrics.items()}
+            }
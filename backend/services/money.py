@@ -0,0 +1,34 @@
+from decimal import ROUND_HALF_EVEN, Decimal
+from typing import Optional
+
+# Amounts are int pence inside pricing, the earnings ledger and payout totals,
+# so sums are exact; pounds (floats) only appear at the API boundary, where
+# from_pence gives the same float round(amount, 2) would.
+Pence = int
+
+PENCE_PER_POUND = 100
+
+
+def to_pence(amount: Optional[float]) -> Pence:
+    """
+    Convert pounds to pence, rounding exactly like round(amount, 2)
+
+    The float's exact binary value is scaled in Decimal and rounded once, so
+    values such as 2.675 (stored as 2.67499...) land on the same side as
+    round(amount, 2) puts them, with no intermediate float rounding.
+    """
+    if amount is None:
+        return 0
+    return int((Decimal(amount) * PENCE_PER_POUND).to_integral_value(ROUND_HALF_EVEN))
+
+
+def from_pence(pence: Pence) -> float:
+    """Convert pence to pounds for API responses and models"""
+    return pence / PENCE_PER_POUND
+
+
+def format_pence(pence: Pence) -> str:
+    """Human readable amount, e.g. £12.05"""
+    sign = "-" if pence < 0 else ""
+    pounds, remainder = divmod(abs(pence), PENCE_PER_POUND)
+    return f"{sign}£{pounds}.{remainder:02d}"
@@ -2,10 +2,7 @@ import os
 from typing import Dict, List, Optional
 from datetime import datetime
 from dotenv import load_dotenv
-import sendgrid
-from sendgrid.helpers.mail import Mail, Email, To, Content
-from twilio.rest import Client
-from twilio.base.exceptions import TwilioException
+from services.registry import service_registry
 
 load_dotenv()
 
@@ -20,14 +17,16 @@ class NotificationService:
         self.twilio_auth_token = os.getenv("TWILIO_AUTH_TOKEN")
         self.twilio_from_number = os.getenv("TWILIO_FROM_NUMBER")
         
-        # Initialize clients
+        # Initialize clients (SDKs are only imported when configured)
         self.sendgrid_client = None
         self.twilio_client = None
         
         if self.sendgrid_api_key:
+            import sendgrid
             self.sendgrid_client = sendgrid.SendGridAPIClient(api_key=self.sendgrid_api_key)
         
         if self.twilio_account_sid and self.twilio_auth_token:
+            from twilio.rest import Client
             self.twilio_client = Client(self.twilio_account_sid, self.twilio_auth_token)
     
     async def send_email(
@@ -58,6 +57,8 @@ class NotificationService:
                 "message": "SendGrid API key not provided"
             }
         
+        from sendgrid.helpers.mail import Mail, Email, To, Content
+        
         try:
             from_email = Email(self.sendgrid_from_email)
             to_email_obj = To(to_email)
@@ -119,6 +120,8 @@ class NotificationService:
                 "message": "Twilio credentials not provided"
             }
         
+        from twilio.base.exceptions import TwilioException
+        
         try:
             message_obj = self.twilio_client.messages.create(
                 body=message,
@@ -473,5 +476,5 @@ class NotificationService:
             "twilio": bool(self.twilio_account_sid and self.twilio_auth_token)
         }
 
-# Create global instance
-notification_service = NotificationService()
+# Global instance, built on first use
+notification_service = service_registry.lazy("notifications", NotificationService)
@@ -0,0 +1,220 @@
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from datetime import datetime
+from services.geo_utils import point_distance_km
+from services.route_optimizer import (
+    MINUTES_PER_KM, ROAD_DISTANCE_FACTOR, build_distance_matrix, optimize_stop_sequence
+)
+
+# Pickup grid for finding neighbouring restaurants (~0.0015 degrees is ~165m)
+PICKUP_CELL_DEGREES = 0.0015
+
+# Detour always allowed (km) so the ratio limit does not rule out short trips
+MIN_DETOUR_ALLOWANCE_KM = 0.3
+
+
+def bearing_degrees(origin: Tuple[float, float], destination: Tuple[float, float]) -> float:
+    """Initial compass bearing from origin to destination (0 = north, clockwise)"""
+    lat1, lat2 = math.radians(origin[0]), math.radians(destination[0])
+    dlng = math.radians(destination[1] - origin[1])
+    x = math.sin(dlng) * math.cos(lat2)
+    y = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlng)
+    return math.degrees(math.atan2(x, y)) % 360
+
+
+def _angle_between(a: float, b: float) -> float:
+    difference = abs(a - b) % 360
+    return min(difference, 360 - difference)
+
+
+def _pickup_cell(point: Tuple[float, float]) -> Tuple[int, int]:
+    return (math.floor(point[0] / PICKUP_CELL_DEGREES), math.floor(point[1] / PICKUP_CELL_DEGREES))
+
+
+class OrderBatcher:
+    """
+    Groups compatible pending orders into multi-drop jobs.
+
+    Orders are compatible when they are picked up within pickup_radius_km
+    of each other, ready within ready_window_minutes, and head the same
+    way (drop-off bearings from the pickup within max_bearing_degrees).
+    Each candidate batch is sequenced with the local route optimizer
+    (pickups before their drop-offs) and kept only while it fits the
+    capacity and every order's detour over its direct trip stays within
+    max_detour_km and max_detour_ratio. Orders that do not batch are
+    returned as single-order jobs.
+    """
+
+    def __init__(
+        self,
+        max_orders: int = 3,
+        pickup_radius_km: float = 0.15,
+        ready_window_minutes: float = 8.0,
+        max_bearing_degrees: float = 35.0,
+        max_detour_km: float = 2.0,
+        max_detour_ratio: float = 0.5,
+        time_limit_seconds: float = 0.005
+    ):
+        self.max_orders = max_orders
+        self.pickup_radius_km = pickup_radius_km
+        self.ready_window_minutes = ready_window_minutes
+        self.max_bearing_degrees = max_bearing_degrees
+        self.max_detour_km = max_detour_km
+        self.max_detour_ratio = max_detour_ratio
+        self.time_limit_seconds = time_limit_seconds
+        self.stats = {"orders": 0, "jobs": 0, "batched_orders": 0}
+
+    def build_jobs(self, orders: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Split orders into jobs
+
+        Orders need _id, pickup (lat, lng), dropoff (lat, lng) or None,
+        ready_at (or None) and priority.
+
+        Returns:
+            Jobs with the dispatch fields (_id, pickup, ready_at, priority)
+            plus order_ids in drop-off order and the sequenced route
+        """
+        pending = sorted(
+            range(len(orders)),
+            key=lambda index: (orders[index].get("ready_at") or datetime.min, index)
+        )
+        by_cell: Dict[Tuple[int, int], List[int]] = {}
+        for index in pending:
+            by_cell.setdefault(_pickup_cell(orders[index]["pickup"]), []).append(index)
+
+        batched = set()
+        jobs = []
+        for seed in pending:
+            if seed in batched:
+                continue
+            batched.add(seed)
+            members = [seed]
+            route = None
+            if self.max_orders > 1 and orders[seed].get("dropoff"):
+                for candidate in self._candidates(orders, seed, by_cell, batched):
+                    trial = self._sequence(orders, members + [candidate])
+                    if trial is not None:
+                        members.append(candidate)
+                        batched.add(candidate)
+                        route = trial
+                        if len(members) >= self.max_orders:
+                            break
+            jobs.append(self._job(orders, members, route))
+
+        self.stats["orders"] += len(orders)
+        self.stats["jobs"] += len(jobs)
+        self.stats["batched_orders"] += sum(len(job["order_ids"]) for job in jobs if len(job["order_ids"]) > 1)
+        return jobs
+
+    def _candidates(self, orders, seed: int, by_cell, batched) -> List[int]:
+        """Unbatched compatible orders near the seed, most co-directional first"""
+        seed_order = orders[seed]
+        pickup = seed_order["pickup"]
+        seed_ready = seed_order.get("ready_at")
+        seed_bearing = bearing_degrees(pickup, seed_order["dropoff"])
+        row, col = _pickup_cell(pickup)
+
+        candidates = []
+        for cell in ((row + dr, col + dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)):
+            for index in by_cell.get(cell, ()):
+                if index in batched:
+                    continue
+                order = orders[index]
+                if not order.get("dropoff"):
+                    continue
+                if point_distance_km(pickup, order["pickup"]) > self.pickup_radius_km:
+                    continue
+                ready = order.get("ready_at")
+                if seed_ready and ready and abs((ready - seed_ready).total_seconds()) > self.ready_window_minutes * 60:
+                    continue
+                angle = _angle_between(seed_bearing, bearing_degrees(pickup, order["dropoff"]))
+                if angle <= self.max_bearing_degrees:
+                    candidates.append((angle, index))
+        candidates.sort()
+        return [index for _, index in candidates]
+
+    def _sequence(self, orders, members: List[int]) -> Optional[Dict[str, Any]]:
+        """Sequence a candidate batch; None if it breaks a detour limit"""
+        count = len(members)
+        # Stops: every pickup, then every drop-off; the first pickup is the start
+        points = [orders[index]["pickup"] for index in members] + [orders[index]["dropoff"] for index in members]
+        matrix = build_distance_matrix(points)
+        precedence = [(position, count + position) for position in range(count)]
+        sequence = optimize_stop_sequence(
+            points, start=0, precedence=precedence, matrix=matrix, time_limit_seconds=self.time_limit_seconds
+        )
+
+        order = sequence["order"]
+        travelled = {order[0]: 0.0}
+        for previous, stop in zip(order, order[1:]):
+            travelled[stop] = travelled[previous] + matrix[previous][stop]
+
+        detours = []
+        for position in range(count):
+            pickup_stop, dropoff_stop = position, count + position
+            direct = matrix[pickup_stop][dropoff_stop]
+            detour = travelled[dropoff_stop] - travelled[pickup_stop] - direct
+            limit = min(self.max_detour_km, max(direct * self.max_detour_ratio, MIN_DETOUR_ALLOWANCE_KM))
+            if detour > limit + 1e-9:
+                return None
+            detours.append(round(detour, 2))
+
+        return {
+            "stops": [
+                {
+                    "order_index": members[stop % count],
+                    "type": "pickup" if stop < count else "dropoff",
+                    "location": points[stop]
+                }
+                for stop in order
+            ],
+            "detours_km": detours,
+            "total_distance_km": sequence["total_distance_km"],
+            "total_duration_minutes": sequence["total_duration_minutes"]
+        }
+
+    def _job(self, orders, members: List[int], route: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        first = orders[members[0]]
+        if route is None:
+            direct_km = (
+                point_distance_km(first["pickup"], first["dropoff"]) * ROAD_DISTANCE_FACTOR
+                if first.get("dropoff") else 0.0
+            )
+            route = {
+                "stops": [{"order_index": members[0], "type": "pickup", "location": first["pickup"]}] + (
+                    [{"order_index": members[0], "type": "dropoff", "location": first["dropoff"]}]
+                    if first.get("dropoff") else []
+                ),
+                "detours_km": [0.0],
+                "total_distance_km": round(direct_km, 2),
+                "total_duration_minutes": round(direct_km * MINUTES_PER_KM, 1)
+            }
+
+        ready_times = [orders[index]["ready_at"] for index in members if orders[index].get("ready_at")]
+        priorities = [orders[index].get("priority", "low") for index in members]
+        drop_order = [stop["order_index"] for stop in route["stops"] if stop["type"] == "dropoff"] or members
+        return {
+            "_id": first["_id"],
+            "order_ids": [orders[index]["_id"] for index in drop_order],
+            "pickup": first["pickup"],
+            "ready_at": max(ready_times) if ready_times else None,
+            "priority": next((level for level in ("high", "medium") if level in priorities), "low"),
+            "route": {
+                **route,
+                "detours_km": {
+                    str(orders[index]["_id"]): detour for index, detour in zip(members, route["detours_km"])
+                },
+                "stops": [
+                    {"order_id": str(orders[stop["order_index"]]["_id"]), "type": stop["type"], "location": stop["location"]}
+                    for stop in route["stops"]
+                ]
+            }
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        jobs = self.stats["jobs"]
+        return {
+            **self.stats,
+            "orders_per_job": round(self.stats["orders"] / jobs, 2) if jobs else 0.0
+        }
@@ -0,0 +1,299 @@
+import os
+import hmac
+import time
+import asyncio
+import hashlib
+from datetime import datetime
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from services.registry import service_registry
+from services.bournemoutheats_api_service import bournemoutheats_api_service
+
+# Signed requests older (or newer) than this are refused as replays
+SIGNATURE_TOLERANCE_SECONDS = 300
+
+# Event ids remembered for dedupe (BournemouthEats retries until it gets a 2xx)
+RECENT_EVENT_IDS = 20000
+
+# Seconds stop() waits for queued events before cancelling the workers
+DRAIN_SECONDS = 5.0
+
+LATENCY_SAMPLES = 500
+
+# Attempts at writing a batch before its events are parked in order_events_failed
+MAX_ATTEMPTS = 4
+RETRY_BASE_SECONDS = 0.5
+
+# Parked events replayed per replay_failed call
+REPLAY_BATCH_SIZE = 500
+
+ORDER_EVENT_TYPES = ("order.created", "order.updated")
+
+
+class OrderWebhook:
+    """
+    Push ingestion of BournemouthEats order events.
+
+    Requests are verified (HMAC-SHA256 over "<timestamp>.<body>") and their
+    events put on a bounded in-process queue, so the sender gets a 202 as
+    soon as the events are queued; a full queue answers 503 and the sender
+    retries. Workers take whatever is queued (up to batch_size), keep the
+    newest event per order and hand the batch to the API service's
+    ingest_orders, the same transform and bulk upsert path as the polling
+    import. Repeated event ids are dropped on arrival, and re-sent order
+    content is left alone by the upsert's content hash.
+
+    A batch that fails to write is retried with exponential backoff; after
+    MAX_ATTEMPTS (or still queued when stop() gives up) its events are
+    parked in the order_events_failed collection, so an event answered with
+    202 is never lost. replay_failed re-ingests parked events; the upsert's
+    updated_at check keeps a replay from overwriting newer order data.
+    """
+
+    def __init__(
+        self,
+        api_service,
+        secret: Optional[str] = None,
+        queue_size: int = 1000,
+        workers: int = 2,
+        batch_size: int = 100,
+        retry_base_seconds: float = RETRY_BASE_SECONDS
+    ):
+        self.api_service = api_service
+        self.secret = secret if secret is not None else (
+            os.getenv("BOURNEMOUTHEATS_WEBHOOK_SECRET") or os.getenv("BOURNEMOUTHEATS_API_SECRET") or ""
+        )
+        self.workers = workers
+        self.batch_size = batch_size
+        self.retry_base_seconds = retry_base_seconds
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._recent_events: "OrderedDict[str, None]" = OrderedDict()
+        self._tasks: List[asyncio.Task] = []
+        self._get_database: Optional[Callable[[], Awaitable[Any]]] = None
+        self._replay_task: Optional[asyncio.Task] = None
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.stats = {
+            "received": 0,
+            "queued": 0,
+            "duplicates": 0,
+            "ignored": 0,
+            "rejected_signature": 0,
+            "queue_full": 0,
+            "processed": 0,
+            "failed": 0,
+            "batches": 0,
+            "retries": 0,
+            "parked": 0,
+            "replayed": 0
+        }
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.secret)
+
+    def verify_signature(self, body: bytes, timestamp: Optional[str], signature: Optional[str]) -> bool:
+        """Check the sha256=<hex> signature of a request and that it is recent"""
+        if not self.secret or not timestamp or not signature:
+            self.stats["rejected_signature"] += 1
+            return False
+        try:
+            age = abs(time.time() - int(timestamp))
+        except ValueError:
+            age = None
+        expected = hmac.new(self.secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+        provided = signature[len("sha256="):] if signature.startswith("sha256=") else signature
+        if age is None or age > SIGNATURE_TOLERANCE_SECONDS or not hmac.compare_digest(expected, provided):
+            self.stats["rejected_signature"] += 1
+            return False
+        return True
+
+    def enqueue(self, events: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Queue order events from one request
+
+        All of a request's events are queued or none are, so a retried
+        request is never half applied.
+
+        Returns:
+            Number of events queued (repeats and other event types are
+            skipped), or None if the queue has no room
+        """
+        self.stats["received"] += len(events)
+        if self._queue.maxsize - self._queue.qsize() < len(events):
+            self.stats["queue_full"] += 1
+            return None
+
+        received_at = time.perf_counter()
+        queued = 0
+        for event in events:
+            order = event.get("order") or (event.get("data") or {}).get("order")
+            if event.get("type") not in ORDER_EVENT_TYPES or not isinstance(order, dict) or not order.get("id"):
+                self.stats["ignored"] += 1
+                continue
+            event_id = event.get("id")
+            if event_id is not None:
+                if event_id in self._recent_events:
+                    self.stats["duplicates"] += 1
+                    continue
+                self._recent_events[event_id] = None
+                if len(self._recent_events) > RECENT_EVENT_IDS:
+                    self._recent_events.popitem(last=False)
+            self._queue.put_nowait((received_at, order))
+            queued += 1
+        self.stats["queued"] += queued
+        return queued
+
+    def start(self, get_database: Callable[[], Awaitable[Any]]):
+        """Start the workers (idempotent); events parked before a restart are replayed once"""
+        self._get_database = get_database
+        self._tasks = [task for task in self._tasks if not task.done()]
+        for _ in range(self.workers - len(self._tasks)):
+            self._tasks.append(asyncio.create_task(self._work(get_database)))
+        if self._replay_task is None:
+            self._replay_task = asyncio.create_task(self._replay_on_start(get_database))
+
+    async def stop(self):
+        """Give queued events a moment to be written, then stop the workers"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), DRAIN_SECONDS)
+        except asyncio.TimeoutError:
+            print(f"Order webhook stopping with {self._queue.qsize()} events unprocessed; parking them")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._replay_task is not None and not self._replay_task.done():
+            self._replay_task.cancel()
+
+        leftover = []
+        while not self._queue.empty():
+            leftover.append(self._queue.get_nowait())
+            self._queue.task_done()
+        if leftover:
+            await self._park(await self._get_database(), leftover, "stopped before processing", 0)
+
+    async def close(self):
+        await self.stop()
+
+    async def _work(self, get_database: Callable[[], Awaitable[Any]]):
+        db = await get_database()
+        while True:
+            batch = [await self._queue.get()]
+            # Whatever else is already waiting goes in the same bulk write
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._process_with_retry(db, batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _process_with_retry(self, db, batch: List[Any]):
+        """Write a batch, retrying with backoff, and park it if every attempt fails"""
+        attempt = 1
+        try:
+            while True:
+                try:
+                    await self._process(db, batch)
+                    return
+                except Exception as e:
+                    error = str(e)
+                if attempt == MAX_ATTEMPTS:
+                    break
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.retry_base_seconds * 2 ** (attempt - 1))
+                attempt += 1
+        except asyncio.CancelledError:
+            await self._park(db, batch, "stopped while processing", attempt)
+            raise
+        print(f"Error processing order webhook events after {MAX_ATTEMPTS} attempts: {error}")
+        await self._park(db, batch, error, MAX_ATTEMPTS)
+
+    async def _park(self, db, batch: List[Any], error: str, attempts: int):
+        """Keep events that could not be written in order_events_failed for replay_failed"""
+        now = datetime.utcnow()
+        try:
+            await db.order_events_failed.insert_many([
+                {
+                    "external_order_id": order["id"],
+                    "order": order,
+                    "error": error,
+                    "attempts": attempts,
+                    "failed_at": now
+                }
+                for _, order in batch
+            ])
+        except Exception as e:
+            self.stats["failed"] += len(batch)
+            print(f"Error parking {len(batch)} order webhook events: {e}")
+            return
+        self.stats["parked"] += len(batch)
+
+    async def replay_failed(self, db, limit: int = REPLAY_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Re-ingest parked events, oldest first
+
+        Events written successfully are removed from order_events_failed;
+        the rest stay for the next replay.
+
+        Returns:
+            Number of events replayed and still parked
+        """
+        parked = await db.order_events_failed.find().sort("failed_at", 1).to_list(length=limit)
+        replayed = 0
+        if parked:
+            try:
+                await self._process(db, [(time.perf_counter(), event["order"]) for event in parked])
+            except Exception as e:
+                print(f"Error replaying parked order webhook events: {e}")
+            else:
+                await db.order_events_failed.delete_many({"_id": {"$in": [event["_id"] for event in parked]}})
+                replayed = len(parked)
+                self.stats["replayed"] += replayed
+        return {"replayed": replayed, "parked": await db.order_events_failed.count_documents({})}
+
+    async def _replay_on_start(self, get_database: Callable[[], Awaitable[Any]]):
+        try:
+            await self.replay_failed(await get_database())
+        except Exception as e:
+            print(f"Error replaying parked order webhook events: {e}")
+
+    async def _process(self, db, batch: List[Any]):
+        # Newest event per order wins; updated_at decides when events arrive out of order
+        latest: Dict[str, Dict[str, Any]] = {}
+        for _, order in batch:
+            current = latest.get(order["id"])
+            if current is None or str(order.get("updated_at") or "") >= str(current.get("updated_at") or ""):
+                latest[order["id"]] = order
+
+        result = await self.api_service.ingest_orders(db, list(latest.values()))
+        persisted = result["persisted"] or {}
+        if persisted.get("write_errors"):
+            # The upsert is idempotent, so the whole batch can be written again
+            raise Exception(f"{persisted['write_errors']} orders failed to write")
+        self.stats["duplicates"] += len(batch) - len(latest)
+        self.stats["processed"] += result["imported_count"]
+        # Events the transform rejects would fail again; they are counted, not retried
+        self.stats["failed"] += result["failed_count"]
+        self.stats["batches"] += 1
+        done = time.perf_counter()
+        self.latencies.extend(done - received_at for received_at, _ in batch)
+
+    def get_status(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        return {
+            "configured": self.configured,
+            "running": any(not task.done() for task in self._tasks),
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize(),
+            "queue_size": self._queue.maxsize,
+            "p50_latency_ms": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else 0.0,
+            "p99_latency_ms": round(latencies[int(len(latencies) * 0.99) - 1 if len(latencies) > 1 else 0] * 1000, 1)
+            if latencies else 0.0,
+            **self.stats
+        }
+
+# Global instance, built on first use
+order_webhook = service_registry.lazy("order_webhook", lambda: OrderWebhook(bournemoutheats_api_service))
@@ -1,28 +1,118 @@
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, TextIO
+import json
 import math
+import os
+import threading
+import time
 from models.delivery import RiderEfficiency
 from models.payment import PaymentCalculation, CustomerCharge, PayoutReport
+from services.earnings_ledger import week_start_for
+from services.pricing_snapshot import PricingSnapshot, RULE_NAMES
+from services.money import from_pence, to_pence
+from services.quote_cache import QuoteCache, cell_center, quantize_point
+from services.payout_report import (
+    DEFAULT_CHUNK_SIZE, PayoutTotals, generate_payout_report, iter_payout_report_json
+)
 
 class PaymentService:
-    def __init__(self):
-        # Base rates and multipliers
-        self.base_delivery_rate = 3.50  # Base rate per delivery
-        self.distance_rate_per_km = 0.75  # Rate per kilometer
-        self.time_rate_per_minute = 0.15  # Rate per minute of delivery time
-        self.efficiency_bonus_threshold = 70.0  # Efficiency percentage for bonus
-        self.efficiency_bonus_multiplier = 1.25  # 25% bonus for high efficiency riders
-        
-        # Customer charge rates
-        self.customer_base_fee = 2.99  # Base delivery fee for customers
-        self.customer_distance_rate = 0.50  # Per km rate for customers
-        self.customer_time_rate = 0.10  # Per minute rate for customers
-        self.profit_margin_multiplier = 1.35  # 35% profit margin
-        
-        # Payout settings
-        self.weekly_payout_day = 6  # Saturday (0=Monday, 6=Sunday)
-        self.minimum_payout_amount = 25.00  # Minimum amount for payout
-        self.payout_processing_fee = 1.50  # Fixed fee per payout
+    """
+    Rider payments, customer charges and payouts.
+    
+    Rates live in an immutable PricingSnapshot (self.pricing). Updates build a
+    new snapshot and swap it in with one assignment; each calculation reads
+    the snapshot once, so it never sees half-applied settings. With
+    PAYMENT_SETTINGS_FILE set, rules are loaded from that JSON file, updates
+    are written back to it and changes made by other processes are picked up.
+    """
+    
+    def __init__(self, settings_file: Optional[str] = None, reload_check_seconds: float = 30.0):
+        self.settings_file = settings_file if settings_file is not None else os.getenv("PAYMENT_SETTINGS_FILE")
+        self.reload_check_seconds = reload_check_seconds
+        self._lock = threading.Lock()
+        self._file_mtime: Optional[float] = None
+        self._next_file_check = 0.0
+        self._snapshot = PricingSnapshot()
+        self.quote_cache = QuoteCache()
+        
+        if self.settings_file and os.path.exists(self.settings_file):
+            self.reload_if_changed(force=True)
+    
+    def __getattr__(self, name: str):
+        # Rates (base_delivery_rate, minimum_payout_amount, ...) read from the current snapshot
+        if name in RULE_NAMES:
+            return getattr(self.pricing, name)
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+    
+    @property
+    def pricing(self) -> PricingSnapshot:
+        """Current pricing snapshot"""
+        if self.settings_file:
+            self.reload_if_changed()
+        return self._snapshot
+    
+    def get_settings(self) -> Dict:
+        """
+        Get current payment settings with their snapshot version
+        """
+        return self.pricing.settings()
+    
+    def update_settings(self, settings: Dict, updated_by: str = "admin") -> int:
+        """
+        Validate settings, then atomically install them as a new snapshot
+        
+        Args:
+            settings: Rule names and new values (omitted rules keep their value)
+            updated_by: Who made the change
+        
+        Returns:
+            Version of the installed snapshot
+        
+        Raises:
+            ValueError: For unknown settings or invalid values
+        """
+        with self._lock:
+            current = self._snapshot
+            snapshot = current.with_updates(current.version + 1, settings, updated_by)
+            if self.settings_file:
+                self._write_settings_file(snapshot)
+            self._snapshot = snapshot
+        return snapshot.version
+    
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """Reload settings from the settings file if it has been modified"""
+        if not self.settings_file:
+            return False
+        
+        now = time.monotonic()
+        if not force and now < self._next_file_check:
+            return False
+        self._next_file_check = now + self.reload_check_seconds
+        
+        try:
+            mtime = os.path.getmtime(self.settings_file)
+            if not force and mtime == self._file_mtime:
+                return False
+            with open(self.settings_file, "r", encoding="utf-8") as settings_file:
+                settings = json.load(settings_file)
+            with self._lock:
+                updated_by = settings.pop("updated_by", "file")
+                snapshot = PricingSnapshot().with_updates(self._snapshot.version + 1, settings, updated_by)
+                self._snapshot = snapshot
+                self._file_mtime = mtime
+            return True
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Error reloading payment settings from {self.settings_file}: {e}")
+            return False
+    
+    def _write_settings_file(self, snapshot: PricingSnapshot):
+        settings = {name: getattr(snapshot, name) for name in RULE_NAMES}
+        settings["updated_by"] = snapshot.updated_by
+        temp_path = f"{self.settings_file}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as settings_file:
+            json.dump(settings, settings_file, indent=2)
+        os.replace(temp_path, self.settings_file)
+        self._file_mtime = os.path.getmtime(self.settings_file)
 
     def calculate_rider_payment(
         self,
@@ -36,65 +126,24 @@ class PaymentService:
         """
         Calculate dynamic rider payment based on multiple factors
         """
-        # Base calculation
-        base_payment = self.base_delivery_rate
-        
-        # Distance-based payment
-        distance_payment = distance_km * self.distance_rate_per_km
-        
-        # Time-based payment
-        time_payment = delivery_time_minutes * self.time_rate_per_minute
-        
-        # Efficiency bonus
-        efficiency_bonus = 0.0
-        if efficiency_percentage >= self.efficiency_bonus_threshold:
-            efficiency_bonus = (base_payment + distance_payment + time_payment) * 0.25
-        
-        # Peak hour bonus (20% extra during busy times)
-        peak_hour_bonus = 0.0
-        if is_peak_hour:
-            peak_hour_bonus = (base_payment + distance_payment + time_payment) * 0.20
-        
-        # Weather conditions bonus (15% extra for adverse weather)
-        weather_bonus = 0.0
-        if weather_conditions in ["rain", "snow", "storm"]:
-            weather_bonus = (base_payment + distance_payment + time_payment) * 0.15
-        
-        # Long distance bonus (extra 10% for deliveries over 5km)
-        long_distance_bonus = 0.0
-        if distance_km > 5.0:
-            long_distance_bonus = distance_payment * 0.10
-        
-        # Calculate total payment
-        total_payment = (
-            base_payment +
-            distance_payment +
-            time_payment +
-            efficiency_bonus +
-            peak_hour_bonus +
-            weather_bonus +
-            long_distance_bonus
+        pricing = self.pricing
+        (base_payment, distance_payment, time_payment, efficiency_bonus,
+         peak_hour_bonus, weather_bonus, long_distance_bonus, total_payment) = pricing.rider_pence(
+            distance_km, delivery_time_minutes, efficiency_percentage, is_peak_hour, weather_conditions
         )
         
-        # Round to 2 decimal places
-        total_payment = round(total_payment, 2)
-        
+        # Amounts are pence internally; pounds only at the model boundary
         return PaymentCalculation(
-            base_payment=round(base_payment, 2),
-            distance_payment=round(distance_payment, 2),
-            time_payment=round(time_payment, 2),
-            efficiency_bonus=round(efficiency_bonus, 2),
-            peak_hour_bonus=round(peak_hour_bonus, 2),
-            weather_bonus=round(weather_bonus, 2),
-            long_distance_bonus=round(long_distance_bonus, 2),
-            total_payment=total_payment,
-            breakdown={
-                "base_rate": self.base_delivery_rate,
-                "distance_rate_per_km": self.distance_rate_per_km,
-                "time_rate_per_minute": self.time_rate_per_minute,
-                "efficiency_threshold": self.efficiency_bonus_threshold,
-                "efficiency_bonus_multiplier": self.efficiency_bonus_multiplier
-            }
+            base_payment=from_pence(base_payment),
+            distance_payment=from_pence(distance_payment),
+            time_payment=from_pence(time_payment),
+            efficiency_bonus=from_pence(efficiency_bonus),
+            peak_hour_bonus=from_pence(peak_hour_bonus),
+            weather_bonus=from_pence(weather_bonus),
+            long_distance_bonus=from_pence(long_distance_bonus),
+            total_payment=from_pence(total_payment),
+            breakdown=pricing.rider_breakdown,
+            pricing_version=pricing.version
         )
 
     def calculate_customer_charge(
@@ -108,64 +157,158 @@ class PaymentService:
         """
         Calculate dynamic customer delivery charge
         """
-        # Base delivery fee
-        base_fee = self.customer_base_fee
+        pricing = self.pricing
+        (base_fee, distance_charge, time_charge, peak_hour_surcharge, weather_surcharge,
+         long_distance_surcharge, subtotal, total_charge, profit_margin) = pricing.customer_pence(
+            distance_km, estimated_delivery_time_minutes, is_peak_hour, weather_conditions
+        )
         
-        # Distance-based charge
-        distance_charge = distance_km * self.customer_distance_rate
+        return CustomerCharge(
+            base_fee=from_pence(base_fee),
+            distance_charge=from_pence(distance_charge),
+            time_charge=from_pence(time_charge),
+            peak_hour_surcharge=from_pence(peak_hour_surcharge),
+            weather_surcharge=from_pence(weather_surcharge),
+            long_distance_surcharge=from_pence(long_distance_surcharge),
+            subtotal=from_pence(subtotal),
+            total_charge=from_pence(total_charge),
+            profit_margin=from_pence(profit_margin),
+            breakdown=pricing.customer_breakdown,
+            pricing_version=pricing.version
+        )
+
+    def quote_customer_charge(
+        self,
+        pickup_lat: float,
+        pickup_lng: float,
+        delivery_lat: float,
+        delivery_lng: float,
+        is_peak_hour: bool = False,
+        weather_conditions: str = "normal"
+    ) -> Dict:
+        """
+        Quote a customer delivery charge through the quote cache
         
-        # Time-based charge
-        time_charge = estimated_delivery_time_minutes * self.customer_time_rate
+        Points are snapped to ~100m cells and the quote is priced between the
+        cell centres, so repeat quotes for the same restaurant and
+        neighbourhood are served from memory.
         
-        # Peak hour surcharge (15% extra during busy times)
-        peak_hour_surcharge = 0.0
-        if is_peak_hour:
-            peak_hour_surcharge = (base_fee + distance_charge + time_charge) * 0.15
-        
-        # Weather surcharge (10% extra for adverse weather)
-        weather_surcharge = 0.0
-        if weather_conditions in ["rain", "snow", "storm"]:
-            weather_surcharge = (base_fee + distance_charge + time_charge) * 0.10
-        
-        # Long distance surcharge (extra 5% for deliveries over 5km)
-        long_distance_surcharge = 0.0
-        if distance_km > 5.0:
-            long_distance_surcharge = distance_charge * 0.05
-        
-        # Calculate subtotal
-        subtotal = (
-            base_fee +
-            distance_charge +
-            time_charge +
-            peak_hour_surcharge +
-            weather_surcharge +
-            long_distance_surcharge
+        Returns:
+            Dictionary with customer_charge (a copy the caller may modify) and
+            the distance_km and estimated_delivery_time it was priced on
+            (cell centre to cell centre), plus cached
+        """
+        pricing = self.pricing
+        pickup_cell = quantize_point(pickup_lat, pickup_lng)
+        delivery_cell = quantize_point(delivery_lat, delivery_lng)
+        key = (pickup_cell, delivery_cell, bool(is_peak_hour), weather_conditions)
+        
+        def compute_quote() -> Dict:
+            pickup = cell_center(pickup_cell)
+            delivery = cell_center(delivery_cell)
+            distance_km = self.calculate_distance_km(pickup[0], pickup[1], delivery[0], delivery[1])
+            estimated_time = self.estimate_delivery_time(distance_km, is_peak_hour, weather_conditions)
+            return {
+                "customer_charge": self.calculate_customer_charge(
+                    distance_km, estimated_time, 0.0, is_peak_hour, weather_conditions
+                ),
+                "distance_km": distance_km,
+                "estimated_delivery_time": estimated_time
+            }
+        
+        quote, cached = self.quote_cache.get_or_compute(key, pricing.version, compute_quote)
+        return {**quote, "customer_charge": quote["customer_charge"].model_copy(deep=True), "cached": cached}
+    
+    def calculate_payment(
+        self,
+        pickup_lat: float,
+        pickup_lng: float,
+        delivery_lat: float,
+        delivery_lng: float,
+        efficiency_percentage: float,
+        order_value: float,
+        is_peak_hour: bool = False,
+        weather_conditions: str = "normal"
+    ) -> Dict:
+        """
+        Calculate rider payment and customer charge for one delivery
+        
+        The rider payment uses the exact route distance; the customer charge is
+        the cached quote for the route's cells, reported with the quote's own
+        distance and time (quote_distance_km, quote_estimated_delivery_time).
+        
+        Returns:
+            Dictionary matching models.payment.PaymentResponse
+        """
+        distance_km = self.calculate_distance_km(pickup_lat, pickup_lng, delivery_lat, delivery_lng)
+        estimated_time = self.estimate_delivery_time(distance_km, is_peak_hour, weather_conditions)
+        rider_payment = self.calculate_rider_payment(
+            distance_km, estimated_time, efficiency_percentage, order_value, is_peak_hour, weather_conditions
+        )
+        quote = self.quote_customer_charge(
+            pickup_lat, pickup_lng, delivery_lat, delivery_lng, is_peak_hour, weather_conditions
         )
         
-        # Apply profit margin
-        total_charge = subtotal * self.profit_margin_multiplier
+        return {
+            "rider_payment": rider_payment,
+            "customer_charge": quote["customer_charge"],
+            "distance_km": distance_km,
+            "estimated_delivery_time": estimated_time,
+            "quote_distance_km": quote["distance_km"],
+            "quote_estimated_delivery_time": quote["estimated_delivery_time"],
+            "is_peak_hour": is_peak_hour,
+            "weather_conditions": weather_conditions
+        }
+    
+    def calculate_rider_payments_batch(
+        self,
+        distance_km,
+        delivery_time_minutes,
+        efficiency_percentage,
+        is_peak_hour,
+        weather_codes
+    ) -> Dict:
+        """
+        Price many deliveries at once from columnar arrays
         
-        # Round to 2 decimal places
-        total_charge = round(total_charge, 2)
+        Returns a dict of int64 pence arrays named like the PaymentCalculation
+        fields (plus pricing_version), identical to calling
+        calculate_rider_payment for each row. Weather codes come from batch_pricing.WEATHER_CODES (see
+        encode_weather).
+        """
+        from services import batch_pricing
+        return batch_pricing.price_rider_payments(
+            self.pricing,
+            distance_km,
+            delivery_time_minutes,
+            efficiency_percentage,
+            is_peak_hour,
+            weather_codes
+        )
+    
+    def calculate_customer_charges_batch(
+        self,
+        distance_km,
+        estimated_delivery_time_minutes,
+        is_peak_hour,
+        weather_codes
+    ) -> Dict:
+        """
+        Quote many customer charges at once from columnar arrays
         
-        return CustomerCharge(
-            base_fee=round(base_fee, 2),
-            distance_charge=round(distance_charge, 2),
-            time_charge=round(time_charge, 2),
-            peak_hour_surcharge=round(peak_hour_surcharge, 2),
-            weather_surcharge=round(weather_surcharge, 2),
-            long_distance_surcharge=round(long_distance_surcharge, 2),
-            subtotal=round(subtotal, 2),
-            total_charge=total_charge,
-            profit_margin=round(total_charge - subtotal, 2),
-            breakdown={
-                "base_fee": self.customer_base_fee,
-                "distance_rate_per_km": self.customer_distance_rate,
-                "time_rate_per_minute": self.customer_time_rate,
-                "profit_margin_multiplier": self.profit_margin_multiplier
-            }
+        Returns a dict of int64 pence arrays named like the CustomerCharge
+        fields (plus pricing_version), identical to calling
+        calculate_customer_charge for each row.
+        """
+        from services import batch_pricing
+        return batch_pricing.price_customer_charges(
+            self.pricing,
+            distance_km,
+            estimated_delivery_time_minutes,
+            is_peak_hour,
+            weather_codes
         )
-
+    
     def calculate_distance_km(
         self,
         pickup_lat: float,
@@ -231,6 +374,55 @@ class PaymentService:
         # Peak hours: 11:00-14:00 (lunch) and 17:00-20:00 (dinner)
         return (11 <= hour <= 14) or (17 <= hour <= 20)
 
+    def build_payout_detail(self, rider: Dict, pricing: Optional[PricingSnapshot] = None) -> Dict:
+        """
+        Build one rider's payout line from their weekly earnings
+        """
+        pricing = pricing or self.pricing
+        rider_id = rider.get("_id")
+        rider_name = rider.get("rider_name") or f"{rider.get('first_name', '')} {rider.get('last_name', '')}"
+        bank_account = rider.get("bank_account", {})
+        
+        # Weekly earnings in pence (ledger rollups provide pence, older callers pounds)
+        weekly_earnings = rider.get("weekly_earnings_pence")
+        if weekly_earnings is None:
+            weekly_earnings = to_pence(rider.get("weekly_earnings", 0))
+        efficiency_bonus = rider.get("efficiency_bonus_pence")
+        if efficiency_bonus is None:
+            efficiency_bonus = to_pence(rider.get("efficiency_bonus", 0))
+        total_earnings = weekly_earnings + efficiency_bonus
+        
+        detail = {
+            "rider_id": str(rider_id) if rider_id is not None else None,
+            "rider_name": rider_name,
+            "bank_account": {
+                "account_holder": bank_account.get("account_holder_name", ""),
+                "account_number": bank_account.get("account_number", ""),
+                "sort_code": bank_account.get("sort_code", ""),
+                "bank_name": bank_account.get("bank_name", "")
+            },
+            "weekly_earnings": from_pence(weekly_earnings),
+            "efficiency_bonus": from_pence(efficiency_bonus),
+            "total_earnings": from_pence(total_earnings)
+        }
+        
+        # Check if eligible for payout
+        if total_earnings >= to_pence(pricing.minimum_payout_amount):
+            processing_fee = to_pence(pricing.payout_processing_fee)
+            detail.update({
+                "processing_fee": from_pence(processing_fee),
+                "payout_amount": from_pence(total_earnings - processing_fee),
+                "is_eligible": True
+            })
+        else:
+            detail.update({
+                "processing_fee": 0,
+                "payout_amount": 0,
+                "is_eligible": False,
+                "reason": f"Below minimum payout threshold (£{pricing.minimum_payout_amount})"
+            })
+        return detail
+    
     def generate_weekly_payout_report(
         self,
         riders_data: List[Dict],
@@ -238,72 +430,67 @@ class PaymentService:
         end_date: datetime
     ) -> PayoutReport:
         """
-        Generate weekly payout report for admin
+        Generate weekly payout report for admin from already loaded rider data
         """
-        total_payouts = 0
-        total_riders = len(riders_data)
-        eligible_riders = 0
+        pricing = self.pricing
+        totals = PayoutTotals(pricing.minimum_payout_amount, pricing.payout_processing_fee)
         payout_details = []
         
         for rider in riders_data:
-            rider_id = rider.get("_id")
-            rider_name = f"{rider.get('first_name', '')} {rider.get('last_name', '')}"
-            bank_account = rider.get("bank_account", {})
-            
-            # Calculate weekly earnings
-            weekly_earnings = rider.get("weekly_earnings", 0)
-            efficiency_bonus = rider.get("efficiency_bonus", 0)
-            total_earnings = weekly_earnings + efficiency_bonus
-            
-            # Check if eligible for payout
-            is_eligible = total_earnings >= self.minimum_payout_amount
-            
-            if is_eligible:
-                eligible_riders += 1
-                payout_amount = total_earnings - self.payout_processing_fee
-                total_payouts += payout_amount
-                
-                payout_details.append({
-                    "rider_id": rider_id,
-                    "rider_name": rider_name,
-                    "bank_account": {
-                        "account_holder": bank_account.get("account_holder_name", ""),
-                        "account_number": bank_account.get("account_number", ""),
-                        "sort_code": bank_account.get("sort_code", ""),
-                        "bank_name": bank_account.get("bank_name", "")
-                    },
-                    "weekly_earnings": round(weekly_earnings, 2),
-                    "efficiency_bonus": round(efficiency_bonus, 2),
-                    "total_earnings": round(total_earnings, 2),
-                    "processing_fee": self.payout_processing_fee,
-                    "payout_amount": round(payout_amount, 2),
-                    "is_eligible": True
-                })
-            else:
-                payout_details.append({
-                    "rider_id": rider_id,
-                    "rider_name": rider_name,
-                    "bank_account": bank_account,
-                    "weekly_earnings": round(weekly_earnings, 2),
-                    "efficiency_bonus": round(efficiency_bonus, 2),
-                    "total_earnings": round(total_earnings, 2),
-                    "processing_fee": 0,
-                    "payout_amount": 0,
-                    "is_eligible": False,
-                    "reason": f"Below minimum payout threshold (£{self.minimum_payout_amount})"
-                })
-        
-        return PayoutReport(
-            report_period=f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
-            total_riders=total_riders,
-            eligible_riders=eligible_riders,
-            total_payouts=round(total_payouts, 2),
-            processing_fees=eligible_riders * self.payout_processing_fee,
-            minimum_payout_threshold=self.minimum_payout_amount,
-            payout_details=payout_details,
-            generated_at=datetime.utcnow()
+            detail = self.build_payout_detail(rider, pricing)
+            totals.add(detail)
+            payout_details.append(detail)
+        
+        return PayoutReport(payout_details=payout_details, **totals.summary(start_date, end_date))
+    
+    async def generate_weekly_payout_report_from_db(
+        self,
+        db,
+        start_date: datetime = None,
+        end_date: datetime = None,
+        output: Optional[TextIO] = None,
+        include_details: bool = False,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Dict:
+        """
+        Generate the weekly payout report with earnings aggregated in MongoDB
+        
+        Riders are streamed from the aggregation cursor in chunks and totals are
+        accumulated as they go, so memory stays bounded unless include_details
+        asks for the details in memory (use stream_weekly_payout_report_json or
+        output for large periods). Earnings come from the weekly ledger
+        rollups; defaults to the last completed week.
+        """
+        start_date, end_date = self._payout_period(start_date, end_date)
+        return await generate_payout_report(
+            self,
+            db,
+            start_date,
+            end_date,
+            output=output,
+            include_details=include_details,
+            chunk_size=chunk_size
         )
 
+    def stream_weekly_payout_report_json(
+        self,
+        db,
+        start_date: datetime = None,
+        end_date: datetime = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ):
+        """The full weekly payout report as an async iterator of JSON text"""
+        start_date, end_date = self._payout_period(start_date, end_date)
+        return iter_payout_report_json(self, db, start_date, end_date, chunk_size)
+    
+    def _payout_period(self, start_date: Optional[datetime], end_date: Optional[datetime]):
+        # Defaults to the last completed week
+        if end_date is None:
+            end_date = week_start_for(datetime.utcnow())
+        if start_date is None:
+            start_date = end_date - timedelta(days=7)
+        return start_date, end_date
+    
     def get_next_payout_date(self, current_date: datetime = None) -> datetime:
         """
         Get the next payout date
@@ -327,8 +514,9 @@ class PaymentService:
         """
         Calculate efficiency bonus for riders
         """
-        if efficiency_percentage >= self.efficiency_bonus_threshold:
-            bonus = base_payment * (self.efficiency_bonus_multiplier - 1)
+        pricing = self.pricing
+        if efficiency_percentage >= pricing.efficiency_bonus_threshold:
+            bonus = base_payment * pricing.efficiency_bonus_rate
             return round(bonus, 2)
         return 0.0
 
@@ -340,16 +528,15 @@ class PaymentService:
         efficiency_bonus_multiplier: float = None
     ):
         """
-        Update payment rates dynamically
+        Update payment rates dynamically (installs a new pricing snapshot)
         """
-        if base_delivery_rate is not None:
-            self.base_delivery_rate = base_delivery_rate
-        if distance_rate_per_km is not None:
-            self.distance_rate_per_km = distance_rate_per_km
-        if time_rate_per_minute is not None:
-            self.time_rate_per_minute = time_rate_per_minute
-        if efficiency_bonus_multiplier is not None:
-            self.efficiency_bonus_multiplier = efficiency_bonus_multiplier
+        rates = {
+            "base_delivery_rate": base_delivery_rate,
+            "distance_rate_per_km": distance_rate_per_km,
+            "time_rate_per_minute": time_rate_per_minute,
+            "efficiency_bonus_multiplier": efficiency_bonus_multiplier
+        }
+        return self.update_settings({name: value for name, value in rates.items() if value is not None})
 
     def get_payment_summary(
         self,
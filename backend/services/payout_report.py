@@ -0,0 +1,198 @@
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, TextIO
+from services.money import from_pence, to_pence
+
+# Riders fetched from the aggregation cursor per round trip
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def weekly_earnings_pipeline(start_date: datetime, end_date: datetime) -> List[Dict]:
+    """
+    Aggregation over riders that sums each rider's weekly earnings rollups for the period
+
+    Every rider is returned (riders with no earnings get 0) in _id order. The
+    rollups are maintained by EarningsLedger, so this reads one document per
+    rider per week rather than every payment.
+    """
+    return [
+        {"$match": {"role": "Rider"}},
+        {"$sort": {"_id": 1}},
+        {"$lookup": {
+            "from": "rider_weekly_earnings",
+            "let": {"rider_id": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {
+                    "$expr": {"$eq": ["$rider_id", "$$rider_id"]},
+                    "week_start": {"$gte": start_date, "$lt": end_date}
+                }},
+                {"$group": {
+                    "_id": None,
+                    "deliveries": {"$sum": "$total_deliveries"},
+                    "total_earnings_pence": {"$sum": "$total_earnings_pence"},
+                    "efficiency_bonus_pence": {"$sum": "$efficiency_bonuses_pence"}
+                }}
+            ],
+            "as": "earnings"
+        }},
+        {"$project": {
+            "first_name": 1,
+            "last_name": 1,
+            "full_name": 1,
+            "bank_account_number": 1,
+            "bank_sort_code": 1,
+            "bank_name": 1,
+            "deliveries": {"$ifNull": [{"$first": "$earnings.deliveries"}, 0]},
+            "total_earnings_pence": {"$ifNull": [{"$first": "$earnings.total_earnings_pence"}, 0]},
+            "efficiency_bonus_pence": {"$ifNull": [{"$first": "$earnings.efficiency_bonus_pence"}, 0]}
+        }},
+        {"$addFields": {"weekly_earnings_pence": {"$subtract": ["$total_earnings_pence", "$efficiency_bonus_pence"]}}}
+    ]
+
+
+def rider_payout_input(rider: Dict) -> Dict:
+    """Convert an aggregation result to the rider dict used by PaymentService.build_payout_detail"""
+    name = rider.get("full_name") or f"{rider.get('first_name', '')} {rider.get('last_name', '')}".strip()
+    return {
+        "_id": str(rider["_id"]),
+        "rider_name": name,
+        "bank_account": {
+            "account_holder_name": name,
+            "account_number": rider.get("bank_account_number") or "",
+            "sort_code": rider.get("bank_sort_code") or "",
+            "bank_name": rider.get("bank_name") or ""
+        },
+        "deliveries": rider.get("deliveries", 0),
+        "weekly_earnings_pence": int(rider.get("weekly_earnings_pence", 0)),
+        "efficiency_bonus_pence": int(rider.get("efficiency_bonus_pence", 0))
+    }
+
+
+class PayoutTotals:
+    """Running totals for a payout report, updated one rider at a time (exact, in pence)"""
+
+    def __init__(self, minimum_payout_amount: float, payout_processing_fee: float):
+        self.minimum_payout_amount = minimum_payout_amount
+        self.payout_processing_fee = payout_processing_fee
+        self.total_riders = 0
+        self.eligible_riders = 0
+        self.total_payouts_pence = 0
+
+    def add(self, detail: Dict):
+        self.total_riders += 1
+        if detail["is_eligible"]:
+            self.eligible_riders += 1
+            self.total_payouts_pence += to_pence(detail["payout_amount"])
+
+    def summary(self, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
+        return {
+            "report_period": f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
+            "total_riders": self.total_riders,
+            "eligible_riders": self.eligible_riders,
+            "total_payouts": from_pence(self.total_payouts_pence),
+            "processing_fees": from_pence(self.eligible_riders * to_pence(self.payout_processing_fee)),
+            "minimum_payout_threshold": self.minimum_payout_amount,
+            "generated_at": datetime.utcnow()
+        }
+
+
+async def stream_payout_details(
+    payment_service,
+    db,
+    start_date: datetime,
+    end_date: datetime,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    pricing=None
+) -> AsyncIterator[List[Dict]]:
+    """Yield payout details in chunks of up to chunk_size riders"""
+    pricing = pricing or payment_service.pricing
+    cursor = db.users.aggregate(
+        weekly_earnings_pipeline(start_date, end_date),
+        allowDiskUse=True,
+        batchSize=chunk_size
+    )
+    while True:
+        riders = await cursor.to_list(length=chunk_size)
+        if not riders:
+            break
+        yield [payment_service.build_payout_detail(rider_payout_input(rider), pricing) for rider in riders]
+
+
+async def iter_payout_report_json(
+    payment_service,
+    db,
+    start_date: datetime,
+    end_date: datetime,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    report: Optional[Dict[str, Any]] = None
+) -> AsyncIterator[str]:
+    """
+    Yield the full report as JSON text, one payout detail at a time
+
+    Suitable for a StreamingResponse or for writing to a file; the totals
+    come last, once every rider has been seen, and are also copied into
+    report when one is given.
+    """
+    # One pricing snapshot for the whole run, even if settings change meanwhile
+    pricing = payment_service.pricing
+    totals = PayoutTotals(pricing.minimum_payout_amount, pricing.payout_processing_fee)
+
+    yield '{"payout_details": ['
+    async for chunk in stream_payout_details(payment_service, db, start_date, end_date, chunk_size, pricing):
+        text = []
+        for detail in chunk:
+            text.append(("," if totals.total_riders else "") + "\n" + json.dumps(detail))
+            totals.add(detail)
+        yield "".join(text)
+
+    summary = totals.summary(start_date, end_date)
+    if report is not None:
+        report.update(summary)
+    yield "\n]" + "".join(f",\n{json.dumps(key)}: {json.dumps(value, default=str)}" for key, value in summary.items())
+    yield "}\n"
+
+
+async def generate_payout_report(
+    payment_service,
+    db,
+    start_date: datetime,
+    end_date: datetime,
+    output: Optional[TextIO] = None,
+    include_details: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """
+    Build a weekly payout report from the database without holding every rider in memory
+
+    Args:
+        payment_service: PaymentService supplying payout rules
+        db: Motor database
+        start_date: Period start (inclusive, compared with rollup week starts)
+        end_date: Period end (exclusive)
+        output: Text file to write the full report to as JSON, detail by detail
+        include_details: Also return payout_details in memory (small periods only;
+            ignored when writing to output)
+        chunk_size: Riders fetched and processed per chunk
+
+    Returns:
+        Report totals, plus payout_details when they are kept in memory
+    """
+    if output is not None:
+        report: Dict[str, Any] = {}
+        async for text in iter_payout_report_json(payment_service, db, start_date, end_date, chunk_size, report):
+            output.write(text)
+        return report
+
+    pricing = payment_service.pricing
+    totals = PayoutTotals(pricing.minimum_payout_amount, pricing.payout_processing_fee)
+    payout_details = [] if include_details else None
+    async for chunk in stream_payout_details(payment_service, db, start_date, end_date, chunk_size, pricing):
+        for detail in chunk:
+            if payout_details is not None:
+                payout_details.append(detail)
+            totals.add(detail)
+
+    report = totals.summary(start_date, end_date)
+    if payout_details is not None:
+        report["payout_details"] = payout_details
+    return report
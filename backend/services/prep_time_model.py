@@ -0,0 +1,237 @@
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from datetime import datetime, timedelta
+
+# Used until a restaurant (or the whole city) has history
+DEFAULT_PREP_MINUTES = 20.0
+DEFAULT_LOG_SPREAD = 0.35
+
+# Observations outside this range are treated as bad data
+MIN_PREP_MINUTES = 1.0
+MAX_PREP_MINUTES = 120.0
+
+# Estimators average the last ~EFFECTIVE_SAMPLES observations, so they follow
+# menu and staffing changes without being thrown by one slow order
+EFFECTIVE_SAMPLES = 50
+
+# Samples a level needs before it outweighs the level above it
+PRIOR_SAMPLES = 5.0
+
+# z-score of the 90th percentile
+P90_Z = 1.2816
+
+MAX_TRACKED_ORDERS = 50000
+
+GLOBAL = ""
+
+
+class _LogEstimator:
+    """Exponentially weighted mean and variance of log(minutes)"""
+
+    __slots__ = ("count", "mean", "variance")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        alpha = max(1.0 / self.count, 1.0 / EFFECTIVE_SAMPLES)
+        difference = value - self.mean
+        increment = alpha * difference
+        self.mean += increment
+        self.variance = (1 - alpha) * (self.variance + difference * increment)
+
+
+def restaurant_key(document: Dict) -> Optional[str]:
+    """Restaurant identifier of an imported order or a delivery document"""
+    for field in ("restaurant_id", "restaurant_name", "pickup_address"):
+        value = document.get(field)
+        if value:
+            return str(value).strip().lower()
+    return None
+
+
+def _as_datetime(value) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
+
+
+class PrepTimeModel:
+    """
+    Learned food preparation times per restaurant and hour of day.
+
+    Each completed preparation updates online estimators of log(minutes)
+    for its restaurant-hour, its restaurant, its hour across the city and
+    the city as a whole. A lookup blends the levels by sample count
+    (restaurant-hour shrinks towards the restaurant, which shrinks towards
+    the city), so a restaurant with a handful of orders still gets a
+    sensible estimate; with no history at all it returns the old
+    20-minute default. Lookups are a few dictionary reads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (restaurant, hour) -> estimator; hour None is all hours, restaurant GLOBAL the city
+        self._estimators: Dict[Tuple[str, Optional[int]], _LogEstimator] = {}
+        self._seen_orders: "OrderedDict[str, None]" = OrderedDict()
+        self.stats = {"observations": 0, "duplicates": 0, "rejected": 0}
+
+    def record_preparation(
+        self,
+        restaurant: Optional[str],
+        started_at: datetime,
+        ready_at: datetime,
+        order_id: Optional[str] = None
+    ) -> bool:
+        """
+        Learn from one finished preparation
+
+        Args:
+            restaurant: Restaurant key (see restaurant_key); None only updates the city
+            started_at: When the restaurant started (or received) the order
+            ready_at: When the food was ready or collected
+            order_id: Order identifier used to ignore repeated imports
+
+        Returns:
+            True if the observation was used
+        """
+        minutes = (ready_at - started_at).total_seconds() / 60
+        with self._lock:
+            if not MIN_PREP_MINUTES <= minutes <= MAX_PREP_MINUTES:
+                self.stats["rejected"] += 1
+                return False
+            if order_id is not None:
+                if order_id in self._seen_orders:
+                    self.stats["duplicates"] += 1
+                    return False
+                self._seen_orders[order_id] = None
+                if len(self._seen_orders) > MAX_TRACKED_ORDERS:
+                    self._seen_orders.popitem(last=False)
+
+            value = math.log(minutes)
+            hour = started_at.hour
+            keys = [(GLOBAL, None), (GLOBAL, hour)]
+            if restaurant:
+                keys += [(restaurant, None), (restaurant, hour)]
+            for key in keys:
+                estimator = self._estimators.get(key)
+                if estimator is None:
+                    estimator = self._estimators[key] = _LogEstimator()
+                estimator.add(value)
+            self.stats["observations"] += 1
+            return True
+
+    def record_orders(self, documents: Iterable[Dict]) -> int:
+        """
+        Learn from imported orders or delivery documents that have finished preparing
+
+        Imported orders use preparation_started_at (or created_at) to
+        ready_at as reported by the restaurant. Deliveries use
+        preparation_start_time to picked_up_at, the closest signal riders give.
+        """
+        recorded = 0
+        for document in documents:
+            if "restaurant_address" in document:
+                started_at = _as_datetime(document.get("preparation_started_at") or document.get("created_at"))
+                ready_at = _as_datetime(document.get("ready_at"))
+            else:
+                started_at = _as_datetime(document.get("preparation_start_time"))
+                ready_at = _as_datetime(document.get("picked_up_at"))
+            if started_at is None or ready_at is None:
+                continue
+            order_id = document.get("external_order_id") or document.get("_id")
+            if self.record_preparation(
+                restaurant_key(document), started_at, ready_at, str(order_id) if order_id is not None else None
+            ):
+                recorded += 1
+        return recorded
+
+    async def load_from_database(self, db, days: int = 28) -> int:
+        """Learn from recent finished preparations (used once at startup)"""
+        since = datetime.utcnow() - timedelta(days=days)
+        recorded = 0
+        order_fields = {
+            "external_order_id": 1, "restaurant_id": 1, "restaurant_name": 1, "restaurant_address": 1,
+            "preparation_started_at": 1, "created_at": 1, "ready_at": 1
+        }
+        cursor = db.orders.find({"created_at": {"$gte": since}, "ready_at": {"$ne": None}}, order_fields)
+        async for order in cursor.sort("created_at", 1):
+            recorded += self.record_orders([order])
+        delivery_fields = {
+            "restaurant_id": 1, "restaurant_name": 1, "pickup_address": 1, "preparation_start_time": 1, "picked_up_at": 1
+        }
+        cursor = db.deliveries.find({"created_at": {"$gte": since}, "picked_up_at": {"$ne": None}}, delivery_fields)
+        async for delivery in cursor.sort("created_at", 1):
+            recorded += self.record_orders([delivery])
+        return recorded
+
+    def _blend(self, restaurant: Optional[str], hour: int) -> Tuple[float, float, int, str]:
+        """(mean, variance, samples, source) of log(minutes), most specific level last"""
+        mean, variance = math.log(DEFAULT_PREP_MINUTES), DEFAULT_LOG_SPREAD ** 2
+        samples, source = 0, "default"
+        levels = [((GLOBAL, None), "city"), ((GLOBAL, hour), "city_hour")]
+        if restaurant:
+            levels += [((restaurant, None), "restaurant"), ((restaurant, hour), "restaurant_hour")]
+        for key, name in levels:
+            estimator = self._estimators.get(key)
+            if estimator is None or estimator.count == 0:
+                continue
+            weight = estimator.count / (estimator.count + PRIOR_SAMPLES)
+            # Blend the spread around the blended mean, not just the variances
+            blended_mean = weight * estimator.mean + (1 - weight) * mean
+            variance = (
+                weight * (estimator.variance + (estimator.mean - blended_mean) ** 2)
+                + (1 - weight) * (variance + (mean - blended_mean) ** 2)
+            )
+            mean = blended_mean
+            samples, source = estimator.count, name
+        return mean, variance, samples, source
+
+    def expected_minutes(self, restaurant: Optional[str], when: Optional[datetime] = None) -> float:
+        """Typical (median) preparation time for a restaurant at a time of day"""
+        hour = (when or datetime.utcnow()).hour
+        with self._lock:
+            mean, _, _, _ = self._blend(restaurant, hour)
+        return math.exp(mean)
+
+    def estimate(self, restaurant: Optional[str], when: Optional[datetime] = None) -> Dict:
+        """Median and 90th percentile preparation time with where the estimate came from"""
+        hour = (when or datetime.utcnow()).hour
+        with self._lock:
+            mean, variance, samples, source = self._blend(restaurant, hour)
+        return {
+            "restaurant": restaurant,
+            "hour": hour,
+            "minutes": round(math.exp(mean), 1),
+            "p90_minutes": round(math.exp(mean + P90_Z * math.sqrt(variance)), 1),
+            "samples": samples,
+            "source": source
+        }
+
+    def ready_at(self, restaurant: Optional[str], started_at: datetime) -> datetime:
+        """Expected time the food is ready"""
+        return started_at + timedelta(minutes=self.expected_minutes(restaurant, started_at))
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get model statistics"""
+        with self._lock:
+            restaurants = sum(1 for restaurant, hour in self._estimators if restaurant != GLOBAL and hour is None)
+            return {
+                **self.stats,
+                "restaurants": restaurants,
+                "estimators": len(self._estimators),
+                "tracked_orders": len(self._seen_orders)
+            }
+
+# Create global instance
+prep_time_model = PrepTimeModel()
@@ -0,0 +1,236 @@
+from dataclasses import dataclass, field, fields, replace
+from datetime import datetime
+from typing import Any, Dict, Mapping, Tuple
+from services.money import Pence, from_pence, to_pence
+
+ADVERSE_WEATHER = ("rain", "snow", "storm")
+
+# Keys accepted by update_settings that are not pricing rules
+SETTINGS_METADATA_KEYS = ("pricing_version", "updated_at", "updated_by")
+
+
+@dataclass(frozen=True)
+class PricingSnapshot:
+    """
+    One immutable, versioned set of pricing rules.
+
+    Derived tables (bonus rates, weather lookups, breakdown dicts) are
+    computed once when the snapshot is built. PaymentService swaps whole
+    snapshots in a single assignment, so a quote reads one consistent set
+    of rules without taking a lock.
+    """
+
+    version: int = 1
+
+    # Rider payment rates
+    base_delivery_rate: float = 3.50
+    distance_rate_per_km: float = 0.75
+    time_rate_per_minute: float = 0.15
+    efficiency_bonus_threshold: float = 70.0
+    efficiency_bonus_multiplier: float = 1.25
+    rider_peak_hour_rate: float = 0.20
+    rider_weather_rate: float = 0.15
+    rider_long_distance_rate: float = 0.10
+
+    # Customer charge rates
+    customer_base_fee: float = 2.99
+    customer_distance_rate: float = 0.50
+    customer_time_rate: float = 0.10
+    profit_margin_multiplier: float = 1.35
+    customer_peak_hour_rate: float = 0.15
+    customer_weather_rate: float = 0.10
+    customer_long_distance_rate: float = 0.05
+
+    long_distance_threshold_km: float = 5.0
+
+    # Payout settings
+    weekly_payout_day: int = 6
+    minimum_payout_amount: float = 25.00
+    payout_processing_fee: float = 1.50
+
+    updated_at: datetime = field(default_factory=datetime.utcnow, compare=False)
+    updated_by: str = field(default="system", compare=False)
+
+    # Derived when the snapshot is built
+    efficiency_bonus_rate: float = field(init=False, repr=False, compare=False)
+    rider_weather_rates: Mapping[str, float] = field(init=False, repr=False, compare=False)
+    customer_weather_rates: Mapping[str, float] = field(init=False, repr=False, compare=False)
+    rider_breakdown: Mapping[str, float] = field(init=False, repr=False, compare=False)
+    customer_breakdown: Mapping[str, float] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        for name in RULE_NAMES:
+            value = getattr(self, name)
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+                raise ValueError(f"{name} must be a non-negative number")
+        if not 0 <= self.weekly_payout_day <= 6:
+            raise ValueError("weekly_payout_day must be between 0 (Monday) and 6 (Sunday)")
+
+        derived = {
+            "efficiency_bonus_rate": self.efficiency_bonus_multiplier - 1,
+            "rider_weather_rates": {weather: self.rider_weather_rate for weather in ADVERSE_WEATHER},
+            "customer_weather_rates": {weather: self.customer_weather_rate for weather in ADVERSE_WEATHER},
+            "rider_breakdown": {
+                "base_rate": self.base_delivery_rate,
+                "distance_rate_per_km": self.distance_rate_per_km,
+                "time_rate_per_minute": self.time_rate_per_minute,
+                "efficiency_threshold": self.efficiency_bonus_threshold,
+                "efficiency_bonus_multiplier": self.efficiency_bonus_multiplier
+            },
+            "customer_breakdown": {
+                "base_fee": self.customer_base_fee,
+                "distance_rate_per_km": self.customer_distance_rate,
+                "time_rate_per_minute": self.customer_time_rate,
+                "profit_margin_multiplier": self.profit_margin_multiplier
+            }
+        }
+        for name, value in derived.items():
+            object.__setattr__(self, name, value)
+
+    def with_updates(self, version: int, changes: Mapping[str, Any], updated_by: str = "admin") -> "PricingSnapshot":
+        """
+        Build the next snapshot with some rules changed
+
+        Raises:
+            ValueError: For unknown rule names or invalid values
+        """
+        allowed = set(RULE_NAMES)
+        updates = {}
+        for name, value in changes.items():
+            if name in SETTINGS_METADATA_KEYS:
+                continue
+            if name not in allowed:
+                raise ValueError(f"Unknown payment setting: {name}")
+            updates[name] = int(value) if name == "weekly_payout_day" else value
+        return replace(self, version=version, updated_at=datetime.utcnow(), updated_by=updated_by, **updates)
+
+    def settings(self) -> Dict[str, Any]:
+        """Rules as a plain dictionary (the PaymentSettings shape plus the version)"""
+        settings = {name: getattr(self, name) for name in RULE_NAMES}
+        settings.update({
+            "pricing_version": self.version,
+            "updated_at": self.updated_at,
+            "updated_by": self.updated_by
+        })
+        return settings
+
+    def rider_components(
+        self,
+        distance_km: float,
+        delivery_time_minutes: float,
+        efficiency_percentage: float,
+        is_peak_hour: bool,
+        weather_conditions: str
+    ) -> Tuple[float, ...]:
+        """
+        Unrounded rider payment components
+
+        Returns:
+            (base, distance, time, efficiency, peak_hour, weather, long_distance, total)
+        """
+        base_payment = self.base_delivery_rate
+        distance_payment = distance_km * self.distance_rate_per_km
+        time_payment = delivery_time_minutes * self.time_rate_per_minute
+        subtotal = base_payment + distance_payment + time_payment
+
+        efficiency_bonus = (
+            subtotal * self.efficiency_bonus_rate
+            if efficiency_percentage >= self.efficiency_bonus_threshold else 0.0
+        )
+        peak_hour_bonus = subtotal * self.rider_peak_hour_rate if is_peak_hour else 0.0
+        weather_rate = self.rider_weather_rates.get(weather_conditions)
+        weather_bonus = subtotal * weather_rate if weather_rate is not None else 0.0
+        long_distance_bonus = (
+            distance_payment * self.rider_long_distance_rate
+            if distance_km > self.long_distance_threshold_km else 0.0
+        )
+
+        total_payment = (
+            base_payment +
+            distance_payment +
+            time_payment +
+            efficiency_bonus +
+            peak_hour_bonus +
+            weather_bonus +
+            long_distance_bonus
+        )
+        return (base_payment, distance_payment, time_payment, efficiency_bonus,
+                peak_hour_bonus, weather_bonus, long_distance_bonus, total_payment)
+
+    def customer_components(
+        self,
+        distance_km: float,
+        estimated_delivery_time_minutes: float,
+        is_peak_hour: bool,
+        weather_conditions: str
+    ) -> Tuple[float, ...]:
+        """
+        Unrounded customer charge components
+
+        Returns:
+            (base, distance, time, peak_hour, weather, long_distance, subtotal, total)
+        """
+        base_fee = self.customer_base_fee
+        distance_charge = distance_km * self.customer_distance_rate
+        time_charge = estimated_delivery_time_minutes * self.customer_time_rate
+        subtotal_before_surcharges = base_fee + distance_charge + time_charge
+
+        peak_hour_surcharge = subtotal_before_surcharges * self.customer_peak_hour_rate if is_peak_hour else 0.0
+        weather_rate = self.customer_weather_rates.get(weather_conditions)
+        weather_surcharge = subtotal_before_surcharges * weather_rate if weather_rate is not None else 0.0
+        long_distance_surcharge = (
+            distance_charge * self.customer_long_distance_rate
+            if distance_km > self.long_distance_threshold_km else 0.0
+        )
+
+        subtotal = (
+            base_fee +
+            distance_charge +
+            time_charge +
+            peak_hour_surcharge +
+            weather_surcharge +
+            long_distance_surcharge
+        )
+        total_charge = subtotal * self.profit_margin_multiplier
+        return (base_fee, distance_charge, time_charge, peak_hour_surcharge,
+                weather_surcharge, long_distance_surcharge, subtotal, total_charge)
+
+    def rider_pence(
+        self,
+        distance_km: float,
+        delivery_time_minutes: float,
+        efficiency_percentage: float,
+        is_peak_hour: bool,
+        weather_conditions: str
+    ) -> Tuple[Pence, ...]:
+        """rider_components rounded to pence (the total is rounded from the unrounded sum)"""
+        return tuple(to_pence(amount) for amount in self.rider_components(
+            distance_km, delivery_time_minutes, efficiency_percentage, is_peak_hour, weather_conditions
+        ))
+    
+    def customer_pence(
+        self,
+        distance_km: float,
+        estimated_delivery_time_minutes: float,
+        is_peak_hour: bool,
+        weather_conditions: str
+    ) -> Tuple[Pence, ...]:
+        """
+        Customer charge in pence
+        
+        Returns:
+            (base, distance, time, peak_hour, weather, long_distance, subtotal, total, profit_margin)
+        """
+        components = self.customer_components(
+            distance_km, estimated_delivery_time_minutes, is_peak_hour, weather_conditions
+        )
+        total_charge = to_pence(components[-1])
+        profit_margin = to_pence(from_pence(total_charge) - components[-2])
+        return tuple(to_pence(amount) for amount in components[:-1]) + (total_charge, profit_margin)
+
+
+# Editable pricing rules (every init field except the version metadata)
+RULE_NAMES = tuple(
+    item.name for item in fields(PricingSnapshot)
+    if item.init and item.name not in ("version", "updated_at", "updated_by")
+)
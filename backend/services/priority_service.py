@@ -1,11 +1,22 @@
-from datetime import datetime, timedelta
-from typing import List, Optional
+from datetime import date, datetime, timedelta
+from bson import ObjectId
+from typing import Callable, List, Optional
 from models.delivery import RiderAction, RiderEfficiency, PrioritySettings
-import random
+from services.efficiency_engine import EfficiencyEngine
+from services.prep_time_model import prep_time_model
+from services.rider_priority_queue import RiderPriorityQueue
+
+# Priority boost for riders above the bonus efficiency threshold
+BONUS_ELIGIBLE_PRIORITY = 100
 
 class PriorityService:
     def __init__(self):
         self.settings = PrioritySettings()
+        self.queue = RiderPriorityQueue()
+        self.efficiency = EfficiencyEngine()
+        self.prep_times = prep_time_model
+        # UTC day the queue scores were computed for; windows move at midnight
+        self._scored_day: Optional[date] = None
     
     def calculate_efficiency(self, accepted: int, penalized_rejections: int) -> float:
         """Calculate efficiency percentage"""
@@ -23,23 +34,30 @@ class PriorityService:
         """Check if rider is eligible for bonus"""
         return efficiency >= self.settings.efficiency_threshold_for_bonus
     
-    def is_penalty_applicable(self, preparation_start_time: datetime, current_time: datetime) -> bool:
+    def grace_period_end(self, preparation_start_time: datetime, restaurant: Optional[str] = None) -> datetime:
+        """End of the rejection penalty window: a share of the restaurant's learned preparation time"""
+        expected_minutes = self.prep_times.expected_minutes(restaurant, preparation_start_time)
+        return preparation_start_time + timedelta(minutes=expected_minutes * self.settings.preparation_grace_fraction)
+    
+    def is_penalty_applicable(self, preparation_start_time: datetime, current_time: datetime,
+                              restaurant: Optional[str] = None) -> bool:
         """Check if rejection penalty should be applied based on timing"""
         if not preparation_start_time:
             return True
         
-        grace_period_end = preparation_start_time + timedelta(minutes=self.settings.preparation_grace_period_minutes)
-        return current_time < grace_period_end
+        return current_time < self.grace_period_end(preparation_start_time, restaurant)
     
     def update_rider_efficiency(self, rider_id: str, action: str, order_id: str, 
-                               preparation_start_time: Optional[datetime] = None) -> dict:
+                               preparation_start_time: Optional[datetime] = None,
+                               current_time: Optional[datetime] = None,
+                               restaurant: Optional[str] = None) -> dict:
         """Update rider efficiency when they accept/reject an order"""
-        current_time = datetime.utcnow()
+        current_time = current_time or datetime.utcnow()
         
         # Check if penalty applies
         penalty_applied = False
         if action == "reject" and preparation_start_time:
-            penalty_applied = self.is_penalty_applicable(preparation_start_time, current_time)
+            penalty_applied = self.is_penalty_applicable(preparation_start_time, current_time, restaurant)
         
         # Create action record
         rider_action = RiderAction(
@@ -57,6 +75,61 @@ class PriorityService:
             "timestamp": current_time
         }
     
+    async def record_rider_action(self, db, rider_id: str, action: str, order_id: str,
+                                  preparation_start_time: Optional[datetime] = None,
+                                  restaurant: Optional[str] = None) -> dict:
+        """
+        Store an accept/reject, update the rolling counters and the rider's stored score
+        
+        The rider document gets the scoring-window efficiency with $set, so it
+        always matches the counters instead of drifting through increments.
+        """
+        result = self.update_rider_efficiency(
+            rider_id, action, order_id, preparation_start_time, restaurant=restaurant
+        )
+        rider_action = result["action"]
+        await db.rider_actions.insert_one(rider_action.model_dump())
+        efficiency = self.apply_rider_action(rider_action)
+        await db.users.update_one(
+            {"_id": ObjectId(rider_id)},
+            {"$set": {
+                "efficiency_score": efficiency.efficiency_percentage,
+                "total_points": efficiency.total_points,
+                "bonus_eligible": efficiency.bonus_eligible,
+                "efficiency_updated_at": efficiency.last_updated
+            }}
+        )
+        return {**result, "efficiency": efficiency}
+    
+    def apply_rider_action(self, rider_action: RiderAction) -> RiderEfficiency:
+        """Count an action in the rolling windows and re-rank the rider (in memory only)"""
+        self.efficiency.record(rider_action.rider_id, rider_action.action, rider_action.penalty_applied, rider_action.timestamp)
+        efficiency = self.get_rider_efficiency(rider_action.rider_id, now=rider_action.timestamp)
+        self.update_rider_priority(efficiency)
+        return efficiency
+    
+    def get_rider_efficiency(self, rider_id: str, window: Optional[str] = None,
+                             now: Optional[datetime] = None) -> RiderEfficiency:
+        """Efficiency, points and bonus eligibility over a window (default: the scoring window)"""
+        counts = self.efficiency.counts(rider_id, window, now)
+        efficiency = self.calculate_efficiency(counts["accepted"], counts["penalized_rejections"])
+        bonus_eligible = self.check_bonus_eligibility(efficiency)
+        return RiderEfficiency(
+            rider_id=rider_id,
+            total_points=self.calculate_points(counts["accepted"], counts["penalized_rejections"]),
+            accepted_orders=counts["accepted"],
+            rejected_orders=counts["rejected"],
+            penalized_rejections=counts["penalized_rejections"],
+            efficiency_percentage=round(efficiency, 2),
+            bonus_eligible=bonus_eligible,
+            last_updated=now or datetime.utcnow(),
+            bonus_amount_per_order=self.settings.bonus_amount_per_order if bonus_eligible else 0.0
+        )
+    
+    def get_rider_efficiency_windows(self, rider_id: str) -> dict:
+        """get_rider_efficiency for every configured window"""
+        return {window: self.get_rider_efficiency(rider_id, window) for window in self.efficiency.windows}
+    
     def get_rider_priority_score(self, efficiency: RiderEfficiency) -> float:
         """Calculate priority score for order assignment"""
         # Base score from points
@@ -64,21 +137,97 @@ class PriorityService:
         
         # Bonus for high efficiency
         if efficiency.bonus_eligible:
-            base_score += 100  # Bonus points for efficient riders
-        
-        # Small random factor to break ties
-        random_factor = random.uniform(0, 1)
+            base_score += BONUS_ELIGIBLE_PRIORITY
         
-        return base_score + random_factor
+        return base_score
     
     def sort_riders_by_priority(self, riders_efficiency: List[RiderEfficiency]) -> List[RiderEfficiency]:
-        """Sort riders by priority score for order assignment"""
+        """Sort riders by priority score for order assignment (ties by rider id)"""
         return sorted(
             riders_efficiency,
-            key=lambda r: self.get_rider_priority_score(r),
-            reverse=True
+            key=lambda r: (-self.get_rider_priority_score(r), r.rider_id)
         )
     
+    def update_rider_priority(self, efficiency: RiderEfficiency, available: Optional[bool] = None) -> float:
+        """Re-rank a rider after their points or bonus eligibility change (O(log n))"""
+        score = self.get_rider_priority_score(efficiency)
+        self.queue.upsert(efficiency.rider_id, score, available)
+        return score
+    
+    def set_rider_available(self, rider_id: str, available: bool):
+        """Mark a rider free for (or busy with) orders, ranking riders seen for the first time"""
+        if not self.queue.set_available(rider_id, available):
+            self.update_rider_priority(self.get_rider_efficiency(rider_id), available)
+    
+    def refresh_scores(self, now: Optional[datetime] = None, force: bool = False) -> int:
+        """
+        Re-rank every queued rider once the efficiency windows have moved on
+        
+        Actions age out of the windows at midnight (UTC), which changes scores
+        without any new action, so this is a no-op until the day changes
+        (or force, e.g. after the points settings change).
+        
+        Returns:
+            Number of riders re-ranked
+        """
+        now = now or datetime.utcnow()
+        if not force and now.date() == self._scored_day:
+            return 0
+        self._scored_day = now.date()
+        rider_ids = self.queue.rider_ids()
+        for rider_id in rider_ids:
+            self.update_rider_priority(self.get_rider_efficiency(rider_id, now=now))
+        return len(rider_ids)
+    
+    def remove_rider(self, rider_id: str):
+        self.queue.remove(rider_id)
+    
+    def select_riders(self, count: int = 1, exclude: Optional[Callable[[str], bool]] = None) -> List[dict]:
+        """
+        Best available riders for an order, best first
+        
+        Args:
+            count: How many riders to return
+            exclude: Optional predicate for riders to skip (e.g. already offered this order)
+        """
+        accept = None if exclude is None else (lambda rider_id: not exclude(rider_id))
+        return [
+            {"rider_id": rider_id, "priority_score": score}
+            for rider_id, score in self.queue.top(count, accept)
+        ]
+    
+    async def ensure_indexes(self, db):
+        await db.rider_actions.create_index([("rider_id", 1), ("timestamp", -1)])
+        await db.rider_actions.create_index("timestamp")
+    
+    async def load_from_database(self, db) -> int:
+        """
+        Rebuild the efficiency counters and rank every active rider (used once at startup)
+        
+        Riders with a delivery in progress start busy.
+        """
+        await self.ensure_indexes(db)
+        self.efficiency.clear()
+        since = datetime.utcnow() - timedelta(days=self.efficiency.horizon)
+        async for action in db.rider_actions.find(
+            {"timestamp": {"$gte": since}},
+            {"rider_id": 1, "action": 1, "penalty_applied": 1, "timestamp": 1}
+        ):
+            self.efficiency.record(action["rider_id"], action["action"], action.get("penalty_applied", False), action["timestamp"])
+        
+        busy = set(await db.deliveries.distinct("rider_id", {"status": "accepted"}))
+        loaded = 0
+        async for rider in db.users.find({"role": "Rider", "is_active": True}, {"_id": 1}):
+            rider_id = str(rider["_id"])
+            self.update_rider_priority(self.get_rider_efficiency(rider_id), rider_id not in busy)
+            loaded += 1
+        self._scored_day = datetime.utcnow().date()
+        return loaded
+    
+    def get_queue_status(self, top: int = 10) -> dict:
+        self.refresh_scores()
+        return {**self.queue.get_stats(), "top": self.select_riders(top)}
+    
     def get_priority_settings(self) -> PrioritySettings:
         """Get current priority settings"""
         return self.settings
@@ -86,4 +235,5 @@ class PriorityService:
     def update_priority_settings(self, new_settings: PrioritySettings) -> PrioritySettings:
         """Update priority settings"""
         self.settings = new_settings
+        self.refresh_scores(force=True)
         return self.settings
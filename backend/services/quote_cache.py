@@ -0,0 +1,104 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+from services.single_flight import SingleFlight
+
+# Quote cells are 0.001 degrees (~110m north-south, ~70m east-west here)
+QUOTE_CELL_DEGREES = 0.001
+
+
+def quantize_point(lat: float, lng: float, cell_degrees: float = QUOTE_CELL_DEGREES) -> Tuple[int, int]:
+    """Grid cell of a (lat, lng) point"""
+    return (math.floor(lat / cell_degrees), math.floor(lng / cell_degrees))
+
+
+def cell_center(cell: Tuple[int, int], cell_degrees: float = QUOTE_CELL_DEGREES) -> Tuple[float, float]:
+    """(lat, lng) at the centre of a cell"""
+    return ((cell[0] + 0.5) * cell_degrees, (cell[1] + 0.5) * cell_degrees)
+
+
+class QuoteCache:
+    """
+    LRU cache of customer quotes keyed by (pickup cell, drop-off cell, peak,
+    weather, pricing version).
+
+    Quotes are computed from the cell centres, so every request in the same
+    cells gets the same price whichever arrived first. The pricing version is
+    part of the key and a new version clears the cache, so settings changes
+    take effect on the next quote. Concurrent misses for the same key are
+    coalesced, so each quote is computed once. Values are shared between
+    callers and must not be mutated (PaymentService hands out copies).
+    """
+
+    def __init__(self, max_entries: int = None):
+        if max_entries is None:
+            max_entries = int(os.getenv("QUOTE_CACHE_SIZE", "50000"))
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._version = None
+        self._flight = SingleFlight()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get_or_compute(self, key: Hashable, version: int, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Return (value, cached) for key under a pricing version
+
+        compute runs outside the cache lock (other keys are not held up), but
+        only once per key: callers that miss while it runs wait for its value.
+        """
+        full_key = (version, key)
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self._entries.clear()
+                    self.stats["invalidations"] += 1
+                self._version = version
+            value = self._lookup(full_key)
+            if value is not None:
+                return value, True
+        return self._flight.do(full_key, self._fill, full_key, version, compute)
+
+    def _lookup(self, full_key: Hashable) -> Any:
+        value = self._entries.get(full_key)
+        if value is not None:
+            self._entries.move_to_end(full_key)
+            self.stats["hits"] += 1
+        return value
+
+    def _fill(self, full_key: Hashable, version: int, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        with self._lock:
+            # Stored by a flight that finished after our lookup
+            value = self._lookup(full_key)
+            if value is not None:
+                return value, True
+            self.stats["misses"] += 1
+
+        value = compute()
+
+        with self._lock:
+            if version == self._version and full_key not in self._entries:
+                self._entries[full_key] = value
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.stats["evictions"] += 1
+        return value, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.stats["invalidations"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "coalesced": self._flight.get_stats()["calls_saved"],
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "pricing_version": self._version,
+                "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,119 @@
+import time
+import inspect
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class ServiceRegistry:
+    """
+    Lazily constructed service singletons.
+
+    Services are registered with a factory and built on first use (or when the
+    app lifespan warms them), so a missing SDK or API key only affects the
+    endpoints that use that service. Construction time is recorded per
+    service. shutdown() closes the built services and drops them, so a later
+    use (a restarted lifespan, a test) builds a fresh instance.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._init_seconds: Dict[str, float] = {}
+        self._errors: Dict[str, str] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        with self._lock:
+            self._factories[name] = factory
+
+    def lazy(self, name: str, factory: Callable[[], Any]) -> "LazyService":
+        """Register a factory and return a proxy that builds the service on first use"""
+        self.register(name, factory)
+        return LazyService(self, name)
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                started_at = time.perf_counter()
+                try:
+                    instance = self._factories[name]()
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    raise
+                self._init_seconds[name] = time.perf_counter() - started_at
+                self._errors.pop(name, None)
+                self._instances[name] = instance
+        return instance
+
+    def is_initialized(self, name: str) -> bool:
+        return name in self._instances
+
+    def warm(self, names: Optional[Iterable[str]] = None) -> Dict[str, Optional[str]]:
+        """Build services ahead of first use; returns an error message per failed service"""
+        results = {}
+        for name in (names if names is not None else list(self._factories)):
+            try:
+                self.get(name)
+                results[name] = None
+            except Exception as e:
+                print(f"Error initializing service {name}: {e}")
+                results[name] = str(e)
+        return results
+
+    async def shutdown(self):
+        """Close every built service that exposes close(), newest first, and forget them"""
+        with self._lock:
+            instances = list(self._instances.items())
+            self._instances.clear()
+            self._init_seconds.clear()
+        # Services built later may depend on earlier ones, so they are closed first
+        for name, instance in reversed(instances):
+            close = getattr(instance, "close", None)
+            if close is None:
+                continue
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"Error closing service {name}: {e}")
+
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        """Initialization state and time per registered service"""
+        return {
+            name: {
+                "initialized": name in self._instances,
+                "init_time_ms": round(self._init_seconds[name] * 1000, 2) if name in self._init_seconds else None,
+                "error": self._errors.get(name)
+            }
+            for name in self._factories
+        }
+
+
+class LazyService:
+    """Module-level stand-in for a service that is built on first attribute access"""
+
+    __slots__ = ("_registry", "_name")
+
+    def __init__(self, registry: ServiceRegistry, name: str):
+        object.__setattr__(self, "_registry", registry)
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, attribute: str) -> Any:
+        return getattr(self._registry.get(self._name), attribute)
+
+    def __setattr__(self, attribute: str, value: Any):
+        setattr(self._registry.get(self._name), attribute, value)
+
+    def __repr__(self) -> str:
+        state = "initialized" if self._registry.is_initialized(self._name) else "lazy"
+        return f"<LazyService {self._name} ({state})>"
+
+
+# Shared registry for the application's service singletons
+service_registry = ServiceRegistry()
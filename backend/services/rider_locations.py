@@ -0,0 +1,33 @@
+from datetime import datetime
+from typing import Optional
+from bson import ObjectId
+
+
+async def record_rider_location(db, rider_id: str, lat: float, lng: float, when: Optional[datetime] = None) -> bool:
+    """
+    Store a rider's latest position as users.current_location
+
+    The dispatch engine and the admin map read it from there. An update older
+    than the stored one is ignored, so late socket messages cannot move a
+    rider backwards.
+
+    Returns:
+        False if the rider does not exist or the update was out of date
+    """
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError(f"Invalid coordinates: {lat}, {lng}")
+    if not ObjectId.is_valid(rider_id):
+        return False
+    when = when or datetime.utcnow()
+    result = await db.users.update_one(
+        {
+            "_id": ObjectId(rider_id),
+            "role": "Rider",
+            "$or": [
+                {"current_location.updated_at": {"$lt": when}},
+                {"current_location.updated_at": None}
+            ]
+        },
+        {"$set": {"current_location": {"lat": lat, "lng": lng, "updated_at": when}}}
+    )
+    return result.modified_count > 0
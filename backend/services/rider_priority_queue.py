@@ -0,0 +1,178 @@
+import threading
+from heapq import heappop, heappush
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Heap entry: (-score, queued_seq, rider_id); smaller sorts first
+Entry = Tuple[float, int, str]
+
+
+class RiderPriorityQueue:
+    """
+    Indexed max-heap of available riders by priority score.
+
+    Each rider's heap position is tracked, so a score change or an
+    availability change is one O(log n) sift instead of a full sort. Ties
+    are broken by when the rider joined the queue (longest waiting first),
+    then by rider id, so the order is reproducible for the same sequence of
+    events. Unavailable riders are parked outside the heap with their score
+    and rejoin at the back of their score band.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heap: List[Entry] = []
+        self._positions: Dict[str, int] = {}
+        self._parked: Dict[str, float] = {}
+        self._sequence = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __contains__(self, rider_id: str) -> bool:
+        return rider_id in self._positions or rider_id in self._parked
+
+    def upsert(self, rider_id: str, score: float, available: Optional[bool] = None):
+        """
+        Set a rider's score (and optionally availability)
+
+        New riders are available unless available=False; for known riders
+        available=None keeps the current availability.
+        """
+        with self._lock:
+            position = self._positions.get(rider_id)
+            if available is None:
+                available = rider_id not in self._parked
+            if position is not None:
+                if not available:
+                    self._remove_at(position)
+                    self._parked[rider_id] = score
+                    return
+                _, queued, _ = self._heap[position]
+                self._heap[position] = (-score, queued, rider_id)
+                self._restore(position)
+            elif available:
+                self._parked.pop(rider_id, None)
+                self._push(rider_id, score)
+            else:
+                self._parked[rider_id] = score
+
+    def set_available(self, rider_id: str, available: bool) -> bool:
+        """Move a known rider in or out of the heap; False if the rider is unknown"""
+        with self._lock:
+            position = self._positions.get(rider_id)
+            if available:
+                if position is not None:
+                    return True
+                if rider_id not in self._parked:
+                    return False
+                self._push(rider_id, self._parked.pop(rider_id))
+                return True
+            if position is not None:
+                self._parked[rider_id] = -self._remove_at(position)[0]
+                return True
+            return rider_id in self._parked
+
+    def remove(self, rider_id: str):
+        with self._lock:
+            position = self._positions.get(rider_id)
+            if position is not None:
+                self._remove_at(position)
+            self._parked.pop(rider_id, None)
+
+    def rider_ids(self) -> List[str]:
+        """Every ranked rider, available or not"""
+        with self._lock:
+            return list(self._positions) + list(self._parked)
+
+    def is_available(self, rider_id: str) -> bool:
+        return rider_id in self._positions
+
+    def score(self, rider_id: str) -> Optional[float]:
+        with self._lock:
+            position = self._positions.get(rider_id)
+            if position is not None:
+                return -self._heap[position][0]
+            return self._parked.get(rider_id)
+
+    def top(self, k: int, accept: Optional[Callable[[str], bool]] = None) -> List[Tuple[str, float]]:
+        """
+        The k best available riders, best first, as (rider_id, score)
+
+        Walks the heap best-first with a small frontier instead of popping,
+        so the heap is left untouched: O(m log m) for m riders visited, which
+        is k plus any rejected by accept.
+        """
+        selected: List[Tuple[str, float]] = []
+        with self._lock:
+            heap = self._heap
+            if k <= 0 or not heap:
+                return selected
+            frontier = [(heap[0], 0)]
+            while frontier and len(selected) < k:
+                entry, position = heappop(frontier)
+                rider_id = entry[2]
+                if accept is None or accept(rider_id):
+                    selected.append((rider_id, -entry[0]))
+                for child in (2 * position + 1, 2 * position + 2):
+                    if child < len(heap):
+                        heappush(frontier, (heap[child], child))
+        return selected
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"available": len(self._heap), "unavailable": len(self._parked)}
+
+    def _push(self, rider_id: str, score: float):
+        self._sequence += 1
+        self._heap.append((-score, self._sequence, rider_id))
+        self._positions[rider_id] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def _remove_at(self, position: int) -> Entry:
+        heap = self._heap
+        entry = heap[position]
+        del self._positions[entry[2]]
+        last = heap.pop()
+        if position < len(heap):
+            heap[position] = last
+            self._positions[last[2]] = position
+            self._restore(position)
+        return entry
+
+    def _restore(self, position: int):
+        if position > 0 and self._heap[position] < self._heap[(position - 1) // 2]:
+            self._sift_up(position)
+        else:
+            self._sift_down(position)
+
+    def _sift_up(self, position: int):
+        heap, positions = self._heap, self._positions
+        entry = heap[position]
+        while position > 0:
+            parent = (position - 1) // 2
+            if not entry < heap[parent]:
+                break
+            heap[position] = heap[parent]
+            positions[heap[position][2]] = position
+            position = parent
+        heap[position] = entry
+        positions[entry[2]] = position
+
+    def _sift_down(self, position: int):
+        heap, positions = self._heap, self._positions
+        size = len(heap)
+        entry = heap[position]
+        while True:
+            child = 2 * position + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if not heap[child] < entry:
+                break
+            heap[position] = heap[child]
+            positions[heap[position][2]] = position
+            position = child
+        heap[position] = entry
+        positions[entry[2]] = position
+
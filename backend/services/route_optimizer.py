@@ -0,0 +1,240 @@
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from services.geo_utils import haversine_km
+
+# Straight-line to road distance factor for Bournemouth streets
+ROAD_DISTANCE_FACTOR = 1.3
+
+# Matches PaymentService.estimate_delivery_time (2 minutes per km)
+MINUTES_PER_KM = 2.0
+
+
+def build_distance_matrix(
+    points: Sequence[Tuple[float, float]],
+    road_factor: float = ROAD_DISTANCE_FACTOR
+) -> List[List[float]]:
+    """Symmetric road-distance estimate (km) between every pair of (lat, lng) points"""
+    size = len(points)
+    matrix = [[0.0] * size for _ in range(size)]
+    for i in range(size):
+        lat1, lng1 = points[i]
+        for j in range(i + 1, size):
+            distance = haversine_km(lat1, lng1, points[j][0], points[j][1]) * road_factor
+            matrix[i][j] = distance
+            matrix[j][i] = distance
+    return matrix
+
+
+class RouteOptimizer:
+    """
+    In-process multi-stop sequencing for pickups and drop-offs.
+
+    Builds an open path from a fixed start (optionally ending at a fixed stop)
+    with a precedence-aware nearest-neighbour seed, then improves it with 2-opt
+    and Or-opt moves until no move helps or the time limit is reached. Every
+    (pickup, dropoff) precedence pair is kept in order throughout.
+    """
+
+    def __init__(
+        self,
+        matrix: Sequence[Sequence[float]],
+        start: int = 0,
+        end: Optional[int] = None,
+        precedence: Iterable[Tuple[int, int]] = (),
+        time_limit_seconds: float = 0.05
+    ):
+        self.matrix = matrix
+        self.size = len(matrix)
+        self.start = start
+        self.end = end
+        self.precedence = [(before, after) for before, after in precedence]
+        self.time_limit_seconds = time_limit_seconds
+        self._validate()
+        self.symmetric = all(
+            matrix[i][j] == matrix[j][i]
+            for i in range(self.size) for j in range(i + 1, self.size)
+        )
+
+        self._predecessors: Dict[int, List[int]] = {}
+        for before, after in self.precedence:
+            self._predecessors.setdefault(after, []).append(before)
+
+    def _validate(self):
+        """Reject stop indexes and precedence pairs that cannot be honoured"""
+        for name, node in (("start", self.start), ("end", self.end)):
+            if node is not None and not 0 <= node < self.size:
+                raise ValueError(f"{name} index {node} is out of range for {self.size} stops")
+        if self.end is not None and self.end == self.start and self.size > 1:
+            raise ValueError("start and end must be different stops")
+        for before, after in self.precedence:
+            if not (0 <= before < self.size and 0 <= after < self.size):
+                raise ValueError(f"Precedence pair ({before}, {after}) is out of range for {self.size} stops")
+            if before == after:
+                raise ValueError(f"Precedence pair ({before}, {after}) refers to one stop")
+            if after == self.start or before == self.end:
+                raise ValueError(f"Precedence pair ({before}, {after}) conflicts with the fixed start or end")
+
+    def cost(self, route: Sequence[int]) -> float:
+        matrix = self.matrix
+        return sum(matrix[route[i]][route[i + 1]] for i in range(len(route) - 1))
+
+    def is_feasible(self, route: Sequence[int]) -> bool:
+        position = {node: index for index, node in enumerate(route)}
+        return all(position[before] < position[after] for before, after in self.precedence)
+
+    def solve(self) -> List[int]:
+        """Return the visiting order as a list of node indexes"""
+        if self.size <= 2:
+            route = [self.start] + [node for node in range(self.size) if node != self.start]
+            return route
+
+        deadline = time.perf_counter() + self.time_limit_seconds
+        route = self._nearest_neighbour()
+
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = self._two_opt(route, deadline)
+            improved = self._or_opt(route, deadline) or improved
+        return route
+
+    def _nearest_neighbour(self) -> List[int]:
+        matrix = self.matrix
+        remaining = set(range(self.size))
+        remaining.discard(self.start)
+        if self.end is not None:
+            remaining.discard(self.end)
+
+        visited = {self.start}
+        route = [self.start]
+        current = self.start
+        while remaining:
+            best_node, best_distance = None, None
+            for node in remaining:
+                if any(before not in visited for before in self._predecessors.get(node, ())):
+                    continue
+                distance = matrix[current][node]
+                if best_distance is None or distance < best_distance:
+                    best_node, best_distance = node, distance
+            if best_node is None:
+                raise ValueError("Precedence constraints contain a cycle")
+            route.append(best_node)
+            visited.add(best_node)
+            remaining.discard(best_node)
+            current = best_node
+
+        if self.end is not None:
+            route.append(self.end)
+        return route
+
+    def _last_movable(self, route: List[int]) -> int:
+        """Index of the last stop that may move (the fixed end stays put)"""
+        return len(route) - 2 if self.end is not None else len(route) - 1
+
+    def _reversal_breaks_precedence(self, route: List[int], i: int, j: int) -> bool:
+        if not self.precedence:
+            return False
+        inside = set(route[i:j + 1])
+        return any(before in inside and after in inside for before, after in self.precedence)
+
+    def _two_opt(self, route: List[int], deadline: float) -> bool:
+        """Reverse route[i..j] while it shortens the path"""
+        matrix = self.matrix
+        last = self._last_movable(route)
+        improved_any = False
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for i in range(1, last):
+                a, b = route[i - 1], route[i]
+                for j in range(i + 1, last + 1):
+                    c = route[j]
+                    d = route[j + 1] if j + 1 < len(route) else None
+                    before = matrix[a][b] + (matrix[c][d] if d is not None else 0.0)
+                    after = matrix[a][c] + (matrix[b][d] if d is not None else 0.0)
+                    if not self.symmetric:
+                        before += self.cost(route[i:j + 1])
+                        after += self.cost(route[j:i - 1:-1])
+                    if after < before - 1e-9 and not self._reversal_breaks_precedence(route, i, j):
+                        route[i:j + 1] = reversed(route[i:j + 1])
+                        improved = improved_any = True
+                        b = route[i]
+        return improved_any
+
+    def _or_opt(self, route: List[int], deadline: float) -> bool:
+        """Move segments of 1-3 consecutive stops to a cheaper position"""
+        matrix = self.matrix
+        improved_any = False
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            last = self._last_movable(route)
+            for length in (1, 2, 3):
+                for i in range(1, last - length + 2):
+                    j = i + length - 1
+                    prev_node = route[i - 1]
+                    next_node = route[j + 1] if j + 1 < len(route) else None
+                    first, tail = route[i], route[j]
+                    removal_gain = matrix[prev_node][first] + (
+                        matrix[tail][next_node] - matrix[prev_node][next_node] if next_node is not None else 0.0
+                    )
+
+                    segment = route[i:j + 1]
+                    rest = route[:i] + route[j + 1:]
+                    rest_last = len(rest) - 2 if self.end is not None else len(rest) - 1
+                    best_gain, best_position = 1e-9, None
+                    for k in range(0, rest_last + 1):
+                        if k == i - 1:
+                            continue
+                        left = rest[k]
+                        right = rest[k + 1] if k + 1 < len(rest) else None
+                        insertion_cost = matrix[left][first] + (
+                            matrix[tail][right] - matrix[left][right] if right is not None else 0.0
+                        )
+                        gain = removal_gain - insertion_cost
+                        if gain > best_gain:
+                            candidate = rest[:k + 1] + segment + rest[k + 1:]
+                            if self.is_feasible(candidate):
+                                best_gain, best_position = gain, k
+                    if best_position is not None:
+                        route[:] = rest[:best_position + 1] + segment + rest[best_position + 1:]
+                        improved = improved_any = True
+                        break
+                if improved or time.perf_counter() >= deadline:
+                    break
+        return improved_any
+
+
+def optimize_stop_sequence(
+    points: Sequence[Tuple[float, float]],
+    start: int = 0,
+    end: Optional[int] = None,
+    precedence: Iterable[Tuple[int, int]] = (),
+    matrix: Optional[Sequence[Sequence[float]]] = None,
+    time_limit_seconds: float = 0.05
+) -> Dict[str, any]:
+    """
+    Sequence stops locally without calling Google
+
+    Args:
+        points: (lat, lng) tuples, one per stop
+        start: Index of the fixed starting stop
+        end: Index of a fixed final stop (optional)
+        precedence: (pickup_index, dropoff_index) pairs that must stay in order
+        matrix: Precomputed distance matrix in km (defaults to a haversine estimate)
+        time_limit_seconds: Improvement time budget
+
+    Returns:
+        Dictionary with the visiting order, distance and estimated duration
+    """
+    if matrix is None:
+        matrix = build_distance_matrix(points)
+
+    optimizer = RouteOptimizer(matrix, start=start, end=end, precedence=precedence,
+                               time_limit_seconds=time_limit_seconds)
+    order = optimizer.solve()
+    distance_km = optimizer.cost(order)
+    return {
+        "order": order,
+        "total_distance_km": round(distance_km, 2),
+        "total_duration_minutes": round(distance_km * MINUTES_PER_KM, 1)
+    }
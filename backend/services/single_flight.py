@@ -0,0 +1,125 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _FlightStats:
+    """Counters shared by the sync and async single-flight groups"""
+
+    def __init__(self):
+        self.calls = 0
+        self.executions = 0
+        self.shared = 0
+        self.errors = 0
+
+    def as_dict(self, in_flight: int) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "calls_saved": self.shared,
+            "errors": self.errors,
+            "in_flight": in_flight,
+            "saved_ratio": round(self.shared / self.calls, 4) if self.calls else 0.0
+        }
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls made from multiple threads.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait for and share its result (or exception). Nothing is cached
+    once the call completes. Callers block, so this is for code running in
+    worker threads (the Maps service is called through run_in_threadpool),
+    never on the event loop itself.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._stats = _FlightStats()
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            self._stats.calls += 1
+            future = self._inflight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._inflight[key] = future
+                self._stats.executions += 1
+            else:
+                self._stats.shared += 1
+
+        if not is_owner:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                self._stats.errors += 1
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(result)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._stats.as_dict(len(self._inflight))
+
+
+class AsyncSingleFlight:
+    """
+    Coalesce concurrent identical coroutine calls within one event loop.
+
+    The call runs in its own task rather than in the first caller, and every
+    caller (the first included) awaits it through asyncio.shield, so a
+    cancelled caller only stops waiting; the others still get the result.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._stats = _FlightStats()
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        self._stats.calls += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self._stats.shared += 1
+        else:
+            task = asyncio.create_task(fn(*args, **kwargs))
+            self._inflight[key] = task
+            self._stats.executions += 1
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            # Calling exception() also marks it retrieved, so a failure nobody awaited is not logged
+            self._stats.errors += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return self._stats.as_dict(len(self._inflight))
+
+
+def coordinate_key(*points, precision: int = 5) -> tuple:
+    """Hashable key for (lat, lng) arguments, rounded to ~1m"""
+    key = []
+    for point in points:
+        if isinstance(point, (list, tuple)):
+            key.append(tuple(round(float(value), precision) for value in point))
+        elif isinstance(point, dict):
+            key.append(tuple(round(float(point[name]), precision) for name in ("lat", "lng")))
+        else:
+            key.append(point)
+    return tuple(key)
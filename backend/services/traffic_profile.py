@@ -0,0 +1,231 @@
+import os
+import json
+import math
+import random
+import threading
+from array import array
+from typing import Callable, Dict, Optional, Tuple
+from datetime import datetime
+from services.geo_utils import point_distance_km
+
+BUCKET_MINUTES = 15
+BUCKETS_PER_WEEK = 7 * 24 * 60 // BUCKET_MINUTES  # 672
+
+# Per-bucket layout in the corridor arrays: sample count, mean ratio, variance,
+# mean squared relative error of the prediction each observation was made against
+_FIELDS = 4
+
+OUTSIDE_ZONES = "other"
+
+
+def time_of_week_bucket(when: datetime) -> int:
+    """15-minute bucket index within the week (Monday 00:00 = 0)"""
+    return (when.weekday() * 24 * 60 + when.hour * 60 + when.minute) // BUCKET_MINUTES
+
+
+class TrafficProfile:
+    """
+    Rolling traffic statistics per corridor (zone pair) and time-of-week bucket.
+
+    Each observation stores the ratio of traffic duration to free-flow duration
+    as an exponentially weighted mean and variance, so the profile tracks
+    changes without keeping history. A per-corridor free-flow pace (seconds
+    per straight-line km) lets the profile predict ETAs for unseen trips.
+
+    Confidence comes from how far observations have actually landed from
+    the bucket's prediction (an exponentially weighted residual), not from
+    the standard error of the mean. Callers still send refresh_rate of
+    confident lookups live so the buckets keep seeing current traffic.
+    """
+
+    def __init__(
+        self,
+        locate_zone: Callable[[float, float], Optional[str]],
+        alpha: float = 0.2,
+        min_samples: int = 5,
+        max_relative_error: float = 0.1,
+        refresh_rate: float = 0.05,
+        profile_file: Optional[str] = None,
+        save_every: int = 50
+    ):
+        self.locate_zone = locate_zone
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.max_relative_error = max_relative_error
+        self.refresh_rate = refresh_rate
+        self.random = random.Random()
+        self.profile_file = profile_file if profile_file is not None else os.getenv("TRAFFIC_PROFILE_FILE")
+        self.save_every = save_every
+
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, array] = {}
+        self._pace: Dict[str, Tuple[int, float]] = {}  # corridor -> (samples, seconds per km)
+        self._unsaved = 0
+        self.stats = {"observations": 0, "predictions": 0, "confident_predictions": 0, "refreshes": 0}
+
+        if self.profile_file and os.path.exists(self.profile_file):
+            self.load(self.profile_file)
+
+    def corridor(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> str:
+        """Corridor key for a trip, e.g. 'Winton Area>Bournemouth Town Centre'"""
+        origin_zone = self.locate_zone(origin[0], origin[1]) or OUTSIDE_ZONES
+        destination_zone = self.locate_zone(destination[0], destination[1]) or OUTSIDE_ZONES
+        return f"{origin_zone}>{destination_zone}"
+
+    def record(
+        self,
+        origin: Tuple[float, float],
+        destination: Tuple[float, float],
+        normal_seconds: float,
+        traffic_seconds: float,
+        when: Optional[datetime] = None
+    ):
+        """
+        Record an observed trip
+
+        Args:
+            origin: (lat, lng) tuple for starting point
+            destination: (lat, lng) tuple for destination
+            normal_seconds: Free-flow duration reported by Google
+            traffic_seconds: Duration in traffic reported by Google
+            when: Time of the observation (defaults to now)
+        """
+        if normal_seconds <= 0:
+            return
+        if when is None:
+            when = datetime.now()
+
+        corridor = self.corridor(origin, destination)
+        offset = time_of_week_bucket(when) * _FIELDS
+        ratio = traffic_seconds / normal_seconds
+        distance_km = point_distance_km(origin, destination)
+
+        with self._lock:
+            buckets = self._buckets.get(corridor)
+            if buckets is None:
+                buckets = array("d", bytes(8 * BUCKETS_PER_WEEK * _FIELDS))
+                self._buckets[corridor] = buckets
+
+            samples, mean, variance, residual = buckets[offset:offset + _FIELDS]
+            if samples == 0:
+                mean, variance = ratio, 0.0
+            else:
+                # Score the prediction this observation would have received before learning from it
+                error = ((ratio - mean) / mean) ** 2 if mean > 0 else 1.0
+                residual = error if samples == 1 else residual + self.alpha * (error - residual)
+                # Exponentially weighted mean and variance
+                delta = ratio - mean
+                mean += self.alpha * delta
+                variance = (1 - self.alpha) * (variance + self.alpha * delta * delta)
+            buckets[offset:offset + _FIELDS] = array("d", (samples + 1, mean, variance, residual))
+
+            if distance_km > 0.05:
+                pace_samples, pace = self._pace.get(corridor, (0, 0.0))
+                pace_value = normal_seconds / distance_km
+                if pace_samples == 0:
+                    pace = pace_value
+                else:
+                    pace += self.alpha * (pace_value - pace)
+                self._pace[corridor] = (pace_samples + 1, pace)
+
+            self.stats["observations"] += 1
+            self._unsaved += 1
+            should_save = self.profile_file and self._unsaved >= self.save_every
+
+        if should_save:
+            self.save(self.profile_file)
+
+    def predict(
+        self,
+        origin: Tuple[float, float],
+        destination: Tuple[float, float],
+        when: Optional[datetime] = None
+    ) -> Optional[Dict[str, any]]:
+        """
+        Predict traffic-adjusted travel time from the profile
+
+        Returns:
+            Prediction with a 'confident' flag, or None if the corridor is unknown
+        """
+        if when is None:
+            when = datetime.now()
+
+        corridor = self.corridor(origin, destination)
+        offset = time_of_week_bucket(when) * _FIELDS
+
+        with self._lock:
+            self.stats["predictions"] += 1
+            buckets = self._buckets.get(corridor)
+            pace = self._pace.get(corridor)
+            if buckets is None or pace is None or buckets[offset] == 0:
+                return None
+            samples, mean, _, residual = buckets[offset:offset + _FIELDS]
+            # Typical relative miss of this bucket's predictions; needs a few scored observations first
+            relative_error = math.sqrt(residual) if samples > 1 else float("inf")
+            confident = samples >= self.min_samples and relative_error <= self.max_relative_error
+            if confident:
+                self.stats["confident_predictions"] += 1
+
+        normal_seconds = pace[1] * point_distance_km(origin, destination)
+        traffic_seconds = normal_seconds * mean
+        return {
+            "corridor": corridor,
+            "normal_seconds": normal_seconds,
+            "traffic_seconds": traffic_seconds,
+            "delay_ratio": mean,
+            "samples": int(samples),
+            "relative_error": relative_error,
+            "confident": confident
+        }
+
+    def should_refresh(self) -> bool:
+        """Whether to check a confident prediction against a live lookup anyway"""
+        if self.random.random() >= self.refresh_rate:
+            return False
+        with self._lock:
+            self.stats["refreshes"] += 1
+        return True
+
+    def save(self, path: str):
+        """Write the profile to a JSON file"""
+        with self._lock:
+            data = {
+                "bucket_minutes": BUCKET_MINUTES,
+                "buckets": {corridor: list(values) for corridor, values in self._buckets.items()},
+                "pace": {corridor: list(pace) for corridor, pace in self._pace.items()}
+            }
+            self._unsaved = 0
+        try:
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as profile_file:
+                json.dump(data, profile_file)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Error saving traffic profile to {path}: {e}")
+
+    def load(self, path: str):
+        """Load a profile previously written by save()"""
+        try:
+            with open(path, "r", encoding="utf-8") as profile_file:
+                data = json.load(profile_file)
+            if data.get("bucket_minutes") != BUCKET_MINUTES:
+                return
+            buckets = {
+                corridor: array("d", values)
+                for corridor, values in data.get("buckets", {}).items()
+                if len(values) == BUCKETS_PER_WEEK * _FIELDS
+            }
+            pace = {corridor: (int(value[0]), float(value[1])) for corridor, value in data.get("pace", {}).items()}
+            with self._lock:
+                self._buckets = buckets
+                self._pace = pace
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Error loading traffic profile from {path}: {e}")
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get profile statistics"""
+        with self._lock:
+            return {
+                **self.stats,
+                "corridors": len(self._buckets)
+            }
@@ -2,14 +2,15 @@ import asyncio
 import json
 from typing import Dict, List, Optional, Any
 from datetime import datetime
-import socketio
 from fastapi import WebSocket
 from models.user import User
 from models.order import Order
 from models.delivery import RiderEfficiency
+from services.registry import service_registry
 
 class WebSocketService:
     def __init__(self):
+        import socketio
         self.sio = socketio.AsyncServer(
             async_mode='asgi',
             cors_allowed_origins=['http://localhost:3000'],
@@ -74,8 +75,15 @@ class WebSocketService:
                     'timestamp': timestamp
                 })
                 
-                # Store location in memory (in production, save to database)
-                print(f"Rider {rider_id} location updated: {location}")
+                # Stored on the rider for dispatch and the admin map
+                try:
+                    from database.connection import get_database
+                    from services.rider_locations import record_rider_location
+                    await record_rider_location(
+                        await get_database(), rider_id, float(location['lat']), float(location['lng'])
+                    )
+                except (KeyError, TypeError, ValueError) as e:
+                    print(f"Invalid location from rider {rider_id}: {e}")
         
         @self.sio.event
         async def order_status_update(sid, data):
@@ -171,5 +179,5 @@ class WebSocketService:
         """Check if a specific rider is online"""
         return rider_id in self.rider_connections
 
-# Create global instance
-websocket_service = WebSocketService()
+# Global instance, built on first use
+websocket_service = service_registry.lazy("websocket", WebSocketService)
@@ -0,0 +1,10 @@
+import os
+import sys
+
+import dotenv
+
+# Tests import the backend packages (services, models) the way main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep tests independent of whatever is in the developer's .env
+dotenv.load_dotenv = lambda *args, **kwargs: False
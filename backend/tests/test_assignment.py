@@ -0,0 +1,67 @@
+import itertools
+import time
+
+import numpy as np
+import pytest
+
+from services.assignment import FORBIDDEN_COST, solve_assignment
+
+
+def brute_force(rows, columns, costs):
+    """(matched count, total cost) of the best matching by exhaustive search"""
+    for size in range(min(rows, columns), 0, -1):
+        found = None
+        for chosen_rows in itertools.combinations(range(rows), size):
+            for chosen_columns in itertools.permutations(range(columns), size):
+                pairs = list(zip(chosen_rows, chosen_columns))
+                if any(costs[pair] >= FORBIDDEN_COST for pair in pairs):
+                    continue
+                total = sum(costs[pair] for pair in pairs)
+                if found is None or total < found:
+                    found = total
+        if found is not None:
+            return size, found
+    return 0, 0.0
+
+
+def sparse(costs):
+    rows, columns = np.nonzero(costs < FORBIDDEN_COST)
+    return rows, columns, costs[rows, columns]
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    rows, columns = rng.integers(1, 6, size=2)
+    costs = rng.uniform(-5, 20, size=(rows, columns)).round(2)
+    costs[rng.random((rows, columns)) < 0.35] = FORBIDDEN_COST
+
+    pairs, optimal = solve_assignment(rows, columns, *sparse(costs))
+    assert optimal
+    assert len({row for row, _ in pairs}) == len({column for _, column in pairs}) == len(pairs)
+    count, total = brute_force(rows, columns, costs)
+    assert len(pairs) == count
+    assert sum(costs[pair] for pair in pairs) == pytest.approx(total)
+
+
+def test_more_matches_beat_cheaper_ones():
+    # Row 0 alone prefers column 0, but then row 1 could not be matched
+    costs = np.array([[1.0, 50.0], [2.0, FORBIDDEN_COST]])
+    pairs, _ = solve_assignment(2, 2, *sparse(costs))
+    assert sorted(pairs) == [(0, 1), (1, 0)]
+
+
+def test_transposed_problem_reports_original_orientation():
+    costs = np.array([[9.0], [1.0], [5.0]])
+    assert solve_assignment(3, 1, *sparse(costs)) == ([(1, 0)], True)
+
+
+def test_no_candidates():
+    assert solve_assignment(3, 4, [], [], []) == ([], True)
+
+
+def test_passed_deadline_falls_back_to_greedy():
+    costs = np.array([[1.0, 2.0], [1.0, 9.0]])
+    pairs, optimal = solve_assignment(2, 2, *sparse(costs), deadline=time.perf_counter() - 1)
+    assert not optimal
+    assert sorted(pairs) == [(0, 0), (1, 1)]
@@ -0,0 +1,104 @@
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from scripts import backtest_pricing
+from scripts.backtest_pricing import (
+    BASELINE, DIMENSIONS, build_report, chunked, merge, price_chunk, stream_from_file
+)
+from services.money import from_pence, to_pence
+from services.payment_service import PaymentService
+
+START = datetime(2026, 10, 5, 10, 0)
+
+
+@pytest.fixture
+def deliveries():
+    rng = random.Random(39)
+    rows = []
+    for index in range(300):
+        accepted = START + timedelta(minutes=rng.randint(0, 7 * 24 * 60))
+        rows.append({
+            "rider_id": f"rider-{index % 12}",
+            "pickup_lat": 50.72 + rng.uniform(-0.02, 0.02),
+            "pickup_lng": -1.88 + rng.uniform(-0.03, 0.03),
+            "delivery_lat": 50.72 + rng.uniform(-0.03, 0.03),
+            "delivery_lng": -1.88 + rng.uniform(-0.04, 0.04),
+            "estimated_distance": round(rng.uniform(0.5, 9.0), 2) if index % 4 else None,
+            "estimated_time": None,
+            "accepted_at": accepted,
+            "completed_at": accepted + timedelta(minutes=rng.randint(8, 50)),
+            "efficiency_percentage": round(rng.uniform(50, 100), 1),
+            "weather_conditions": rng.choice(["normal", "rain", None])
+        })
+    return rows
+
+
+@pytest.fixture
+def scenarios(monkeypatch):
+    monkeypatch.delenv("PAYMENT_SETTINGS_FILE", raising=False)
+    scenarios = {BASELINE: {}, "higher_base": {"base_delivery_rate": 4.0}}
+    backtest_pricing._init_worker(scenarios)
+    return scenarios
+
+
+def price_all(deliveries, chunk_size):
+    totals = {}
+    for chunk in chunked(deliveries, chunk_size):
+        merge(totals, price_chunk(chunk))
+    return totals
+
+
+def test_baseline_matches_the_payment_service(scenarios, deliveries):
+    service = PaymentService(settings_file="")
+    row = deliveries[1]
+    totals = price_all([row], 10)
+    minutes = int((row["completed_at"] - row["accepted_at"]).total_seconds() // 60)
+    peak = service.is_peak_hour(row["completed_at"])
+    weather = row["weather_conditions"] or "normal"
+    pay = service.calculate_rider_payment(row["estimated_distance"], minutes, row["efficiency_percentage"], 0.0, peak, weather)
+    charge = service.calculate_customer_charge(row["estimated_distance"], minutes, 0.0, peak, weather)
+
+    group = totals[BASELINE]["rider"][row["rider_id"]]
+    assert group[:3] == [1, to_pence(pay.total_payment), to_pence(charge.total_charge)]
+
+
+def test_chunking_does_not_change_the_totals(scenarios, deliveries):
+    one_chunk = price_all(deliveries, len(deliveries))
+    many_chunks = price_all(deliveries, 7)
+    for name in scenarios:
+        for dimension in DIMENSIONS:
+            assert one_chunk[name][dimension].keys() == many_chunks[name][dimension].keys()
+            for key, group in one_chunk[name][dimension].items():
+                assert group[:4] == many_chunks[name][dimension][key][:4]
+                assert list(group[4]) == list(many_chunks[name][dimension][key][4])
+
+
+def test_report_compares_scenarios_with_the_baseline(scenarios, deliveries):
+    report = build_report(price_all(deliveries, 50), scenarios, len(deliveries), 1.0)
+    baseline = report["scenarios"][BASELINE]["summary"]
+    higher = report["scenarios"]["higher_base"]["summary"]
+    assert baseline["deliveries"] == higher["deliveries"] == len(deliveries)
+    assert higher["vs_baseline"]["rider_pay_total"] > 0
+    assert higher["vs_baseline"]["customer_charge_total"] == 0
+    assert sum(group["deliveries"] for group in report["scenarios"][BASELINE]["by_rider"].values()) == len(deliveries)
+    assert baseline["rider_pay_total"] == from_pence(
+        sum(to_pence(group["rider_pay_total"]) for group in report["scenarios"][BASELINE]["by_hour"].values())
+    )
+
+
+def test_rows_without_distance_or_points_are_skipped(scenarios, deliveries):
+    row = {**deliveries[0], "estimated_distance": None, "pickup_lat": None}
+    assert price_chunk(next(chunked([row], 10)))[BASELINE]["rider"] == {}
+
+
+def test_exports_stream_from_json_lines_and_csv(tmp_path, deliveries):
+    jsonl = tmp_path / "deliveries.jsonl"
+    jsonl.write_text("\n".join(json.dumps(row, default=str) for row in deliveries[:3]) + "\n\n")
+    assert [row["rider_id"] for row in stream_from_file(str(jsonl))] == ["rider-0", "rider-1", "rider-2"]
+
+    csv_path = tmp_path / "deliveries.csv"
+    csv_path.write_text("rider_id,estimated_distance\nrider-9,2.5\n")
+    assert list(stream_from_file(str(csv_path))) == [{"rider_id": "rider-9", "estimated_distance": "2.5"}]
@@ -0,0 +1,75 @@
+import random
+
+import numpy as np
+import pytest
+
+from services.batch_pricing import (
+    WEATHER_CODES, encode_weather, price_customer_charges, price_rider_payments, round2
+)
+from services.money import to_pence
+from services.payment_service import PaymentService
+from services.pricing_snapshot import PricingSnapshot
+
+RIDER_FIELDS = (
+    "base_payment", "distance_payment", "time_payment", "efficiency_bonus",
+    "peak_hour_bonus", "weather_bonus", "long_distance_bonus", "total_payment"
+)
+CUSTOMER_FIELDS = (
+    "base_fee", "distance_charge", "time_charge", "peak_hour_surcharge", "weather_surcharge",
+    "long_distance_surcharge", "subtotal", "total_charge", "profit_margin"
+)
+
+
+@pytest.fixture
+def rows():
+    rng = random.Random(34)
+    count = 2000
+    return {
+        "distance": [round(rng.uniform(0.1, 12.0), 2) for _ in range(count)],
+        "minutes": [rng.randint(5, 60) for _ in range(count)],
+        "efficiency": [round(rng.uniform(40, 100), 1) for _ in range(count)],
+        "peak": [rng.random() < 0.4 for _ in range(count)],
+        "weather": [rng.choice(list(WEATHER_CODES)) for _ in range(count)]
+    }
+
+
+def test_round2_matches_python_round_on_half_cases():
+    values = np.array([2.675, 1.005, 0.125, 10.0049999, 3.14159, -1.235])
+    assert round2(values).tolist() == [round(float(value), 2) for value in values]
+
+
+def test_rider_batch_matches_scalar_path(rows):
+    service = PaymentService(settings_file="")
+    batch = price_rider_payments(
+        service.pricing, rows["distance"], rows["minutes"], rows["efficiency"], rows["peak"],
+        encode_weather(rows["weather"])
+    )
+    for index in range(len(rows["distance"])):
+        scalar = service.calculate_rider_payment(
+            rows["distance"][index], rows["minutes"][index], rows["efficiency"][index], 0.0,
+            rows["peak"][index], rows["weather"][index]
+        )
+        for field in RIDER_FIELDS:
+            assert batch[field][index] == to_pence(getattr(scalar, field)), (index, field)
+
+
+def test_customer_batch_matches_scalar_path(rows):
+    service = PaymentService(settings_file="")
+    batch = price_customer_charges(
+        service.pricing, rows["distance"], rows["minutes"], rows["peak"], encode_weather(rows["weather"])
+    )
+    for index in range(len(rows["distance"])):
+        scalar = service.calculate_customer_charge(
+            rows["distance"][index], rows["minutes"][index], 0.0, rows["peak"][index], rows["weather"][index]
+        )
+        for field in CUSTOMER_FIELDS:
+            assert batch[field][index] == to_pence(getattr(scalar, field)), (index, field)
+
+
+def test_mismatched_columns_are_rejected():
+    with pytest.raises(ValueError):
+        price_customer_charges(PricingSnapshot(), [1.0, 2.0], [10], [False, False], [0, 0])
+
+
+def test_unknown_weather_prices_as_normal():
+    assert encode_weather(["hail", "rain"]).tolist() == [0, 1]
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import services.demand_heatmap as heatmap_module
+from services.demand_heatmap import DemandHeatmap
+
+TOWN_CENTRE = (50.7192, -1.8808)
+WINTON = (50.7300, -1.8700)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    class Clock(datetime):
+        now_value = datetime(2026, 10, 19, 18, 0, 30)
+
+        @classmethod
+        def utcnow(cls):
+            return cls.now_value
+
+    monkeypatch.setattr(heatmap_module, "datetime", Clock)
+    return Clock
+
+
+def test_windows_count_pickups_and_dropoffs(clock):
+    heatmap = DemandHeatmap()
+    heatmap.record_order("a", TOWN_CENTRE, WINTON, clock.now_value)
+    heatmap.record_order("b", TOWN_CENTRE, None, clock.now_value - timedelta(minutes=30))
+
+    assert heatmap.get_heatmap("15m", "pickup")["total"] == 1
+    assert heatmap.get_heatmap("1h", "pickup")["total"] == 2
+    assert heatmap.get_heatmap("1h", "all")["total"] == 3
+
+
+def test_repeated_orders_are_counted_once(clock):
+    heatmap = DemandHeatmap()
+    assert heatmap.record_order("a", TOWN_CENTRE, WINTON)
+    assert not heatmap.record_order("a", TOWN_CENTRE, WINTON)
+    assert heatmap.get_stats()["duplicates"] == 1
+
+
+def test_running_windows_expire_as_time_moves(clock):
+    heatmap = DemandHeatmap()
+    heatmap.record_order("a", TOWN_CENTRE, WINTON)
+    clock.now_value += timedelta(minutes=20)
+    assert heatmap.get_heatmap("15m")["total"] == 0
+    assert heatmap.get_heatmap("1h")["total"] == 1
+    clock.now_value += timedelta(hours=1)
+    assert heatmap.get_heatmap("1h")["total"] == 0
+
+
+def test_last_week_window_reads_the_same_hour_a_week_ago(clock):
+    heatmap = DemandHeatmap()
+    heatmap.record_order("old", TOWN_CENTRE, WINTON, clock.now_value - timedelta(days=7, minutes=10))
+    assert heatmap.get_heatmap("last_week", "dropoff")["total"] == 1
+    assert heatmap.get_heatmap("1h")["total"] == 0
+
+
+def test_points_outside_the_grid_are_skipped(clock):
+    heatmap = DemandHeatmap()
+    heatmap.record_order("far", (51.5, -0.12), TOWN_CENTRE)
+    assert heatmap.get_stats()["outside_grid"] == 1
+    assert heatmap.get_heatmap("15m", "all")["total"] == 1
+
+
+def test_record_orders_reads_both_document_formats(clock):
+    heatmap = DemandHeatmap()
+    recorded = heatmap.record_orders([
+        {
+            "external_order_id": "x",
+            "restaurant_address": {"latitude": TOWN_CENTRE[0], "longitude": TOWN_CENTRE[1]},
+            "delivery_address": {"latitude": WINTON[0], "longitude": WINTON[1]},
+            "created_at": clock.now_value
+        },
+        {"_id": "d1", "pickup_lat": WINTON[0], "pickup_lng": WINTON[1], "delivery_lat": None, "delivery_lng": None}
+    ])
+    assert recorded == 2
+    assert heatmap.get_heatmap("15m", "pickup")["total"] == 2
+
+
+def test_unknown_window_is_rejected():
+    with pytest.raises(ValueError):
+        DemandHeatmap().get_heatmap("2h")
@@ -0,0 +1,68 @@
+import json
+import math
+from datetime import datetime
+
+import pytest
+
+from services.demand_zones import GRID_CELL_LAT, GRID_CELL_LNG, DemandZoneEngine
+from services.geo_utils import EARTH_RADIUS_KM, haversine_km
+
+ZONE = {
+    "name": "Test Zone",
+    "center": (50.72, -1.88),
+    "radius_km": 1.0,
+    "demand_level": "high",
+    "peak_hours": ["17:00-20:00", "23:30-00:30"]
+}
+
+
+def test_locate_and_peak_multiplier():
+    engine = DemandZoneEngine(zones=[ZONE], zones_file="")
+    assert engine.locate(50.72, -1.88) == "Test Zone"
+    assert engine.locate(50.80, -1.88) is None
+    assert engine.get_demand_multiplier(50.72, -1.88, datetime(2026, 1, 5, 18, 0)) == 2.5
+    assert engine.get_demand_multiplier(50.72, -1.88, datetime(2026, 1, 5, 15, 0)) == 1.5
+    # Windows that end before they start wrap past midnight
+    assert engine.get_demand_multiplier(50.72, -1.88, datetime(2026, 1, 5, 0, 15)) == 2.5
+
+
+def test_overlapping_zones_resolve_to_relatively_closest_centre():
+    wide = {**ZONE, "name": "Wide", "center": (50.73, -1.88), "radius_km": 5.0}
+    engine = DemandZoneEngine(zones=[wide, ZONE], zones_file="")
+    assert engine.locate(50.72, -1.88) == "Test Zone"
+
+
+@pytest.mark.parametrize("radius_km", [0, -1.0])
+def test_non_positive_radius_is_rejected(radius_km):
+    engine = DemandZoneEngine(zones=[ZONE], zones_file="")
+    version = engine.version
+    with pytest.raises(ValueError):
+        engine.load_zones([{**ZONE, "radius_km": radius_km}])
+    # The previous zone set stays installed
+    assert engine.version == version
+    assert engine.locate(50.72, -1.88) == "Test Zone"
+
+
+def test_point_just_inside_the_radius_across_a_cell_edge_is_found():
+    # Put the circle's northern edge just past a grid row boundary, where a
+    # bounding box sized with 111.32 km per degree stops one row short
+    edge = 10145 * GRID_CELL_LAT
+    centre = (edge - 0.008988, 102 * GRID_CELL_LNG + 0.004)
+    engine = DemandZoneEngine(zones=[{**ZONE, "center": centre}], zones_file="")
+
+    lat = centre[0] + math.degrees(0.9995 / EARTH_RADIUS_KM)
+    assert lat > edge
+    assert haversine_km(lat, centre[1], *centre) < ZONE["radius_km"]
+    assert engine.locate(lat, centre[1]) == "Test Zone"
+
+
+def test_malformed_zones_file_keeps_the_current_zones(tmp_path):
+    zones_file = tmp_path / "zones.json"
+    zones_file.write_text(json.dumps([ZONE]))
+    engine = DemandZoneEngine(zones_file=str(zones_file))
+    version = engine.version
+
+    zones_file.write_text(json.dumps([{**ZONE, "center": 50}]))
+    assert not engine.reload_if_changed(force=True)
+    assert engine.version == version
+    assert engine.locate(50.72, -1.88) == "Test Zone"
@@ -0,0 +1,220 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from services.dispatch_engine import DispatchEngine
+from services.order_batching import OrderBatcher
+from services.priority_service import PriorityService
+from services.rider_locations import record_rider_location
+
+RESTAURANT = {"latitude": 50.7192, "longitude": -1.8808}
+
+
+@pytest.fixture
+def db():
+    return AsyncMongoMockClient()["dispatch_test"]
+
+
+def make_engine(batcher=None):
+    # mongomock has no sessions; exercise the standalone-server path
+    return DispatchEngine(
+        PriorityService(), time_budget_seconds=1.0, batcher=batcher or OrderBatcher(max_orders=1), use_transactions=False
+    )
+
+
+def add_rider(db, lat=50.7200, lng=-1.8800, when=None):
+    rider_id = asyncio.run(db.users.insert_one({"role": "Rider", "is_active": True, "dispatch_order_id": None})).inserted_id
+    assert asyncio.run(record_rider_location(db, str(rider_id), lat, lng, when))
+    return str(rider_id)
+
+
+def add_order(db, dropoff=(50.7300, -1.8700)):
+    return asyncio.run(db.orders.insert_one({
+        "status": "pending",
+        "rider_id": None,
+        "restaurant_id": "r-1",
+        "restaurant_name": "Harbour Pizza",
+        "restaurant_address": RESTAURANT,
+        "delivery_address": {"latitude": dropoff[0], "longitude": dropoff[1]},
+        "created_at": datetime.utcnow() - timedelta(minutes=5),
+        "priority": "medium"
+    })).inserted_id
+
+
+def find(db, collection, query):
+    return asyncio.run(getattr(db, collection).find_one(query))
+
+
+class Crash(Exception):
+    pass
+
+
+class FailingInsertDb:
+    """Database wrapper whose insert into one collection fails after writing"""
+
+    def __init__(self, db, collection, method):
+        self.db = db
+        self.collection = collection
+        self.method = method
+
+    def __getattr__(self, name):
+        collection = getattr(self.db, name)
+        if name != self.collection:
+            return collection
+        method = self.method
+
+        class Failing:
+            def __getattr__(self, attribute):
+                inner = getattr(collection, attribute)
+                if attribute != method:
+                    return inner
+
+                async def insert(*args, **kwargs):
+                    # Like a connection lost after the server applied the write
+                    await inner(*args, **kwargs)
+                    raise Crash(f"lost connection inserting into {name}")
+                return insert
+
+        return Failing()
+
+
+def test_tick_assigns_located_rider_and_creates_delivery(db):
+    engine = make_engine()
+    rider_id = add_rider(db)
+    order_id = add_order(db)
+
+    result = asyncio.run(engine.run_tick(db))
+    assert [assignment["rider_id"] for assignment in result["assignments"]] == [rider_id]
+
+    order = find(db, "orders", {"_id": order_id})
+    assert (order["status"], order["rider_id"], order["assigned_by"]) == ("assigned", rider_id, "dispatch")
+    assert find(db, "users", {"_id": ObjectId(rider_id)})["dispatch_order_id"] == order_id
+    delivery = find(db, "deliveries", {"order_id": str(order_id)})
+    assert (delivery["rider_id"], delivery["status"], delivery["dispatch_order_id"]) == (rider_id, "accepted", order_id)
+    assert delivery["estimated_distance"] > 0
+    assert not engine.priority_service.queue.is_available(rider_id)
+
+    # The claimed rider is not offered again
+    assert asyncio.run(engine.run_tick(db))["riders"] == 0
+
+
+def test_stale_or_missing_locations_are_not_dispatched(db):
+    engine = make_engine()
+    add_rider(db, when=datetime.utcnow() - timedelta(minutes=engine.location_max_age_minutes + 1))
+    asyncio.run(db.users.insert_one({"role": "Rider", "is_active": True, "dispatch_order_id": None}))
+    add_order(db)
+    result = asyncio.run(engine.run_tick(db))
+    assert (result["riders"], result["assigned"]) == (0, 0)
+
+
+def test_older_location_does_not_overwrite_newer(db):
+    rider_id = add_rider(db, lat=50.72, lng=-1.88)
+    assert not asyncio.run(record_rider_location(db, rider_id, 50.0, -1.0, datetime.utcnow() - timedelta(minutes=1)))
+    assert find(db, "users", {"_id": ObjectId(rider_id)})["current_location"]["lat"] == 50.72
+    with pytest.raises(ValueError):
+        asyncio.run(record_rider_location(db, rider_id, 91.0, 0.0))
+    assert not asyncio.run(record_rider_location(db, "not-an-id", 50.0, -1.0))
+
+
+def test_rider_is_freed_only_when_every_order_of_the_job_is_done(db):
+    engine = make_engine(OrderBatcher())
+    rider_id = add_rider(db)
+    first = add_order(db, dropoff=(50.7300, -1.8700))
+    second = add_order(db, dropoff=(50.7310, -1.8690))
+
+    result = asyncio.run(engine.run_tick(db))
+    assert sorted(result["assignments"][0]["order_ids"]) == sorted([str(first), str(second)])
+    job_id = find(db, "users", {"_id": ObjectId(rider_id)})["dispatch_order_id"]
+
+    def complete(order_id):
+        delivery = asyncio.run(db.deliveries.find_one_and_update(
+            {"order_id": str(order_id), "status": "accepted"}, {"$set": {"status": "completed"}}
+        ))
+        return asyncio.run(engine.finish_delivery(db, delivery, "completed"))
+
+    assert not complete(first)
+    assert find(db, "users", {"_id": ObjectId(rider_id)})["dispatch_order_id"] == job_id
+    assert find(db, "orders", {"_id": first})["status"] == "completed"
+    assert complete(second)
+    assert find(db, "users", {"_id": ObjectId(rider_id)})["dispatch_order_id"] is None
+    assert engine.priority_service.queue.is_available(rider_id)
+
+
+def test_release_only_clears_the_same_job(db):
+    engine = make_engine()
+    rider_id = add_rider(db)
+    other_job = ObjectId()
+    asyncio.run(db.users.update_one({"_id": ObjectId(rider_id)}, {"$set": {"dispatch_order_id": other_job}}))
+    asyncio.run(engine.release_rider(db, rider_id, ObjectId()))
+    assert find(db, "users", {"_id": ObjectId(rider_id)})["dispatch_order_id"] == other_job
+
+
+def test_cancelled_order_releases_rider_on_next_tick(db):
+    engine = make_engine()
+    rider_id = add_rider(db)
+    order_id = add_order(db)
+    asyncio.run(engine.run_tick(db))
+    asyncio.run(db.orders.update_one({"_id": order_id}, {"$set": {"external_status": "cancelled"}}))
+
+    result = asyncio.run(engine.run_tick(db))
+    assert result["cancelled"] == 1
+    assert find(db, "orders", {"_id": order_id})["status"] == "cancelled"
+    assert find(db, "deliveries", {"order_id": str(order_id)})["status"] == "cancelled"
+    assert find(db, "users", {"_id": ObjectId(rider_id)})["dispatch_order_id"] is None
+    assert asyncio.run(engine.run_tick(db))["cancelled"] == 0
+
+
+def test_returned_job_is_dispatched_again(db):
+    engine = make_engine()
+    rider_id = add_rider(db)
+    order_id = add_order(db)
+    asyncio.run(engine.run_tick(db))
+
+    assert asyncio.run(engine.return_job(db, rider_id, order_id)) == 1
+    order = find(db, "orders", {"_id": order_id})
+    assert (order["status"], order["rider_id"]) == ("pending", None)
+    assert "assigned_by" not in order
+    assert find(db, "deliveries", {"order_id": str(order_id)})["status"] == "rejected"
+    assert find(db, "users", {"_id": ObjectId(rider_id)})["dispatch_order_id"] is None
+
+    engine.priority_service.set_rider_available(rider_id, True)
+    assert asyncio.run(engine.run_tick(db))["assigned"] == 1
+    assert asyncio.run(db.deliveries.count_documents({"order_id": str(order_id), "status": "accepted"})) == 1
+
+
+def test_ready_time_prefers_reported_then_estimated_then_learned(db):
+    engine = make_engine()
+    started = datetime(2026, 10, 14, 18, 0)
+    reported, estimated, learned = (add_order(db) for _ in range(3))
+    asyncio.run(db.orders.update_many({}, {"$set": {"preparation_started_at": started}}))
+    asyncio.run(db.orders.update_one({"_id": reported}, {"$set": {
+        "ready_at": started + timedelta(minutes=7), "estimated_preparation_time": 25
+    }}))
+    asyncio.run(db.orders.update_one({"_id": estimated}, {"$set": {"estimated_preparation_time": 25}}))
+
+    ready = {order["_id"]: order["ready_at"] for order in asyncio.run(engine.load_orders(db))}
+    assert ready[reported] == started + timedelta(minutes=7)
+    assert ready[estimated] == started + timedelta(minutes=25)
+    assert ready[learned] == engine.priority_service.prep_times.ready_at("r-1", started)
+
+
+@pytest.mark.parametrize("collection, method", [("deliveries", "insert_many"), ("order_batches", "insert_one")])
+def test_failed_insert_puts_the_job_back_without_transactions(db, collection, method):
+    engine = make_engine(OrderBatcher())
+    rider_id = add_rider(db)
+    orders = [add_order(db, dropoff=(50.7300, -1.8700)), add_order(db, dropoff=(50.7310, -1.8690))]
+
+    with pytest.raises(Crash):
+        asyncio.run(engine.run_tick(FailingInsertDb(db, collection, method)))
+
+    for order_id in orders:
+        order = find(db, "orders", {"_id": order_id})
+        assert (order["status"], order["rider_id"]) == ("pending", None)
+        assert "assigned_by" not in order
+    assert asyncio.run(db.deliveries.count_documents({})) == 0
+    assert find(db, "users", {"_id": ObjectId(rider_id)})["dispatch_order_id"] is None
+
+    assert asyncio.run(engine.run_tick(db))["assigned"] == 1
@@ -0,0 +1,151 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from services.earnings_ledger import EarningsLedger
+from services.payment_service import PaymentService
+
+WHEN = datetime(2026, 10, 14, 18, 30)
+
+
+class Crash(Exception):
+    pass
+
+
+class CrashingDb:
+    """Database wrapper that fails the first update_one on one collection"""
+
+    def __init__(self, db, collection):
+        self.db = db
+        self.collection = collection
+        self.crashed = False
+
+    def __getattr__(self, name):
+        collection = getattr(self.db, name)
+        if name != self.collection or self.crashed:
+            return collection
+        wrapper = self
+
+        class Crashing:
+            def __getattr__(self, attribute):
+                return getattr(collection, attribute)
+
+            async def update_one(self, *args, **kwargs):
+                wrapper.crashed = True
+                raise Crash(f"lost connection updating {name}")
+
+        return Crashing()
+
+
+@pytest.fixture
+def db():
+    return AsyncMongoMockClient()["ledger_test"]
+
+
+@pytest.fixture
+def ledger(db):
+    ledger = EarningsLedger()
+    # mongomock has no sessions; exercise the standalone-server path
+    ledger._transactions_supported = False
+    asyncio.run(ledger.ensure_indexes(db))
+    return ledger
+
+
+@pytest.fixture
+def rider_id(db):
+    result = asyncio.run(db.users.insert_one({"role": "Rider", "total_earnings_pence": 0}))
+    return str(result.inserted_id)
+
+
+def pay(ledger, db, rider_id, order_id="order-1", when=WHEN):
+    calculation = PaymentService(settings_file="").calculate_rider_payment(
+        distance_km=3.2, delivery_time_minutes=18, efficiency_percentage=92.0, order_value=0.0
+    )
+    entry = asyncio.run(ledger.record_delivery_payment(
+        db, rider_id, order_id, calculation, distance_km=3.2, delivery_time_minutes=18,
+        efficiency_percentage=92.0, when=when
+    ))
+    return entry, calculation
+
+
+def totals(db, rider_id):
+    async def read():
+        rollups = await db.rider_weekly_earnings.find({"rider_id": rider_id}).to_list(length=None)
+        user = await db.users.find_one({"_id": ObjectId(rider_id)})
+        payments = await db.payments.count_documents({"rider_id": rider_id})
+        pending = await db.earnings_ledger.count_documents({"pending": True})
+        return rollups, user, payments, pending
+    return asyncio.run(read())
+
+
+def test_delivery_payment_updates_rollup_and_user_once(ledger, db, rider_id):
+    entry, calculation = pay(ledger, db, rider_id)
+    assert "pending" not in entry and "payment" not in entry
+    assert pay(ledger, db, rider_id)[0] is None
+
+    rollups, user, payments, pending = totals(db, rider_id)
+    assert len(rollups) == 1
+    assert rollups[0]["total_deliveries"] == 1
+    assert rollups[0]["total_earnings_pence"] == entry["amount_pence"]
+    assert rollups[0]["entry_ids"] == [entry["_id"]]
+    assert user["total_earnings_pence"] == entry["amount_pence"]
+    assert (payments, pending) == (1, 0)
+
+
+@pytest.mark.parametrize("collection", ["payments", "rider_weekly_earnings", "users", "earnings_ledger"])
+def test_retry_after_interrupted_write_applies_each_step_once(ledger, db, rider_id, collection):
+    crashing = CrashingDb(db, collection)
+    with pytest.raises(Crash):
+        pay(ledger, crashing, rider_id)
+    assert totals(db, rider_id)[3] == 1
+
+    # The retry happens later with freshly computed amounts; the original entry wins
+    entry, calculation = pay(ledger, db, rider_id, when=WHEN + timedelta(minutes=3))
+    assert entry["created_at"] == WHEN
+    assert pay(ledger, db, rider_id)[0] is None
+
+    rollups, user, payments, pending = totals(db, rider_id)
+    assert rollups[0]["total_deliveries"] == 1
+    assert rollups[0]["total_earnings_pence"] == entry["amount_pence"]
+    assert user["total_earnings_pence"] == entry["amount_pence"]
+    assert (payments, pending) == (1, 0)
+
+
+def test_apply_pending_entries_finishes_unretried_payments(ledger, db, rider_id):
+    with pytest.raises(Crash):
+        pay(ledger, CrashingDb(db, "rider_weekly_earnings"), rider_id)
+
+    assert asyncio.run(ledger.apply_pending_entries(db, older_than=timedelta(days=365 * 10))) == 0
+    assert asyncio.run(ledger.apply_pending_entries(db)) == 1
+    assert asyncio.run(ledger.apply_pending_entries(db)) == 0
+
+    rollups, user, payments, pending = totals(db, rider_id)
+    assert rollups[0]["total_deliveries"] == 1
+    assert user["total_earnings_pence"] > 0
+    assert (payments, pending) == (1, 0)
+
+
+def test_bonus_and_deliveries_share_the_weekly_rollup(ledger, db, rider_id):
+    pay(ledger, db, rider_id, "order-1")
+    pay(ledger, db, rider_id, "order-2", when=WHEN + timedelta(hours=1))
+    asyncio.run(ledger.record_bonus(db, rider_id, 5.0, when=WHEN + timedelta(hours=2)))
+
+    statement = asyncio.run(ledger.get_weekly_earnings(db, rider_id, WHEN))
+    assert statement["total_deliveries"] == 2
+    assert statement["admin_bonuses"] == 5.0
+    rollups = totals(db, rider_id)[0]
+    assert len(rollups[0]["entry_ids"]) == 3
+
+
+def test_backfill_sets_missing_user_totals_from_rollups(ledger, db, rider_id):
+    pay(ledger, db, rider_id, "order-1")
+    pay(ledger, db, rider_id, "order-2")
+    expected = totals(db, rider_id)[1]["total_earnings_pence"]
+    asyncio.run(db.users.update_one({"_id": ObjectId(rider_id)}, {"$unset": {"total_earnings_pence": ""}}))
+
+    assert asyncio.run(ledger.backfill_user_totals(db)) == 1
+    assert asyncio.run(ledger.backfill_user_totals(db)) == 0
+    assert totals(db, rider_id)[1]["total_earnings_pence"] == expected
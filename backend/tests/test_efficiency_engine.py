@@ -0,0 +1,65 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.efficiency_engine import EfficiencyEngine
+
+START = datetime(2026, 9, 1, 12, 0)
+
+
+def brute_force(actions, window_days, now):
+    """Counts of the actions on the window's days, rescanning everything"""
+    first_day = (now - timedelta(days=window_days - 1)).date()
+    counts = {"accepted": 0, "rejected": 0, "penalized_rejections": 0}
+    for kind, penalty, when in actions:
+        if first_day <= when.date() <= now.date():
+            if kind == "accept":
+                counts["accepted"] += 1
+            else:
+                counts["rejected"] += 1
+                counts["penalized_rejections"] += int(penalty)
+    return counts
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_rolling_windows_match_a_full_rescan(seed):
+    rng = random.Random(seed)
+    engine = EfficiencyEngine(scoring_window="30d")
+    actions = []
+    now = START
+    for _ in range(400):
+        now += timedelta(hours=rng.choice([0, 1, 3, 20, 30, 24 * 12]))
+        # Some events arrive late, a few of them too late to count anywhere
+        when = now - timedelta(days=rng.choice([0, 0, 0, 2, 9, 45]), hours=rng.randint(0, 5))
+        kind = rng.choice(["accept", "accept", "reject"])
+        penalty = kind == "reject" and rng.random() < 0.5
+        if engine.record("rider", kind, penalty, when):
+            actions.append((kind, penalty, when))
+        else:
+            assert when.date() <= (now - timedelta(days=30)).date()
+        for name, days in engine.windows.items():
+            assert engine.counts("rider", name, now) == brute_force(actions, days, now)
+
+
+def test_reads_advance_windows_without_new_actions():
+    engine = EfficiencyEngine()
+    engine.record("rider", "accept", False, START)
+    engine.record("rider", "reject", True, START)
+    assert engine.counts("rider", "today", START)["accepted"] == 1
+    assert engine.counts("rider", "today", START + timedelta(days=1))["accepted"] == 0
+    assert engine.counts("rider", "7d", START + timedelta(days=6))["penalized_rejections"] == 1
+    assert engine.counts("rider", "30d", START + timedelta(days=31)) == {
+        "accepted": 0, "rejected": 0, "penalized_rejections": 0
+    }
+
+
+def test_unknown_windows_and_riders():
+    engine = EfficiencyEngine()
+    assert engine.counts("nobody")["accepted"] == 0
+    with pytest.raises(ValueError):
+        engine.counts("nobody", "90d")
+    with pytest.raises(ValueError):
+        EfficiencyEngine(scoring_window="90d")
+    with pytest.raises(ValueError):
+        EfficiencyEngine(windows={"none": 0})
@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+
+from services.geocode_cache import GeocodeCache, normalize_address
+
+
+@pytest.fixture
+def cache(tmp_path):
+    centroids = tmp_path / "units.csv"
+    centroids.write_text("postcode,latitude,longitude\nBH1 1AA,50.7201,-1.8702\n")
+    return GeocodeCache(db_path=str(tmp_path / "geocode.sqlite3"), centroids_path=str(centroids))
+
+
+def test_normalize_address_is_stable_across_spellings():
+    assert normalize_address("12 Old Christchurch Rd, Bournemouth, bh1 1aa, UK") == \
+        normalize_address("12 OLD CHRISTCHURCH ROAD,  Bournemouth, BH11AA")
+
+
+def test_lookup_order_address_then_unit_postcode(cache):
+    assert cache.lookup("1 Somewhere Street, BH1 1AA")["precision"] == "postcode"
+    cache.store("1 Somewhere Street, BH1 1AA", (50.72, -1.87))
+    assert cache.lookup("1 Somewhere St, BH1 1AA") == {
+        "location": (50.72, -1.87), "source": "cache", "precision": "address"
+    }
+
+
+def test_district_centroid_only_when_approximate_allowed(cache):
+    assert cache.lookup("4 Unknown Road, Bournemouth BH2 9ZZ") is None
+    result = cache.lookup("4 Unknown Road, Bournemouth BH2 9ZZ", allow_approximate=True)
+    assert result["precision"] == "district"
+
+
+def test_get_or_load_calls_loader_once_and_learns_postcode(cache):
+    calls = []
+
+    def loader(address):
+        calls.append(address)
+        return (50.74, -1.86)
+
+    assert cache.get_or_load("7 New Road, BH3 7AB", loader) == (50.74, -1.86)
+    assert cache.get_or_load("7 New Rd, BH3 7AB", loader) == (50.74, -1.86)
+    assert len(calls) == 1
+    # The learned unit centroid now answers other addresses in the postcode
+    assert cache.lookup("9 New Road, BH3 7AB")["precision"] == "postcode"
+
+
+def test_stats_are_consistent_under_concurrent_lookups(cache):
+    def work():
+        for _ in range(500):
+            cache.lookup("nowhere at all")
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.get_stats()["misses"] == 4000
+
+
+def test_geocode_orders_never_writes_district_centroids(tmp_path, monkeypatch):
+    monkeypatch.delenv("GOOGLE_MAPS_API_KEY", raising=False)
+    monkeypatch.setenv("GEOCODE_CACHE_PATH", str(tmp_path / "geocode.sqlite3"))
+    from services.google_maps_service import GoogleMapsService
+
+    service = GoogleMapsService()
+    service.geocode_cache.store("1 Known Road, Bournemouth, BH1 2CD", (50.721, -1.871))
+    orders = [{
+        "restaurant_address": {"street": "1 Known Road", "city": "Bournemouth", "postcode": "BH1 2CD"},
+        "delivery_address": {"street": "5 Far Lane", "city": "Bournemouth", "postcode": "BH2 9ZZ"}
+    }]
+    counts = service.geocode_orders(orders)
+
+    assert counts == {"resolved": 1, "unresolved": 1, "approximate": 1}
+    assert orders[0]["restaurant_address"]["geocode_precision"] == "address"
+    assert "latitude" not in orders[0]["delivery_address"]
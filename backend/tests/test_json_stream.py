@@ -0,0 +1,87 @@
+import json
+import random
+
+import pytest
+
+from services.json_stream import COMPACT_CHARS, JSONArrayStream
+
+
+def parse_in_chunks(data: bytes, sizes):
+    parser = JSONArrayStream("orders")
+    items = []
+    position = 0
+    for size in sizes:
+        items.extend(parser.feed(data[position:position + size]))
+        position += size
+    items.extend(parser.feed(data[position:]))
+    return items, parser.close()
+
+
+def document(rng, count):
+    orders = [
+        {
+            "id": f"order-{index}",
+            "total_amount": round(rng.uniform(5, 80), 2),
+            "quantity": rng.randint(1, 12000),
+            "customer": rng.choice(["Zoë", "José", "Bob \"the\" Builder", "北京"]),
+            "is_paid": rng.random() < 0.5,
+            "notes": None,
+            "items": [{"name": "Margherita", "price": 9.5}] * rng.randint(0, 3)
+        }
+        for index in range(count)
+    ]
+    return {"total": count, "orders": orders, "page": {"limit": 50, "exponent": 1.5e-3}}
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_any_chunking_matches_json_loads(seed):
+    rng = random.Random(seed)
+    expected = document(rng, rng.randint(0, 25))
+    data = json.dumps(expected, ensure_ascii=False, indent=rng.choice([None, 2])).encode()
+    sizes = [rng.randint(1, 40) for _ in range(len(data))]
+
+    items, fields = parse_in_chunks(data, sizes)
+    assert items == expected["orders"]
+    assert fields == {"total": expected["total"], "page": expected["page"]}
+
+
+def test_every_split_point_of_a_small_document():
+    data = '{"orders": [{"id": 1, "amount": -12.5e2, "name": "Zoë"}, 123456, true], "next": null}'.encode()
+    for split in range(len(data) + 1):
+        items, fields = parse_in_chunks(data, [split])
+        assert items == [{"id": 1, "amount": -1250.0, "name": "Zoë"}, 123456, True]
+        assert fields == {"next": None}
+
+
+def test_items_are_returned_as_soon_as_they_complete():
+    parser = JSONArrayStream("orders")
+    assert parser.feed(b'{"orders": [{"id": 1}, {"id"') == [{"id": 1}]
+    assert parser.feed(b': 2}, 3') == [{"id": 2}]
+    assert parser.feed(b"4]}") == [34]
+    assert parser.close() == {}
+
+
+def test_parsed_text_is_dropped_from_the_buffer():
+    parser = JSONArrayStream("orders")
+    parser.feed(b'{"orders": [')
+    item = json.dumps({"id": "x" * 1000}).encode()
+    for _ in range(500):
+        parser.feed(item + b",")
+    assert len(parser._buffer) < COMPACT_CHARS + 2 * len(item)
+    parser.feed(item + b"]}")
+    parser.close()
+
+
+@pytest.mark.parametrize("data", [
+    b'{"orders": [{"id": 1}',
+    b'{"orders": [1, 2]',
+    b'[1, 2]',
+    b'{"orders": [1] 2}',
+    b'{"orders": [1]} {}',
+    b'{"orders": [1,, 2]}'
+])
+def test_invalid_or_truncated_documents_raise(data):
+    parser = JSONArrayStream("orders")
+    with pytest.raises(ValueError):
+        parser.feed(data)
+        parser.close()
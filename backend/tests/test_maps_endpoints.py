@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from auth.jwt_handler import get_current_user
+from services.google_maps_service import GoogleMapsService
+from services.maps_scheduler import MapsCallScheduler
+
+ROUTE = {"origin": {"lat": 50.7192, "lng": -1.8808}, "destination": {"lat": 50.7260, "lng": -1.8650}}
+
+
+class FakeMapsClient:
+    def __init__(self):
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def directions(self, origin, destination, mode=None, departure_time=None):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return [{
+            "legs": [{
+                "distance": {"value": 2400, "text": "2.4 km"},
+                "duration": {"value": 420, "text": "7 mins"},
+                "steps": [],
+                "start_address": "Bournemouth Square",
+                "end_address": "Lansdowne"
+            }]
+        }]
+
+
+@pytest.fixture
+def maps(monkeypatch):
+    service = GoogleMapsService()
+    service.gmaps = FakeMapsClient()
+    monkeypatch.setattr(main, "google_maps_service", service)
+    main.app.dependency_overrides[get_current_user] = lambda: {"_id": "admin", "role": "Admin"}
+    yield service
+    main.app.dependency_overrides.clear()
+
+
+def test_concurrent_route_requests_share_one_upstream_call(maps):
+    client = TestClient(main.app)
+    responses = []
+
+    def post():
+        responses.append(client.post("/admin/google-maps/calculate-route", json=ROUTE))
+
+    owner = threading.Thread(target=post)
+    owner.start()
+    assert maps.gmaps.started.wait(5)
+    follower = threading.Thread(target=post)
+    follower.start()
+    # Hold the upstream call until the second request has joined it
+    deadline = time.monotonic() + 5
+    while maps.single_flight.get_stats()["calls_saved"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    maps.gmaps.release.set()
+    owner.join()
+    follower.join()
+
+    assert [response.status_code for response in responses] == [200, 200]
+    assert responses[0].json() == responses[1].json()
+    assert responses[0].json()["distance_km"] == 2.4
+    assert maps.gmaps.calls == 1
+
+
+def test_route_request_rejects_missing_coordinates(maps):
+    client = TestClient(main.app)
+    response = client.post(
+        "/admin/google-maps/calculate-route",
+        json={"origin": {"lat": 50.7192}, "destination": ROUTE["destination"]}
+    )
+    assert response.status_code == 400
+    assert maps.gmaps.calls == 0
+
+
+def test_route_request_is_charged_to_the_scheduler_and_waits_off_the_loop(maps):
+    maps.gmaps.release.set()
+    maps.scheduler = MapsCallScheduler(qps=10, burst=1, daily_budget=100)
+    # Spend the only token so the next call has to wait for a refill
+    maps.scheduler.execute("dispatch", lambda: None)
+
+    response = TestClient(main.app).post("/admin/google-maps/calculate-route", json=ROUTE)
+
+    assert response.status_code == 200
+    assert "error" not in response.json()
+    stats = maps.scheduler.get_stats()
+    assert stats["budget_used_today"] == 2
+    assert stats["classes"]["quote"]["executed"] == 1
+    assert stats["classes"]["quote"]["rejected_rate_limit"] == 0
+
+
+def test_maps_call_made_on_the_event_loop_is_shed_instead_of_waiting(maps):
+    maps.gmaps.release.set()
+    maps.scheduler = MapsCallScheduler(qps=0.1, burst=1, daily_budget=100)
+    maps.scheduler.execute("dispatch", lambda: None)
+
+    async def on_loop():
+        started = time.monotonic()
+        result = maps.calculate_distance_and_time((50.7192, -1.8808), (50.7260, -1.8650))
+        return result, time.monotonic() - started
+
+    result, elapsed = asyncio.run(on_loop())
+    assert "rate limit" in result["error"]
+    assert elapsed < 0.5
+    assert maps.gmaps.calls == 0
+    assert maps.scheduler.get_stats()["classes"]["quote"]["rejected_rate_limit"] == 1
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.maps_scheduler import MapsCallScheduler, MapsPriority, MapsQuotaExceeded
+
+
+def test_daily_budget_sheds_analytics_before_dispatch():
+    scheduler = MapsCallScheduler(qps=1000, burst=1000, daily_budget=10)
+    for _ in range(8):
+        scheduler.execute("analytics", lambda: None)
+    with pytest.raises(MapsQuotaExceeded):
+        scheduler.execute("analytics", lambda: None)
+    scheduler.execute("dispatch", lambda: None)
+    classes = scheduler.get_stats()["classes"]
+    assert classes["analytics"]["rejected_budget"] == 1
+    assert classes["dispatch"]["executed"] == 1
+
+
+def test_rate_limit_waits_for_tokens_in_worker_threads():
+    scheduler = MapsCallScheduler(qps=20, burst=1, daily_budget=1000)
+    started = time.monotonic()
+    threads = [threading.Thread(target=scheduler.execute, args=("dispatch", lambda: None)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # One token up front, then one every 50ms
+    assert time.monotonic() - started >= 0.18
+    assert scheduler.get_stats()["classes"]["dispatch"]["executed"] == 5
+
+
+def test_lower_class_is_shed_when_it_cannot_get_a_token_in_time():
+    scheduler = MapsCallScheduler(
+        qps=1, burst=1, daily_budget=1000,
+        max_wait_seconds={MapsPriority.DISPATCH: 1.0, MapsPriority.QUOTE: 0.05, MapsPriority.ANALYTICS: 0.05}
+    )
+    scheduler.execute("quote", lambda: None)
+    with pytest.raises(MapsQuotaExceeded):
+        scheduler.execute("quote", lambda: None)
+    # A shed call hands its budget back
+    assert scheduler.get_stats()["budget_used_today"] == 1
+
+
+def test_calls_on_the_event_loop_never_block_it():
+    scheduler = MapsCallScheduler(qps=0.5, burst=1, daily_budget=1000)
+
+    async def scenario():
+        scheduler.execute("dispatch", lambda: None)
+        started = time.monotonic()
+        with pytest.raises(MapsQuotaExceeded):
+            scheduler.execute("dispatch", lambda: None)
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 0.05
+
+
+def test_threadpool_calls_wait_without_stalling_the_loop():
+    from fastapi.concurrency import run_in_threadpool
+
+    scheduler = MapsCallScheduler(qps=10, burst=1, daily_budget=1000)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await asyncio.gather(*(run_in_threadpool(scheduler.execute, "dispatch", lambda: None) for _ in range(3)))
+        task.cancel()
+        return ticks
+
+    # Two calls wait ~100ms each for a token while the loop keeps running
+    assert asyncio.run(scenario()) >= 10
@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+from services.money import format_pence, from_pence, to_pence
+
+
+@pytest.mark.parametrize("amount, pence", [
+    (2.675, 267),   # stored as 2.67499..., round(2.675, 2) == 2.67
+    (1.005, 100),
+    (0.125, 12),    # exact half rounds to even, like round()
+    (0.135, 14),
+    (12.5, 1250),
+    (-1.235, -124),
+    (None, 0),
+    (0, 0)
+])
+def test_to_pence_known_values(amount, pence):
+    assert to_pence(amount) == pence
+
+
+def test_to_pence_matches_round_to_two_places():
+    rng = random.Random(40)
+    for _ in range(20000):
+        amount = rng.choice([rng.uniform(-50, 500), rng.randint(0, 500000) / 1000, rng.randint(0, 50000) / 100 + 0.005])
+        assert to_pence(amount) == round(round(amount, 2) * 100), amount
+
+
+def test_pence_sums_are_exact():
+    amounts = [0.1] * 10 + [0.2] * 5
+    assert sum(amounts) != 2.0
+    assert from_pence(sum(to_pence(amount) for amount in amounts)) == 2.0
+
+
+def test_from_pence_round_trips():
+    for pence in range(-500, 5000, 7):
+        assert to_pence(from_pence(pence)) == pence
+        assert from_pence(pence) == round(pence / 100, 2)
+
+
+def test_format_pence():
+    assert format_pence(1205) == "£12.05"
+    assert format_pence(-7) == "-£0.07"
+    assert format_pence(0) == "£0.00"
@@ -0,0 +1,84 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.order_batching import OrderBatcher, bearing_degrees
+from services.route_optimizer import build_distance_matrix
+
+RESTAURANT = (50.7192, -1.8808)
+NOW = datetime(2026, 10, 14, 18, 0)
+
+
+def order(order_id, dropoff, pickup=RESTAURANT, ready_in=10, priority="low"):
+    return {
+        "_id": order_id,
+        "pickup": pickup,
+        "dropoff": dropoff,
+        "ready_at": NOW + timedelta(minutes=ready_in),
+        "priority": priority
+    }
+
+
+def test_bearing_degrees():
+    assert bearing_degrees((50.0, -1.0), (51.0, -1.0)) == pytest.approx(0.0)
+    assert bearing_degrees((50.0, -1.0), (50.0, -0.9)) == pytest.approx(90.0, abs=0.1)
+    assert bearing_degrees((50.0, -1.0), (49.0, -1.0)) == pytest.approx(180.0)
+
+
+def test_same_way_orders_share_a_job():
+    jobs = OrderBatcher().build_jobs([
+        order("near", (50.7300, -1.8700), ready_in=8),
+        order("far", (50.7350, -1.8650), ready_in=12, priority="high")
+    ])
+    assert len(jobs) == 1
+    job = jobs[0]
+    assert job["order_ids"] == ["near", "far"]
+    assert job["ready_at"] == NOW + timedelta(minutes=12)
+    assert job["priority"] == "high"
+    stops = [(stop["order_id"], stop["type"]) for stop in job["route"]["stops"]]
+    for order_id in ("near", "far"):
+        assert stops.index((order_id, "pickup")) < stops.index((order_id, "dropoff"))
+
+
+@pytest.mark.parametrize("second", [
+    order("opposite", (50.7080, -1.8920)),
+    order("other_restaurant", (50.7300, -1.8700), pickup=(50.7250, -1.8808)),
+    order("much_later", (50.7310, -1.8690), ready_in=40),
+    order("no_dropoff", None)
+])
+def test_incompatible_orders_stay_single(second):
+    jobs = OrderBatcher().build_jobs([order("first", (50.7300, -1.8700)), second])
+    assert sorted(len(job["order_ids"]) for job in jobs) == [1, 1]
+
+
+def test_random_orders_are_batched_within_limits():
+    rng = random.Random(44)
+    batcher = OrderBatcher(max_orders=3)
+    restaurants = [(RESTAURANT[0] + rng.uniform(-0.01, 0.01), RESTAURANT[1] + rng.uniform(-0.01, 0.01)) for _ in range(6)]
+    orders = []
+    for index in range(120):
+        pickup = rng.choice(restaurants)
+        dropoff = (pickup[0] + rng.uniform(-0.03, 0.03), pickup[1] + rng.uniform(-0.04, 0.04))
+        orders.append(order(f"order-{index}", dropoff, pickup=pickup, ready_in=rng.uniform(0, 20)))
+
+    jobs = batcher.build_jobs(orders)
+    assigned = [order_id for job in jobs for order_id in job["order_ids"]]
+    assert sorted(assigned) == sorted(item["_id"] for item in orders)
+    assert any(len(job["order_ids"]) > 1 for job in jobs)
+
+    by_id = {item["_id"]: item for item in orders}
+    for job in jobs:
+        if len(job["order_ids"]) == 1:
+            continue
+        assert len(job["order_ids"]) <= batcher.max_orders
+        members = [by_id[order_id] for order_id in job["order_ids"]]
+        ready = [member["ready_at"] for member in members]
+        assert max(ready) - min(ready) <= timedelta(minutes=2 * batcher.ready_window_minutes)
+        for order_id, detour in job["route"]["detours_km"].items():
+            member = by_id[order_id]
+            direct = build_distance_matrix([member["pickup"], member["dropoff"]])[0][1]
+            assert detour <= min(batcher.max_detour_km, max(direct * batcher.max_detour_ratio, 0.3)) + 0.005
+
+    stats = batcher.get_stats()
+    assert (stats["orders"], stats["jobs"]) == (len(orders), len(jobs))
@@ -0,0 +1,216 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from services.bournemoutheats_api_service import BournemouthEatsAPIService
+
+START = datetime(2026, 10, 14, 17, 0)
+
+
+class FakeContent:
+    def __init__(self, body: bytes):
+        self.body = body
+
+    async def iter_chunked(self, size):
+        for start in range(0, len(self.body), 7):
+            yield self.body[start:start + 7]
+
+
+class FakeResponse:
+    status = 200
+
+    def __init__(self, body: bytes):
+        self.content = FakeContent(body)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """The orders endpoint: updated at or after since, oldest first, at most limit"""
+
+    def __init__(self, orders):
+        self.orders = sorted(orders, key=lambda order: order["updated_at"])
+        self.requests = []
+
+    def get(self, url, params):
+        self.requests.append(params)
+        page = [order for order in self.orders if order["updated_at"] >= params["since"]][:params["limit"]]
+        return FakeResponse(json.dumps({"orders": page}).encode())
+
+
+def api_orders(count, step_minutes=1):
+    return [
+        {"id": f"order-{index}", "updated_at": (START + timedelta(minutes=step_minutes * index)).isoformat()}
+        for index in range(1, count + 1)
+    ]
+
+
+def fetch(service, since, until, page_size=3):
+    seen = []
+
+    async def ingest(batch):
+        seen.extend(order["id"] for order in batch)
+
+    return asyncio.run(service._fetch_orders(since, until, page_size, ingest)), seen
+
+
+@pytest.fixture
+def service():
+    service = BournemouthEatsAPIService()
+    service.import_interval_minutes = 60
+    return service
+
+
+def test_pages_by_update_time_until_a_short_page(service):
+    service.session = FakeSession(api_orders(7))
+    result, seen = fetch(service, START, START + timedelta(minutes=30))
+
+    assert set(seen) == {f"order-{index}" for index in range(1, 8)}
+    assert result["caught_up"]
+    assert result["high_water_mark"] == START + timedelta(minutes=7)
+    assert [params["since"] for params in service.session.requests] == [
+        (START + timedelta(minutes=minutes)).isoformat() for minutes in (0, 3, 5, 7)
+    ]
+    assert all("cursor" not in params and "until" not in params for params in service.session.requests)
+
+
+def test_page_cap_moves_mark_only_to_the_last_update_seen(service):
+    service.max_pages_per_import = 1
+    service.session = FakeSession(api_orders(7))
+    result, seen = fetch(service, START, START + timedelta(minutes=30))
+
+    assert seen == ["order-1", "order-2", "order-3"]
+    assert not result["caught_up"]
+    assert result["high_water_mark"] == START + timedelta(minutes=3)
+
+
+def test_orders_past_until_are_left_for_the_next_run(service):
+    service.session = FakeSession(api_orders(7))
+    result, seen = fetch(service, START, START + timedelta(minutes=4, seconds=30), page_size=10)
+
+    assert seen == ["order-1", "order-2", "order-3", "order-4"]
+    assert result["caught_up"]
+    assert result["high_water_mark"] == START + timedelta(minutes=4)
+
+
+def test_nothing_new_keeps_the_mark(service):
+    service.session = FakeSession([])
+    result, seen = fetch(service, START, START + timedelta(minutes=30))
+    assert seen == [] and result["caught_up"]
+    assert result["high_water_mark"] == START
+
+
+def test_full_page_sharing_one_update_time_stops_incomplete(service):
+    orders = [{"id": f"order-{index}", "updated_at": START.isoformat()} for index in range(5)]
+    service.session = FakeSession(orders)
+    result, _ = fetch(service, START, START + timedelta(minutes=30))
+    assert not result["caught_up"]
+    assert len(service.session.requests) == 1
+
+
+class FailingSliceSession:
+    """The first slice's request fails; the others hang until cancelled"""
+
+    def __init__(self, failing_since):
+        self.failing_since = failing_since.isoformat()
+        self.cancelled = []
+
+    def get(self, url, params):
+        session = self
+
+        class Response:
+            async def __aenter__(self):
+                if params["since"] == session.failing_since:
+                    raise ConnectionError("orders API unreachable")
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    session.cancelled.append(params["since"])
+                    raise
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Response()
+
+
+def test_failed_slice_cancels_the_others(service):
+    service.session = FailingSliceSession(START)
+
+    async def ingest(batch):
+        pass
+
+    async def scenario():
+        with pytest.raises(ConnectionError, match="unreachable"):
+            await service._fetch_orders(START, START + timedelta(hours=4), 3, ingest)
+        # Cancelled before the error reached the caller, not when the loop shut down
+        return list(service.session.cancelled)
+
+    assert len(asyncio.run(scenario())) == service.import_concurrency - 1
+
+
+def stored_order(service, external_id, updated_at, status="pending"):
+    return service._transform_order({
+        "id": external_id,
+        "status": status,
+        "restaurant_id": "r-1",
+        "restaurant_name": "Harbour Pizza",
+        "created_at": START.isoformat(),
+        "updated_at": updated_at.isoformat()
+    })
+
+
+def test_older_update_never_overwrites_a_newer_one(service):
+    db = AsyncMongoMockClient()["import_test"]
+    newer = stored_order(service, "ext-1", START + timedelta(minutes=10), status="ready")
+    older = stored_order(service, "ext-1", START + timedelta(minutes=5), status="preparing")
+    assert newer["content_hash"] != older["content_hash"]
+
+    assert asyncio.run(service._persist_orders(db, [newer]))["inserted"] == 1
+    counts = asyncio.run(service._persist_orders(db, [older]))
+    assert (counts["updated"], counts["unchanged"], counts["write_errors"]) == (0, 1, 0)
+    stored = asyncio.run(db.orders.find_one({"external_order_id": "ext-1"}))
+    assert stored["updated_at"] == newer["updated_at"]
+    assert stored["content_hash"] == newer["content_hash"]
+
+    latest = stored_order(service, "ext-1", START + timedelta(minutes=15), status="cancelled")
+    assert asyncio.run(service._persist_orders(db, [latest]))["updated"] == 1
+    assert asyncio.run(db.orders.count_documents({})) == 1
+
+
+def test_persisting_the_same_orders_again_changes_nothing(service, monkeypatch):
+    monkeypatch.setattr("services.bournemoutheats_api_service.PERSIST_BATCH_SIZE", 4)
+    db = AsyncMongoMockClient()["import_test"]
+    orders = [stored_order(service, f"ext-{index}", START + timedelta(minutes=index)) for index in range(10)]
+
+    first = asyncio.run(service._persist_orders(db, orders))
+    assert (first["inserted"], first["updated"], first["unchanged"], first["write_errors"]) == (10, 0, 0, 0)
+    before = asyncio.run(db.orders.find().sort("external_order_id", 1).to_list(length=None))
+
+    again = asyncio.run(service._persist_orders(db, orders))
+    assert (again["inserted"], again["updated"], again["unchanged"], again["write_errors"]) == (0, 0, 10, 0)
+    assert asyncio.run(db.orders.find().sort("external_order_id", 1).to_list(length=None)) == before
+
+
+def test_update_keeps_fields_dispatch_owns(service):
+    db = AsyncMongoMockClient()["import_test"]
+    original = stored_order(service, "ext-1", START)
+    asyncio.run(service._persist_orders(db, [original]))
+    asyncio.run(db.orders.update_one(
+        {"external_order_id": "ext-1"}, {"$set": {"status": "assigned", "rider_id": "rider-1"}}
+    ))
+
+    changed = stored_order(service, "ext-1", START + timedelta(minutes=2), status="ready")
+    changed["created_at"] = START + timedelta(hours=1)
+    assert asyncio.run(service._persist_orders(db, [changed]))["updated"] == 1
+    stored = asyncio.run(db.orders.find_one({"external_order_id": "ext-1"}))
+    assert (stored["status"], stored["rider_id"]) == ("assigned", "rider-1")
+    assert stored["created_at"] == original["created_at"]
+    assert stored["content_hash"] == changed["content_hash"]
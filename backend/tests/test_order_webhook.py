@@ -0,0 +1,93 @@
+import asyncio
+import hashlib
+import hmac
+import time
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from services.order_webhook import MAX_ATTEMPTS, OrderWebhook
+
+SECRET = "webhook-secret"
+
+
+class FlakyApiService:
+    """ingest_orders that fails its first `failures` calls"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = 0
+        self.ingested = []
+
+    async def ingest_orders(self, db, orders):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("lost connection to the database")
+        self.ingested.extend(order["id"] for order in orders)
+        return {"imported_count": len(orders), "failed_count": 0, "persisted": None}
+
+
+def sign(body, timestamp, secret=SECRET):
+    return "sha256=" + hmac.new(secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+
+
+def event(event_id, order_id, updated_at="2026-10-14T18:00:00"):
+    return {"id": event_id, "type": "order.updated", "order": {"id": order_id, "updated_at": updated_at}}
+
+
+def test_signature_must_match_body_secret_and_time():
+    webhook = OrderWebhook(FlakyApiService(), secret=SECRET)
+    body = b'{"events": []}'
+    now = str(int(time.time()))
+    assert webhook.verify_signature(body, now, sign(body, now))
+    assert not webhook.verify_signature(body + b" ", now, sign(body, now))
+    assert not webhook.verify_signature(body, now, sign(body, now, "other-secret"))
+    stale = str(int(time.time()) - 3600)
+    assert not webhook.verify_signature(body, stale, sign(body, stale))
+    assert not webhook.verify_signature(body, "not-a-time", sign(body, "not-a-time"))
+    assert not OrderWebhook(FlakyApiService(), secret="").verify_signature(body, now, sign(body, now, ""))
+    assert webhook.stats["rejected_signature"] == 4
+
+
+def test_enqueue_is_all_or_nothing_and_drops_repeats():
+    webhook = OrderWebhook(FlakyApiService(), secret=SECRET, queue_size=3)
+    assert webhook.enqueue([event("e1", "o1"), event("e1", "o1"), {"type": "rider.updated"}]) == 1
+    assert webhook.enqueue([event("e2", "o2"), event("e3", "o3"), event("e4", "o4")]) is None
+    assert webhook.stats["duplicates"] == 1 and webhook.stats["ignored"] == 1
+
+
+def run_webhook(api_service, events):
+    db = AsyncMongoMockClient()["webhook_test"]
+    webhook = OrderWebhook(api_service, secret=SECRET, retry_base_seconds=0.001)
+
+    async def get_database():
+        return db
+
+    async def scenario():
+        webhook.start(get_database)
+        webhook.enqueue(events)
+        await webhook.stop()
+
+    asyncio.run(scenario())
+    return webhook, db
+
+
+def test_failed_batch_is_retried_until_written():
+    api_service = FlakyApiService(failures=MAX_ATTEMPTS - 1)
+    webhook, db = run_webhook(api_service, [event("e1", "o1"), event("e2", "o2")])
+    assert sorted(api_service.ingested) == ["o1", "o2"]
+    assert webhook.stats["retries"] == MAX_ATTEMPTS - 1
+    assert (webhook.stats["parked"], webhook.stats["failed"]) == (0, 0)
+
+
+def test_batch_failing_every_attempt_is_parked_and_replayed():
+    api_service = FlakyApiService(failures=MAX_ATTEMPTS)
+    webhook, db = run_webhook(api_service, [event("e1", "o1"), event("e2", "o1", "2026-10-14T18:05:00")])
+    assert api_service.ingested == []
+    assert webhook.stats["parked"] == 2
+    parked = asyncio.run(db.order_events_failed.find().to_list(length=None))
+    assert [event["external_order_id"] for event in parked] == ["o1", "o1"]
+
+    assert asyncio.run(webhook.replay_failed(db)) == {"replayed": 2, "parked": 0}
+    # Only the newest version of the order is written
+    assert api_service.ingested == ["o1"]
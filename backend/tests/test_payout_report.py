@@ -0,0 +1,108 @@
+import asyncio
+import io
+import json
+from datetime import datetime
+
+from services.payment_service import PaymentService
+from services.payout_report import generate_payout_report, iter_payout_report_json, rider_payout_input
+
+START = datetime(2026, 10, 5)
+END = datetime(2026, 10, 12)
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.fetches = []
+
+    async def to_list(self, length):
+        chunk, self.rows = self.rows[:length], self.rows[length:]
+        self.fetches.append(len(chunk))
+        return chunk
+
+
+class FakeCollection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.cursor = None
+
+    def aggregate(self, pipeline, **kwargs):
+        self.cursor = FakeCursor(self.rows)
+        return self.cursor
+
+
+class FakeDb:
+    def __init__(self, rows):
+        self.users = FakeCollection(rows)
+
+
+def aggregated_rows(count):
+    # Shape of weekly_earnings_pipeline results; every third rider is under the minimum
+    rows = []
+    for index in range(count):
+        bonus = 250 * (index % 2)
+        total = 1000 if index % 3 == 0 else 3000 + index * 7
+        rows.append({
+            "_id": f"rider-{index}",
+            "first_name": "Rider",
+            "last_name": str(index),
+            "bank_account_number": "12345678",
+            "bank_sort_code": "12-34-56",
+            "deliveries": 3,
+            "total_earnings_pence": total,
+            "efficiency_bonus_pence": bonus,
+            "weekly_earnings_pence": total - bonus
+        })
+    return rows
+
+
+def test_rider_payout_input_builds_name_and_bank_account():
+    rider = rider_payout_input(aggregated_rows(1)[0])
+    assert rider["rider_name"] == "Rider 0"
+    assert rider["bank_account"]["account_number"] == "12345678"
+    assert rider["bank_account"]["bank_name"] == ""
+    assert rider["weekly_earnings_pence"] + rider["efficiency_bonus_pence"] == 1000
+
+
+def test_report_totals_are_exact_and_details_are_off_by_default():
+    service = PaymentService(settings_file="")
+    db = FakeDb(aggregated_rows(10))
+    report = asyncio.run(generate_payout_report(service, db, START, END, chunk_size=4))
+
+    assert "payout_details" not in report
+    assert db.users.cursor.fetches == [4, 4, 2, 0]
+    assert report["total_riders"] == 10
+    assert report["eligible_riders"] == 6
+    eligible = [row["total_earnings_pence"] - 150 for row in aggregated_rows(10) if row["total_earnings_pence"] >= 2500]
+    assert report["total_payouts"] == sum(eligible) / 100
+    assert report["processing_fees"] == 9.0
+
+
+def test_service_report_defaults_to_totals_only():
+    service = PaymentService(settings_file="")
+    report = asyncio.run(service.generate_weekly_payout_report_from_db(FakeDb(aggregated_rows(3)), START, END))
+    assert "payout_details" not in report
+
+
+def test_streamed_json_matches_in_memory_report():
+    service = PaymentService(settings_file="")
+    in_memory = asyncio.run(generate_payout_report(
+        service, FakeDb(aggregated_rows(7)), START, END, include_details=True, chunk_size=3
+    ))
+
+    async def collect():
+        return [text async for text in iter_payout_report_json(service, FakeDb(aggregated_rows(7)), START, END, 3)]
+
+    streamed = json.loads("".join(asyncio.run(collect())))
+    assert streamed["payout_details"] == in_memory["payout_details"]
+    for key in ("total_riders", "eligible_riders", "total_payouts", "processing_fees"):
+        assert streamed[key] == in_memory[key]
+
+
+def test_streamed_json_with_no_riders_is_valid():
+    service = PaymentService(settings_file="")
+    output = io.StringIO()
+    report = asyncio.run(generate_payout_report(service, FakeDb([]), START, END, output=output))
+    written = json.loads(output.getvalue())
+    assert written["payout_details"] == []
+    assert report["total_riders"] == written["total_riders"] == 0
@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from services.dispatch_engine import DispatchEngine
+from services.prep_time_model import DEFAULT_PREP_MINUTES, PrepTimeModel, restaurant_key
+
+EVENING = datetime(2026, 10, 19, 18, 0)
+
+
+def record(model, restaurant, minutes, count, start=EVENING):
+    for index in range(count):
+        started_at = start + timedelta(days=index)
+        model.record_preparation(restaurant, started_at, started_at + timedelta(minutes=minutes))
+
+
+def test_no_history_uses_the_default():
+    estimate = PrepTimeModel().estimate("pizza place", EVENING)
+    assert estimate["minutes"] == DEFAULT_PREP_MINUTES
+    assert estimate["source"] == "default"
+
+
+def test_new_restaurant_shrinks_towards_the_city():
+    model = PrepTimeModel()
+    record(model, "noodle bar", 10, 40)
+    record(model, "pizza place", 40, 1)
+
+    estimate = model.estimate("pizza place", EVENING)
+    assert estimate["source"] == "restaurant_hour"
+    assert estimate["samples"] == 1
+    # One slow order only pulls the estimate part of the way from the city level
+    assert model.expected_minutes(None, EVENING) < estimate["minutes"] < 25
+
+
+def test_restaurant_history_outweighs_the_city():
+    model = PrepTimeModel()
+    record(model, "noodle bar", 10, 40)
+    record(model, "pizza place", 40, 40)
+
+    assert 35 < model.expected_minutes("pizza place", EVENING) <= 40
+    assert model.expected_minutes("unknown", EVENING) < 25
+
+
+def test_restaurant_hour_shrinks_towards_the_restaurant():
+    model = PrepTimeModel()
+    record(model, "pizza place", 30, 30, start=EVENING.replace(hour=12))
+    record(model, "pizza place", 15, 1)
+
+    evening = model.estimate("pizza place", EVENING)
+    assert evening["source"] == "restaurant_hour"
+    assert 15 < evening["minutes"] < 30
+    assert 29 < model.estimate("pizza place", EVENING.replace(hour=12))["minutes"] <= 30
+
+
+def test_dispatched_delivery_is_learned_again_after_a_reload():
+    async def scenario():
+        db = AsyncMongoMockClient()["prep_time_test"]
+        now = datetime.utcnow()
+        order = {
+            "_id": ObjectId(),
+            "restaurant_id": "R-42",
+            "restaurant_name": "Pizza Place",
+            "pickup": (50.7192, -1.8808),
+            "dropoff": (50.7260, -1.8650),
+            "preparation_started_at": now - timedelta(minutes=30)
+        }
+        delivery = DispatchEngine._delivery_for(order, ObjectId(), "rider-1", None, now - timedelta(minutes=25))
+        delivery["picked_up_at"] = now
+        delivery["_id"] = (await db.deliveries.insert_one(delivery)).inserted_id
+
+        live = PrepTimeModel()
+        live.record_preparation(
+            restaurant_key(delivery), delivery["preparation_start_time"], delivery["picked_up_at"], str(delivery["_id"])
+        )
+        reloaded = PrepTimeModel()
+        recorded = await reloaded.load_from_database(db)
+        return live, reloaded, recorded, order
+
+    live, reloaded, recorded, order = asyncio.run(scenario())
+    assert recorded == 1
+    when = order["preparation_started_at"]
+    assert reloaded.estimate("r-42", when) == live.estimate("r-42", when)
+    assert reloaded.estimate("r-42", when)["source"] == "restaurant_hour"
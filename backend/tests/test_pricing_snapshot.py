@@ -0,0 +1,79 @@
+import dataclasses
+import json
+import os
+
+import pytest
+
+from services.payment_service import PaymentService
+from services.pricing_snapshot import RULE_NAMES, PricingSnapshot
+
+
+def test_snapshot_is_immutable():
+    snapshot = PricingSnapshot()
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        snapshot.base_delivery_rate = 10.0
+
+
+def test_with_updates_builds_a_new_version():
+    snapshot = PricingSnapshot()
+    updated = snapshot.with_updates(2, {"base_delivery_rate": 4.0, "pricing_version": 99}, updated_by="ops")
+    assert (updated.version, updated.base_delivery_rate, updated.updated_by) == (2, 4.0, "ops")
+    assert snapshot.base_delivery_rate == 3.50
+    assert updated.rider_breakdown["base_rate"] == 4.0
+
+
+@pytest.mark.parametrize("changes", [
+    {"no_such_rule": 1.0},
+    {"distance_rate_per_km": -0.5},
+    {"time_rate_per_minute": "fast"},
+    {"weekly_payout_day": 7}
+])
+def test_invalid_updates_are_refused(changes):
+    with pytest.raises(ValueError):
+        PricingSnapshot().with_updates(2, changes)
+
+
+def test_update_keeps_earlier_snapshots_consistent():
+    service = PaymentService(settings_file="")
+    before = service.pricing
+    version = service.update_settings({"base_delivery_rate": 5.0, "customer_base_fee": 3.49})
+    assert version == before.version + 1
+    assert (before.base_delivery_rate, before.customer_base_fee) == (3.50, 2.99)
+    assert (service.base_delivery_rate, service.customer_base_fee) == (5.0, 3.49)
+    assert service.get_settings()["pricing_version"] == version
+
+
+def test_settings_file_round_trip_and_hot_reload(tmp_path):
+    path = str(tmp_path / "payment_settings.json")
+    writer = PaymentService(settings_file=path)
+    writer.update_settings({"base_delivery_rate": 4.25}, updated_by="ops")
+
+    reader = PaymentService(settings_file=path, reload_check_seconds=0)
+    assert reader.base_delivery_rate == 4.25
+    assert reader.pricing.updated_by == "ops"
+    first_version = reader.pricing.version
+
+    # Another process edits the file
+    with open(path, encoding="utf-8") as settings_file:
+        settings = json.load(settings_file)
+    assert set(RULE_NAMES) <= set(settings)
+    settings["base_delivery_rate"] = 4.75
+    with open(path, "w", encoding="utf-8") as settings_file:
+        json.dump(settings, settings_file)
+    mtime = os.path.getmtime(path) + 10
+    os.utime(path, (mtime, mtime))
+
+    assert reader.base_delivery_rate == 4.75
+    assert reader.pricing.version == first_version + 1
+
+
+def test_broken_settings_file_keeps_current_rules(tmp_path):
+    path = tmp_path / "payment_settings.json"
+    service = PaymentService(settings_file=str(path), reload_check_seconds=0)
+    service.update_settings({"base_delivery_rate": 4.0})
+    path.write_text("{ not json")
+    mtime = os.path.getmtime(path) + 10
+    os.utime(path, (mtime, mtime))
+
+    assert not service.reload_if_changed()
+    assert service.base_delivery_rate == 4.0
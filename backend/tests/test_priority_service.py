@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+from models.delivery import PrioritySettings, RiderAction
+from services.priority_service import BONUS_ELIGIBLE_PRIORITY, PriorityService
+
+NOW = datetime(2026, 10, 14, 12, 0)
+
+
+def action(rider_id, kind, when, penalty=False):
+    return RiderAction(rider_id=rider_id, action=kind, timestamp=when, order_id="order", penalty_applied=penalty)
+
+
+def test_new_rider_is_ranked_on_first_availability():
+    service = PriorityService()
+    service.set_rider_available("new-rider", True)
+    assert service.queue.is_available("new-rider")
+    assert service.select_riders(1) == [{"rider_id": "new-rider", "priority_score": BONUS_ELIGIBLE_PRIORITY}]
+
+
+def test_new_busy_rider_is_parked_then_freed():
+    service = PriorityService()
+    service.set_rider_available("busy-rider", False)
+    assert "busy-rider" in service.queue
+    assert not service.queue.is_available("busy-rider")
+    service.set_rider_available("busy-rider", True)
+    assert service.queue.is_available("busy-rider")
+
+
+def test_actions_rerank_riders():
+    service = PriorityService()
+    service.set_rider_available("steady", True)
+    service.set_rider_available("sloppy", True)
+    for _ in range(3):
+        service.apply_rider_action(action("steady", "accept", NOW))
+        service.apply_rider_action(action("sloppy", "reject", NOW, penalty=True))
+    assert [rider["rider_id"] for rider in service.select_riders(2)] == ["steady", "sloppy"]
+
+
+def test_scores_refresh_when_actions_leave_the_window():
+    service = PriorityService()
+    window_days = service.efficiency.windows[service.efficiency.scoring_window]
+    long_ago = NOW - timedelta(days=window_days + 1)
+    for _ in range(4):
+        service.apply_rider_action(action("veteran", "accept", long_ago))
+    old_score = service.queue.score("veteran")
+
+    # Same day as the last scoring: nothing to do
+    service._scored_day = long_ago.date()
+    assert service.refresh_scores(long_ago) == 0
+    assert service.refresh_scores(NOW) == 1
+    assert service.queue.score("veteran") < old_score
+    assert service.refresh_scores(NOW) == 0
+
+
+def test_settings_change_rescores_immediately():
+    service = PriorityService()
+    service.apply_rider_action(action("rider", "accept", datetime.utcnow()))
+    before = service.queue.score("rider")
+    service.update_priority_settings(PrioritySettings(points_per_acceptance=10))
+    assert service.queue.score("rider") == before + 8
@@ -0,0 +1,65 @@
+import threading
+import time
+
+from services.payment_service import PaymentService
+from services.quote_cache import QuoteCache
+
+PICKUP = (50.7192, -1.8808)
+DROPOFF = (50.7400, -1.8600)
+
+
+def test_concurrent_misses_compute_once():
+    cache = QuoteCache(max_entries=10)
+    calls = []
+    start = threading.Barrier(8)
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return {"price": 4.2}
+
+    def worker():
+        start.wait()
+        results.append(cache.get_or_compute("route", 1, compute))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(value == {"price": 4.2} for value, _ in results)
+    assert cache.get_or_compute("route", 1, compute) == ({"price": 4.2}, True)
+    assert cache.get_stats()["misses"] == 1
+
+
+def test_new_pricing_version_invalidates():
+    cache = QuoteCache(max_entries=10)
+    assert cache.get_or_compute("route", 1, lambda: "v1") == ("v1", False)
+    assert cache.get_or_compute("route", 2, lambda: "v2") == ("v2", False)
+    assert cache.get_stats()["invalidations"] == 1
+
+
+def test_quote_hands_out_copies():
+    service = PaymentService(settings_file="")
+    first = service.quote_customer_charge(*PICKUP, *DROPOFF)
+    first["customer_charge"].total_charge = 0.0
+    first["customer_charge"].breakdown["tampered"] = True
+
+    second = service.quote_customer_charge(*PICKUP, *DROPOFF)
+    assert second["cached"]
+    assert second["customer_charge"].total_charge > 0
+    assert "tampered" not in second["customer_charge"].breakdown
+
+
+def test_quote_is_priced_on_the_distance_it_reports():
+    service = PaymentService(settings_file="")
+    payment = service.calculate_payment(*PICKUP, *DROPOFF, efficiency_percentage=90.0, order_value=20.0)
+    expected = service.calculate_customer_charge(
+        payment["quote_distance_km"], payment["quote_estimated_delivery_time"], 0.0
+    )
+    assert payment["customer_charge"].total_charge == expected.total_charge
+    assert payment["distance_km"] == service.calculate_distance_km(*PICKUP, *DROPOFF)
+    assert abs(payment["quote_distance_km"] - payment["distance_km"]) < 0.2
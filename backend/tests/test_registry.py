@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from services.registry import ServiceRegistry
+
+
+class Service:
+    def __init__(self, name, closed):
+        self.name = name
+        self.closed = closed
+        self.value = 1
+
+    async def close(self):
+        self.closed.append(self.name)
+
+
+def test_services_are_built_once_on_first_use():
+    registry = ServiceRegistry()
+    built = []
+    proxy = registry.lazy("a", lambda: built.append("a") or Service("a", []))
+    assert not registry.is_initialized("a")
+    assert repr(proxy) == "<LazyService a (lazy)>"
+    assert proxy.value == 1
+    proxy.value = 2
+    assert registry.get("a").value == 2
+    assert built == ["a"]
+    assert registry.get_status()["a"]["initialized"]
+
+
+def test_failed_factory_is_reported_and_retried():
+    registry = ServiceRegistry()
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("sdk missing")
+        return Service("b", [])
+
+    registry.register("b", factory)
+    assert registry.warm(["b"]) == {"b": "sdk missing"}
+    assert registry.get_status()["b"]["error"] == "sdk missing"
+    assert registry.get("b").name == "b"
+    assert registry.get_status()["b"]["error"] is None
+
+
+def test_shutdown_closes_newest_first_and_drops_instances():
+    registry = ServiceRegistry()
+    closed = []
+    registry.register("first", lambda: Service("first", closed))
+    registry.register("second", lambda: Service("second", closed))
+    first = registry.get("first")
+    registry.get("second")
+
+    asyncio.run(registry.shutdown())
+
+    assert closed == ["second", "first"]
+    assert not registry.is_initialized("first")
+    assert registry.get_status()["first"]["init_time_ms"] is None
+    # The next use builds a fresh instance
+    assert registry.get("first") is not first
+
+
+def test_unknown_service_raises():
+    with pytest.raises(KeyError):
+        ServiceRegistry().get("missing")
@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from services.route_optimizer import RouteOptimizer, build_distance_matrix, optimize_stop_sequence
+
+
+def random_points(count, seed=3):
+    rng = random.Random(seed)
+    return [(50.70 + rng.random() * 0.06, -1.92 + rng.random() * 0.1) for _ in range(count)]
+
+
+def test_route_visits_every_stop_once_from_the_start():
+    points = random_points(12)
+    result = optimize_stop_sequence(points, start=0)
+    assert result["order"][0] == 0
+    assert sorted(result["order"]) == list(range(12))
+
+
+def test_improvement_beats_the_nearest_neighbour_seed():
+    matrix = build_distance_matrix(random_points(30, seed=11))
+    optimizer = RouteOptimizer(matrix, time_limit_seconds=1.0)
+    assert optimizer.cost(optimizer.solve()) <= optimizer.cost(optimizer._nearest_neighbour())
+
+
+def test_fixed_end_and_precedence_are_kept():
+    points = random_points(10, seed=5)
+    precedence = [(1, 6), (2, 7), (3, 8), (4, 5)]
+    result = optimize_stop_sequence(points, start=0, end=9, precedence=precedence)
+    order = result["order"]
+    position = {stop: index for index, stop in enumerate(order)}
+    assert order[0] == 0 and order[-1] == 9
+    assert all(position[before] < position[after] for before, after in precedence)
+
+
+@pytest.mark.parametrize("precedence", [[(1, 9)], [(-1, 2)], [(2, 2)], [(1, 0)], [(3, 4)]])
+def test_invalid_precedence_is_rejected(precedence):
+    points = random_points(5)
+    with pytest.raises(ValueError):
+        optimize_stop_sequence(points, start=0, end=3, precedence=precedence)
+
+
+def test_precedence_cycle_is_rejected():
+    with pytest.raises(ValueError):
+        optimize_stop_sequence(random_points(4), precedence=[(1, 2), (2, 1)])
+
+
+def test_out_of_range_end_is_rejected():
+    with pytest.raises(ValueError):
+        optimize_stop_sequence(random_points(4), end=4)
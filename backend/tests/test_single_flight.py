@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.single_flight import AsyncSingleFlight, SingleFlight, coordinate_key
+
+
+def test_threads_share_one_execution():
+    flights = SingleFlight()
+    started = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return "value"
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(flights.do("key", load)))
+    owner.start()
+    started.wait()
+    waiters = [threading.Thread(target=lambda: results.append(flights.do("key", load))) for _ in range(4)]
+    for thread in waiters:
+        thread.start()
+    for thread in [owner] + waiters:
+        thread.join()
+
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert flights.get_stats()["calls_saved"] == 4
+
+
+def test_async_callers_share_result_and_errors():
+    async def scenario():
+        flights = AsyncSingleFlight()
+        calls = []
+
+        async def load(value):
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            if value == "bad":
+                raise RuntimeError("upstream failed")
+            return value
+
+        shared = await asyncio.gather(*(flights.do("a", load, "ok") for _ in range(3)))
+        failed = await asyncio.gather(*(flights.do("b", load, "bad") for _ in range(2)), return_exceptions=True)
+        return calls, shared, failed, flights.get_stats()
+
+    calls, shared, failed, stats = asyncio.run(scenario())
+    assert calls == ["ok", "bad"]
+    assert shared == ["ok"] * 3
+    assert all(isinstance(error, RuntimeError) for error in failed)
+    assert stats["errors"] == 1 and stats["in_flight"] == 0
+
+
+def test_cancelling_the_first_caller_does_not_fail_the_others():
+    async def scenario():
+        flights = AsyncSingleFlight()
+        release = asyncio.Event()
+
+        async def load():
+            await release.wait()
+            return 42
+
+        owner = asyncio.create_task(flights.do("key", load))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flights.do("key", load))
+        await asyncio.sleep(0)
+        owner.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return await waiter
+
+    assert asyncio.run(scenario()) == 42
+
+
+def test_coordinate_key_rounds_points():
+    assert coordinate_key((50.7192001, -1.8808), {"lat": 50.7192, "lng": -1.8808000004}) == \
+        ((50.7192, -1.8808), (50.7192, -1.8808))
@@ -0,0 +1,73 @@
+import random
+from datetime import datetime
+
+from services.traffic_profile import TrafficProfile, time_of_week_bucket
+
+ORIGIN = (50.7192, -1.8808)
+DESTINATION = (50.7400, -1.8600)
+MONDAY_6PM = datetime(2026, 10, 19, 18, 0)
+
+
+def make_profile(**kwargs):
+    return TrafficProfile(lambda lat, lng: "zone", profile_file="", **kwargs)
+
+
+def test_time_of_week_bucket():
+    assert time_of_week_bucket(datetime(2026, 10, 19, 0, 0)) == 0
+    assert time_of_week_bucket(MONDAY_6PM) == 18 * 4
+    assert time_of_week_bucket(datetime(2026, 10, 25, 23, 59)) == 671
+
+
+def test_steady_corridor_becomes_confident():
+    profile = make_profile()
+    for _ in range(10):
+        profile.record(ORIGIN, DESTINATION, 600, 780, when=MONDAY_6PM)
+    prediction = profile.predict(ORIGIN, DESTINATION, when=MONDAY_6PM)
+    assert prediction["confident"]
+    assert round(prediction["delay_ratio"], 3) == 1.3
+    assert prediction["relative_error"] < 0.01
+
+
+def test_confidence_follows_prediction_error_not_sample_count():
+    rng = random.Random(7)
+    profile = make_profile()
+    # A noisy slot: plenty of samples, but each one misses the mean by ~30%
+    for _ in range(200):
+        profile.record(ORIGIN, DESTINATION, 600, 600 * rng.choice((1.0, 1.8)), when=MONDAY_6PM)
+    prediction = profile.predict(ORIGIN, DESTINATION, when=MONDAY_6PM)
+    assert prediction["samples"] == 200
+    assert prediction["relative_error"] > 0.2
+    assert not prediction["confident"]
+
+
+def test_profile_keeps_tracking_after_a_shift():
+    profile = make_profile()
+    for _ in range(10):
+        profile.record(ORIGIN, DESTINATION, 600, 660, when=MONDAY_6PM)
+    assert profile.predict(ORIGIN, DESTINATION, when=MONDAY_6PM)["confident"]
+    # Roadworks: the first live refresh after the change knocks confidence out
+    profile.record(ORIGIN, DESTINATION, 600, 1200, when=MONDAY_6PM)
+    assert not profile.predict(ORIGIN, DESTINATION, when=MONDAY_6PM)["confident"]
+    for _ in range(30):
+        profile.record(ORIGIN, DESTINATION, 600, 1200, when=MONDAY_6PM)
+    prediction = profile.predict(ORIGIN, DESTINATION, when=MONDAY_6PM)
+    assert prediction["confident"]
+    assert abs(prediction["delay_ratio"] - 2.0) < 0.05
+
+
+def test_should_refresh_samples_confident_lookups():
+    profile = make_profile(refresh_rate=0.1)
+    profile.random.seed(1)
+    refreshes = sum(profile.should_refresh() for _ in range(5000))
+    assert 400 < refreshes < 600
+    assert profile.get_stats()["refreshes"] == refreshes
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "profile.json")
+    profile = make_profile()
+    for _ in range(6):
+        profile.record(ORIGIN, DESTINATION, 600, 720, when=MONDAY_6PM)
+    profile.save(path)
+    loaded = TrafficProfile(lambda lat, lng: "zone", profile_file=path)
+    assert loaded.predict(ORIGIN, DESTINATION, when=MONDAY_6PM) == profile.predict(ORIGIN, DESTINATION, when=MONDAY_6PM)
@@ -120,23 +120,27 @@ function DeliveryRequests() {
     setRejectionReason('');
   };
 
-  const isWithinPenaltyWindow = (preparationStartTime) => {
-    if (!preparationStartTime) return true;
+  // The server sends each restaurant's learned grace period; 10 minutes if it is missing
+  const getGracePeriodEnd = (request) => {
+    if (request.grace_period_ends_at) return new Date(request.grace_period_ends_at);
+    if (!request.preparation_start_time) return null;
     
-    const prepTime = new Date(preparationStartTime);
-    const now = new Date();
-    const gracePeriodEnd = new Date(prepTime.getTime() + (10 * 60 * 1000)); // 10 minutes
+    const prepTime = new Date(request.preparation_start_time);
+    return new Date(prepTime.getTime() + (10 * 60 * 1000));
+  };
+
+  const isWithinPenaltyWindow = (request) => {
+    const gracePeriodEnd = getGracePeriodEnd(request);
+    if (!gracePeriodEnd) return true;
     
-    return now < gracePeriodEnd;
+    return new Date() < gracePeriodEnd;
   };
 
-  const getTimeRemaining = (preparationStartTime) => {
-    if (!preparationStartTime) return null;
+  const getTimeRemaining = (request) => {
+    const gracePeriodEnd = getGracePeriodEnd(request);
+    if (!gracePeriodEnd) return null;
     
-    const prepTime = new Date(preparationStartTime);
     const now = new Date();
-    const gracePeriodEnd = new Date(prepTime.getTime() + (10 * 60 * 1000));
-    
     if (now >= gracePeriodEnd) return null;
     
     const timeRemaining = Math.ceil((gracePeriodEnd - now) / 1000 / 60);
@@ -168,8 +172,8 @@ function DeliveryRequests() {
       ) : (
         <div className="space-y-4">
           {requests.map((request) => {
-            const timeRemaining = getTimeRemaining(request.preparation_start_time);
-            const isPenaltyWindow = isWithinPenaltyWindow(request.preparation_start_time);
+            const timeRemaining = getTimeRemaining(request);
+            const isPenaltyWindow = isWithinPenaltyWindow(request);
             
             return (
               <div key={request.id} className="border border-gray-200 rounded-lg p-4 hover:shadow-md transition-shadow duration-200">
@@ -288,12 +292,12 @@ function DeliveryRequests() {
             </div>
             
             <div className="mb-6">
-              {isWithinPenaltyWindow(selectedRequest.preparation_start_time) ? (
+              {isWithinPenaltyWindow(selectedRequest) ? (
                 <div className="text-red-700 bg-red-50 p-3 rounded-lg border border-red-200">
                   <p className="font-medium mb-2">⚠️ Efficiency Impact Warning</p>
                   <p className="text-sm">
                     Rejecting this order now will lower your efficiency score and points. 
-                    If you wait until the restaurant preparation window ends (10 minutes), no penalty will be applied.
+                    If you wait until the restaurant preparation window ends, no penalty will be applied.
                   </p>
                   <p className="text-sm mt-2 font-medium">
                     Are you sure you want to reject?